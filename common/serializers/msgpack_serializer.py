@@ -18,6 +18,14 @@ class MsgPackSerializer(MappingSerializer, StreamSerializer):
     The serializer preserves the order (in sorted order)
     '"""
 
+    def __eq__(self, other):
+        # The serializer has no state, all instances serialize data the same
+        # way
+        return type(other) is type(self)
+
+    def __hash__(self):
+        return hash(type(self))
+
     def serialize(self, data: Dict, fields=None, toBytes=True):
         """
         Serializes a dict to bytes preserving the order (in sorted order)
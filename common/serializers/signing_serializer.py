@@ -47,6 +47,10 @@ class SigningSerializer:
         >>> signing.serlize({1:'a', 2:'b', 3:[1,{2:'k'}]})
         '1:a|2:b|3:1,2:k'
 
+        Nested data structures are serialized using an explicit stack instead
+        of recursion, the output is identical to serializing each nested
+        value separately and joining the results.
+
         :param obj: the object to serlize
         :param level: a parameter used internally for recursion to serialize nested
          data structures
@@ -54,34 +58,77 @@ class SigningSerializer:
          serialization
         :return: a string representation of `obj`
         """
-        res = None
-        if not isinstance(obj, acceptableTypes):
-            error("invalid type found {}: {}".format(objname, obj))
-        elif isinstance(obj, str):
-            res = obj
-        elif isinstance(obj, dict):
-            if level > 0:
-                keys = list(obj.keys())
+        parts = []
+        # Items are either strings to be output as is or tuples of a value to
+        # serialize, its nesting level and its name
+        stack = [(obj, level, objname)]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            item = pop()
+            if item.__class__ is str:
+                parts.append(item)
+                continue
+            o, lvl, nm = item
+            cls = o.__class__
+            if cls is dict or cls is list:
+                pass
+            elif not isinstance(o, acceptableTypes):
+                error("invalid type found {}: {}".format(nm, o))
+            elif isinstance(o, str):
+                parts.append(o)
+                continue
+            elif not isinstance(o, (dict, Iterable)):
+                if o is not None:
+                    parts.append(str(o))
+                continue
+
+            if isinstance(o, dict):
+                if lvl > 0:
+                    keys = list(o.keys())
+                else:
+                    topLevelKeysToIgnore = topLevelKeysToIgnore or []
+                    keys = [k for k in o.keys() if k not in topLevelKeysToIgnore]
+                keys.sort()
+                children = [(k, o[k]) for k in keys]
+                sep = "|"
             else:
-                topLevelKeysToIgnore = topLevelKeysToIgnore or []
-                keys = [k for k in obj.keys() if k not in topLevelKeysToIgnore]
-            keys.sort()
-            strs = []
-            for k in keys:
-                onm = ".".join([objname, k]) if objname else k
-                strs.append(
-                    str(k) + ":" + self.serialize(obj[k], level + 1, onm, toBytes=False))
-            res = "|".join(strs)
-        elif isinstance(obj, Iterable):
-            strs = []
-            for o in obj:
-                strs.append(self.serialize(
-                    o, level + 1, objname, toBytes=False))
-            res = ",".join(strs)
-        elif obj is None:
-            res = ""
-        else:
-            res = str(obj)
+                children = [(None, v) for v in o]
+                sep = ","
+
+            # Children are pushed in reverse so that they are popped in order.
+            # Values of the most common primitive types are serialized right
+            # away along with the separator and key preceding them
+            lvl += 1
+            i = len(children)
+            for k, v in reversed(children):
+                i -= 1
+                if k is None:
+                    prefix = sep if i else ""
+                else:
+                    if nm and not (isinstance(nm, str) and isinstance(k, str)):
+                        # names of nested values are made by joining keys
+                        # which are strings
+                        raise TypeError(
+                            "cannot serialize key {!r} of {}, keys of nested "
+                            "mappings must be strings".format(k, nm))
+                    prefix = (sep + str(k) + ":") if i else (str(k) + ":")
+                vcls = v.__class__
+                if vcls is str:
+                    push(prefix + v)
+                elif vcls is int or vcls is float or vcls is bool:
+                    push(prefix + str(v))
+                elif v is None:
+                    push(prefix)
+                else:
+                    if k is None:
+                        push((v, lvl, nm))
+                    else:
+                        push((v, lvl, ".".join([nm, k]) if nm else k))
+                    if prefix:
+                        push(prefix)
+
+        res = "".join(parts)
 
         # logger.trace("serialized msg {} into {}".format(obj, res))
 
@@ -89,6 +136,3 @@ class SigningSerializer:
             return res
 
         return res.encode('utf-8')
-
-        # topLevelKeysToIgnore = topLevelKeysToIgnore or []
-        # return ujson.dumps({k:obj[k] for k in obj.keys() if k not in topLevelKeysToIgnore}, sort_keys=True)
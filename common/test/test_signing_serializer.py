@@ -0,0 +1,151 @@
+import random
+import string
+from collections import Iterable, OrderedDict
+
+import pytest
+
+from common.serializers.signing_serializer import SigningSerializer, \
+    acceptableTypes
+
+serializer = SigningSerializer()
+
+
+def reference_serialize(obj, level=0, objname=None, topLevelKeysToIgnore=None,
+                        toBytes=True):
+    """
+    The original recursive implementation of `SigningSerializer.serialize`,
+    serialized messages have to stay byte-identical to it since signatures
+    are made over them
+    """
+    res = None
+    if not isinstance(obj, acceptableTypes):
+        raise Exception("invalid type found {}: {}".format(objname, obj))
+    elif isinstance(obj, str):
+        res = obj
+    elif isinstance(obj, dict):
+        if level > 0:
+            keys = list(obj.keys())
+        else:
+            topLevelKeysToIgnore = topLevelKeysToIgnore or []
+            keys = [k for k in obj.keys() if k not in topLevelKeysToIgnore]
+        keys.sort()
+        strs = []
+        for k in keys:
+            onm = ".".join([objname, k]) if objname else k
+            strs.append(str(k) + ":" +
+                        reference_serialize(obj[k], level + 1, onm,
+                                            toBytes=False))
+        res = "|".join(strs)
+    elif isinstance(obj, Iterable):
+        strs = []
+        for o in obj:
+            strs.append(reference_serialize(o, level + 1, objname,
+                                            toBytes=False))
+        res = ",".join(strs)
+    elif obj is None:
+        res = ""
+    else:
+        res = str(obj)
+    if not toBytes:
+        return res
+    return res.encode('utf-8')
+
+
+corpus = [
+    ("str", b"str"),
+    ("", b""),
+    ("строка", "строка".encode()),
+    (1, b"1"),
+    (-14.5, b"-14.5"),
+    (True, b"True"),
+    (None, b""),
+    ([], b""),
+    ({}, b""),
+    ([1, 2, 3, 4, 5], b"1,2,3,4,5"),
+    ([[1, 2], [], [3]], b"1,2,,3"),
+    ({1: 'a', 2: 'b'}, b"1:a|2:b"),
+    ({'b': None, 'a': [None, 1]}, b"a:,1|b:"),
+    (OrderedDict([('z', 1), ('a', 2)]), b"a:2|z:1"),
+    ({'a': {'c': {'e': 'f', 'd': [1, {'y': 2, 'x': 3}]}, 'b': []}},
+     b"a:b:|c:d:1,x:3|y:2|e:f"),
+    ({'identifier': '5G72199XZB7wREviUbQma7',
+      'reqId': 1507732000123456,
+      'operation': {'type': '1', 'dest': 'GEzcdDLhCpGCYRHW82kjHd',
+                    'verkey': '~HmUWn928bnFT6Ephf65YXv', 'role': None},
+      'signature': '3SyRto3MGcBy1o4UmHoDezy1TJiNHDdU9o7TjHtYcSqgtpWzejMoHDr'},
+     b"identifier:5G72199XZB7wREviUbQma7|operation:dest:GEzcdDLhCpGCYRHW82kjHd"
+     b"|role:|type:1|verkey:~HmUWn928bnFT6Ephf65YXv|reqId:1507732000123456|"
+     b"signature:3SyRto3MGcBy1o4UmHoDezy1TJiNHDdU9o7TjHtYcSqgtpWzejMoHDr"),
+]
+
+
+@pytest.mark.parametrize('obj, expected', corpus)
+def test_serialize_corpus(obj, expected):
+    assert serializer.serialize(obj) == expected
+    assert serializer.serialize(obj, toBytes=False) == expected.decode()
+    assert reference_serialize(obj) == expected
+
+
+def test_top_level_keys_ignored():
+    msg = {'a': 1, 'signature': 'sig', 'b': {'signature': 'nested'}}
+    expected = b"a:1|b:signature:nested"
+    assert serializer.serialize(
+        msg, topLevelKeysToIgnore=['signature']) == expected
+    assert reference_serialize(
+        msg, topLevelKeysToIgnore=['signature']) == expected
+
+
+@pytest.mark.parametrize('obj', [
+    (1, 2),
+    {'a': {'b': b'bytes'}},
+    [1, {'a': {1, 2}}],
+    {'a': [{'b': object()}]},
+])
+def test_invalid_types_rejected(obj):
+    with pytest.raises(Exception) as refErr:
+        reference_serialize(obj)
+    with pytest.raises(Exception) as err:
+        serializer.serialize(obj)
+    assert str(err.value) == str(refErr.value)
+
+
+def test_non_string_nested_keys_rejected():
+    obj = {'a': {'b': {1: 'c'}}}
+    with pytest.raises(TypeError):
+        reference_serialize(obj)
+    with pytest.raises(TypeError) as err:
+        serializer.serialize(obj)
+    assert 'a.b' in str(err.value)
+
+
+def random_value(depth=0):
+    kinds = ['str', 'int', 'float', 'bool', 'none']
+    if depth < 4:
+        kinds += ['list', 'dict'] * 2
+    kind = random.choice(kinds)
+    if kind == 'str':
+        return ''.join(random.choice(string.printable + 'ёж')
+                       for _ in range(random.randint(0, 10)))
+    if kind == 'int':
+        return random.randint(-10 ** 12, 10 ** 12)
+    if kind == 'float':
+        return random.uniform(-1000, 1000)
+    if kind == 'bool':
+        return random.choice([True, False])
+    if kind == 'none':
+        return None
+    if kind == 'list':
+        return [random_value(depth + 1) for _ in range(random.randint(0, 5))]
+    return {''.join(random.choice(string.ascii_letters)
+                    for _ in range(random.randint(1, 6))):
+            random_value(depth + 1) for _ in range(random.randint(0, 5))}
+
+
+def test_serialize_same_as_reference_for_random_msgs():
+    random.seed(42)
+    for _ in range(2000):
+        msg = {'identifier': random_value(4), 'reqId': random_value(4),
+               'operation': random_value(1), 'signature': random_value(4)}
+        assert serializer.serialize(
+            msg, topLevelKeysToIgnore=['signature']) == reference_serialize(
+            msg, topLevelKeysToIgnore=['signature'])
@@ -1,10 +1,10 @@
-import functools
 from binascii import hexlify
 from typing import List, Tuple, Sequence
 
 import ledger.merkle_tree as merkle_tree
 from ledger.hash_stores.hash_store import HashStore
 from ledger.hash_stores.memory_hash_store import MemoryHashStore
+from ledger.subtree_hash_cache import SubtreeHashCache
 from ledger.tree_hasher import TreeHasher
 from ledger.util import count_bits_set, lowest_bit_set
 from ledger.util import ConsistencyVerificationFailed
@@ -20,11 +20,14 @@ class CompactMerkleTree(merkle_tree.MerkleTree):
     """
 
     def __init__(self, hasher=TreeHasher(), tree_size=0, hashes=(),
-                 hashStore=None):
+                 hashStore=None, hashCache=None):
 
         # These two queues should be written to two simple position-accessible
         # arrays (files, database tables, etc.)
         self.__hashStore = hashStore or MemoryHashStore()  # type: HashStore
+        # Hashes of complete subtrees used by proofs
+        self.__hashCache = hashCache if hashCache is not None \
+            else SubtreeHashCache()  # type: SubtreeHashCache
         self.__hasher = hasher
         self._update(tree_size, hashes)
 
@@ -32,6 +35,10 @@ class CompactMerkleTree(merkle_tree.MerkleTree):
     def hashStore(self):
         return self.__hashStore
 
+    @property
+    def hashCache(self):
+        return self.__hashCache
+
     def _update(self, tree_size: int, hashes: Sequence[bytes]):
         bits_set = count_bits_set(tree_size)
         num_hashes = len(hashes)
@@ -160,30 +167,54 @@ class CompactMerkleTree(merkle_tree.MerkleTree):
         self._push_subtree([new_leaf])
         return auditPath
 
-    def extend(self, new_leaves: List[bytes]):
+    def extend(self, new_leaves: List[bytes]) -> List[Tuple[bytes]]:
         """Extend this tree with new_leaves on the end.
 
-        The algorithm works by using _push_subtree() as a primitive, calling
-        it with the maximum number of allowed leaves until we can add the
-        remaining leaves as a valid entire (non-full) subtree in one go.
+        Leaves are pushed one at a time like append() does, so the hash store
+        gets the same leaves and nodes, but they are written to it at once.
+
+        Returns: the hashes of this tree after each of new_leaves is pushed,
+        the hashes before a leaf is pushed, reversed, are its audit path.
         """
-        size = len(new_leaves)
-        final_size = self.tree_size + size
-        idx = 0
-        while True:
-            # keep pushing subtrees until mintree_size > remaining
-            max_h = self.__mintree_height
-            max_size = 1 << (max_h - 1) if max_h > 0 else 0
-            if max_h > 0 and size - idx >= max_size:
-                self._push_subtree(new_leaves[idx:idx + max_size])
-                idx += max_size
-            else:
-                break
-        # fill in rest of tree in one go, now that we can
-        if idx < size:
-            root_hash, hashes = self.__hasher._hash_full(new_leaves, idx, size)
-            self._update(final_size, self.hashes + hashes)
-        assert self.tree_size == final_size
+        leaf_hashes, nodes, hashes = self.push_leaves(new_leaves)
+        self.store_hashes(leaf_hashes, nodes)
+        return hashes
+
+    def push_leaves(self, new_leaves: List[bytes]):
+        """Push new_leaves on the end of this tree without writing to the
+        hash store.
+
+        Returns: a tuple of the hashes of the leaves, the new nodes and the
+        hashes of this tree after each of new_leaves is pushed.
+        """
+        leaf_hashes = []
+        nodes = []
+        hashes = []
+        for leaf in new_leaves:
+            leaf_hash = self.__hasher.hash_leaf(leaf)
+            new_node_hashes = self.__push_subtree_hash(1, leaf_hash)
+            leaf_hashes.append(leaf_hash)
+            nodes.extend((self.tree_size, height, h)
+                         for h, height in new_node_hashes)
+            hashes.append(self.__hashes)
+        return leaf_hashes, nodes, hashes
+
+    def push_subtree_hash(self, subtree_h: int, sub_hash: bytes):
+        """Push the root hash of a full subtree of height subtree_h (of
+        2^(subtree_h - 1) leaves) on the end of this tree without writing to
+        the hash store, like _push_subtree() does for its leaves.
+
+        Returns: the new nodes.
+        """
+        new_node_hashes = self.__push_subtree_hash(subtree_h, sub_hash)
+        return [(self.tree_size, height, h) for h, height in new_node_hashes]
+
+    def store_hashes(self, leaf_hashes: List[bytes], nodes: List[Tuple]):
+        """Write hashes of leaves and nodes pushed by push_leaves() to the
+        hash store."""
+        if self.hashStore:
+            self.hashStore.writeLeafs(leaf_hashes)
+            self.hashStore.writeNodes(nodes)
 
     def extended(self, new_leaves: List[bytes]):
         """Returns a new tree equal to this tree extended with new_leaves."""
@@ -195,12 +226,25 @@ class CompactMerkleTree(merkle_tree.MerkleTree):
         mth = self.merkle_tree_hash(start, end)
         return hexlify(mth)
 
-    @functools.lru_cache(maxsize=256)
     def merkle_tree_hash(self, start: int, end: int):
         if not end > start:
             raise ValueError("end must be greater than start")
-        if (end - start) == 1:
-            return self.hashStore.readLeaf(end)
+        width = end - start
+        if width & (width - 1) == 0 and start % width == 0:
+            # A complete subtree, it is a leaf or a node of the hash store
+            h = self.__hashCache.get(start, end)
+            if h is None:
+                h = self.hashStore.readLeaf(end) if width == 1 else \
+                    self.hashStore.readNodeByTree(end, width.bit_length() - 1)
+                self.__hashCache.put(start, end, h)
+            return h
+        split = 1 << (width.bit_length() - 1)
+        if start % (2 * split) == 0:
+            # A complete subtree followed by the rest of the leaves, like
+            # the ranges of proofs
+            return self.__hasher.hash_children(
+                self.merkle_tree_hash(start, start + split),
+                self.merkle_tree_hash(start + split, end))
         leafs, nodes = self.hashStore.getPath(end, start)
         leafHash = self.hashStore.readLeaf(end)
         hashes = [leafHash, ]
@@ -44,6 +44,19 @@ class FileHashStore(HashStore):
                     size, dataSize))
         store.put(key=None, value=data)
 
+    @classmethod
+    def writeMany(cls, datas, store, size):
+        # Entries are of fixed size and have no separators, so they are
+        # written to the file as a single value
+        datas = [d if isinstance(d, bytes) else d.encode() for d in datas]
+        for data in datas:
+            if len(data) != size:
+                raise ValueError(
+                    "Data size not allowed. Size of the data should be "
+                    "{} but instead was {}".format(size, len(data)))
+        if datas:
+            store.put(key=None, value=b''.join(datas))
+
     @staticmethod
     def read(store: KeyValueStorageFile, entryNo, size):
         store.db_file.seek((entryNo - 1) * size)
@@ -72,6 +85,13 @@ class FileHashStore(HashStore):
     def writeLeaf(self, leafHash):
         self.write(leafHash, self.leavesFile, self.leafSize)
 
+    def writeNodes(self, nodes):
+        self.writeMany([node[2] for node in nodes], self.nodesFile,
+                       self.nodeSize)
+
+    def writeLeafs(self, leafHashes):
+        self.writeMany(leafHashes, self.leavesFile, self.leafSize)
+
     def readNode(self, pos):
         data = self.read(self.nodesFile, pos, self.nodeSize)
         if len(data) < self.nodeSize:
@@ -110,6 +130,10 @@ class FileHashStore(HashStore):
         self.nodesFile.open()
         self.leavesFile.open()
 
+    def sync(self):
+        self.nodesFile.sync()
+        self.leavesFile.sync()
+
     def close(self):
         self.nodesFile.close()
         self.leavesFile.close()
@@ -29,6 +29,34 @@ class HashStore:
         :param node: tuple of start, height and nodeHash
         """
 
+    def writeLeafs(self, leafHashes):
+        """
+        append the leafHashes to the leaf hash store
+
+        :param leafHashes: hashes of the leaves
+        """
+        for leafHash in leafHashes:
+            self.writeLeaf(leafHash)
+
+    def writeNodes(self, nodes):
+        """
+        append the nodes to the node hash store.
+
+        :param nodes: tuples of start, height and nodeHash
+        """
+        for node in nodes:
+            self.writeNode(node)
+
+    def flush(self):
+        """
+        Make sure written hashes are stored, for hash stores buffering them
+        """
+
+    def sync(self):
+        """
+        Make the stored hashes durable, see `KeyValueStorage.sync`
+        """
+
     @abstractmethod
     def readLeaf(self, pos):
         """
@@ -0,0 +1,223 @@
+import mmap
+import os
+
+from ledger.hash_stores.hash_store import HashStore
+
+
+class MmapHashFile:
+    """
+    File of fixed size hashes read through a memory map. Appended hashes are
+    buffered and written to the file when flushed, until then they are read
+    from the buffer.
+    """
+
+    def __init__(self, path, entrySize, ensureDurability=True):
+        self.path = path
+        self.entrySize = entrySize
+        self.ensureDurability = ensureDurability
+        self._file = None
+        self._map = None
+        self._mappedCount = 0
+        self._fileCount = 0
+        self._pending = []
+
+    @property
+    def closed(self):
+        return self._file is None
+
+    @property
+    def count(self) -> int:
+        return self._fileCount + len(self._pending)
+
+    @property
+    def pendingCount(self) -> int:
+        return len(self._pending)
+
+    def open(self):
+        self._file = open(self.path, mode="a+b")
+        self._fileCount = os.fstat(self._file.fileno()).st_size // \
+            self.entrySize
+        self._map = None
+        self._mappedCount = 0
+
+    def close(self):
+        self.flush()
+        self._unmap()
+        self._file.close()
+        self._file = None
+
+    def reset(self):
+        self._pending = []
+        self._unmap()
+        self._file.truncate(0)
+        self._fileCount = 0
+
+    def append(self, data):
+        if not isinstance(data, bytes):
+            data = data.encode()
+        if len(data) != self.entrySize:
+            raise ValueError(
+                "Data size not allowed. Size of the data should be "
+                "{} but instead was {}".format(self.entrySize, len(data)))
+        self._pending.append(data)
+
+    def flush(self):
+        if not self._pending:
+            return
+        self._file.write(b''.join(self._pending))
+        self._file.flush()
+        if self.ensureDurability:
+            os.fsync(self._file.fileno())
+        self._fileCount += len(self._pending)
+        self._pending = []
+
+    def sync(self):
+        os.fsync(self._file.fileno())
+
+    def read(self, pos) -> bytes:
+        if pos > self._fileCount:
+            return self._pending[pos - self._fileCount - 1]
+        start = (pos - 1) * self.entrySize
+        return self._mapped(pos)[start:start + self.entrySize]
+
+    def readRange(self, startPos, endPos):
+        """
+        Return hashes from `startPos` to `endPos` (both inclusive), the ones
+        in the file are memoryview slices of the memory map.
+        """
+        fileEnd = min(endPos, self._fileCount)
+        hashes = []
+        if startPos <= fileEnd:
+            view = memoryview(self._mapped(fileEnd))
+            hashes.extend(view[(pos - 1) * self.entrySize:
+                               pos * self.entrySize]
+                          for pos in range(startPos, fileEnd + 1))
+        hashes.extend(self._pending[max(startPos, fileEnd + 1) -
+                                    self._fileCount - 1:
+                                    endPos - self._fileCount])
+        return hashes
+
+    def _mapped(self, pos):
+        if pos > self._mappedCount:
+            # The file grew since it was mapped, views of the old map keep
+            # it open until they are released
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+            self._mappedCount = self._fileCount
+        return self._map
+
+    def _unmap(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # Hashes read with `readRange` are still in use
+                pass
+        self._map = None
+        self._mappedCount = 0
+
+
+class MmapHashStore(HashStore):
+    """
+    Hash store with the same files as `FileHashStore`, read through memory
+    maps. Written hashes are buffered and written to the files when the
+    store is flushed (after each committed batch), closed or when
+    `flushEvery` hashes are buffered. Hashes lost in a crash are recovered
+    from the transaction log like for any incomplete hash store.
+    """
+
+    def __init__(self, dataDir, fileNamePrefix="", leafSize=32, nodeSize=32,
+                 flushEvery=1000, ensureDurability=True):
+        self.dataDir = dataDir
+        self.fileNamePrefix = fileNamePrefix
+        self.flushEvery = flushEvery
+        os.makedirs(dataDir, exist_ok=True)
+        self.nodesFile = MmapHashFile(
+            os.path.join(dataDir, fileNamePrefix + "_merkleNodes.bin"),
+            nodeSize, ensureDurability)
+        self.leavesFile = MmapHashFile(
+            os.path.join(dataDir, fileNamePrefix + "_merkleLeaves.bin"),
+            leafSize, ensureDurability)
+        self.open()
+
+    @property
+    def is_persistent(self) -> bool:
+        return True
+
+    def writeLeaf(self, leafHash):
+        self.leavesFile.append(leafHash)
+        self._flushIfNeeded()
+
+    def writeNode(self, node):
+        self.nodesFile.append(node[2])
+        self._flushIfNeeded()
+
+    def writeLeafs(self, leafHashes):
+        for leafHash in leafHashes:
+            self.leavesFile.append(leafHash)
+        self._flushIfNeeded()
+
+    def writeNodes(self, nodes):
+        for node in nodes:
+            self.nodesFile.append(node[2])
+        self._flushIfNeeded()
+
+    def flush(self):
+        self.leavesFile.flush()
+        self.nodesFile.flush()
+
+    def sync(self):
+        # Only the hashes flushed to the files are synced
+        self.leavesFile.sync()
+        self.nodesFile.sync()
+
+    def _flushIfNeeded(self):
+        if self.leavesFile.pendingCount + self.nodesFile.pendingCount >= \
+                self.flushEvery:
+            self.flush()
+
+    def readLeaf(self, pos):
+        self._checkPos(pos, self.leafCount, "leaf")
+        return self.leavesFile.read(pos)
+
+    def readNode(self, pos):
+        self._checkPos(pos, self.nodeCount, "node")
+        return self.nodesFile.read(pos)
+
+    def readLeafs(self, startpos, endpos):
+        self._validatePos(startpos)
+        return self.leavesFile.readRange(startpos, min(endpos, self.leafCount))
+
+    def readNodes(self, startpos, endpos):
+        self._validatePos(startpos)
+        return self.nodesFile.readRange(startpos, min(endpos, self.nodeCount))
+
+    def _checkPos(self, pos, count, kind):
+        self._validatePos(pos)
+        if pos > count:
+            raise IndexError("No {} at given position".format(kind))
+
+    @property
+    def leafCount(self) -> int:
+        return self.leavesFile.count
+
+    @property
+    def nodeCount(self) -> int:
+        return self.nodesFile.count
+
+    @property
+    def closed(self):
+        return self.nodesFile.closed and self.leavesFile.closed
+
+    def open(self):
+        self.nodesFile.open()
+        self.leavesFile.open()
+
+    def close(self):
+        self.nodesFile.close()
+        self.leavesFile.close()
+
+    def reset(self):
+        self.nodesFile.reset()
+        self.leavesFile.reset()
+        return True
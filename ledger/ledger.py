@@ -1,5 +1,9 @@
 import logging
+import multiprocessing
 import time
+from collections import deque
+from itertools import islice
+from typing import Iterable, List, Sequence, Tuple
 
 import base58
 from common.serializers.mapping_serializer import MappingSerializer
@@ -8,8 +12,13 @@ from ledger.genesis_txn.genesis_txn_initiator import GenesisTxnInitiator
 from ledger.immutable_store import ImmutableStore
 from ledger.merkle_tree import MerkleTree
 from ledger.tree_hasher import TreeHasher
-from ledger.util import F, ConsistencyVerificationFailed
+from ledger.tree_recovery import hash_chunk, init_worker, \
+    serialize_entry_for_tree
+from ledger.txn_index import TxnIndex
+from ledger.util import F, ConsistencyVerificationFailed, count_bits_set, \
+    lowest_bit_set
 from storage.kv_store import KeyValueStorage
+from storage.kv_store_leveldb import KeyValueStorageLeveldb
 from storage.kv_store_leveldb_int_keys import KeyValueStorageLeveldbIntKeys
 
 
@@ -21,6 +30,10 @@ class Ledger(ImmutableStore):
                       open=True) -> KeyValueStorage:
         return KeyValueStorageLeveldbIntKeys(dataDir, logName, open)
 
+    @staticmethod
+    def _defaultIndexStore(dataDir, logName) -> KeyValueStorage:
+        return KeyValueStorageLeveldb(dataDir, logName + '_index')
+
     def __init__(self,
                  tree: MerkleTree,
                  dataDir: str,
@@ -29,7 +42,11 @@ class Ledger(ImmutableStore):
                  fileName: str = None,
                  ensureDurability: bool = True,
                  transactionLogStore: KeyValueStorage = None,
-                 genesis_txn_initiator: GenesisTxnInitiator = None):
+                 genesis_txn_initiator: GenesisTxnInitiator = None,
+                 indexes: Sequence[Sequence[str]] = (),
+                 indexStore: KeyValueStorage = None,
+                 recoveryProcesses: int = 0,
+                 recoveryChunkSize: int = 2 ** 14):
         """
         :param tree: an implementation of MerkleTree
         :param dataDir: the directory where the transaction log is stored
@@ -37,6 +54,15 @@ class Ledger(ImmutableStore):
         it and storing it in the MerkleTree
         :param fileName: the name of the transaction log file
         :param genesis_txn_initiator: file or dir to use for initialization of transaction log store
+        :param indexes: fields of the secondary indexes used by `get`, each
+        index covers queries on exactly its fields
+        :param indexStore: key value store of the indexes, a leveldb next to
+        the transaction log by default
+        :param recoveryProcesses: number of processes hashing the transaction
+        log when the tree is recovered from it, it is hashed in the ledger
+        process if not more than 1
+        :param recoveryChunkSize: number of transactions hashed at once by a
+        recovery process, a power of 2
         """
         self.genesis_txn_initiator = genesis_txn_initiator
 
@@ -51,8 +77,22 @@ class Ledger(ImmutableStore):
         self.ensureDurability = ensureDurability
         self._customTransactionLogStore = transactionLogStore
         self.seqNo = 0
+        self.recoveryProcesses = recoveryProcesses
+        assert recoveryChunkSize > 0 and \
+            recoveryChunkSize & (recoveryChunkSize - 1) == 0
+        self.recoveryChunkSize = recoveryChunkSize
+        # Sequence number of the first leaf of the last batch added with
+        # `addBatch` and the hashes of the tree before and after each of its
+        # leaves was added
+        self._lastBatch = None
+        self._index = TxnIndex(
+            indexStore or self._defaultIndexStore(dataDir,
+                                                  self._transactionLogName),
+            indexes) if indexes else None
         self.start()
         self.recoverTree()
+        if self._index:
+            self._index.sync(lambda frm: self.getAllTxn(frm=frm), self.size)
         if self.genesis_txn_initiator and self.size == 0:
             self.genesis_txn_initiator.init_ledger_from_genesis_txn(self)
 
@@ -84,13 +124,67 @@ class Ledger(ImmutableStore):
     def recoverTreeFromTxnLog(self):
         # TODO: in this and some other lines specific fields of
         self.tree.hashStore.reset()
+        self.tree.hashCache.clear()
+        if self.recoveryProcesses > 1:
+            self.recoverTreeFromTxnLogInParallel()
+            return
         for key, entry in self._transactionLog.iterator():
-            if self.txn_serializer != self.hash_serializer:
-                entry = self.serialize_for_tree(
-                    self.txn_serializer.deserialize(entry))
-            if isinstance(entry, str):
-                entry = entry.encode()
-            self._addToTreeSerialized(entry)
+            self._addToTreeSerialized(serialize_entry_for_tree(
+                entry, self.txn_serializer, self.hash_serializer))
+
+    def recoverTreeFromTxnLogInParallel(self):
+        """
+        Recover the tree from the transaction log with `recoveryProcesses`
+        processes. Chunks of `recoveryChunkSize` transactions are hashed
+        in the processes as full subtrees, which are pushed on the tree in
+        order with their hashes written to the hash store at once.
+        """
+        chunkHeight = self.recoveryChunkSize.bit_length()
+        entries = (entry for _, entry in self._transactionLog.iterator())
+        self.tree._update(0, ())
+        lastReport = time.perf_counter()
+        with multiprocessing.Pool(
+                self.recoveryProcesses, initializer=init_worker,
+                initargs=(self.txn_serializer, self.hash_serializer)) as pool:
+            # Only a few chunks are read ahead of the ones hashed
+            pending = deque()
+            start = 0
+            while True:
+                while len(pending) < 2 * self.recoveryProcesses:
+                    chunk = list(islice(entries, self.recoveryChunkSize))
+                    if not chunk:
+                        break
+                    pending.append(
+                        (len(chunk),
+                         pool.apply_async(hash_chunk, (chunk, start))))
+                    start += len(chunk)
+                if not pending:
+                    break
+                size, result = pending.popleft()
+                leafHashes, nodes, hashes = result.get()
+                if size == self.recoveryChunkSize:
+                    nodes.extend(self.tree.push_subtree_hash(chunkHeight,
+                                                             hashes[0]))
+                else:
+                    # Only the last chunk can be partial
+                    self.tree._update(self.tree.tree_size + size,
+                                      self.tree.hashes + tuple(hashes))
+                self.tree.store_hashes(leafHashes, nodes)
+                if time.perf_counter() - lastReport >= 1:
+                    lastReport = time.perf_counter()
+                    logging.info("Recovered {} leaves of the tree".
+                                 format(self.tree.tree_size))
+        self.tree.hashStore.flush()
+        self.seqNo = self.tree.tree_size
+        self._verifyRecoveredTree(self.seqNo)
+
+    def _verifyRecoveredTree(self, size):
+        # The hashes of the tree are computed again from the hash store
+        self.tree.verify_consistency(size)
+        self.tree.hashCache.clear()
+        if size and list(reversed(self.tree.inclusion_proof(size, size + 1))) \
+                != list(self.tree.hashes):
+            raise ConsistencyVerificationFailed()
 
     def recoverTreeFromHashStore(self):
         treeSize = self.tree.leafCount
@@ -116,9 +210,51 @@ class Ledger(ImmutableStore):
 
         serz_leaf_for_tree = self.serialize_for_tree(leaf)
         merkle_info = self._addToTree(serz_leaf_for_tree, serialized=True)
+        if self._index:
+            self._index.add([(self.seqNo, leaf)])
 
         return merkle_info
 
+    def addBatch(self, leaves: List, hashed: Tuple = None) -> Tuple[int, int]:
+        """
+        Add the leaves (transactions) to the log and the merkle tree at once.
+
+        Unlike `add`, merkle proofs of the leaves are not built, `merkleInfo`
+        builds them when needed without reading the hash store for the leaves
+        of the last batch.
+
+        :param hashed: what `CompactMerkleTree.push_leaves` returned for the
+        leaves pushed on a copy of the tree, if they are hashed already
+        :return: sequence numbers of the first and the last added leaf
+        """
+        start = self.seqNo + 1
+        serz_leaves = [self.serialize_for_txn_log(leaf) for leaf in leaves]
+        self._transactionLog.setBatch(
+            [(str(seqNo), serz_leaf)
+             for seqNo, serz_leaf in enumerate(serz_leaves, start)])
+
+        hashes = [self.tree.hashes]
+        if hashed is None:
+            if self.txn_serializer == self.hash_serializer and \
+                    self._transactionLog.is_byte:
+                # Leaves are serialized the same way for the log and the tree
+                serz_leaves_for_tree = serz_leaves
+            else:
+                serz_leaves_for_tree = [self.serialize_for_tree(leaf)
+                                        for leaf in leaves]
+            hashed = self.tree.push_leaves(serz_leaves_for_tree)
+        elif leaves:
+            self.tree._update(self.tree.tree_size + len(leaves), hashed[2][-1])
+        leaf_hashes, nodes, tree_hashes = hashed
+        self.tree.store_hashes(leaf_hashes, nodes)
+        self.tree.hashStore.flush()
+        hashes.extend(tree_hashes)
+        self.seqNo += len(leaves)
+        self._lastBatch = (start, hashes)
+        if self._index:
+            self._index.add(enumerate(leaves, start))
+        return start, self.seqNo
+
     def _addToTree(self, leafData, serialized=False):
         serializedLeafData = self.serialize_for_tree(leafData) if \
             not serialized else leafData
@@ -144,8 +280,10 @@ class Ledger(ImmutableStore):
     def append(self, txn):
         return self.add(txn)
 
-    # TODO: add tests for this
     def get(self, **kwargs):
+        if self._index and self._index.covers(kwargs):
+            seqNo = self._index.lookup(**kwargs)
+            return self.getBySeqNo(seqNo) if seqNo else None
         for seqNo, value in self._transactionLog.iterator():
             data = self.txn_serializer.deserialize(value)
             # If `kwargs` is a subset of `data`
@@ -186,6 +324,17 @@ class Ledger(ImmutableStore):
     def merkleInfo(self, seqNo):
         seqNo = int(seqNo)
         assert seqNo > 0
+        if self._lastBatch:
+            start, hashes = self._lastBatch
+            if start <= seqNo < start + len(hashes) - 1:
+                # The hashes of the tree before the leaf was added are its
+                # audit path, the ones after give the root hash
+                return {
+                    F.rootHash.name: self.hashToStr(
+                        self.hasher._hash_fold(hashes[seqNo - start + 1])),
+                    F.auditPath.name: [self.hashToStr(h) for h in
+                                       reversed(hashes[seqNo - start])]
+                }
         rootHash = self.tree.merkle_tree_hash(0, seqNo)
         auditPath = self.tree.inclusion_proof(seqNo - 1, seqNo)
         return {
@@ -193,6 +342,75 @@ class Ledger(ImmutableStore):
             F.auditPath.name: [self.hashToStr(h) for h in auditPath]
         }
 
+    def snapshotTxns(self, size: int,
+                     start: int = 1) -> Iterable[Tuple[int, bytes]]:
+        """
+        Yield the sequence numbers and the entries of the transaction log, as
+        they are stored, of the first `size` transactions, from seqNo `start`
+        """
+        if start > size:
+            return
+        for key, value in self._transactionLog.iterator(start=start,
+                                                        end=size):
+            if isinstance(value, str):
+                value = value.encode()
+            yield int(key), value
+
+    def snapshotHashes(self, size: int) -> Tuple[Iterable[bytes],
+                                                 Iterable[bytes]]:
+        """
+        Leaves and nodes of the hash store for the first `size` transactions,
+        in the order they are stored
+        """
+        hashStore = self.tree.hashStore
+        return ((hashStore.readLeaf(pos) for pos in range(1, size + 1)),
+                (hashStore.readNode(pos)
+                 for pos in range(1, size - count_bits_set(size) + 1)))
+
+    def loadSnapshot(self, txns: Iterable[Tuple[int, bytes]],
+                     leaves: Iterable[bytes], nodes: Iterable[bytes]):
+        """
+        Replace the contents of the ledger with the transactions and the
+        hashes of a snapshot, as `snapshotTxns` and `snapshotHashes` give
+        them. The tree is recovered from the hash store like when the ledger
+        starts.
+        """
+        self.reset()
+        txns = iter(txns)
+        while True:
+            chunk = list(islice(txns, self.recoveryChunkSize))
+            if not chunk:
+                break
+            self._transactionLog.setBatch(
+                (str(seqNo), value if self._transactionLog.is_byte
+                 else value.decode()) for seqNo, value in chunk)
+
+        hashStore = self.tree.hashStore
+        leaves = iter(leaves)
+        size = 0
+        while True:
+            chunk = list(islice(leaves, self.recoveryChunkSize))
+            if not chunk:
+                break
+            hashStore.writeLeafs(chunk)
+            size += len(chunk)
+        # Nodes are stored in the order the tree creates them when leaves
+        # are pushed, see `CompactMerkleTree.push_leaves`
+        positions = ((seqNo, height) for seqNo in range(2, size + 1, 2)
+                     for height in range(1, lowest_bit_set(seqNo)))
+        nodes = ((seqNo, height, h)
+                 for (seqNo, height), h in zip(positions, nodes))
+        while True:
+            chunk = list(islice(nodes, self.recoveryChunkSize))
+            if not chunk:
+                break
+            hashStore.writeNodes(chunk)
+        hashStore.flush()
+
+        self.recoverTree()
+        if self._index:
+            self._index.sync(lambda frm: self.getAllTxn(frm=frm), self.size)
+
     def start(self, loop=None, ensureDurability=True):
         if self._transactionLog and not self._transactionLog.closed:
             logging.debug("Ledger already started.")
@@ -208,15 +426,33 @@ class Ledger(ImmutableStore):
                 self._transactionLog.open()
             if self.tree.hashStore.closed:
                 self.tree.hashStore.open()
+            if self._index:
+                self._index.open()
+
+    def sync(self):
+        """
+        Make the added transactions and their hashes durable, can be called
+        from another thread. The index is not synced since it is updated from
+        the transaction log when the ledger starts.
+        """
+        self._transactionLog.sync()
+        self.tree.hashStore.sync()
 
     def stop(self):
         self._transactionLog.close()
         self.tree.hashStore.close()
+        if self._index:
+            self._index.close()
 
     def reset(self):
         # THIS IS A DESTRUCTIVE ACTION
+        self._lastBatch = None
         self._transactionLog.reset()
         self.tree.hashStore.reset()
+        self.tree.hashCache.clear()
+        self.tree._update(0, ())
+        if self._index:
+            self._index.reset()
 
     # TODO: rename getAllTxn to get_txn_slice with required parameters frm to
     # add get_txn_all without args.
@@ -0,0 +1,54 @@
+from collections import OrderedDict
+from typing import Optional
+
+
+class SubtreeHashCache:
+    """
+    LRU cache of the root hashes of complete subtrees of a merkle tree, the
+    subtrees of 2^k leaves starting at a multiple of 2^k. The hash of such a
+    subtree never changes once the tree has all of its leaves, so it can be
+    shared by every proof needing it. Hashes are kept within a budget of
+    `maxBytes`.
+    """
+
+    # Approximate memory taken by an entry, with its key and its place in
+    # the LRU order
+    entrySize = 200
+
+    def __init__(self, maxBytes: int = 65536 * entrySize):
+        self.maxBytes = maxBytes
+        self.maxEntries = maxBytes // self.entrySize
+        self._hashes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._hashes)
+
+    @property
+    def hitRatio(self) -> Optional[float]:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+    def get(self, start: int, end: int) -> Optional[bytes]:
+        h = self._hashes.get((start, end))
+        if h is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._hashes.move_to_end((start, end))
+        return h
+
+    def put(self, start: int, end: int, h: bytes):
+        if self.maxEntries <= 0:
+            return
+        self._hashes[(start, end)] = h
+        self._hashes.move_to_end((start, end))
+        if len(self._hashes) > self.maxEntries:
+            self._hashes.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all hashes, the tree is not the one they were computed for
+        """
+        self._hashes.clear()
@@ -75,7 +75,8 @@ def hash_serializer(request):
         return CompactSerializer(orderedFields)
 
 
-@pytest.yield_fixture(scope="function", params=['TextFileStorage', 'ChunkedFileStorage', 'LeveldbStorage'])
+@pytest.yield_fixture(scope="function", params=['TextFileStorage', 'ChunkedFileStorage',
+                                                'LeveldbStorage', 'BlockFileStorage'])
 def ledger(request, genesis_txn_file, tempdir, txn_serializer, hash_serializer):
     ledger = create_ledger(request, txn_serializer,
                            hash_serializer, tempdir, genesis_txn_file)
@@ -83,14 +84,16 @@ def ledger(request, genesis_txn_file, tempdir, txn_serializer, hash_serializer):
     ledger.stop()
 
 
-@pytest.yield_fixture(scope="function", params=['TextFileStorage', 'ChunkedFileStorage', 'LeveldbStorage'])
+@pytest.yield_fixture(scope="function", params=['TextFileStorage', 'ChunkedFileStorage',
+                                                'LeveldbStorage', 'BlockFileStorage'])
 def ledger_no_genesis(request, tempdir, txn_serializer, hash_serializer):
     ledger = create_ledger(request, txn_serializer, hash_serializer, tempdir)
     yield ledger
     ledger.stop()
 
 
-@pytest.yield_fixture(scope="function", params=['TextFileStorage', 'ChunkedFileStorage', 'LeveldbStorage'])
+@pytest.yield_fixture(scope="function", params=['TextFileStorage', 'ChunkedFileStorage',
+                                                'LeveldbStorage', 'BlockFileStorage'])
 def ledger_with_genesis(request, init_genesis_txn_file, tempdir, txn_serializer, hash_serializer):
     ledger = create_ledger(request, txn_serializer,
                            hash_serializer, tempdir, init_genesis_txn_file)
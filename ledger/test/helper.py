@@ -11,6 +11,7 @@ from ledger.ledger import Ledger
 from ledger.util import STH
 from storage.binary_serializer_based_file_store import BinarySerializerBasedFileStore
 from storage.chunked_file_store import ChunkedFileStore
+from storage.kv_store_block_file import KeyValueStorageBlockFile
 from storage.kv_store_leveldb_int_keys import KeyValueStorageLeveldbIntKeys
 from storage.text_file_store import TextFileStore
 
@@ -71,6 +72,8 @@ def create_ledger(request, txn_serializer, hash_serializer, tempdir, init_genesi
         return create_ledger_chunked_file_storage(txn_serializer, hash_serializer, tempdir, init_genesis_txn_file)
     elif request.param == 'LeveldbStorage':
         return create_ledger_leveldb_file_storage(txn_serializer, hash_serializer, tempdir, init_genesis_txn_file)
+    elif request.param == 'BlockFileStorage':
+        return create_ledger_block_file_storage(txn_serializer, hash_serializer, tempdir, init_genesis_txn_file)
 
 
 def create_ledger_text_file_storage(txn_serializer, hash_serializer, tempdir, init_genesis_txn_file=None):
@@ -98,6 +101,13 @@ def create_ledger_leveldb_file_storage(txn_serializer, hash_serializer, tempdir,
     return __create_ledger(store, txn_serializer, hash_serializer, tempdir, init_genesis_txn_file)
 
 
+def create_ledger_block_file_storage(txn_serializer, hash_serializer, tempdir, init_genesis_txn_file=None):
+    store = KeyValueStorageBlockFile(tempdir,
+                                     'transactions',
+                                     blockSize=4)
+    return __create_ledger(store, txn_serializer, hash_serializer, tempdir, init_genesis_txn_file)
+
+
 def create_ledger_chunked_file_storage(txn_serializer, hash_serializer, tempdir, init_genesis_txn_file=None):
     chunk_creator = None
     db_name = 'transactions'
@@ -0,0 +1,81 @@
+import time
+
+from ledger.compact_merkle_tree import CompactMerkleTree
+from ledger.hash_stores.file_hash_store import FileHashStore
+from ledger.test.helper import create_default_ledger, random_txn
+from ledger.util import F
+
+
+def test_add_batch_same_as_add(ledger_no_genesis, tmpdir_factory):
+    ledger = ledger_no_genesis
+    txns = [random_txn(i) for i in range(20)]
+    infos = [ledger.add(txn) for txn in txns[:5]]
+    assert ledger.addBatch(txns[5:]) == (6, 20)
+
+    # The same hashes as if txns were added one by one
+    tree = CompactMerkleTree(hashStore=FileHashStore(
+        dataDir=tmpdir_factory.mktemp('').strpath))
+    for txn in txns:
+        infos.append(tree.append(ledger.serialize_for_tree(txn)))
+    assert ledger.size == 20
+    assert ledger.tree.hashes == tree.hashes
+    assert ledger.tree.leafCount == tree.leafCount
+    assert ledger.tree.nodeCount == tree.nodeCount
+    for seqNo in range(1, 21):
+        assert ledger.tree.hashStore.readLeaf(seqNo) == \
+            tree.hashStore.readLeaf(seqNo)
+    for pos in range(1, tree.nodeCount + 1):
+        assert ledger.tree.hashStore.readNode(pos) == \
+            tree.hashStore.readNode(pos)
+
+    for seqNo, txn in enumerate(txns, 1):
+        stored = ledger.getBySeqNo(seqNo)
+        stored.pop(F.seqNo.name)
+        assert sorted(stored.items()) == sorted(txn.items())
+
+
+def test_merkle_info_of_last_batch_same_as_from_hash_store(ledger_no_genesis):
+    ledger = ledger_no_genesis
+    for i in range(3):
+        ledger.add(random_txn(i))
+    ledger.addBatch([random_txn(i) for i in range(3, 30)])
+    infos = {seqNo: ledger.merkleInfo(seqNo) for seqNo in range(1, 31)}
+
+    ledger._lastBatch = None
+    assert infos == {seqNo: ledger.merkleInfo(seqNo)
+                     for seqNo in range(1, 31)}
+
+
+def test_recover_merkle_tree_after_add_batch(tempdir):
+    ledger = create_default_ledger(tempdir)
+    for i in range(10):
+        ledger.addBatch([random_txn(10 * i + j) for j in range(i + 1)])
+    ledger.stop()
+    size_before = ledger.size
+    root_hash_before = ledger.root_hash
+
+    restartedLedger = create_default_ledger(tempdir)
+    assert restartedLedger.tree.verify_consistency(size_before)
+    assert restartedLedger.size == size_before
+    assert restartedLedger.root_hash == root_hash_before
+
+
+def testMeasureBatchAddTime(tempdir):
+    txns = [random_txn(i) for i in range(100)]
+    ledger = create_default_ledger(tempdir + '/oneByOne')
+    start = time.perf_counter()
+    for txn in txns:
+        ledger.add(txn)
+    timeTakenOneByOne = time.perf_counter() - start
+    ledger.stop()
+
+    ledger = create_default_ledger(tempdir + '/batch')
+    start = time.perf_counter()
+    ledger.addBatch(txns)
+    timeTakenInBatch = time.perf_counter() - start
+    ledger.stop()
+
+    print("Time taken to add {} txns one by one is {} seconds and in a batch "
+          "is {} seconds".format(len(txns), timeTakenOneByOne,
+                                 timeTakenInBatch))
+    assert timeTakenInBatch < timeTakenOneByOne
@@ -0,0 +1,164 @@
+import os
+import time
+from random import randint
+
+import pytest
+
+from ledger.compact_merkle_tree import CompactMerkleTree
+from ledger.hash_stores.file_hash_store import FileHashStore
+from ledger.hash_stores.mmap_hash_store import MmapHashStore
+from ledger.ledger import Ledger
+from ledger.subtree_hash_cache import SubtreeHashCache
+from ledger.test.helper import random_txn
+from ledger.test.test_file_hash_store import generateHashes
+from ledger.util import count_bits_set
+
+
+@pytest.fixture(scope="module")
+def nodesLeaves():
+    return [(randint(0, 1000000), randint(0, 255), h)
+            for h in generateHashes(10)], generateHashes(10)
+
+
+def testSimpleReadWrite(nodesLeaves, tempdir):
+    nodes, leaves = nodesLeaves
+    mhs = MmapHashStore(tempdir)
+    assert mhs.is_persistent
+
+    for leaf in leaves[:5]:
+        mhs.writeLeaf(leaf)
+    for node in nodes[:5]:
+        mhs.writeNode(node)
+    mhs.flush()
+    # Hashes not flushed yet are read as well as the flushed ones
+    mhs.writeLeafs(leaves[5:])
+    mhs.writeNodes(nodes[5:])
+    assert mhs.leafCount == len(leaves)
+    assert mhs.nodeCount == len(nodes)
+    for i, leaf in enumerate(leaves):
+        assert leaf == mhs.readLeaf(i + 1)
+    for i, node in enumerate(nodes):
+        assert node[2] == mhs.readNode(i + 1)
+    assert [bytes(l) for l in mhs.readLeafs(1, len(leaves))] == leaves
+    assert [bytes(n) for n in mhs.readNodes(3, 7)] == \
+        [n[2] for n in nodes[2:7]]
+    assert [bytes(l) for l in mhs.readLeafs(4, 100)] == leaves[3:]
+
+    with pytest.raises(IndexError):
+        mhs.readLeaf(len(leaves) + 1)
+    with pytest.raises(IndexError):
+        mhs.readNode(len(nodes) + 1)
+
+    mhs.close()
+    assert mhs.closed
+    reopened = MmapHashStore(tempdir)
+    assert reopened.leafCount == len(leaves)
+    assert reopened.nodeCount == len(nodes)
+    assert [bytes(l) for l in reopened.readLeafs(1, len(leaves))] == leaves
+
+    reopened.reset()
+    assert reopened.leafCount == 0
+    assert reopened.nodeCount == 0
+
+
+def testIncorrectWrites(tempdir):
+    mhs = MmapHashStore(tempdir, leafSize=50, nodeSize=50)
+
+    with pytest.raises(ValueError):
+        mhs.writeLeaf(b"less than 50")
+    with pytest.raises(ValueError):
+        mhs.writeNode((8, 1, b"also less than 50"))
+
+
+def testFlushedEveryFewHashes(nodesLeaves, tempdir):
+    _, leaves = nodesLeaves
+    mhs = MmapHashStore(tempdir, flushEvery=4)
+    mhs.writeLeafs(leaves[:3])
+    assert mhs.leavesFile.pendingCount == 3
+    mhs.writeLeaf(leaves[3])
+    assert mhs.leavesFile.pendingCount == 0
+    assert os.path.getsize(mhs.leavesFile.path) == 4 * 32
+
+
+def testSameFilesAsFileHashStore(nodesLeaves, tempdir):
+    nodes, leaves = nodesLeaves
+    fhs = FileHashStore(tempdir, fileNamePrefix='domain')
+    for leaf in leaves:
+        fhs.writeLeaf(leaf)
+    for node in nodes:
+        fhs.writeNode(node)
+    fhs.close()
+
+    mhs = MmapHashStore(tempdir, fileNamePrefix='domain')
+    assert mhs.leafCount == len(leaves)
+    assert mhs.nodeCount == len(nodes)
+    for i, leaf in enumerate(leaves):
+        assert leaf == mhs.readLeaf(i + 1)
+    mhs.writeLeaf(leaves[0])
+    mhs.close()
+
+    fhs = FileHashStore(tempdir, fileNamePrefix='domain')
+    assert fhs.leafCount == len(leaves) + 1
+    assert fhs.readLeaf(len(leaves) + 1) == leaves[0]
+
+
+def testLedgerWithMmapHashStore(tempdir):
+    ledger = Ledger(CompactMerkleTree(hashStore=MmapHashStore(tempdir)),
+                    dataDir=tempdir)
+    for i in range(10):
+        ledger.add(random_txn(i))
+    ledger.addBatch([random_txn(i) for i in range(10, 30)])
+    root = ledger.root_hash
+    proofs = [ledger.merkleInfo(seqNo) for seqNo in range(1, 31)]
+    ledger.stop()
+
+    ledger = Ledger(CompactMerkleTree(hashStore=MmapHashStore(tempdir)),
+                    dataDir=tempdir)
+    assert ledger.size == 30
+    assert ledger.root_hash == root
+    assert proofs == [ledger.merkleInfo(seqNo) for seqNo in range(1, 31)]
+    ledger.stop()
+
+
+def writeRandomHashes(path, count, chunk=100000):
+    with open(path, 'wb') as f:
+        while count > 0:
+            f.write(os.urandom(32 * min(chunk, count)))
+            count -= chunk
+
+
+def proofTime(hashStore, leafCount, proofCount):
+    tree = CompactMerkleTree(
+        tree_size=leafCount,
+        hashes=[b'\0' * 32] * count_bits_set(leafCount),
+        hashStore=hashStore,
+        hashCache=SubtreeHashCache(maxBytes=0))
+    start = time.perf_counter()
+    for _ in range(proofCount):
+        tree.inclusion_proof(randint(0, leafCount - 1), leafCount)
+    return (time.perf_counter() - start) / proofCount
+
+
+def measureProofTime(tempdir, leafCount, proofCount):
+    # Hash stores are filled with random hashes, proofs are computed the
+    # same way whatever the hashes are
+    writeRandomHashes(os.path.join(tempdir, '_merkleLeaves.bin'), leafCount)
+    writeRandomHashes(os.path.join(tempdir, '_merkleNodes.bin'),
+                      leafCount - count_bits_set(leafCount))
+    fileTime = proofTime(FileHashStore(tempdir), leafCount, proofCount)
+    mmapTime = proofTime(MmapHashStore(tempdir), leafCount, proofCount)
+    print("Time taken to generate a proof for a ledger of {} leaves is {:.2f} "
+          "us with a file hash store and {:.2f} us with a memory-mapped "
+          "hash store".format(leafCount, fileTime * 1e6, mmapTime * 1e6))
+    return fileTime, mmapTime
+
+
+def testMeasureProofTime(tempdir):
+    # Proofs are dominated by path computation and hashing at this size,
+    # the times are only reported
+    measureProofTime(tempdir, 100000, 1000)
+
+
+@pytest.mark.skip(reason="Writes 640MB of hashes, run manually")
+def testMeasureProofTimeOn10MLeaves(tempdir):
+    measureProofTime(tempdir, 10000000, 10000)
@@ -0,0 +1,96 @@
+import os
+import time
+
+import pytest
+
+from ledger.compact_merkle_tree import CompactMerkleTree
+from ledger.hash_stores.file_hash_store import FileHashStore
+from ledger.ledger import Ledger
+from ledger.test.helper import random_txn
+from ledger.tree_recovery import hash_leaves
+from storage.kv_store_leveldb_int_keys import KeyValueStorageLeveldbIntKeys
+
+
+@pytest.mark.parametrize('count', [1, 2, 5, 7, 8])
+def test_hash_leaves_same_as_push_leaves(count):
+    leaves = [str(i).encode() for i in range(24 + count)]
+    tree = CompactMerkleTree()
+    tree.push_leaves(leaves[:24])
+    expected = tree.push_leaves(leaves[24:])
+
+    leafHashes, nodes, hashes = hash_leaves(leaves[24:], 24)
+    assert leafHashes == expected[0]
+    if count < 8:
+        assert nodes == expected[1]
+        assert tuple(tree.hashes[-len(hashes):]) == tuple(hashes)
+    else:
+        # The rest of the nodes are created from the root of a full subtree
+        assert nodes == expected[1][:len(nodes)]
+        assert hashes[0] == \
+            CompactMerkleTree(hashes=hashes, tree_size=count).root_hash
+
+
+def create_ledger(dataDir, txn_serializer=None, hash_serializer=None,
+                  recoveryProcesses=0, recoveryChunkSize=8):
+    return Ledger(CompactMerkleTree(hashStore=FileHashStore(dataDir=dataDir)),
+                  dataDir=dataDir,
+                  txn_serializer=txn_serializer,
+                  hash_serializer=hash_serializer,
+                  transactionLogStore=KeyValueStorageLeveldbIntKeys(
+                      dataDir, 'transactions'),
+                  recoveryProcesses=recoveryProcesses,
+                  recoveryChunkSize=recoveryChunkSize)
+
+
+def hash_store_contents(ledger):
+    hashStore = ledger.tree.hashStore
+    return ([hashStore.readLeaf(pos)
+             for pos in range(1, hashStore.leafCount + 1)],
+            [hashStore.readNode(pos)
+             for pos in range(1, hashStore.nodeCount + 1)])
+
+
+@pytest.mark.parametrize('count', [0, 1, 8, 100])
+def test_recover_tree_in_parallel(tempdir, txn_serializer, hash_serializer,
+                                  count):
+    ledger = create_ledger(tempdir, txn_serializer, hash_serializer)
+    for i in range(count):
+        ledger.add(random_txn(i % 90))
+    root_hash = ledger.root_hash
+    hashes = ledger.tree.hashes
+    contents = hash_store_contents(ledger)
+    # delete hash store, so that the only option for recovering is txn log
+    ledger.tree.hashStore.reset()
+    ledger.stop()
+
+    ledger = create_ledger(tempdir, txn_serializer, hash_serializer,
+                           recoveryProcesses=2)
+    assert ledger.size == count
+    assert ledger.root_hash == root_hash
+    assert ledger.tree.hashes == hashes
+    assert hash_store_contents(ledger) == contents
+    ledger.add(random_txn(1))
+    assert ledger.size == count + 1
+    ledger.stop()
+
+
+def testMeasureRecoveryTime(tempdir):
+    count = 10000
+    processes = max(os.cpu_count(), 2)
+    ledger = create_ledger(tempdir)
+    ledger.addBatch([random_txn(i % 90) for i in range(count)])
+    root_hash = ledger.root_hash
+    ledger.stop()
+
+    times = {}
+    for recoveryProcesses in (0, processes):
+        FileHashStore(dataDir=tempdir).reset()
+        start = time.perf_counter()
+        ledger = create_ledger(tempdir, recoveryProcesses=recoveryProcesses,
+                               recoveryChunkSize=1024)
+        times[recoveryProcesses] = time.perf_counter() - start
+        assert ledger.root_hash == root_hash
+        ledger.stop()
+    print("Time taken to recover the tree of a ledger of {} txns is {:.2f} "
+          "seconds in the ledger process and {:.2f} seconds with {} "
+          "processes".format(count, times[0], times[processes], processes))
@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+from ledger.compact_merkle_tree import CompactMerkleTree
+from ledger.hash_stores.file_hash_store import FileHashStore
+from ledger.subtree_hash_cache import SubtreeHashCache
+from ledger.tree_hasher import TreeHasher
+
+
+def create_tree(dataDir, leafCount, hashCache=None):
+    tree = CompactMerkleTree(hashStore=FileHashStore(dataDir=dataDir),
+                             hashCache=hashCache)
+    tree.extend([str(i).encode() for i in range(leafCount)])
+    return tree
+
+
+def cache_of(entries):
+    return SubtreeHashCache(maxBytes=entries * SubtreeHashCache.entrySize)
+
+
+def reference_hash(leaves, start, end, hasher=TreeHasher()):
+    return hasher.hash_full_tree(leaves[start:end])
+
+
+def test_cache_evicts_least_recently_used():
+    cache = cache_of(2)
+    cache.put(0, 1, b'a')
+    cache.put(1, 2, b'b')
+    assert cache.get(0, 1) == b'a'
+    cache.put(2, 3, b'c')
+    assert len(cache) == 2
+    assert cache.get(1, 2) is None
+    assert cache.get(0, 1) == b'a'
+    assert cache.get(2, 3) == b'c'
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert cache.hitRatio == 0.75
+
+
+def test_merkle_tree_hash_with_cache(tempdir):
+    leafCount = 37
+    leaves = [str(i).encode() for i in range(leafCount)]
+    tree = create_tree(tempdir, leafCount)
+    for start in range(leafCount):
+        for end in range(start + 1, leafCount + 1):
+            # Proofs need hashes of ranges starting at a multiple of the
+            # least power of 2 not below their width
+            if start % (1 << (end - start - 1).bit_length()):
+                continue
+            assert tree.merkle_tree_hash(start, end) == \
+                reference_hash(leaves, start, end)
+    # Only complete subtrees are cached
+    assert len(tree.hashCache) == sum(leafCount // 2 ** h for h in range(6))
+
+
+@pytest.mark.parametrize('maxEntries', [0, 4, 65536])
+def test_proofs_same_with_any_cache_size(tempdir, maxEntries):
+    leafCount = 45
+    expected = create_tree(tempdir + '/expected', leafCount,
+                           cache_of(0))
+    tree = create_tree(tempdir + '/cached', leafCount,
+                       cache_of(maxEntries))
+    for _ in range(2):
+        for first in range(1, leafCount + 1):
+            assert tree.consistency_proof(first, leafCount) == \
+                expected.consistency_proof(first, leafCount)
+            assert tree.inclusion_proof(first - 1, leafCount) == \
+                expected.inclusion_proof(first - 1, leafCount)
+    assert len(tree.hashCache) <= maxEntries
+
+
+def test_proofs_share_cached_hashes(tempdir):
+    tree = create_tree(tempdir, 1000)
+    for seqNo in range(1, 1001):
+        tree.inclusion_proof(seqNo - 1, 1000)
+    cache = tree.hashCache
+    lookups = cache.hits + cache.misses
+    hits = cache.hits
+    # Catchup replies of other nodes ask for the same consistency proofs
+    for _ in range(5):
+        for start in range(0, 1000, 100):
+            tree.consistency_proof(start + 1, 1000)
+    assert cache.hits - hits == cache.hits + cache.misses - lookups
+    assert cache.hitRatio > 0.5
+
+
+def testMeasureProofTimeWithCache(tempdir):
+    leafCount = 100000
+    tree = create_tree(tempdir, leafCount)
+    times = {}
+    for maxEntries in (0, 65536):
+        tree = CompactMerkleTree(tree_size=tree.tree_size, hashes=tree.hashes,
+                                 hashStore=tree.hashStore,
+                                 hashCache=cache_of(maxEntries))
+        start = time.perf_counter()
+        for seqNo in range(1, leafCount + 1, 10):
+            tree.inclusion_proof(seqNo - 1, leafCount)
+            tree.consistency_proof(seqNo, leafCount)
+        times[maxEntries] = time.perf_counter() - start
+    print("Time taken to build {} proofs is {:.2f} seconds without cache and "
+          "{:.2f} seconds with cache".format(leafCount // 5, times[0],
+                                             times[65536]))
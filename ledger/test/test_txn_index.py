@@ -0,0 +1,112 @@
+import pytest
+
+from ledger.compact_merkle_tree import CompactMerkleTree
+from ledger.hash_stores.file_hash_store import FileHashStore
+from ledger.ledger import Ledger
+from ledger.test.helper import random_txn
+from ledger.util import F
+
+INDEXES = [('identifier', 'reqId'), ('op',)]
+
+
+def create_indexed_ledger(tempdir, indexes=INDEXES):
+    return Ledger(CompactMerkleTree(hashStore=FileHashStore(dataDir=tempdir)),
+                  dataDir=tempdir,
+                  indexes=indexes)
+
+
+def txn_at(ledger, seqNo):
+    txn = ledger.getBySeqNo(seqNo)
+    assert txn[F.seqNo.name] == seqNo
+    return txn
+
+
+@pytest.fixture()
+def no_scan(monkeypatch):
+    def scanning(ledger):
+        def fail(*args, **kwargs):
+            raise AssertionError('Transaction log scanned')
+        monkeypatch.setattr(ledger._transactionLog, 'iterator', fail)
+    return scanning
+
+
+def test_get_uses_index(tempdir, no_scan):
+    ledger = create_indexed_ledger(tempdir)
+    for i in range(5):
+        ledger.add(random_txn(i))
+    ledger.addBatch([random_txn(i) for i in range(5, 20)])
+    no_scan(ledger)
+
+    for seqNo in range(1, 21):
+        txn = txn_at(ledger, seqNo)
+        assert ledger.get(identifier=txn['identifier'],
+                          reqId=txn['reqId']) == txn
+        assert ledger.get(reqId=txn['reqId'],
+                          identifier=txn['identifier']) == txn
+        assert ledger.get(op=txn['op']) == txn
+    assert ledger.get(identifier='cli1', reqId=1) is None
+    assert ledger.get(op='unknown') is None
+
+
+def test_get_returns_first_txn_with_indexed_values(tempdir, no_scan):
+    ledger = create_indexed_ledger(tempdir)
+    txns = [dict(random_txn(i), op='same') for i in range(4)]
+    ledger.add(txns[0])
+    ledger.addBatch(txns[1:])
+    ledger.addBatch([dict(random_txn(9), op='other'),
+                     dict(random_txn(10), op='other')])
+    no_scan(ledger)
+
+    assert ledger.get(op='same') == txn_at(ledger, 1)
+    assert ledger.get(op='other') == txn_at(ledger, 5)
+
+
+def test_get_not_covered_by_index_scans_log(tempdir):
+    ledger = create_indexed_ledger(tempdir)
+    ledger.addBatch([random_txn(i) for i in range(10)])
+    assert ledger.get(identifier='cli3') == txn_at(ledger, 4)
+    assert ledger.get(reqId=5, op=txn_at(ledger, 5)['op']) == \
+        txn_at(ledger, 5)
+
+
+def test_index_synced_on_restart(tempdir, no_scan):
+    ledger = create_indexed_ledger(tempdir)
+    ledger.addBatch([random_txn(i) for i in range(10)])
+    ledger.stop()
+
+    # Txns added while the indexes are not updated
+    ledger = create_indexed_ledger(tempdir, indexes=())
+    ledger.addBatch([random_txn(i) for i in range(10, 20)])
+    ledger.stop()
+
+    ledger = create_indexed_ledger(tempdir)
+    assert ledger._index.size == 20
+    no_scan(ledger)
+    for seqNo in range(1, 21):
+        txn = txn_at(ledger, seqNo)
+        assert ledger.get(identifier=txn['identifier'],
+                          reqId=txn['reqId']) == txn
+    ledger.stop()
+
+
+def test_index_rebuilt_when_ahead_of_ledger(tempdir):
+    ledger = create_indexed_ledger(tempdir)
+    ledger.addBatch([random_txn(i) for i in range(10)])
+    ledger._transactionLog.reset()
+    ledger.tree.hashStore.reset()
+    ledger.stop()
+
+    ledger = create_indexed_ledger(tempdir)
+    assert ledger.size == 0
+    assert ledger._index.size == 0
+    assert ledger.get(identifier='cli1', reqId=2) is None
+    ledger.add(random_txn(5))
+    assert ledger.get(identifier='cli5', reqId=6) == txn_at(ledger, 1)
+
+
+def test_reset_clears_index(tempdir):
+    ledger = create_indexed_ledger(tempdir)
+    ledger.addBatch([random_txn(i) for i in range(10)])
+    ledger.reset()
+    assert ledger._index.size == 0
+    assert ledger.get(identifier='cli1', reqId=2) is None
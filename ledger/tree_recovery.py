@@ -0,0 +1,72 @@
+from typing import List, Tuple
+
+from ledger.tree_hasher import TreeHasher
+from ledger.util import lowest_bit_set
+
+# Serializers of the ledger being recovered, set in each worker process
+_serializers = None
+
+
+def init_worker(txn_serializer, hash_serializer):
+    global _serializers
+    _serializers = (txn_serializer, hash_serializer)
+
+
+def serialize_entry_for_tree(entry, txn_serializer, hash_serializer) -> bytes:
+    """
+    Serialize an entry of a transaction log the way it is hashed in the tree
+    """
+    # Some stores give entries already deserialized
+    if txn_serializer != hash_serializer or \
+            not isinstance(entry, (bytes, str)):
+        entry = hash_serializer.serialize(txn_serializer.deserialize(entry),
+                                          toBytes=True)
+    if isinstance(entry, str):
+        entry = entry.encode()
+    return entry
+
+
+def hash_chunk(entries: List, start: int):
+    """
+    Hash a chunk of entries of a transaction log in a worker process, see
+    `hash_leaves`.
+    """
+    txn_serializer, hash_serializer = _serializers
+    return hash_leaves(
+        [serialize_entry_for_tree(entry, txn_serializer, hash_serializer)
+         for entry in entries],
+        start)
+
+
+def hash_leaves(leaves: List[bytes], start: int,
+                hasher=TreeHasher()) -> Tuple[List[bytes], List[Tuple],
+                                              List[bytes]]:
+    """
+    Hash leaves pushed on the end of a tree of `start` leaves, where `start`
+    is a multiple of the least power of 2 not below the number of leaves,
+    so the leaves form subtrees of their own. The hashes of the subtrees are
+    computed level by level.
+
+    :return: the hashes of the leaves, the nodes of the subtrees in the order
+    `CompactMerkleTree.push_leaves` creates them and the hashes of the full
+    subtrees formed by the leaves, sorted in descending order of size
+    """
+    levels = [[hasher.hash_leaf(leaf) for leaf in leaves]]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        levels.append([hasher.hash_children(level[i], level[i + 1])
+                       for i in range(0, len(level) - 1, 2)])
+
+    # A node of height h covering leaves up to the i-th one is created when
+    # the i-th leaf is pushed, for each h up to the lowest bit set in i
+    nodes = [(start + i, height, levels[height][(i >> height) - 1])
+             for i in range(2, len(leaves) + 1, 2)
+             for height in range(1, lowest_bit_set(i))]
+
+    hashes = []
+    pushed = 0
+    for height in reversed(range(len(levels))):
+        if len(leaves) - pushed >= 1 << height:
+            hashes.append(levels[height][pushed >> height])
+            pushed += 1 << height
+    return levels[0], nodes, hashes
@@ -0,0 +1,112 @@
+import json
+from itertools import islice
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from storage.kv_store import KeyValueStorage
+
+
+class TxnIndex:
+    """
+    Secondary indexes of the transactions of a ledger. Each index is declared
+    with the fields it covers and maps the values of these fields to the
+    sequence number of the first transaction having them.
+
+    The indexes are kept in a key value store with the number of indexed
+    transactions, so transactions added to the ledger while the indexes were
+    not updated (like before a crash) are indexed when it is started again.
+    """
+
+    sizeKey = b'\x00size'
+    # Number of transactions indexed at once when syncing with the ledger
+    syncChunkSize = 1000
+
+    def __init__(self, store: KeyValueStorage,
+                 indexes: Iterable[Sequence[str]]):
+        self._store = store
+        # Fields of an index sorted, keyed by the set of its fields
+        self.indexes = {frozenset(fields): tuple(sorted(fields))
+                        for fields in indexes}
+
+    @property
+    def size(self) -> int:
+        try:
+            return int(self._store.get(self.sizeKey))
+        except KeyError:
+            return 0
+
+    def covers(self, query: Dict) -> bool:
+        return frozenset(query) in self.indexes
+
+    def lookup(self, **query) -> Optional[int]:
+        """
+        Return the sequence number of the first transaction with the values
+        of the query, the query must be covered by an index.
+        """
+        fields = self.indexes[frozenset(query)]
+        try:
+            return int(self._store.get(self._key(fields, query)))
+        except KeyError:
+            return None
+
+    def add(self, txns: Iterable[Tuple[int, Dict]]):
+        """
+        Index transactions with their sequence numbers, they must follow the
+        transactions already indexed.
+        """
+        batch = {}
+        seqNo = None
+        for seqNo, txn in txns:
+            for fields in self.indexes.values():
+                key = self._key(fields, txn)
+                if key not in batch and not self._has(key):
+                    batch[key] = str(seqNo)
+        if seqNo is None:
+            return
+        batch[self.sizeKey] = str(seqNo)
+        self._store.setBatch(batch.items())
+
+    def sync(self, txnsFrom: Callable[[int], Iterable[Tuple[int, Dict]]],
+             ledgerSize: int):
+        """
+        Index the transactions added to the ledger since it was indexed last,
+        all of them if the indexes are ahead of the ledger.
+
+        :param txnsFrom: returns the transactions of the ledger with their
+        sequence numbers from the given sequence number
+        """
+        size = self.size
+        if size == ledgerSize:
+            return
+        if size > ledgerSize:
+            self.reset()
+            size = 0
+        txns = iter(txnsFrom(size + 1))
+        while True:
+            chunk = list(islice(txns, self.syncChunkSize))
+            if not chunk:
+                return
+            self.add(chunk)
+
+    def reset(self):
+        self._store.reset()
+
+    def open(self):
+        if self._store.closed:
+            self._store.open()
+
+    def close(self):
+        self._store.close()
+
+    def _has(self, key) -> bool:
+        try:
+            self._store.get(key)
+        except KeyError:
+            return False
+        return True
+
+    @staticmethod
+    def _key(fields: Tuple[str], txn: Dict) -> bytes:
+        return '{}:{}'.format(
+            ','.join(fields),
+            json.dumps([txn.get(field) for field in fields],
+                       sort_keys=True)).encode()
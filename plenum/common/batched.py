@@ -1,13 +1,20 @@
 from collections import deque
+from functools import partial
 from typing import Any, Iterable
 
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+import msgpack
+
 from plenum.common.constants import BATCH, OP_FIELD_NAME
 from plenum.common.prepare_batch import split_messages_on_batches
 from stp_core.common.constants import CONNECTION_PREFIX
 from stp_core.crypto.signer import Signer
 from stp_core.common.log import getlogger
 from plenum.common.types import f
-from plenum.common.messages.node_messages import Batch
 from plenum.common.message_processor import MessageProcessor
 from plenum.common.exceptions import InvalidMessageExceedingSizeException
 from stp_core.validators.message_length_validator import MessageLenValidator
@@ -15,6 +22,18 @@ from stp_core.common.config.util import getConfig
 
 logger = getlogger()
 
+# Batches are assembled from serialized messages without building and
+# serializing a `Batch`, the signature goes before the messages so a batch
+# is a prefix followed by the nested messages
+_packer = msgpack.Packer(use_bin_type=True)
+_BINARY_BATCH_PREFIX = _packer.pack_map_header(3) + \
+    _packer.pack(OP_FIELD_NAME) + _packer.pack(BATCH) + \
+    _packer.pack(f.SIG.nm) + _packer.pack(None) + _packer.pack(f.MSGS.nm)
+_JSON_BATCH_PREFIX = '{{{}:{},{}:null,{}:['.format(
+    json.dumps(OP_FIELD_NAME), json.dumps(BATCH),
+    json.dumps(f.SIG.nm), json.dumps(f.MSGS.nm)).encode()
+_JSON_BATCH_SUFFIX = b']}'
+
 
 class Batched(MessageProcessor):
     """
@@ -63,16 +82,22 @@ class Batched(MessageProcessor):
         """
         # Signing (if required) and serializing before enqueueing otherwise
         # each call to `_enqueue` will have to sign it and `transmit` will try
-        # to serialize it which is waste of resources
-        serializedPayload, err_msg = self.signSerializeAndCheckLen(msg, signer)
-        if serializedPayload is None:
-            return False, err_msg
-
-        if rids:
-            for r in rids:
-                self._enqueue(serializedPayload, r, signer)
-        else:
-            self._enqueueIntoAllRemotes(serializedPayload, signer)
+        # to serialize it which is waste of resources. The payload is
+        # serialized once for every codec used by the remotes.
+        payload = self.prepForSending(msg, signer)
+        serializedPayloads = {}
+        for rid in (rids or self.remotes.keys()):
+            serializer = self.serializerFor(self.remotes.get(rid))
+            if serializer not in serializedPayloads:
+                serializedPayload, err_msg = self._serializeAndCheckLen(
+                    payload, serializer)
+                if serializedPayload is None:
+                    return False, err_msg
+                serializedPayloads[serializer] = serializedPayload
+            # The codec of the remote can change before the outboxes are
+            # flushed, so the message is enqueued with its codec
+            self._enqueue((serializedPayloads[serializer], serializer),
+                          rid, signer)
         return True, None
 
     def flushOutBoxes(self) -> None:
@@ -80,15 +105,22 @@ class Batched(MessageProcessor):
         Clear the outBoxes and transmit batched messages to remotes.
         """
         removedRemotes = []
+        # Broadcasting puts the same messages in every outbox, so batches are
+        # made once for the same messages going to remotes with the same codec
+        batchesByMsgs = {}
+        # Messages serialized for nesting in a batch, by codec
+        batchMembers = {}
         for rid, msgs in self.outBoxes.items():
             try:
-                dest = self.remotes[rid].name
+                remote = self.remotes[rid]
             except KeyError:
                 removedRemotes.append(rid)
                 continue
+            dest = remote.name
             if msgs:
+                serializer = self.serializerFor(remote)
                 if len(msgs) == 1:
-                    msg = msgs.popleft()
+                    msg = self._reserialize(*msgs.popleft(), serializer)
                     # Setting timeout to never expire
                     self.transmit(msg, rid, timeout=self.messageTimeout,
                                   serialized=True)
@@ -99,10 +131,21 @@ class Batched(MessageProcessor):
                         "{} batching {} msgs to {} into one transmission".
                         format(self, len(msgs), dest))
                     logger.trace("    messages: {}".format(msgs))
-                    batches = split_messages_on_batches(list(msgs),
-                                                        self._make_batch,
-                                                        self._test_batch_len,
-                                                        )
+                    key = (serializer, tuple(msgs))
+                    if key in batchesByMsgs:
+                        batches = batchesByMsgs[key]
+                    else:
+                        # Members are encoded by the codec each message was
+                        # serialized with, not the current one of the remote
+                        make_batch = partial(
+                            self._make_batch,
+                            serializer=serializer,
+                            members=batchMembers.setdefault(serializer, {}),
+                            codecs=dict(msgs))
+                        batches = split_messages_on_batches(
+                            [msg for msg, _ in msgs],
+                            make_batch, self._test_batch_len)
+                        batchesByMsgs[key] = batches
                     msgs.clear()
                     if batches:
                         for batch in batches:
@@ -129,10 +172,49 @@ class Batched(MessageProcessor):
                              logMethod=logger.debug)
             del self.outBoxes[rid]
 
-    def _make_batch(self, msgs):
-        batch = Batch(msgs, None)
-        serialized_batch = self.sign_and_serialize(batch)
-        return serialized_batch
+    def _reserialize(self, msg, msgSerializer, serializer):
+        """
+        Return the message serialized with `msgSerializer` as the remote
+        getting messages serialized with `serializer` can decode it. The
+        remote decodes JSON in any case, messages encoded with msgpack are
+        encoded with JSON if the remote no longer accepts msgpack.
+        """
+        if msgSerializer == serializer or not self.isBinaryMsg(msg):
+            return msg
+        return serializer(self.deserializeMsg(msg))
+
+    def _make_batch(self, msgs, serializer=None, members=None, codecs=None):
+        """
+        Make a serialized batch of messages serialized with `serializer`,
+        the same as serializing a `Batch` of them.
+
+        :param members: messages already serialized for nesting in a batch,
+        by the message, updated with the messages of this batch
+        :param codecs: serializers the messages were serialized with, by the
+        message, messages not in it are serialized with `serializer`
+        """
+        binary = serializer == self.serializeBinaryMsg
+        members = {} if members is None else members
+        codecs = {} if codecs is None else codecs
+        nested = []
+        for msg in msgs:
+            member = members.get(msg)
+            if member is None:
+                # With msgpack messages are nested as bytes, with JSON
+                # as strings, so messages encoded with msgpack are encoded
+                # with JSON again for a JSON batch
+                if binary:
+                    member = _packer.pack(msg)
+                else:
+                    member = json.dumps(self._reserialize(
+                        msg, codecs.get(msg, serializer),
+                        serializer).decode()).encode()
+                members[msg] = member
+            nested.append(member)
+        if binary:
+            return _BINARY_BATCH_PREFIX + \
+                _packer.pack_array_header(len(nested)) + b''.join(nested)
+        return _JSON_BATCH_PREFIX + b','.join(nested) + _JSON_BATCH_SUFFIX
 
     def _test_batch_len(self, batch_len):
         return self.msg_len_val.is_len_less_than_limit(batch_len)
@@ -153,7 +235,11 @@ class Batched(MessageProcessor):
         return msg
 
     def signSerializeAndCheckLen(self, msg, signer=None):
-        msg_bytes = self.sign_and_serialize(msg, signer)
+        payload = self.prepForSending(msg, signer)
+        return self._serializeAndCheckLen(payload, self.serializeMsg)
+
+    def _serializeAndCheckLen(self, payload, serializer):
+        msg_bytes = serializer(payload)
         err_msg = None
         try:
             self.msg_len_val.validate(msg_bytes)
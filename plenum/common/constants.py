@@ -120,6 +120,8 @@ class StorageType(IntEnum):
 class KeyValueStorageType(IntEnum):
     Leveldb = 1
     Memory = 2
+    Rocksdb = 3
+    BlockFile = 4
 
 
 @unique
@@ -142,6 +144,7 @@ NODE_HASH_STORE_SUFFIX = "HS"
 HS_FILE = "file"
 HS_MEMORY = "memory"
 HS_LEVELDB = 'leveldb'
+HS_MMAP = 'mmap'
 
 PLUGIN_BASE_DIR_PATH = "PluginBaseDirPath"
 POOL_LEDGER_ID = 0
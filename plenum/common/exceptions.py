@@ -199,6 +199,10 @@ class KeyValueStorageConfigNotFound(StorageException):
     pass
 
 
+class SnapshotVerificationFailed(StorageException):
+    pass
+
+
 class UnsupportedOperation(Exception):
     pass
 
@@ -2,7 +2,9 @@ from copy import copy
 from typing import List, Tuple
 
 import base58
+from ledger.compact_merkle_tree import CompactMerkleTree
 from ledger.ledger import Ledger as _Ledger
+from ledger.util import F
 from stp_core.common.log import getlogger
 
 logger = getlogger()
@@ -17,6 +19,11 @@ class Ledger(_Ledger):
         self.uncommittedTxns = []
         self.uncommittedRootHash = None
         self.uncommittedTree = None
+        # Snapshots of the uncommitted merkle tree, one for each batch of
+        # applied transactions in order, with the number of transactions in
+        # the batch and the hashes computed when applying them. Discarding
+        # a batch drops its snapshot, committing it stores its hashes
+        self.uncommittedBatches = []  # type: List[Tuple[int, CompactMerkleTree, Tuple]]
 
     @property
     def uncommitted_size(self) -> int:
@@ -26,9 +33,12 @@ class Ledger(_Ledger):
         # These transactions are not yet committed so they do not go to
         # the ledger
         uncommittedSize = self.size + len(self.uncommittedTxns)
-        self.uncommittedTree = self.treeWithAppliedTxns(txns,
-                                                        self.uncommittedTree)
+        self.uncommittedTree, hashed = self._treeWithHashedTxns(
+            txns, self.uncommittedTree)
         self.uncommittedRootHash = self.uncommittedTree.root_hash
+        if txns and self._batchesCoverUncommittedTxns():
+            self.uncommittedBatches.append(
+                (len(txns), self.uncommittedTree, hashed))
         self.uncommittedTxns.extend(txns)
         if txns:
             return (uncommittedSize + 1, uncommittedSize + len(txns)), txns
@@ -40,25 +50,68 @@ class Ledger(_Ledger):
         The number of txns from the beginning of `uncommittedTxns` to commit
         :param count:
         :return: a tuple of 2 seqNos indicating the start and end of sequence
-        numbers of the committed txns
+        numbers of the committed txns, and the committed txns with their
+        seqNos. The txns do not have merkle proofs (audit path and root hash),
+        `merkleInfo` builds them for the txns needing them.
         """
         committedSize = self.size
-        committedTxns = []
-        for txn in self.uncommittedTxns[:count]:
-            txn.update(self.append(txn))
-            committedTxns.append(txn)
+        committedTxns = self.uncommittedTxns[:count]
+        # Merkle proofs of the txns are built by `merkleInfo` only for the
+        # txns needing them
+        self.addBatch(committedTxns,
+                      self._popCommittedHashes(len(committedTxns)))
+        for seqNo, txn in enumerate(committedTxns, committedSize + 1):
+            txn[F.seqNo.name] = seqNo
         self.uncommittedTxns = self.uncommittedTxns[count:]
         logger.debug('Committed {} txns, {} are uncommitted'.
                      format(len(committedTxns), len(self.uncommittedTxns)))
         if not self.uncommittedTxns:
-            self.uncommittedTree = None
-            self.uncommittedRootHash = None
+            self.reset_uncommitted()
         # Do not change `uncommittedTree` or `uncommittedRootHash`
         # if there are any `uncommittedTxns` since the ledger still has a
         # valid uncommittedTree and a valid root hash which are
         # different from the committed ones
         return (committedSize + 1, committedSize + count), committedTxns
 
+    def _popCommittedHashes(self, count: int):
+        """
+        Remove hashes of the first `count` uncommitted txns from the
+        snapshots of uncommitted batches and return them like
+        `CompactMerkleTree.push_leaves` does.
+        """
+        if not self.uncommittedBatches or \
+                not self._batchesCoverUncommittedTxns() or \
+                self.uncommittedBatches[0][1].tree_size - \
+                self.uncommittedBatches[0][0] != self.size:
+            # Snapshots do not match uncommitted txns or the ledger, the txns
+            # are hashed again
+            self.uncommittedBatches = []
+            return None
+        committedSize = self.size + count
+        leafHashes, nodes, treeHashes = [], [], []
+        while count and self.uncommittedBatches:
+            size, tree, (batchLeafHashes, batchNodes, batchTreeHashes) = \
+                self.uncommittedBatches[0]
+            # A batch can be committed partially, nodes are created when
+            # the tree reaches the size given in them
+            leafHashes.extend(batchLeafHashes[:count])
+            nodes.extend(n for n in batchNodes if n[0] <= committedSize)
+            treeHashes.extend(batchTreeHashes[:count])
+            if size <= count:
+                self.uncommittedBatches.pop(0)
+            else:
+                self.uncommittedBatches[0] = (
+                    size - count, tree,
+                    (batchLeafHashes[count:],
+                     [n for n in batchNodes if n[0] > committedSize],
+                     batchTreeHashes[count:]))
+            count -= min(size, count)
+        return leafHashes, nodes, treeHashes
+
+    def _batchesCoverUncommittedTxns(self):
+        return sum(size for size, _, _ in self.uncommittedBatches) == \
+            len(self.uncommittedTxns)
+
     def appendCommittedTxns(self, txns: List):
         # Called while receiving committed txns from other nodes
         for txn in txns:
@@ -71,16 +124,27 @@ class Ledger(_Ledger):
         :param count:
         :return:
         """
-        # TODO: This can be optimised if multiple discards are combined
-        # together since merkle root computation will be done only once.
         old_hash = self.uncommittedRootHash
         self.uncommittedTxns = self.uncommittedTxns[:-count]
         if not self.uncommittedTxns:
-            self.uncommittedTree = None
-            self.uncommittedRootHash = None
+            self.reset_uncommitted()
         else:
-            self.uncommittedTree = self.treeWithAppliedTxns(
-                self.uncommittedTxns)
+            # Whole batches are discarded by dropping their snapshots
+            remaining = count
+            while self.uncommittedBatches and \
+                    self.uncommittedBatches[-1][0] <= remaining:
+                remaining -= self.uncommittedBatches.pop()[0]
+            if remaining or not self.uncommittedBatches:
+                # A batch is discarded partially (or there are no snapshots),
+                # the tree for the rest of it is built again
+                size = self.uncommittedBatches.pop()[0] - remaining \
+                    if self.uncommittedBatches else len(self.uncommittedTxns)
+                tree, hashed = self._treeWithHashedTxns(
+                    self.uncommittedTxns[-size:],
+                    self.uncommittedBatches[-1][1]
+                    if self.uncommittedBatches else None)
+                self.uncommittedBatches.append((size, tree, hashed))
+            self.uncommittedTree = self.uncommittedBatches[-1][1]
             self.uncommittedRootHash = self.uncommittedTree.root_hash
         logger.debug('Discarding {} txns and root hash {} and new root hash '
                      'is {}. {} are still uncommitted'.
@@ -93,16 +157,28 @@ class Ledger(_Ledger):
         :param txns:
         :return:
         """
+        return self._treeWithHashedTxns(txns, currentTree)[0]
+
+    def _treeWithHashedTxns(self, txns: List, currentTree=None):
+        """
+        Return a copy of merkle tree after applying the txns and the hashes
+        computed for them as `CompactMerkleTree.push_leaves` returns them
+        """
         currentTree = currentTree or self.tree
         # Copying the tree is not a problem since its a Compact Merkle Tree
         # so the size of the tree would be 32*(lg n) bytes where n is the
         # number of leaves (no. of txns)
         tempTree = copy(currentTree)
-        for txn in txns:
-            tempTree.append(self.serialize_for_tree(txn))
-        return tempTree
+        hashed = tempTree.push_leaves(
+            [self.serialize_for_tree(txn) for txn in txns])
+        return tempTree, hashed
+
+    def loadSnapshot(self, *args, **kwargs):
+        super().loadSnapshot(*args, **kwargs)
+        self.reset_uncommitted()
 
     def reset_uncommitted(self):
         self.uncommittedTxns = []
         self.uncommittedRootHash = None
         self.uncommittedTree = None
+        self.uncommittedBatches = []
@@ -444,9 +444,11 @@ class LedgerManager(HasActionQueue):
         consProof = [Ledger.hashToStr(p) for p in
                      ledger.tree.consistency_proof(end, req.catchupTill)]
 
+        # Keys are strings as the receiver looks txns up by stringified
+        # seq no whatever the codec of the message is
         txns = {}
         for seq_no, txn in ledger.getAllTxn(start, end):
-            txns[seq_no] = self.owner.update_txn_with_extra_data(txn)
+            txns[str(seq_no)] = self.owner.update_txn_with_extra_data(txn)
         self.sendTo(msg=CatchupRep(getattr(req, f.LEDGER_ID.nm), txns,
                                    consProof), to=frm)
 
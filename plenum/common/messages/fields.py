@@ -12,6 +12,8 @@ class FieldValidator(metaclass=ABCMeta):
     Interface for field validators
     """
 
+    __slots__ = ()
+
     optional = False
 
     @abstractmethod
@@ -1,19 +1,49 @@
-from operator import itemgetter
+from abc import ABCMeta
+from operator import attrgetter
 
-import itertools
-from typing import Mapping
+from collections.abc import Mapping
 from collections import OrderedDict
 from plenum.common.constants import OP_FIELD_NAME
 from plenum.common.messages.fields import FieldValidator
 
 
+class CompiledSchema:
+    """
+    Schema prepared for validation: field names in the order of the schema,
+    validation functions by field name and the set of required fields, so
+    they are not rebuilt for every validated message.
+    """
+
+    __slots__ = ('schema', 'names', 'validators', 'required', 'values_of')
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.names = tuple(name for name, _ in schema)
+        self.validators = {name: field.validate for name, field in schema}
+        self.required = frozenset(name for name, field in schema
+                                  if not field.optional)
+        # Returns a tuple of values of the fields of a message
+        if len(self.names) > 1:
+            self.values_of = attrgetter(*self.names)
+        elif self.names:
+            name = self.names[0]
+            self.values_of = lambda obj: (getattr(obj, name),)
+        else:
+            self.values_of = lambda obj: ()
+
+
 class MessageValidator(FieldValidator):
 
     # the schema has to be an ordered iterable because the message class
     # can be create with positional arguments __init__(*args)
 
+    __slots__ = ()
+
     schema = ()
     optional = False
+    schema_is_strict = True
+    # `CompiledSchema` of `schema`, compiled on first use if not yet done
+    _compiled = None
 
     def __init__(self, schema_is_strict=True):
         self.schema_is_strict = schema_is_strict
@@ -22,21 +52,35 @@ class MessageValidator(FieldValidator):
         self._validate_fields_with_schema(dct, self.schema)
         self._validate_message(dct)
 
+    def _compiled_schema(self, schema):
+        compiled = self._compiled
+        if compiled is not None and compiled.schema is schema:
+            return compiled
+        compiled = CompiledSchema(schema)
+        # The schema can be replaced on the class or set on an instance,
+        # so the compiled one is kept where the schema itself is.
+        if schema is self.schema:
+            if type(self).schema is schema:
+                type(self)._compiled = compiled
+            else:
+                self._compiled = compiled
+        return compiled
+
     def _validate_fields_with_schema(self, dct, schema):
         if not isinstance(dct, dict):
             self._raise_invalid_type(dct)
-        schema_dct = dict(schema)
-        required_fields = filter(lambda x: not x[1].optional, schema)
-        required_field_names = map(lambda x: x[0], required_fields)
-        missed_required_fields = set(required_field_names) - set(dct)
+        compiled = self._compiled_schema(schema)
+        missed_required_fields = compiled.required.difference(dct)
         if missed_required_fields:
             self._raise_missed_fields(*missed_required_fields)
+        validators = compiled.validators
         for k, v in dct.items():
-            if k not in schema_dct:
+            validate = validators.get(k)
+            if validate is None:
                 if self.schema_is_strict:
                     self._raise_unknown_fields(k, v)
             else:
-                validation_error = schema_dct[k].validate(v)
+                validation_error = validate(v)
                 if validation_error:
                     self._raise_invalid_fields(k, v, validation_error)
 
@@ -70,7 +114,30 @@ class MessageValidator(FieldValidator):
         return 'validation error [{}]:'.format(self.__class__.__name__)
 
 
-class MessageBase(Mapping, MessageValidator):
+class MessageMeta(ABCMeta):
+    """
+    Lays out the fields of a message class as slots, so messages are
+    compact and their fields are read as plain attributes, and compiles
+    the schema of the class once it is created.
+    """
+
+    def __new__(mcs, name, bases, namespace):
+        if '__slots__' not in namespace:
+            inherited = set()
+            for base in bases:
+                for klass in base.__mro__:
+                    inherited.update(klass.__dict__.get('__slots__', ()))
+            namespace['__slots__'] = tuple(
+                field_name for field_name, _ in namespace.get('schema', ())
+                if field_name not in inherited)
+        cls = super().__new__(mcs, name, bases, namespace)
+        cls._compiled = CompiledSchema(cls.schema)
+        return cls
+
+
+class MessageBase(Mapping, MessageValidator, metaclass=MessageMeta):
+    __slots__ = ()
+
     typename = None
 
     def __init__(self, *args, **kwargs):
@@ -91,21 +158,50 @@ class MessageBase(Mapping, MessageValidator):
 
         self.validate(input_as_dict)
 
-        self._fields = OrderedDict(
-            (name, input_as_dict[name]) for name, _ in self.schema)
+        self._set_fields(input_as_dict)
 
-    def _join_with_schema(self, args):
-        return dict(zip(map(itemgetter(0), self.schema), args))
+    @classmethod
+    def create_trusted(cls, *args, **kwargs):
+        """
+        Create a message without validating it. Only for messages built by
+        the node itself from values known to be valid, never for messages
+        received from others.
+        """
+        msg = cls.__new__(cls)
+        if kwargs:
+            kwargs.pop(OP_FIELD_NAME, None)
+            msg._set_fields(kwargs)
+        else:
+            names = msg._field_names
+            assert len(args) == len(names), \
+                "number of parameters should be the " \
+                "same as a number of fields in schema, but it was {}" \
+                .format(len(args))
+            for name, value in zip(names, args):
+                setattr(msg, name, value)
+        return msg
+
+    def _set_fields(self, dct):
+        for name in self._field_names:
+            setattr(self, name, dct[name])
+
+    @property
+    def _field_names(self):
+        return self._compiled_schema(self.schema).names
 
-    def __getattr__(self, item):
-        return self._fields[item]
+    def _values(self):
+        return self._compiled_schema(self.schema).values_of(self)
+
+    @property
+    def _fields(self):
+        return OrderedDict(zip(self._field_names, self._values()))
+
+    def _join_with_schema(self, args):
+        return dict(zip(self._field_names, args))
 
     def __getitem__(self, key):
-        values = list(self._fields.values())
-        if isinstance(key, slice):
-            return values[key]
-        if isinstance(key, int):
-            return values[key]
+        if isinstance(key, (int, slice)):
+            return self._values()[key]
         raise TypeError("Invalid argument type.")
 
     def _asdict(self):
@@ -116,20 +212,26 @@ class MessageBase(Mapping, MessageValidator):
         """
         Return a dictionary form.
         """
-        m = self._fields.copy()
-        m[OP_FIELD_NAME] = self.typename
-        m.move_to_end(OP_FIELD_NAME, False)
-        return m
+        compiled = self._compiled_schema(self.schema)
+        return OrderedDict(zip((OP_FIELD_NAME,) + compiled.names,
+                               (self.typename,) + compiled.values_of(self)))
 
     @property
     def __name__(self):
         return self.typename
 
+    def __getstate__(self):
+        return self._values()
+
+    def __setstate__(self, state):
+        for name, value in zip(self._field_names, state):
+            setattr(self, name, value)
+
     def __iter__(self):
-        return self._fields.values().__iter__()
+        return iter(self._values())
 
     def __len__(self):
-        return len(self._fields)
+        return len(self._field_names)
 
     def items(self):
         return self._fields.items()
@@ -149,11 +251,12 @@ class MessageBase(Mapping, MessageValidator):
     def __eq__(self, other):
         if not issubclass(other.__class__, self.__class__):
             return False
-        return self._asdict() == other._asdict()
+        return self.typename == other.typename and \
+            self._values() == other._values()
 
     def __hash__(self):
         h = 1
-        for index, value in enumerate(list(self.__iter__())):
+        for index, value in enumerate(self._values()):
             h = h * (index + 1) * (hash(value) + 1)
         return h
 
@@ -1,3 +1,4 @@
+from copy import deepcopy
 from hashlib import sha256
 from typing import Mapping, NamedTuple
 
@@ -9,6 +10,15 @@ from stp_core.types import Identifier
 
 
 class Request:
+    # Fields of the request covered by the signature, changing any of them
+    # invalidates the memoized signing bytes
+    _signedFields = (f.IDENTIFIER.nm, f.REQ_ID.nm, OPERATION)
+    # Attributes holding memoized values, not part of the request's state
+    _memoAttrs = ('_signingBytes', '_signedOperation')
+
+    _signingBytes = None
+    _signedOperation = None
+
     def __init__(self,
                  identifier: Identifier=None,
                  reqId: int=None,
@@ -39,15 +49,43 @@ class Request:
     def key(self):
         return self.identifier, self.reqId
 
+    def __setattr__(self, key, value):
+        if key in self._signedFields:
+            self._signingBytes = None
+        super().__setattr__(key, value)
+
+    @property
+    def signingBytes(self) -> bytes:
+        """
+        Canonical serialization of `signingState`, i.e. the bytes the client
+        signs. It is computed once and reused for the digest, authentication
+        and hashing, and is recomputed if the signed fields are reassigned or
+        the operation is changed in place, at any depth.
+        """
+        if self._signingBytes is None or \
+                self._signedOperation != self.operation:
+            self._updateSigningBytes()
+        return self._signingBytes
+
+    def _updateSigningBytes(self):
+        # A deep copy, so that any change to the operation is noticed by
+        # comparing it with the copy
+        self._signedOperation = deepcopy(self.operation)
+        self._signingBytes = serialize_msg_for_signing(self.signingState)
+
     def getDigest(self):
-        return sha256(serialize_msg_for_signing(self.signingState)).hexdigest()
+        # Always serializes the request afresh since callers changing the
+        # request in place rely on it to update the digest
+        self._updateSigningBytes()
+        return sha256(self._signingBytes).hexdigest()
 
     @property
     def reqDigest(self):
         return ReqDigest(self.identifier, self.reqId, self.digest)
 
     def __getstate__(self):
-        return self.__dict__
+        return {k: v for k, v in self.__dict__.items()
+                if k not in self._memoAttrs}
 
     @property
     def signingState(self):
@@ -75,7 +113,7 @@ class Request:
         return str(force) == 'True'
 
     def __hash__(self):
-        return hash(self.serialized())
+        return hash((self.signingBytes, self.signature))
 
 
 class ReqDigest(NamedTuple(REQDIGEST, [f.IDENTIFIER,
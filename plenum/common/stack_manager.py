@@ -5,10 +5,13 @@ from ledger.genesis_txn.genesis_txn_initiator_from_file import GenesisTxnInitiat
 from plenum.common.keygen_utils import initRemoteKeys
 from plenum.common.signer_did import DidIdentity
 from plenum.persistence.leveldb_hash_store import LevelDbHashStore
+from plenum.persistence.storage import initKeyValueStorageIntKeys, \
+    txnLogDbConfig
 from stp_core.types import HA
 from stp_core.network.exceptions import RemoteNotFound
 from stp_core.common.log import getlogger
 from ledger.compact_merkle_tree import CompactMerkleTree
+from ledger.subtree_hash_cache import SubtreeHashCache
 
 from plenum.common.constants import DATA, ALIAS, TARGET_NYM, NODE_IP, CLIENT_IP, \
     CLIENT_PORT, NODE_PORT, VERKEY, TXN_TYPE, NODE, SERVICES, VALIDATOR, CLIENT_STACK_SUFFIX, IDENTIFIER
@@ -51,10 +54,17 @@ class TxnStackManager(metaclass=ABCMeta):
                 dataDir=dataDir, fileNamePrefix='pool')
             self._ledger = Ledger(
                 CompactMerkleTree(
-                    hashStore=self.hashStore),
+                    hashStore=self.hashStore,
+                    hashCache=SubtreeHashCache(
+                        self.config.SubtreeHashCacheSize)),
                 dataDir=dataDir,
                 fileName=self.ledgerFile,
                 ensureDurability=self.config.EnsureLedgerDurability,
+                transactionLogStore=initKeyValueStorageIntKeys(
+                    self.config.transactionLogDefaultStorage,
+                    dataDir,
+                    self.ledgerFile,
+                    db_config=txnLogDbConfig(self.config)),
                 genesis_txn_initiator=genesis_txn_initiator)
         return self._ledger
 
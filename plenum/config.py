@@ -47,6 +47,8 @@ seqNoDbName = 'seq_no_db'
 
 clientBootStrategy = ClientBootStrategy.PoolTxn
 
+# Type of the hash stores of ledgers, `HS_FILE`, `HS_LEVELDB`, `HS_MMAP`
+# (same files as `HS_FILE` read through memory maps) or `HS_MEMORY`
 hashStore = {
     "type": HS_FILE
 }
@@ -57,6 +59,70 @@ domainStateStorage = KeyValueStorageType.Leveldb
 poolStateStorage = KeyValueStorageType.Leveldb
 reqIdToTxnStorage = KeyValueStorageType.Leveldb
 
+# Secondary indexes of the domain ledger, each one is a tuple of the fields
+# of the transactions it covers
+domainTxnIndexes = [('identifier', 'reqId'), ('type',)]
+domainTxnIndexStorage = KeyValueStorageType.Leveldb
+domainTxnIndexDbName = 'domain_txn_index'
+
+# If enabled, trie nodes of the states written while applying batches are
+# kept in memory and only the nodes of committed state roots are written to
+# the state stores, see `WriteBackDB`
+StateWriteBack = False
+
+# Memory budget in bytes of the cache of decoded trie nodes of each state
+StateNodeCacheSize = 32 * 1024 * 1024
+
+# Number of last committed state roots whose trie nodes are kept, the nodes
+# of older roots are deleted from the state stores a slice of
+# `StateCompactionTimeSlice` seconds every `StateCompactionFreq` seconds,
+# see `PruningDB`. Trie nodes are never deleted if 0
+StateRetainedRoots = 0
+StateCompactionFreq = 1
+StateCompactionTimeSlice = 0.01
+
+# Number of ledger txns applied to a state between commits when the state
+# is brought up to date with its ledger on start
+StateReplayBatchSize = 1000
+
+# Store of the transaction logs of the ledgers, `KeyValueStorageType.Leveldb`,
+# `KeyValueStorageType.Rocksdb` or `KeyValueStorageType.BlockFile`
+transactionLogDefaultStorage = KeyValueStorageType.Leveldb
+
+# Options of transaction logs in compressed blocks of transactions
+# (`KeyValueStorageType.BlockFile`), see `KeyValueStorageBlockFile`
+blockFileTxnLogConfig = {
+    'blockSize': 256,
+    'compressionLevel': 6,
+    'cachedBlocks': 16
+}
+
+# Options of RocksDB stores (`KeyValueStorageType.Rocksdb`) by the kind of
+# data they keep, see `KeyValueStorageRocksdb`. Trie nodes of states are read
+# by their hashes, prefix bloom filters avoid reading the disk for hashes
+# not in the store
+rocksdbTxnLogConfig = {
+    'bloomBitsPerKey': 10,
+    'blockCacheSize': 64 * 1024 * 1024,
+    'writeBufferSize': 64 * 1024 * 1024
+}
+rocksdbStateConfig = {
+    'bloomBitsPerKey': 10,
+    'prefixLength': 8,
+    'blockCacheSize': 256 * 1024 * 1024,
+    'writeBufferSize': 64 * 1024 * 1024
+}
+rocksdbSeqNoConfig = {
+    'bloomBitsPerKey': 10,
+    'blockCacheSize': 32 * 1024 * 1024,
+    'writeBufferSize': 32 * 1024 * 1024
+}
+rocksdbTxnIndexConfig = {
+    'bloomBitsPerKey': 10,
+    'blockCacheSize': 32 * 1024 * 1024,
+    'writeBufferSize': 32 * 1024 * 1024
+}
+
 DefaultPluginPath = {
     # PLUGIN_BASE_DIR_PATH: "<abs path of plugin directory can be given here,
     #  if not given, by default it will pickup plenum/server/plugin path>",
@@ -149,6 +215,15 @@ ExpectedConnectTime = 3.3 if sys.platform == 'win32' else 2
 # repository
 EnsureLedgerDurability = False
 
+# Number of processes hashing the domain ledger when its merkle tree is
+# recovered from the transaction log, it is hashed in the node process if
+# not more than 1
+LedgerRecoveryProcesses = 0
+
+# Memory in bytes for hashes of complete subtrees of the merkle tree of each
+# ledger, kept for building merkle proofs (during catchup and in replies)
+SubtreeHashCacheSize = 12 * 1024 * 1024
+
 log_override_tags = dict(cli={}, demo={})
 
 # TODO needs to be refactored to use a transport protocol abstraction
@@ -166,6 +241,56 @@ Max3PCBatchSize = 100
 # Max time to wait before creating a batch for 3 phase commit
 Max3PCBatchWait = .001
 
+# If enabled, primaries adapt the batch size and the time to wait for a batch
+# to their load, between `Min3PCBatchSize` and `Max3PCBatchSize` and between
+# `Min3PCBatchWait` and `Max3PCBatchWait`
+Adaptive3PCBatching = False
+Min3PCBatchSize = 1
+Min3PCBatchWait = .0001
+# Number of batches sent but not ordered at which batches grow
+Adaptive3PCBatchMaxInFlight = 4
+# Average ordering latency (in seconds) above which the wait for a batch
+# shrinks
+Adaptive3PCBatchTargetLatency = 1
+
+# If enabled, signatures of client requests and PROPAGATEs are verified in
+# batches of `SigVerificationBatchSize` on a pool of
+# `SigVerificationProcesses` worker processes (or in the node process if it is
+# 0) instead of one at a time as messages arrive
+BatchSigVerification = False
+SigVerificationProcesses = 2
+SigVerificationBatchSize = 100
+
+# If enabled, replies to clients are sent only after the ledger, the state
+# and the seqNoDB are synced to disk. The stores are synced on a background
+# thread once for all the batches committed during the previous sync, which
+# makes writes durable without the cost of `EnsureLedgerDurability`
+GroupCommit = False
+
+# If set, snapshots of the domain ledger and state are written in this
+# directory every `SnapshotEveryCheckpoints` stable checkpoints of the master
+# instance, a slice of `SnapshotTimeSlice` seconds every `SnapshotWriteFreq`
+# seconds. The `export_ledger_snapshot` script writes one for a stopped node.
+# A new node started with `BootstrapSnapshot` as the path of a snapshot imports
+# its domain ledger and state from it once f+1 nodes sent the root of their
+# domain ledger at the size of the snapshot, and catches up only the
+# transactions ordered after the snapshot. The snapshot is dropped if the
+# roots are not received in `BootstrapSnapshotTimeout` seconds
+SnapshotDir = None
+SnapshotEveryCheckpoints = 10
+SnapshotTimeSlice = 0.05
+SnapshotWriteFreq = 0.2
+BootstrapSnapshot = None
+BootstrapSnapshotTimeout = 60
+
+# If enabled, replicas of backup protocol instances run in worker processes,
+# one per replica, leaving the node process to the master replica
+BackupReplicasInProcesses = False
+
+# Max number of requests remembered as having a verified signature, so that
+# the PROPAGATEs of a request do not need signature verification
+VerifiedReqCacheSize = 10000
+
 
 # Each node keeps a map of PrePrepare sequence numbers and the corresponding
 # txn seqnos that came out of it. Helps in servicing Consistency Proof Requests
@@ -79,6 +79,10 @@ class LevelDbHashStore(HashStore):
         self.leavesDb = KeyValueStorageLeveldb(
             self.dataDir, self.leaves_db_name)
 
+    def sync(self):
+        self.nodesDb.sync()
+        self.leavesDb.sync()
+
     def close(self):
         self.nodesDb.close()
         self.leavesDb.close()
@@ -40,5 +40,8 @@ class ReqIdrToTxn:
     def size(self):
         return self._keyValueStorage.size
 
+    def sync(self):
+        self._keyValueStorage.sync()
+
     def close(self):
         self._keyValueStorage.close()
@@ -5,7 +5,11 @@ from plenum.common.exceptions import DataDirectoryNotFound, KeyValueStorageConfi
 from plenum.common.messages.node_messages import Reply
 from storage.kv_in_memory import KeyValueStorageInMemory
 from storage.kv_store import KeyValueStorage
+from storage.kv_store_block_file import KeyValueStorageBlockFile
 from storage.kv_store_leveldb import KeyValueStorageLeveldb
+from storage.kv_store_leveldb_int_keys import KeyValueStorageLeveldbIntKeys
+from storage.kv_store_rocksdb import KeyValueStorageRocksdb
+from storage.kv_store_rocksdb_int_keys import KeyValueStorageRocksdbIntKeys
 from storage.text_file_store import TextFileStore
 
 
@@ -28,15 +32,53 @@ class Storage(ABC):
 
 
 def initKeyValueStorage(keyValueType, dataLocation,
-                        keyValueStorageName) -> KeyValueStorage:
+                        keyValueStorageName,
+                        db_config=None) -> KeyValueStorage:
+    """
+    :param db_config: options of the store for its kind of data, passed to
+    RocksDB stores
+    """
     if keyValueType == KeyValueStorageType.Leveldb:
         return KeyValueStorageLeveldb(dataLocation, keyValueStorageName)
+    elif keyValueType == KeyValueStorageType.Rocksdb:
+        return KeyValueStorageRocksdb(dataLocation, keyValueStorageName,
+                                      **(db_config or {}))
     elif keyValueType == KeyValueStorageType.Memory:
         return KeyValueStorageInMemory()
     else:
         raise KeyValueStorageConfigNotFound
 
 
+def initKeyValueStorageIntKeys(keyValueType, dataLocation,
+                               keyValueStorageName,
+                               db_config=None) -> KeyValueStorage:
+    """
+    Same as `initKeyValueStorage` for stores with keys ordered as integers,
+    like transaction logs
+    """
+    if keyValueType == KeyValueStorageType.Leveldb:
+        return KeyValueStorageLeveldbIntKeys(dataLocation, keyValueStorageName)
+    elif keyValueType == KeyValueStorageType.Rocksdb:
+        return KeyValueStorageRocksdbIntKeys(dataLocation,
+                                             keyValueStorageName,
+                                             **(db_config or {}))
+    elif keyValueType == KeyValueStorageType.BlockFile:
+        return KeyValueStorageBlockFile(dataLocation, keyValueStorageName,
+                                        **(db_config or {}))
+    else:
+        raise KeyValueStorageConfigNotFound
+
+
+def txnLogDbConfig(config):
+    """
+    Options of the store of transaction logs configured by
+    `transactionLogDefaultStorage`
+    """
+    if config.transactionLogDefaultStorage == KeyValueStorageType.BlockFile:
+        return config.blockFileTxnLogConfig
+    return config.rocksdbTxnLogConfig
+
+
 def initStorage(storageType, name, dataDir=None, config=None):
     if storageType == StorageType.File:
         if dataDir is None:
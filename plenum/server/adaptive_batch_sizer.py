@@ -0,0 +1,59 @@
+GROW = 'grow'
+SHRINK = 'shrink'
+KEEP = 'keep'
+
+
+class AdaptiveBatchSizer:
+    """
+    Chooses the size of 3 phase batches and the time to wait for them from
+    the load of a primary replica. A decision is made every time a batch is
+    created:
+
+    - when more requests are queued than fit in a batch or too many batches
+    are in flight, the replica is loaded, the batch size and the wait are
+    doubled to order more requests per batch,
+    - when the batch is cut before it is full, the replica is idle, the batch
+    size and the wait are halved to order requests sooner,
+    - when the ordering latency is above the target, the wait is halved
+    whatever the load is.
+
+    Both values stay within the bounds given by the config.
+    """
+
+    def __init__(self, config):
+        self.minBatchSize = config.Min3PCBatchSize
+        self.maxBatchSize = config.Max3PCBatchSize
+        self.minBatchWait = config.Min3PCBatchWait
+        self.maxBatchWait = config.Max3PCBatchWait
+        self.maxInFlight = config.Adaptive3PCBatchMaxInFlight
+        self.targetLatency = config.Adaptive3PCBatchTargetLatency
+        assert 0 < self.minBatchSize <= self.maxBatchSize
+        assert 0 < self.minBatchWait <= self.maxBatchWait
+
+        # Start small, an idle replica orders requests as soon as they come
+        self.batchSize = self.minBatchSize
+        self.batchWait = self.minBatchWait
+
+    def update(self, queueDepth: int, inFlight: int, latency: float) -> str:
+        """
+        Adjust the batch size and the wait after a batch is created.
+
+        :param queueDepth: number of requests queued when the batch was created
+        :param inFlight: number of batches sent but not yet ordered
+        :param latency: recent average ordering latency of requests
+        :return: the decision made, one of `GROW`, `SHRINK` or `KEEP`
+        """
+        if queueDepth > self.batchSize or inFlight >= self.maxInFlight:
+            decision = GROW
+            self.batchSize = min(self.batchSize * 2, self.maxBatchSize)
+            self.batchWait = min(self.batchWait * 2, self.maxBatchWait)
+        elif queueDepth < self.batchSize:
+            decision = SHRINK
+            self.batchSize = max(self.batchSize // 2, self.minBatchSize)
+            self.batchWait = max(self.batchWait / 2, self.minBatchWait)
+        else:
+            decision = KEEP
+
+        if latency > self.targetLatency:
+            self.batchWait = max(self.batchWait / 2, self.minBatchWait)
+        return decision
@@ -0,0 +1,115 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Callable, List, Tuple
+
+from plenum.common.verifier import DidVerifier
+from stp_core.common.log import getlogger
+
+logger = getlogger()
+
+# identifier, verkey, raw signature, serialized message
+SigVerificationItem = Tuple[str, str, bytes, bytes]
+
+
+def verify_signatures(items: List[SigVerificationItem]) -> List[bool]:
+    """
+    Verify a batch of signatures. Executed in a worker process so should
+    not depend on any state of the node.
+
+    :param items: list of (identifier, verkey, signature, serialized msg)
+    :return: list of verification results in the same order as `items`
+    """
+    results = []
+    for identifier, verkey, sig, ser in items:
+        try:
+            vr = DidVerifier(verkey, identifier=identifier)
+            results.append(vr.verify(sig, ser))
+        except Exception as ex:
+            logger.debug('Could not verify signature of {}: {}'.
+                         format(identifier, ex))
+            results.append(False)
+    return results
+
+
+class BatchedSigVerifier:
+    """
+    Collects signatures to be verified and verifies them in batches. If
+    `processes` is positive, batches are verified on a pool of worker
+    processes so signature checks do not block the event loop and scale with
+    the number of cores, otherwise they are verified in the calling process.
+
+    Results are delivered through callbacks from `service`, in the order in
+    which the signatures were added.
+    """
+
+    def __init__(self, processes: int=0, batchSize: int=100):
+        assert batchSize > 0
+        self.processes = processes
+        self.batchSize = batchSize
+        # Worker processes are started on first use and again after `stop`
+        self._executor = None
+        # Signatures not yet submitted for verification
+        self._pending = []  # type: List[Tuple[SigVerificationItem, Callable]]
+        # Submitted batches, as tuples of future and callbacks
+        self._inProgress = deque()
+
+    def __len__(self):
+        return len(self._pending) + \
+            sum(len(callbacks) for _, callbacks in self._inProgress)
+
+    def add(self, identifier: str, verkey: str, sig: bytes, ser: bytes,
+            callback: Callable[[bool], None]):
+        """
+        Queue a signature for verification.
+
+        :param callback: called with the result of verification
+        """
+        self._pending.append(((identifier, verkey, sig, ser), callback))
+
+    def service(self) -> int:
+        """
+        Submit the queued signatures for verification and deliver the results
+        of completed batches.
+
+        :return: the number of signatures whose results were delivered
+        """
+        self._submitPending()
+        return self._deliverResults()
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _submitPending(self):
+        if self._pending and self._executor is None and self.processes > 0:
+            self._executor = ProcessPoolExecutor(max_workers=self.processes)
+        while self._pending:
+            batch = self._pending[:self.batchSize]
+            self._pending = self._pending[self.batchSize:]
+            items = [item for item, _ in batch]
+            callbacks = [callback for _, callback in batch]
+            if self._executor is not None:
+                fut = self._executor.submit(verify_signatures, items)
+            else:
+                fut = Future()
+                fut.set_result(verify_signatures(items))
+            self._inProgress.append((fut, callbacks))
+
+    def _deliverResults(self) -> int:
+        count = 0
+        while self._inProgress:
+            fut, callbacks = self._inProgress[0]
+            if not fut.done():
+                break
+            self._inProgress.popleft()
+            try:
+                results = fut.result()
+            except Exception as ex:
+                logger.warning('Batch signature verification failed: {}'.
+                               format(ex))
+                results = [False] * len(callbacks)
+            for callback, verified in zip(callbacks, results):
+                callback(verified)
+            count += len(callbacks)
+        return count
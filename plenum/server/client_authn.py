@@ -2,7 +2,7 @@
 Clients are authenticated with a digital signature.
 """
 from abc import abstractmethod
-from typing import Dict
+from typing import Dict, Tuple
 
 import base58
 from common.serializers.serialization import serialize_msg_for_signing
@@ -28,7 +28,8 @@ class ClientAuthNr:
     def authenticate(self,
                      msg: Dict,
                      identifier: str = None,
-                     signature: str = None) -> str:
+                     signature: str = None,
+                     serialized: bytes = None) -> str:
         """
         Authenticate the client's message with the signature provided.
 
@@ -36,6 +37,8 @@ class ClientAuthNr:
         msg['identifier'] as identifier
         :param signature: a utf-8 and base58 encoded signature
         :param msg: the message to authenticate
+        :param serialized: the message already serialized for signing, if
+        known; if None, `msg` is serialized
         :return: the identifier; an exception of type SigningException is
             raised if the signature is not valid
         """
@@ -67,7 +70,36 @@ class NaclAuthNr(ClientAuthNr):
     def authenticate(self,
                      msg: Dict,
                      identifier: str = None,
-                     signature: str = None) -> str:
+                     signature: str = None,
+                     serialized: bytes = None) -> str:
+        try:
+            identifier, verkey, sig, ser = self.getVerificationData(
+                msg, identifier, signature, serialized)
+            vr = DidVerifier(verkey, identifier=identifier)
+            isVerified = vr.verify(sig, ser)
+            if not isVerified:
+                raise InvalidSignature
+        except SigningException as e:
+            raise e
+        except Exception as ex:
+            raise CouldNotAuthenticate from ex
+        return identifier
+
+    def getVerificationData(self,
+                            msg: Dict,
+                            identifier: str = None,
+                            signature: str = None,
+                            serialized: bytes = None) -> Tuple[str, str, bytes,
+                                                               bytes]:
+        """
+        Get everything needed to verify the signature of the client's message
+        without doing the (expensive) verification itself, so it can be done
+        elsewhere, for example in a batch.
+
+        :return: tuple of identifier, verkey, raw signature and the serialized
+            message; an exception of type SigningException is raised if the
+            message can not be authenticated
+        """
         try:
             if not signature:
                 try:
@@ -89,22 +121,18 @@ class NaclAuthNr(ClientAuthNr):
                 sig = base58.b58decode(signature)
             except Exception as ex:
                 raise InvalidSignatureFormat from ex
-            ser = self.serializeForSig(msg, topLevelKeysToIgnore=[f.SIG.nm])
+            ser = serialized if serialized is not None else \
+                self.serializeForSig(msg, topLevelKeysToIgnore=[f.SIG.nm])
             verkey = self.getVerkey(identifier)
 
             if verkey is None:
                 raise CouldNotAuthenticate(
                     'Can not find verkey for DID {}'.format(identifier))
-
-            vr = DidVerifier(verkey, identifier=identifier)
-            isVerified = vr.verify(sig, ser)
-            if not isVerified:
-                raise InvalidSignature
         except SigningException as e:
             raise e
         except Exception as ex:
             raise CouldNotAuthenticate from ex
-        return identifier
+        return identifier, verkey, sig, ser
 
     @abstractmethod
     def addIdr(self, identifier, verkey, role=None):
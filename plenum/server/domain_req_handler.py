@@ -1,4 +1,6 @@
+from collections import Counter
 from hashlib import sha256
+from typing import List, Tuple
 
 from common.serializers.serialization import domain_state_serializer
 from ledger.util import F
@@ -16,10 +18,22 @@ logger = getlogger()
 
 class DomainRequestHandler(RequestHandler):
     stateSerializer = domain_state_serializer
+    # Key of the role counts kept with the committed state, outside of it
+    roleCountsKey = b'\x00roleCounts'
+    committedMetaKeys = (roleCountsKey,)
 
     def __init__(self, ledger, state, reqProcessors):
         super().__init__(ledger, state)
         self.reqProcessors = reqProcessors
+        # Number of nyms having each role in the committed state and in the
+        # head of the state. They are not part of the state, whose root the
+        # pool agrees on, the committed ones are written with the committed
+        # root and restored on start by `initRoleCounts`
+        self._committedRoleCounts = Counter()
+        self._roleCounts = Counter()
+        # State roots and role counts after each batch applied but not
+        # committed yet, in the order of the batches
+        self._uncommittedRoleCounts = []  # type: List[Tuple[bytes, Counter]]
 
     def validate(self, req: Request, config=None):
         if req.operation.get(TXN_TYPE) == NYM:
@@ -38,6 +52,20 @@ class DomainRequestHandler(RequestHandler):
                                                 req.reqId,
                                                 error)
 
+    def prefetch(self, reqs: List[Request]):
+        # Validating and applying a NYM reads the nyms of its sender and
+        # target, reading them in one walk of the trie brings the nodes on
+        # their paths in the node cache of the state
+        nyms = set()
+        for req in reqs:
+            if req.operation.get(TXN_TYPE) == NYM:
+                nyms.add(req.identifier)
+                nyms.add(req.operation.get(TARGET_NYM))
+        nyms.discard(None)
+        if nyms:
+            self.state.get_many([self.nym_to_state_key(nym) for nym in nyms],
+                                isCommitted=False)
+
     def _reqToTxn(self, req: Request, cons_time: int):
         txn = reqToTxn(req, cons_time)
         for processor in self.reqProcessors:
@@ -75,25 +103,88 @@ class DomainRequestHandler(RequestHandler):
             logger.debug(
                 'Cannot apply request of type {} to state'.format(typ))
 
-    def countStewards(self) -> int:
+    def committedStateMeta(self, stateRoot):
+        for i, (batchRoot, counts) in enumerate(self._uncommittedRoleCounts):
+            if batchRoot == stateRoot:
+                self._committedRoleCounts = counts
+                del self._uncommittedRoleCounts[:i + 1]
+                break
+        else:
+            # The batch was applied without being tracked, it is the head
+            self._committedRoleCounts = self._roleCounts.copy()
+            self._uncommittedRoleCounts = []
+        return self._roleCountsMeta(self._committedRoleCounts)
+
+    def onBatchCreated(self, stateRoot):
+        self._uncommittedRoleCounts.append((stateRoot,
+                                            self._roleCounts.copy()))
+
+    def onBatchRejected(self):
+        # The state has been reverted to the root of an earlier batch, the
+        # counts are a function of the state so they are the ones of that
+        # root
+        head = self.state.headHash
+        while self._uncommittedRoleCounts and \
+                self._uncommittedRoleCounts[-1][0] != head:
+            self._uncommittedRoleCounts.pop()
+        counts = self._uncommittedRoleCounts[-1][1] \
+            if self._uncommittedRoleCounts else self._committedRoleCounts
+        self._roleCounts = counts.copy()
+
+    def initRoleCounts(self):
+        """
+        Restore the role counts kept with the committed state. The counts of
+        a state committed before they were kept with it are counted once
+        from the ledger txns applied to it
         """
-        Count the number of stewards added to the pool transaction store
-        Note: This is inefficient, a production use case of this function
-        should require an efficient storage mechanism
+        data = self.state.getCommittedMeta(self.roleCountsKey)
+        if data is not None:
+            counts = Counter(self.stateSerializer.deserialize(data))
+        elif self.state.isEmpty:
+            counts = Counter()
+        else:
+            roles = {}
+            for _, txn in self.ledger.getAllTxn(
+                    to=self.state.committedSeqNo):
+                if txn.get(TXN_TYPE) == NYM and ROLE in txn:
+                    roles[txn.get(TARGET_NYM)] = txn[ROLE]
+            counts = Counter(role for role in roles.values() if role)
+            # Kept with the committed state for the next starts
+            self.state.commit(rootHash=self.state.committedHeadHash,
+                              seqNo=self.state.committedSeqNo,
+                              meta=self._roleCountsMeta(counts))
+        self._committedRoleCounts = counts
+        self._roleCounts = counts.copy()
+        self._uncommittedRoleCounts = []
+
+    def _roleCountsMeta(self, counts):
+        return {self.roleCountsKey:
+                self.stateSerializer.serialize(dict(counts))}
+
+    def countRole(self, role, isCommitted: bool = True) -> int:
+        counts = self._committedRoleCounts if isCommitted \
+            else self._roleCounts
+        return counts[role]
+
+    def countStewards(self, isCommitted: bool = True) -> int:
+        """
+        Count the number of nyms with the steward role, from the role
+        counters kept in memory
         """
-        # THIS SHOULD NOT BE DONE FOR PRODUCTION
-        return sum(1 for _, txn in self.ledger.getAllTxn() if
-                   (txn[TXN_TYPE] == NYM) and (txn.get(ROLE) == STEWARD))
+        return self.countRole(STEWARD, isCommitted=isCommitted)
 
-    def stewardThresholdExceeded(self, config) -> bool:
+    def stewardThresholdExceeded(self, config,
+                                 isCommitted: bool = True) -> bool:
         """We allow at most `stewardThreshold` number of  stewards to be added
         by other stewards"""
-        return self.countStewards() > config.stewardThreshold
+        return self.countStewards(isCommitted=isCommitted) > \
+            config.stewardThreshold
 
     def updateNym(self, nym, txn, isCommitted=True):
         existingData = self.getNymDetails(self.state, nym,
                                           isCommitted=isCommitted)
         newData = {}
+        oldRole = existingData.get(ROLE)
         if not existingData:
             # New nym being added to state, set the TrustAnchor
             newData[f.IDENTIFIER.nm] = txn.get(f.IDENTIFIER.nm)
@@ -113,8 +204,19 @@ class DomainRequestHandler(RequestHandler):
         val = self.stateSerializer.serialize(existingData)
         key = self.nym_to_state_key(nym)
         self.state.set(key, val)
+        if existingData.get(ROLE) != oldRole:
+            self._updateRoleCount(oldRole, -1, isCommitted)
+            self._updateRoleCount(existingData.get(ROLE), 1, isCommitted)
         return existingData
 
+    def _updateRoleCount(self, role, delta, isCommitted):
+        if not role:
+            return
+        self._roleCounts[role] += delta
+        if isCommitted:
+            # Committed txns are applied when there is no uncommitted batch
+            self._committedRoleCounts[role] += delta
+
     def hasNym(self, nym, isCommitted: bool = True):
         key = self.nym_to_state_key(nym)
         data = self.state.get(key, isCommitted)
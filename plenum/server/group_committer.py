@@ -0,0 +1,105 @@
+from collections import deque
+from threading import Condition, Thread
+from typing import Callable, Iterable, List, Tuple
+
+from stp_core.common.log import getlogger
+
+logger = getlogger()
+
+
+class GroupCommitter:
+    """
+    Makes the writes of committed batches durable with a single sync of each
+    store written to, for all the batches committed while the previous sync
+    was going on. Stores are synced on a background thread, so neither the
+    writes nor the event loop wait for the disk.
+
+    Callbacks of the batches (sending replies to clients) are called from
+    `service`, in the order in which the batches were added, once all the
+    stores the batch was written to are synced.
+    """
+
+    def __init__(self):
+        self._cond = Condition()
+        # Batches not yet synced, as tuples of stores and callback
+        self._pending = []  # type: List[Tuple[Iterable, Callable]]
+        # Callbacks of synced batches
+        self._synced = deque()
+        # Thread syncing the stores, started on first use and again after
+        # `stop`
+        self._thread = None
+        self._stopping = False
+        # Number of syncs of stores, each for one or more batches
+        self.syncCount = 0
+
+    def __len__(self):
+        return len(self._pending) + len(self._synced)
+
+    def add(self, stores: Iterable, callback: Callable[[], None]):
+        """
+        Queue a committed batch to be made durable.
+
+        :param stores: the stores the batch was written to, anything having
+        a `sync` method
+        :param callback: called once the stores are synced
+        """
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name='group-commit',
+                                  daemon=True)
+            self._thread.start()
+        with self._cond:
+            self._pending.append((tuple(stores), callback))
+            self._cond.notify()
+
+    def service(self) -> int:
+        """
+        Call the callbacks of the synced batches.
+
+        :return: the number of callbacks called
+        """
+        count = 0
+        while self._synced:
+            callback = self._synced.popleft()
+            callback()
+            count += 1
+        return count
+
+    def stop(self):
+        """
+        Sync the queued batches and stop the syncing thread, the callbacks of
+        the batches are still called from `service`.
+        """
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join()
+        self._thread = None
+        self._stopping = False
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                batches, self._pending = self._pending, []
+            self._sync(batches)
+
+    def _sync(self, batches: List[Tuple[Iterable, Callable]]):
+        synced = set()
+        for stores, _ in batches:
+            for store in stores:
+                if id(store) in synced:
+                    continue
+                synced.add(id(store))
+                try:
+                    store.sync()
+                except Exception as ex:
+                    logger.warning('Could not sync {}: {}'.format(store, ex))
+        self.syncCount += 1
+        logger.trace('Synced {} stores for {} batches'.
+                     format(len(synced), len(batches)))
+        self._synced.extend(callback for _, callback in batches)
@@ -0,0 +1,412 @@
+"""
+Snapshots of ledgers, with their hash stores, and of states, written to a
+compressed archive so a new node can start from them instead of catching up
+and applying every transaction.
+
+The archive is a gzipped tar. Its first member is a manifest giving the size
+and the merkle root of each ledger, and the committed root, the ledger seqNo
+and the entries kept outside of the trie of each state. Then come, for each
+ledger, the entries of its transaction log and the hashes of its hash store,
+and for each state, the trie nodes reachable from its root. A state of a
+snapshot is always committed at the size of the ledger of the same id, so a
+ledger verified against the pool binds the state imported with it: the nodes
+of the state are checked against its root, and the root is checked by the
+pool when the node orders its next batches.
+
+Members are read in the order they are written, without seeking in the
+compressed archive.
+"""
+
+import gzip
+import json
+import os
+import shutil
+import struct
+import tarfile
+import tempfile
+import time
+from binascii import hexlify, unhexlify
+from itertools import islice
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Tuple
+
+from ledger.tree_hasher import TreeHasher
+from ledger.tree_recovery import serialize_entry_for_tree
+from plenum.common.exceptions import SnapshotVerificationFailed
+from plenum.common.ledger import Ledger
+from state.pruning_state import PruningState
+from stp_core.common.log import getlogger
+
+logger = getlogger()
+
+SNAPSHOT_VERSION = 2
+MANIFEST = 'manifest.json'
+
+_recordLength = struct.Struct('>I')
+
+
+def _txnsMember(ledgerId) -> str:
+    return 'ledger/{}/txns'.format(ledgerId)
+
+
+def _leavesMember(ledgerId) -> str:
+    return 'ledger/{}/leaves'.format(ledgerId)
+
+
+def _nodesMember(ledgerId) -> str:
+    return 'ledger/{}/nodes'.format(ledgerId)
+
+
+def _stateMember(stateId) -> str:
+    return 'state/{}/nodes'.format(stateId)
+
+
+def _packRecords(records: Iterable[Tuple[bytes, bytes]]) -> bytes:
+    return b''.join(_recordLength.pack(len(key)) + key +
+                    _recordLength.pack(len(value)) + value
+                    for key, value in records)
+
+
+def _readRecords(f: BinaryIO) -> Iterable[Tuple[bytes, bytes]]:
+    def read(size):
+        data = f.read(size)
+        if len(data) != size:
+            raise SnapshotVerificationFailed('Truncated snapshot')
+        return data
+
+    while True:
+        header = f.read(_recordLength.size)
+        if not header:
+            return
+        if len(header) != _recordLength.size:
+            raise SnapshotVerificationFailed('Truncated snapshot')
+        key = read(_recordLength.unpack(header)[0])
+        value = read(_recordLength.unpack(read(_recordLength.size))[0])
+        yield key, value
+
+
+def _readHashes(f: BinaryIO, size: int) -> Iterable[bytes]:
+    while True:
+        data = f.read(size)
+        if not data:
+            return
+        if len(data) != size:
+            raise SnapshotVerificationFailed('Truncated snapshot')
+        yield data
+
+
+class SnapshotWriter:
+    """
+    Writes a snapshot of the committed ledgers and states a chunk at a time,
+    so that a node can write it in time slices between its other work, like
+    states are compacted.
+
+    The sizes and roots of the snapshot are taken when the writer is
+    created; the ledgers can grow while the snapshot is written since only
+    their first transactions are read. The trie nodes of a state are read as
+    they are written, so they must not be deleted by compaction until the
+    snapshot is written. Stores are read only within a step, nothing read
+    from them is kept across steps.
+
+    The archive is written next to `path` and renamed once complete, so an
+    existing snapshot is replaced only by a complete one.
+    """
+
+    def __init__(self, path: str, ledgers: Dict[int, Ledger],
+                 states: Optional[Dict[int, PruningState]] = None,
+                 stateMetaKeys: Optional[Dict[int, Iterable[bytes]]] = None,
+                 compressLevel: int = 6, chunkSize: int = 1000):
+        """
+        :param states: states written with the ledgers of the same ids, each
+        has to be committed at the size of its ledger
+        :param stateMetaKeys: keys of the entries kept outside of the trie of
+        the states, see `PruningState.commit`, written with them
+        """
+        states = states or {}
+        stateMetaKeys = stateMetaKeys or {}
+        self.path = path
+        self.chunkSize = chunkSize
+        self.manifest = {'version': SNAPSHOT_VERSION, 'ledgers': {},
+                         'states': {}}
+        for ledgerId, ledger in ledgers.items():
+            self.manifest['ledgers'][str(ledgerId)] = {
+                'size': ledger.size,
+                'rootHash': ledger.root_hash,
+                'hashSize': len(ledger.tree.root_hash)
+            }
+        for stateId, state in states.items():
+            ledgerInfo = self.manifest['ledgers'].get(str(stateId))
+            if ledgerInfo is None or \
+                    state.committedSeqNo != ledgerInfo['size']:
+                raise ValueError('State {} is committed at seqNo {}, not at '
+                                 'the size of its ledger'.
+                                 format(stateId, state.committedSeqNo))
+            meta = {}
+            for key in stateMetaKeys.get(stateId, ()):
+                value = state.getCommittedMeta(key)
+                if value is not None:
+                    meta[hexlify(key).decode()] = hexlify(value).decode()
+            self.manifest['states'][str(stateId)] = {
+                'rootHash': hexlify(state.committedHeadHash).decode(),
+                'seqNo': state.committedSeqNo,
+                'meta': meta
+            }
+        self._steps = self._write(ledgers, states, compressLevel)
+
+    def write(self, timeLimit: Optional[float] = None) -> bool:
+        """
+        Write the snapshot for at most about `timeLimit` seconds, until it
+        is complete if no limit is given
+
+        :return: whether the snapshot is complete
+        """
+        start = time.perf_counter()
+        for _ in self._steps:
+            if timeLimit is not None and \
+                    time.perf_counter() - start >= timeLimit:
+                return False
+        return True
+
+    def abort(self):
+        """
+        Stop writing the snapshot, the incomplete archive is removed
+        """
+        self._steps.close()
+
+    def _write(self, ledgers: Dict[int, Ledger],
+               states: Dict[int, PruningState], compressLevel: int):
+        tmpPath = self.path + '.tmp'
+        complete = False
+        try:
+            with open(tmpPath, 'wb') as raw, \
+                    gzip.GzipFile(fileobj=raw, mode='wb',
+                                  compresslevel=compressLevel) as out:
+                yield from self._addMember(
+                    out, MANIFEST, [json.dumps(self.manifest).encode()])
+                for ledgerId, ledger in ledgers.items():
+                    info = self.manifest['ledgers'][str(ledgerId)]
+                    leaves, nodes = ledger.snapshotHashes(info['size'])
+                    yield from self._addMember(
+                        out, _txnsMember(ledgerId),
+                        self._txnChunks(ledger, info['size']))
+                    yield from self._addMember(
+                        out, _leavesMember(ledgerId), self._chunks(leaves))
+                    yield from self._addMember(
+                        out, _nodesMember(ledgerId), self._chunks(nodes))
+                for stateId, state in states.items():
+                    info = self.manifest['states'][str(stateId)]
+                    yield from self._addMember(
+                        out, _stateMember(stateId),
+                        self._chunks(state.snapshotNodes(
+                            unhexlify(info['rootHash'])), _packRecords))
+                out.write(tarfile.NUL * (2 * tarfile.BLOCKSIZE))
+            os.replace(tmpPath, self.path)
+            complete = True
+        finally:
+            if not complete and os.path.exists(tmpPath):
+                os.remove(tmpPath)
+        logger.info('Snapshot of ledgers {} and states {} written to {}'.
+                    format(self.manifest['ledgers'], self.manifest['states'],
+                           self.path))
+
+    def _txnChunks(self, ledger: Ledger, size: int) -> Iterator[bytes]:
+        # The transaction log is iterated anew for each chunk, its
+        # iterators are not valid once the ledger is appended to
+        for start in range(1, size + 1, self.chunkSize):
+            end = min(start + self.chunkSize - 1, size)
+            yield _packRecords((str(seqNo).encode(), value) for seqNo, value
+                               in ledger.snapshotTxns(end, start=start))
+
+    def _chunks(self, items: Iterable, pack=b''.join) -> Iterator[bytes]:
+        items = iter(items)
+        while True:
+            chunk = list(islice(items, self.chunkSize))
+            if not chunk:
+                return
+            yield pack(chunk)
+
+    @staticmethod
+    def _addMember(out: BinaryIO, name: str, chunks: Iterable[bytes],
+                   copySize: int = 1 << 20):
+        # Members are written to a temporary file first since the size of a
+        # member is needed before its contents
+        with tempfile.TemporaryFile() as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield
+            info = tarfile.TarInfo(name)
+            info.size = f.tell()
+            info.mtime = int(time.time())
+            out.write(info.tobuf(tarfile.DEFAULT_FORMAT, tarfile.ENCODING,
+                                 'surrogateescape'))
+            f.seek(0)
+            while True:
+                data = f.read(copySize)
+                if not data:
+                    break
+                out.write(data)
+                yield
+            remainder = info.size % tarfile.BLOCKSIZE
+            if remainder:
+                out.write(tarfile.NUL * (tarfile.BLOCKSIZE - remainder))
+
+
+def exportSnapshot(path: str, ledgers: Dict[int, Ledger],
+                   states: Optional[Dict[int, PruningState]] = None,
+                   stateMetaKeys: Optional[Dict[int, Iterable[bytes]]] = None,
+                   compressLevel: int = 6):
+    """
+    Write a snapshot of the committed ledgers and states at once, see
+    `SnapshotWriter`
+    """
+    SnapshotWriter(path, ledgers, states, stateMetaKeys,
+                   compressLevel).write()
+
+
+def _nextMember(tar: tarfile.TarFile, name: str) -> BinaryIO:
+    info = tar.next()
+    if info is None or info.name != name:
+        raise SnapshotVerificationFailed(
+            'Expected member {} of snapshot, found {}'.
+            format(name, info.name if info else None))
+    return tar.extractfile(info)
+
+
+def _memberRecords(tar: tarfile.TarFile, name: str, read=_readRecords):
+    # The member is only read once the records are, after the members
+    # before it
+    yield from read(_nextMember(tar, name))
+
+
+def readManifest(path: str) -> Dict:
+    with tarfile.open(path, 'r|gz') as tar:
+        manifest = json.loads(_nextMember(tar, MANIFEST).read().decode())
+    if manifest.get('version') != SNAPSHOT_VERSION:
+        raise SnapshotVerificationFailed(
+            'Unsupported snapshot version {}'.format(manifest.get('version')))
+    return manifest
+
+
+def importSnapshot(path: str, ledgers: Dict[int, Ledger],
+                   states: Optional[Dict[int, PruningState]] = None) \
+        -> Dict[int, int]:
+    """
+    Replace the ledgers, and the states of the ledgers, by their snapshot.
+    Only the ledgers and states given are imported. The transactions a
+    ledger has, like its genesis transactions, have to be the first ones of
+    the snapshot. The ledgers are checked against the roots of the
+    manifest, which the caller has to verify with the pool, and the states
+    against the roots of the manifest. If any check fails every ledger and
+    state given is discarded.
+
+    :return: the sizes of the imported ledgers by their ids
+    """
+    states = states or {}
+    manifest = readManifest(path)
+    for ledgerId, ledger in ledgers.items():
+        info = manifest['ledgers'].get(str(ledgerId))
+        if info is not None:
+            _checkPrefix(path, ledgerId, ledger, info)
+
+    imported = {}
+    try:
+        with tarfile.open(path, 'r|gz') as tar:
+            _nextMember(tar, MANIFEST)
+            for ledgerId, info in manifest['ledgers'].items():
+                ledger = ledgers.get(int(ledgerId))
+                if ledger is None:
+                    for name in (_txnsMember(ledgerId),
+                                 _leavesMember(ledgerId),
+                                 _nodesMember(ledgerId)):
+                        _nextMember(tar, name)
+                    continue
+                _importLedger(tar, ledgerId, ledger, info)
+                imported[int(ledgerId)] = ledger.size
+            for stateId, info in manifest['states'].items():
+                state = states.get(int(stateId))
+                nodes = _memberRecords(tar, _stateMember(stateId))
+                if state is None or int(stateId) not in imported:
+                    next(nodes, None)
+                    continue
+                if info['seqNo'] != imported[int(stateId)]:
+                    raise SnapshotVerificationFailed(
+                        'State {} of the snapshot is committed at seqNo {} '
+                        'instead of {}'.format(stateId, info['seqNo'],
+                                               imported[int(stateId)]))
+                try:
+                    state.loadSnapshot(
+                        nodes, unhexlify(info['rootHash']), info['seqNo'],
+                        {unhexlify(k): unhexlify(v)
+                         for k, v in info['meta'].items()})
+                except ValueError as ex:
+                    raise SnapshotVerificationFailed(
+                        'State {} of the snapshot does not match its root: '
+                        '{}'.format(stateId, ex)) from ex
+                logger.info('Imported state {} at root {} from snapshot {}'.
+                            format(stateId, info['rootHash'], path))
+    except Exception:
+        for ledger in ledgers.values():
+            _discard(ledger)
+        for state in states.values():
+            state.reset()
+        raise
+    return imported
+
+
+def _importLedger(tar: tarfile.TarFile, ledgerId: str, ledger: Ledger,
+                  info: Dict):
+    # The ledger reads the transactions, then the leaves, then the nodes,
+    # in the order they are in the archive
+    ledger.loadSnapshot(
+        ((int(seqNo), value) for seqNo, value in
+         _memberRecords(tar, _txnsMember(ledgerId))),
+        _memberRecords(tar, _leavesMember(ledgerId),
+                       lambda f: _readHashes(f, info['hashSize'])),
+        _memberRecords(tar, _nodesMember(ledgerId),
+                       lambda f: _readHashes(f, info['hashSize'])))
+    if (ledger.size, ledger.root_hash) != (info['size'], info['rootHash']):
+        raise SnapshotVerificationFailed(
+            'Ledger {} of the snapshot has size {} and root {} instead of {} '
+            'and {}'.format(ledgerId, ledger.size, ledger.root_hash,
+                            info['size'], info['rootHash']))
+    logger.info('Imported ledger {} of size {} from snapshot'.
+                format(ledgerId, ledger.size))
+
+
+def _discard(ledger: Ledger):
+    # The ledger is left as a new one, with its genesis transactions
+    ledger.reset()
+    if ledger.genesis_txn_initiator:
+        ledger.genesis_txn_initiator.init_ledger_from_genesis_txn(ledger)
+    ledger.reset_uncommitted()
+
+
+def _checkPrefix(path: str, ledgerId: int, ledger: Ledger, info: Dict,
+                 hasher=TreeHasher()):
+    """
+    Check that the transactions of the ledger are the first ones of the
+    snapshot, before the ledger is replaced
+    """
+    size = ledger.size
+    if not size:
+        return
+    if size > info['size']:
+        raise SnapshotVerificationFailed(
+            'Ledger has {} transactions, more than the snapshot'.format(size))
+    name = _txnsMember(ledgerId)
+    leaves = []
+    with tarfile.open(path, 'r|gz') as tar:
+        for member in tar:
+            if member.name == name:
+                break
+        else:
+            raise SnapshotVerificationFailed(
+                'Snapshot has no member {}'.format(name))
+        for _, entry in islice(_readRecords(tar.extractfile(member)), size):
+            if not ledger._transactionLog.is_byte:
+                entry = entry.decode()
+            leaves.append(serialize_entry_for_tree(
+                entry, ledger.txn_serializer, ledger.hash_serializer))
+    if hasher.hash_full_tree(leaves) != ledger.tree.root_hash:
+        raise SnapshotVerificationFailed(
+            'Transactions of the ledger are not the first ones of the '
+            'snapshot')
@@ -1,7 +1,7 @@
 from typing import Dict, Any, Optional
 from abc import ABCMeta, abstractmethod
 
-from plenum.common.constants import THREE_PC_PREFIX
+from plenum.common.constants import THREE_PC_PREFIX, PREPREPARE, PREPARE
 from plenum.common.messages.fields import RequestIdentifierField
 from plenum.common.messages.node_messages import MessageReq, MessageRep, \
     LedgerStatus, PrePrepare, ConsistencyProof, Propagate, Prepare
@@ -29,14 +29,17 @@ class BaseHandler(metaclass=ABCMeta):
         pass
 
     @abstractmethod
-    def requestor(self, params: Dict[str, Any]) -> Any:
+    def requestor(self, params: Dict[str, Any], frm: str) -> Any:
+        """
+        The message requested by `frm`, None if it is not sent in reply
+        """
         pass
 
     @abstractmethod
     def processor(self, validated_msg: object, params: Dict[str, Any], frm: str) -> None:
         pass
 
-    def serve(self, msg: MessageReq):
+    def serve(self, msg: MessageReq, frm: str):
         params = {}
 
         for field_name, type_name in self.fields.items():
@@ -46,7 +49,7 @@ class BaseHandler(metaclass=ABCMeta):
             self.node.discard(msg, 'cannot serve request', logMethod=logger.debug)
             return None
 
-        return self.requestor(params)
+        return self.requestor(params, frm)
 
     def process(self, msg: MessageRep, frm: str):
         params = {}
@@ -74,7 +77,7 @@ class LedgerStatusHandler(BaseHandler):
     def create(self, msg: Dict, **kwargs) -> LedgerStatus:
         return LedgerStatus(**msg)
 
-    def requestor(self, params: Dict[str, Any]) -> LedgerStatus:
+    def requestor(self, params: Dict[str, Any], frm: str) -> LedgerStatus:
         return self.node.getLedgerStatus(params['ledger_id'])
 
     def processor(self, validated_msg: LedgerStatus, params: Dict[str, Any], frm: str) -> None:
@@ -98,14 +101,14 @@ class ConsistencyProofHandler(BaseHandler):
     def create(self, msg: Dict, **kwargs) -> ConsistencyProof:
         return ConsistencyProof(**msg)
 
-    def requestor(self, params: Dict[str, Any]) -> ConsistencyProof:
+    def requestor(self, params: Dict[str, Any], frm: str) -> ConsistencyProof:
         return self.node.ledgerManager._buildConsistencyProof(
             params['ledger_id'],
             params['seq_no_start'],
             params['seq_no_end'])
 
     def processor(self, validated_msg: ConsistencyProof, params: Dict[str, Any], frm: str) -> None:
-        self.node.ledgerManager.processConsistencyProof(validated_msg, frm=frm)
+        self.node.processConsistencyProof(validated_msg, frm=frm)
 
 
 class PreprepareHandler(BaseHandler):
@@ -130,9 +133,11 @@ class PreprepareHandler(BaseHandler):
             return None
         return pp
 
-    def requestor(self, params: Dict[str, Any]) -> Optional[PrePrepare]:
-        return self.node.replicas[params['inst_id']].getPrePrepare(
-            params['view_no'], params['pp_seq_no'])
+    def requestor(self, params: Dict[str, Any], frm: str) -> Optional[PrePrepare]:
+        # A replica in a replica process returns nothing, the node replies
+        # once the process found the message
+        return self.node.replicas[params['inst_id']].serve_requested_msg(
+            PREPREPARE, params['view_no'], params['pp_seq_no'], frm)
 
     def processor(self, validated_msg: PrePrepare, params: Dict[str, Any], frm: str) -> None:
         inst_id = params['inst_id']
@@ -163,9 +168,10 @@ class PrepareHandler(BaseHandler):
             return None
         return prepare
 
-    def requestor(self, params: Dict[str, Any]) -> Prepare:
-        return self.node.replicas[params['inst_id']].get_prepare(
-            params['view_no'], params['pp_seq_no'])
+    def requestor(self, params: Dict[str, Any], frm: str) -> Optional[Prepare]:
+        # See `PreprepareHandler.requestor`
+        return self.node.replicas[params['inst_id']].serve_requested_msg(
+            PREPARE, params['view_no'], params['pp_seq_no'], frm)
 
     def processor(self, validated_msg: Prepare, params: Dict[str, Any], frm: str) -> None:
         inst_id = params['inst_id']
@@ -195,7 +201,7 @@ class PropagateHandler(BaseHandler):
             return None
         return ppg
 
-    def requestor(self, params: Dict[str, Any]) -> Optional[Propagate]:
+    def requestor(self, params: Dict[str, Any], frm: str) -> Optional[Propagate]:
         req_key = (params['identifier'], params['req_id'])
         if req_key in self.node.requests and self.node.requests[req_key].finalised:
             sender_client = self.node.requestSender.get(req_key)
@@ -29,14 +29,17 @@ class MessageReqProcessor:
         # maintain a unique internal message id to correlate responses.
         msg_type = msg.msg_type
         handler = self.handlers[msg_type]
-        resp = handler.serve(msg)
+        resp = handler.serve(msg, frm)
 
         if not resp:
             return
 
+        self.reply_message_req(msg_type, msg.params, resp, frm)
+
+    def reply_message_req(self, msg_type, params: Dict, resp, frm):
         self.sendToNodes(MessageRep(**{
             f.MSG_TYPE.nm: msg_type,
-            f.PARAMS.nm: msg.params,
+            f.PARAMS.nm: params,
             f.MSG.nm: resp
         }), names=[frm, ])
 
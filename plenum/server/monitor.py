@@ -1,4 +1,5 @@
 import time
+from collections import deque
 from datetime import datetime
 from operator import itemgetter
 from statistics import mean
@@ -8,6 +9,7 @@ from typing import Tuple
 
 import psutil
 
+from ledger.subtree_hash_cache import SubtreeHashCache
 from plenum.common.config_util import getConfig
 from plenum.common.constants import MONITORING_PREFIX
 from stp_core.common.log import getlogger
@@ -22,6 +24,7 @@ from plenum.server.instances import Instances
 from plenum.server.notifier_plugin_manager import notifierPluginTriggerEvents, \
     PluginManager
 from plenum.server.plugin.has_plugin_loader_helper import PluginLoaderHelper
+from state.trie.node_cache import TrieNodeCache
 
 pluginManager = PluginManager()
 logger = getlogger()
@@ -105,7 +108,7 @@ class Monitor(HasActionQueue, PluginLoaderHelper):
         # Times and latencies (as a tuple) of requests ordered by master in last
         # `LatencyWindowSize` seconds. `LatencyWindowSize` is
         # defined in config
-        self.latenciesByMasterInLast = []
+        self.latenciesByMasterInLast = deque()
 
         # Times and latencies (as a tuple) of requests ordered by backups in last
         # `LatencyWindowSize` seconds. `LatencyWindowSize` is
@@ -113,6 +116,17 @@ class Monitor(HasActionQueue, PluginLoaderHelper):
         #  value is a tuple of ordering time and latency of a request
         self.latenciesByBackupsInLast = {}
 
+        # Batch size and wait chosen by adaptive 3 phase batching of each
+        # protocol instance, along with the number of each decision made
+        self.batchSizes = {}  # type: Dict[int, Tuple[int, float]]
+        self.batchSizeDecisions = {}  # type: Dict[int, Dict[str, int]]
+
+        # Caches of subtree hashes used for merkle proofs of each ledger
+        self.subtreeHashCaches = {}  # type: Dict[int, SubtreeHashCache]
+
+        # Caches of decoded trie nodes of the state of each ledger
+        self.trieNodeCaches = {}  # type: Dict[int, TrieNodeCache]
+
         # Monitoring suspicious spikes in cluster throughput
         self.clusterThroughputSpikeMonitorData = {
             'value': 0,
@@ -168,7 +182,15 @@ class Monitor(HasActionQueue, PluginLoaderHelper):
             ("master throughput", masterThrp),
             ("total requests", self.totalRequests),
             ("avg backup throughput", backupThrp),
-            ("master throughput ratio", r)]
+            ("master throughput ratio", r),
+            ("3PC batch sizes and waits", self.batchSizes),
+            ("3PC batch size decisions", self.batchSizeDecisions),
+            ("subtree hash cache hit ratios",
+             {ledgerId: cache.hitRatio
+              for ledgerId, cache in self.subtreeHashCaches.items()}),
+            ("trie node cache hit ratios",
+             {ledgerId: cache.hitRatio
+              for ledgerId, cache in self.trieNodeCaches.items()})]
         return m
 
     @property
@@ -215,6 +237,8 @@ class Monitor(HasActionQueue, PluginLoaderHelper):
             self.instances.remove(index)
             del self.numOrderedRequests[index]
             del self.clientAvgReqLatencies[index]
+            self.batchSizes.pop(index, None)
+            self.batchSizeDecisions.pop(index, None)
 
     def requestOrdered(self, reqIdrs: List[Tuple[str, int]], instId: int,
                        byMaster: bool = False) -> Dict:
@@ -240,7 +264,7 @@ class Monitor(HasActionQueue, PluginLoaderHelper):
                 self.latenciesByMasterInLast.append((now, duration))
             else:
                 if instId not in self.latenciesByBackupsInLast:
-                    self.latenciesByBackupsInLast[instId] = []
+                    self.latenciesByBackupsInLast[instId] = deque()
                 self.latenciesByBackupsInLast[instId].append((now, duration))
 
             if identifier not in self.clientAvgReqLatencies[instId]:
@@ -526,7 +550,7 @@ class Monitor(HasActionQueue, PluginLoaderHelper):
         while self.latenciesByMasterInLast and \
             (now - self.latenciesByMasterInLast[0][0]) > \
                 config.LatencyWindowSize:
-            self.latenciesByMasterInLast = self.latenciesByMasterInLast[1:]
+            self.latenciesByMasterInLast.popleft()
         return (sum(l[1] for l in self.latenciesByMasterInLast) /
                 len(self.latenciesByMasterInLast)) if \
             len(self.latenciesByMasterInLast) > 0 else 0
@@ -539,14 +563,55 @@ class Monitor(HasActionQueue, PluginLoaderHelper):
             while latencies and \
                 (now - latencies[0][0]) > \
                     config.LatencyWindowSize:
-                latencies = latencies[1:]
+                latencies.popleft()
             backupLatencies.append(
                 (sum(l[1] for l in latencies) / len(latencies)) if
                 len(latencies) > 0 else 0)
-            self.latenciesByBackupsInLast[instId] = latencies
 
         return self.mean(backupLatencies)
 
+    def orderingLatency(self, instId: int) -> float:
+        """
+        Return the average latency of requests ordered by the protocol
+        instance in the last `LatencyWindowSize` seconds.
+        """
+        if instId == self.instances.masterId:
+            return self.masterLatency
+        latencies = self.latenciesByBackupsInLast.get(instId)
+        if not latencies:
+            return 0
+        now = time.perf_counter()
+        while latencies and \
+                (now - latencies[0][0]) > config.LatencyWindowSize:
+            latencies.popleft()
+        return (sum(l[1] for l in latencies) / len(latencies)) if \
+            len(latencies) > 0 else 0
+
+    def batchSizeAdapted(self, instId: int, decision: str, batchSize: int,
+                         batchWait: float):
+        """
+        Record a decision of adaptive 3 phase batching of the protocol
+        instance.
+        """
+        self.batchSizes[instId] = (batchSize, batchWait)
+        decisions = self.batchSizeDecisions.setdefault(instId, {})
+        decisions[decision] = decisions.get(decision, 0) + 1
+
+    def registerSubtreeHashCache(self, ledgerId: int,
+                                 cache: SubtreeHashCache):
+        """
+        Report the hit ratio of the subtree hash cache of the ledger in the
+        metrics.
+        """
+        self.subtreeHashCaches[ledgerId] = cache
+
+    def registerTrieNodeCache(self, ledgerId: int, cache: TrieNodeCache):
+        """
+        Report the hit ratio of the cache of trie nodes of the state of the
+        ledger in the metrics.
+        """
+        self.trieNodeCaches[ledgerId] = cache
+
     def sendLatencies(self):
         logger.debug("{} sending latencies".format(self))
         utcTime = datetime.utcnow()
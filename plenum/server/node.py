@@ -1,31 +1,37 @@
 import json
 import os
+import tarfile
 import time
 from binascii import unhexlify
-from collections import deque, defaultdict
+from collections import Counter, deque, defaultdict
 from contextlib import closing
 from functools import partial
+from itertools import islice
 from typing import Dict, Any, Mapping, Iterable, List, Optional, Set, Tuple
 
 from intervaltree import IntervalTree
 
+from common.serializers.serialization import serialize_msg_for_signing
 from ledger.compact_merkle_tree import CompactMerkleTree
 from ledger.genesis_txn.genesis_txn_initiator_from_file import GenesisTxnInitiatorFromFile
 from ledger.hash_stores.file_hash_store import FileHashStore
 from ledger.hash_stores.hash_store import HashStore
 from ledger.hash_stores.memory_hash_store import MemoryHashStore
+from ledger.hash_stores.mmap_hash_store import MmapHashStore
+from ledger.subtree_hash_cache import SubtreeHashCache
 from ledger.util import F
 from plenum.client.wallet import Wallet
 from plenum.common.config_util import getConfig
 from plenum.common.constants import openTxns, POOL_LEDGER_ID, DOMAIN_LEDGER_ID, CLIENT_BLACKLISTER_SUFFIX, \
-    NODE_BLACKLISTER_SUFFIX, NODE_PRIMARY_STORAGE_SUFFIX, HS_FILE, HS_LEVELDB, TXN_TYPE, LedgerState, LEDGER_STATUS, \
+    NODE_BLACKLISTER_SUFFIX, NODE_PRIMARY_STORAGE_SUFFIX, HS_FILE, HS_LEVELDB, HS_MMAP, TXN_TYPE, LedgerState, LEDGER_STATUS, \
     CLIENT_STACK_SUFFIX, PRIMARY_SELECTION_PREFIX, VIEW_CHANGE_PREFIX, OP_FIELD_NAME, CATCH_UP_PREFIX, NYM, \
     POOL_TXN_TYPES, GET_TXN, DATA, MONITORING_PREFIX, TXN_TIME, VERKEY, TARGET_NYM, ROLE, STEWARD, TRUSTEE, ALIAS, \
-    NODE_IP
+    NODE_IP, CONSISTENCY_PROOF
 from plenum.common.exceptions import SuspiciousNode, SuspiciousClient, \
     MissingNodeOp, InvalidNodeOp, InvalidNodeMsg, InvalidClientMsgType, \
     InvalidClientRequest, BaseExc, \
-    InvalidClientMessageException, KeysNotFoundException as REx, BlowUp
+    InvalidClientMessageException, KeysNotFoundException as REx, BlowUp, \
+    InvalidSignature, SnapshotVerificationFailed
 from plenum.common.has_file_storage import HasFileStorage
 from plenum.common.keygen_utils import areKeysSetup
 from plenum.common.ledger import Ledger
@@ -52,17 +58,23 @@ from plenum.common.util import friendlyEx, getMaxFailures, pop_keys, \
 from plenum.common.verifier import DidVerifier
 from plenum.persistence.leveldb_hash_store import LevelDbHashStore
 from plenum.persistence.req_id_to_txn import ReqIdrToTxn
-from plenum.persistence.storage import Storage, initStorage, initKeyValueStorage
+from plenum.persistence.storage import Storage, initStorage, \
+    initKeyValueStorage, initKeyValueStorageIntKeys, txnLogDbConfig
+from plenum.server.batched_sig_verifier import BatchedSigVerifier
+from plenum.server.group_committer import GroupCommitter
 from plenum.server.blacklister import Blacklister
 from plenum.server.blacklister import SimpleBlacklister
 from plenum.server.client_authn import ClientAuthNr, SimpleAuthNr
 from plenum.server.domain_req_handler import DomainRequestHandler
 from plenum.server.has_action_queue import HasActionQueue
 from plenum.server.instances import Instances
+from plenum.server.ledger_snapshot import SnapshotWriter, importSnapshot, \
+    readManifest
 from plenum.server.message_req_processor import MessageReqProcessor
 from plenum.server.models import InstanceChanges
 from plenum.server.monitor import Monitor
 from plenum.server.validator_info_tool import ValidatorNodeInfoTool
+from plenum.server.verified_req_cache import VerifiedReqCache
 from plenum.server.notifier_plugin_manager import notifierPluginTriggerEvents, \
     PluginManager
 from plenum.server.plugin.has_plugin_loader_helper import PluginLoaderHelper
@@ -152,8 +164,31 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
         self.reqHandler = self.getDomainReqHandler()
         self.initDomainState()
 
+        # Size and merkle root of the domain ledger of the snapshot set by
+        # `BootstrapSnapshot`, None if there is no snapshot to import. The
+        # snapshot is imported once enough nodes attest its root
+        self.bootstrapSnapshot = self.readBootstrapSnapshot()
+        # Roots of the domain ledger at the size of the snapshot by the
+        # names of the nodes which sent them
+        self._snapshotRoots = {}  # type: Dict[str, str]
+        self._snapshotRootsRequested = False
+
+        # Number of stable checkpoints of the master instance since the last
+        # snapshot was written, and the writer of the snapshot being written
+        self._checkpointsSinceSnapshot = 0
+        self._snapshotWriter = None  # type: Optional[SnapshotWriter]
+
         self.clientAuthNr = clientAuthNr or self.defaultAuthNr()
 
+        # Verifies signatures of client requests and PROPAGATEs in batches,
+        # None if signatures are verified one by one as messages arrive
+        self.sigVerifier = self.create_sig_verifier()
+        self.groupCommitter = self.create_group_committer()
+
+        # Requests whose signatures have been verified, so that PROPAGATEs of
+        # an already authenticated request do not need to be verified again
+        self.verifiedReqs = VerifiedReqCache(self.config.VerifiedReqCacheSize)
+
         self.addGenesisNyms()
 
         self.initPoolManager(nodeRegistry, ha, cliname, cliha)
@@ -260,6 +295,10 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
                             .notifierEventTriggeringConfig[
                                 'nodeRequestSpike']['freq'])
 
+        if self.config.StateRetainedRoots:
+            self.startRepeating(self.compactStates,
+                                self.config.StateCompactionFreq)
+
         self.initInsChngThrottling()
 
         # BE CAREFUL HERE
@@ -304,7 +343,7 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
             (Checkpoint, self.sendToReplica),
             (ThreePCState, self.sendToReplica),
             (LedgerStatus, self.ledgerManager.processLedgerStatus),
-            (ConsistencyProof, self.ledgerManager.processConsistencyProof),
+            (ConsistencyProof, self.processConsistencyProof),
             (CatchupReq, self.ledgerManager.processCatchupReq),
             (CatchupRep, self.ledgerManager.processCatchupRep),
             (CurrentState, self.process_current_state_message)
@@ -378,6 +417,18 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
     def create_replicas(self) -> Replicas:
         return Replicas(self, self.monitor)
 
+    def create_sig_verifier(self) -> Optional[BatchedSigVerifier]:
+        if not self.config.BatchSigVerification:
+            return None
+        return BatchedSigVerifier(
+            processes=self.config.SigVerificationProcesses,
+            batchSize=self.config.SigVerificationBatchSize)
+
+    def create_group_committer(self) -> Optional[GroupCommitter]:
+        if not self.config.GroupCommit:
+            return None
+        return GroupCommitter()
+
     def reject_client_msg_handler(self, reason, frm):
         self.transmitToClient(Reject("", "", reason), frm)
 
@@ -443,7 +494,8 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
             initKeyValueStorage(
                 self.config.reqIdToTxnStorage,
                 self.dataLocation,
-                self.config.seqNoDbName)
+                self.config.seqNoDbName,
+                db_config=self.config.rocksdbSeqNoConfig)
         )
 
     # noinspection PyAttributeOutsideInit
@@ -529,11 +581,25 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
                 self.config.baseDir, self.config.domainTransactionsFile)
             return Ledger(
                 CompactMerkleTree(
-                    hashStore=self.getHashStore('domain')),
+                    hashStore=self.getHashStore('domain'),
+                    hashCache=SubtreeHashCache(
+                        self.config.SubtreeHashCacheSize)),
                 dataDir=self.dataLocation,
                 fileName=self.config.domainTransactionsFile,
                 ensureDurability=self.config.EnsureLedgerDurability,
-                genesis_txn_initiator=genesis_txn_initiator)
+                transactionLogStore=initKeyValueStorageIntKeys(
+                    self.config.transactionLogDefaultStorage,
+                    self.dataLocation,
+                    self.config.domainTransactionsFile,
+                    db_config=txnLogDbConfig(self.config)),
+                genesis_txn_initiator=genesis_txn_initiator,
+                recoveryProcesses=self.config.LedgerRecoveryProcesses,
+                indexes=self.config.domainTxnIndexes,
+                indexStore=initKeyValueStorage(
+                    self.config.domainTxnIndexStorage,
+                    self.dataLocation,
+                    self.config.domainTxnIndexDbName,
+                    db_config=self.config.rocksdbTxnIndexConfig))
         else:
             # TODO: we need to rethink this functionality
             return initStorage(self.config.primaryStorage,
@@ -552,6 +618,9 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
         elif hsConfig == HS_LEVELDB:
             return LevelDbHashStore(dataDir=self.dataLocation,
                                     fileNamePrefix=name)
+        elif hsConfig == HS_MMAP:
+            return MmapHashStore(dataDir=self.dataLocation,
+                                 fileNamePrefix=name)
         else:
             return MemoryHashStore()
 
@@ -579,13 +648,22 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
     def on_new_ledger_added(self, ledger_id):
         # If a ledger was added after a replicas were created
         self.replicas.register_new_ledger(ledger_id)
+        self.monitor.registerSubtreeHashCache(
+            ledger_id, self.getLedger(ledger_id).tree.hashCache)
+        state = self.getState(ledger_id)
+        if state is not None and state.nodeCache is not None:
+            self.monitor.registerTrieNodeCache(ledger_id, state.nodeCache)
 
     def loadDomainState(self):
         return PruningState(
             initKeyValueStorage(
                 self.config.domainStateStorage,
                 self.dataLocation,
-                self.config.domainStateDbName)
+                self.config.domainStateDbName,
+                db_config=self.config.rocksdbStateConfig),
+            writeBack=self.config.StateWriteBack,
+            nodeCacheSize=self.config.StateNodeCacheSize,
+            retainedRoots=self.config.StateRetainedRoots
         )
 
     @classmethod
@@ -682,6 +760,14 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
 
         self.reset()
 
+        if self._snapshotWriter is not None:
+            self._snapshotWriter.abort()
+            self._snapshotWriter = None
+
+        # Committed batches are synced before the stores are closed
+        if self.groupCommitter:
+            self.groupCommitter.stop()
+
         # Stop the ledgers
         for ledger in self.ledgers:
             try:
@@ -693,6 +779,11 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
         self.nodestack.stop()
         self.clientstack.stop()
 
+        if self.sigVerifier:
+            self.sigVerifier.stop()
+
+        self.replicas.stop()
+
         self.closeAllKVStores()
 
         self.mode = None
@@ -741,6 +832,7 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
             c += await self.serviceClientMsgs(limit)
             c += self._serviceActions()
             c += self.ledgerManager.service()
+            c += self.serviceGroupCommitter()
             c += self.monitor._serviceActions()
             c += await self.serviceElector()
             self.nodestack.flushOutBoxes()
@@ -769,6 +861,7 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
         :return: the number of messages successfully processed
         """
         n = await self.nodestack.service(limit)
+        n += self.serviceSigVerifier()
         await self.processNodeInBox()
         return n
 
@@ -780,9 +873,31 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
         :return: the number of messages successfully processed
         """
         c = await self.clientstack.service(limit)
+        c += self.serviceSigVerifier()
         await self.processClientInBox()
         return c
 
+    def serviceSigVerifier(self) -> int:
+        """
+        Submit queued signatures for batched verification and pass the
+        messages whose signatures were verified to the inboxes.
+
+        :return: the number of messages whose verification completed
+        """
+        if self.sigVerifier is None:
+            return 0
+        return self.sigVerifier.service()
+
+    def serviceGroupCommitter(self) -> int:
+        """
+        Send the replies of the committed batches made durable.
+
+        :return: the number of batches whose replies were sent
+        """
+        if self.groupCommitter is None:
+            return 0
+        return self.groupCommitter.service()
+
     async def serviceElector(self) -> int:
         """
         Service the elector's inBox, outBox and action queues.
@@ -1218,12 +1333,16 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
                 logger.debug("{} msg validated {}".format(self, wrappedMsg),
                              extra={"tags": ["node-msg-validation"]})
                 self.unpackNodeMsg(*vmsg)
-            else:
+            elif vmsg is None:
                 logger.info("{} invalidated msg {}".format(self, wrappedMsg),
                             extra={"tags": ["node-msg-validation"]})
-        except SuspiciousNode as ex:
-            self.reportSuspiciousNodeEx(ex)
         except Exception as ex:
+            self.handleNodeMsgException(ex, wrappedMsg)
+
+    def handleNodeMsgException(self, ex, wrappedMsg):
+        if isinstance(ex, SuspiciousNode):
+            self.reportSuspiciousNodeEx(ex)
+        else:
             msg, frm = wrappedMsg
             self.discard(msg, ex, logger.info)
 
@@ -1233,7 +1352,9 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
 
         :param wrappedMsg: Tuple of message and the name of the node that sent
         the message
-        :return: Tuple of message from node and name of the node
+        :return: Tuple of message from node and name of the node, None if the
+        message is invalid or an empty tuple if it waits for its signature to
+        be verified
         """
         msg, frm = wrappedMsg
         if self.isNodeBlacklisted(frm):
@@ -1249,6 +1370,17 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
             raise InvalidNodeMsg(str(ex))
 
         try:
+            if self.isSigVerificationBatched(message):
+                self.queueSigVerification(
+                    message,
+                    onVerified=partial(self.unpackNodeMsg, message, frm),
+                    onFailed=partial(self.onNodeMsgSigVerificationFailed,
+                                     message, frm),
+                    onError=partial(self.handleNodeMsgException,
+                                    wrappedMsg=(message, frm)))
+                logger.debug("{} queued signature verification of node "
+                             "message from {}: {}".format(self, frm, message))
+                return ()
             self.verifySignature(message)
         except BaseExc as ex:
             raise SuspiciousNode(frm, ex, message) from ex
@@ -1257,6 +1389,9 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
                      extra={"cli": False})
         return message, frm
 
+    def onNodeMsgSigVerificationFailed(self, msg, frm, ex):
+        self.reportSuspiciousNodeEx(SuspiciousNode(frm, ex, msg))
+
     def unpackNodeMsg(self, msg, frm) -> None:
         """
         If the message is a batch message validate each message in the batch,
@@ -1308,15 +1443,18 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
             vmsg = self.validateClientMsg(wrappedMsg)
             if vmsg:
                 self.unpackClientMsg(*vmsg)
-        except BlowUp:
-            raise
         except Exception as ex:
-            msg, frm = wrappedMsg
-            friendly = friendlyEx(ex)
-            if isinstance(ex, SuspiciousClient):
-                self.reportSuspiciousClient(frm, friendly)
+            self.handleClientMsgException(ex, wrappedMsg)
+
+    def handleClientMsgException(self, ex, wrappedMsg):
+        if isinstance(ex, BlowUp):
+            raise ex
+        msg, frm = wrappedMsg
+        friendly = friendlyEx(ex)
+        if isinstance(ex, SuspiciousClient):
+            self.reportSuspiciousClient(frm, friendly)
 
-            self.handleInvalidClientMsg(ex, wrappedMsg)
+        self.handleInvalidClientMsg(ex, wrappedMsg)
 
     def handleInvalidClientMsg(self, ex, wrappedMsg):
         msg, frm = wrappedMsg
@@ -1375,6 +1513,15 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
                                     msg[OPERATION])
 
         if self.isSignatureVerificationNeeded(msg):
+            if self.isSigVerificationBatched(cMsg):
+                self.queueSigVerification(
+                    cMsg,
+                    onVerified=partial(self.unpackClientMsg, cMsg, frm),
+                    onFailed=partial(self.onClientMsgSigVerificationFailed,
+                                     cMsg, frm),
+                    onError=partial(self.handleClientMsgException,
+                                    wrappedMsg=(cMsg, frm)))
+                return None
             self.verifySignature(cMsg)
             # Suspicions should only be raised when lot of sig failures are
             # observed
@@ -1388,6 +1535,9 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
                      format(self.clientstack.name, cMsg))
         return cMsg, frm
 
+    def onClientMsgSigVerificationFailed(self, msg, frm, ex):
+        self.handleInvalidClientMsg(ex, (msg, frm))
+
     def unpackClientMsg(self, msg, frm):
         """
         If the message is a batch message validate each message in the batch,
@@ -1461,6 +1611,11 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
         self.start_domain_ledger_sync()
 
     def start_domain_ledger_sync(self):
+        if self.bootstrapSnapshot is not None:
+            # The domain ledger is synced once the snapshot is imported or
+            # dropped
+            self.requestSnapshotRoots()
+            return
         self._sync_ledger(DOMAIN_LEDGER_ID)
         self.ledgerManager.processStashedLedgerStatuses(DOMAIN_LEDGER_ID)
 
@@ -1492,8 +1647,7 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
         rh = self.postRecvTxnFromCatchup(ledger_id, txn)
         if rh:
             rh.updateState([txn], isCommitted=True)
-            state = self.getState(ledger_id)
-            state.commit(rootHash=state.headHash)
+            rh.commitHead(self.getLedger(ledger_id).size)
         self.updateSeqNoMap([txn])
         self._clear_req_key_for_txn(ledger_id, txn)
 
@@ -2228,6 +2382,70 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
         """
         if isinstance(msg, self.authnWhitelist):
             return  # whitelisted message types rely on RAET for authn
+        typ, req, ser = self._reqForSigVerification(msg)
+        cacheKey = self._verifiedReqKey(req, ser)
+        if cacheKey is not None and self.verifiedReqs.is_verified(cacheKey):
+            logger.debug("{} found {} signature on {} request {} already "
+                         "verified".format(self, req.get(f.IDENTIFIER.nm),
+                                           typ, req['reqId']))
+            return
+        identifier = self.authNr(req).authenticate(req, serialized=ser)
+        if cacheKey is not None:
+            self.verifiedReqs.add(cacheKey)
+        logger.debug("{} authenticated {} signature on {} request {}".
+                     format(self, identifier, typ, req['reqId']),
+                     extra={"cli": True,
+                            "tags": ["node-msg-processing"]})
+
+    def isSigVerificationBatched(self, msg) -> bool:
+        return self.sigVerifier is not None and \
+            not isinstance(msg, self.authnWhitelist)
+
+    def queueSigVerification(self, msg, onVerified, onFailed, onError):
+        """
+        Queue the signature of the request for batched verification. Checks
+        which do not need the signature to be verified, like whether the
+        identifier is known, are done right away.
+
+        :param msg: a message requiring signature verification
+        :param onVerified: called without arguments if the signature is valid
+        :param onFailed: called with the exception if the signature is invalid
+        :param onError: called with the exception raised by `onVerified` or
+            `onFailed`, like the errors of messages processed right away
+        :return: None; raises an exception if the request can not be
+            authenticated
+        """
+        typ, req, ser = self._reqForSigVerification(msg)
+        identifier, verkey, sig, ser = \
+            self.authNr(req).getVerificationData(req, serialized=ser)
+        cacheKey = self.verifiedReqs.key(req, verkey, ser)
+        if self.verifiedReqs.is_verified(cacheKey):
+            onVerified()
+            return
+        reqId = req.get(f.REQ_ID.nm)
+
+        def onResult(verified):
+            try:
+                if verified:
+                    self.verifiedReqs.add(cacheKey)
+                    logger.debug("{} authenticated {} signature on {} "
+                                 "request {}".format(self, identifier, typ,
+                                                     reqId),
+                                 extra={"cli": True,
+                                        "tags": ["node-msg-processing"]})
+                    onVerified()
+                else:
+                    onFailed(InvalidSignature(identifier, reqId))
+            except Exception as ex:
+                onError(ex)
+
+        self.sigVerifier.add(identifier, verkey, sig, ser, onResult)
+
+    def _reqForSigVerification(self, msg):
+        """
+        :return: tuple of the type of message, the request as a dictionary and
+            the request serialized for signing
+        """
         if isinstance(msg, Propagate):
             typ = 'propagate '
             req = msg.request
@@ -2235,14 +2453,31 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
             typ = ''
             req = msg
 
+        # Requests memoize their serialized form, other requests are
+        # serialized once for both the cache of verified requests and the
+        # authenticator
+        ser = req.signingBytes if isinstance(req, Request) else None
         if not isinstance(req, Mapping):
             req = msg.as_dict
+        if ser is None:
+            ser = serialize_msg_for_signing(req,
+                                            topLevelKeysToIgnore=[f.SIG.nm])
+        return typ, req, ser
 
-        identifier = self.authNr(req).authenticate(req)
-        logger.debug("{} authenticated {} signature on {} request {}".
-                     format(self, identifier, typ, req['reqId']),
-                     extra={"cli": True,
-                            "tags": ["node-msg-processing"]})
+    def _verifiedReqKey(self, req, ser):
+        """
+        :return: the key of the request in the cache of verified requests,
+            None if the verkey of its identifier can not be found, in which
+            case authenticating the request fails
+        """
+        try:
+            verkey = self.authNr(req).getVerkey(req.get(f.IDENTIFIER.nm))
+        except Exception:
+            return None
+        return self.verifiedReqs.key(req, verkey, ser)
+
+    def on_request_removed(self, request_key):
+        self.verifiedReqs.evict(request_key)
 
     def authNr(self, req):
         return self.clientAuthNr
@@ -2329,11 +2564,39 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
                              stateRoot, txnRoot) -> List:
         committedTxns = reqHandler.commit(len(reqs), stateRoot, txnRoot)
         self.updateSeqNoMap(committedTxns)
-        self.sendRepliesToClients(
-            map(self.update_txn_with_extra_data, committedTxns),
+        self.sendCommittedReplies(
+            reqHandler,
+            map(self.update_txn_with_extra_data,
+                self.txnsToReply(reqHandler.ledger, committedTxns)),
             ppTime)
         return committedTxns
 
+    def sendCommittedReplies(self, reqHandler, committedTxns, ppTime):
+        """
+        Send replies for the txns of a committed batch. With group commit,
+        they are sent once the ledger, the state and the seqNoDB the batch was
+        written to are synced.
+        """
+        if self.groupCommitter is None:
+            self.sendRepliesToClients(committedTxns, ppTime)
+        else:
+            self.groupCommitter.add(
+                (reqHandler.ledger, reqHandler.state, self.seqNoDB),
+                partial(self.sendRepliesToClients, list(committedTxns),
+                        ppTime))
+
+    def txnsToReply(self, ledger, committedTxns):
+        """
+        Yield copies of the committed txns that clients are waiting replies
+        for, with their merkle proofs. Merkle proofs are not built for the
+        other txns since nothing is sent for them.
+        """
+        for txn in committedTxns:
+            if self.isProcessingReq(txn[f.IDENTIFIER.nm], txn[f.REQ_ID.nm]):
+                txn = dict(txn)
+                txn.update(ledger.merkleInfo(txn[F.seqNo.name]))
+                yield txn
+
     def executeDomainTxns(self, ppTime, reqs: List[Request], stateRoot,
                           txnRoot) -> List:
         committedTxns = self.commitAndSendReplies(
@@ -2360,6 +2623,19 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
             logger.debug('{} did not know how to handle for ledger {}'.
                          format(self, ledgerId))
 
+    def prefetchBatchState(self, ledgerId, reqs: List[Request]):
+        """
+        Read the state needed by the requests of a batch at once, before
+        they are validated and applied one by one
+        :param ledgerId:
+        :param reqs: requests of the batch
+        """
+        if ledgerId == POOL_LEDGER_ID:
+            if isinstance(self.poolManager, TxnPoolManager):
+                self.poolManager.reqHandler.prefetch(reqs)
+        elif ledgerId == DOMAIN_LEDGER_ID:
+            self.reqHandler.prefetch(reqs)
+
     def onBatchRejected(self, ledgerId):
         """
         A batch of requests has been rejected, if stateRoot is None, reject
@@ -2423,19 +2699,233 @@ class Node(HasActionQueue, Motor, Propagator, MessageProcessor, HasFileStorage,
 
     def initStateFromLedger(self, state: State, ledger: Ledger, reqHandler):
         """
-        If the trie is empty then initialize it by applying
-        txns from ledger.
+        Bring the state up to date with the ledger by applying the txns
+        after the one the committed state root was committed with. If the
+        trie is empty then initialize it by applying txns from ledger. A
+        state which is not empty and does not know the seqNo of its root is
+        considered up to date.
+        """
+        seqNo = state.committedSeqNo
+        if seqNo is None:
+            if not state.isEmpty:
+                return
+            seqNo = 0
+        if seqNo > ledger.size:
+            logger.warning('{} found state committed at seqNo {} ahead of '
+                           'its ledger of size {}'.
+                           format(self, seqNo, ledger.size))
+            return
+        if seqNo == ledger.size:
+            return
+        logger.info('{} found state committed at seqNo {}, applying txns up '
+                    'to {} from ledger'.format(self, seqNo, ledger.size))
+        # Txns are applied to the head of the state, which is committed with
+        # the seqNo of the last txn applied every `StateReplayBatchSize`
+        # txns
+        txns = []
+        for seq_no, txn in ledger.getAllTxn(frm=seqNo + 1):
+            txn[f.SEQ_NO.nm] = seq_no
+            txns.append(self.update_txn_with_extra_data(txn))
+            if len(txns) >= self.config.StateReplayBatchSize:
+                self._applyTxnsToState(reqHandler, txns)
+                txns = []
+        if txns:
+            self._applyTxnsToState(reqHandler, txns)
+
+    @staticmethod
+    def _applyTxnsToState(reqHandler, txns):
+        reqHandler.updateState(txns, isCommitted=False)
+        reqHandler.commitHead(txns[-1][f.SEQ_NO.nm])
+
+    def compactStates(self):
+        """
+        Delete the trie nodes of the states which are no longer reachable
+        from their retained roots, in a bounded time slice
         """
-        if state.isEmpty:
-            logger.info('{} found state to be empty, recreating from '
-                        'ledger'.format(self))
-            for seq_no, txn in ledger.getAllTxn():
-                txn[f.SEQ_NO.nm] = seq_no
-                txn = self.update_txn_with_extra_data(txn)
-                reqHandler.updateState([txn, ], isCommitted=True)
-                state.commit(rootHash=state.headHash)
+        if self._snapshotWriter is not None:
+            # The nodes of the state root being written are kept until the
+            # snapshot is complete
+            return
+        for ledgerId, state in self.states.items():
+            if isinstance(state, PruningState):
+                deleted = state.compact(self.config.StateCompactionTimeSlice)
+                if deleted:
+                    logger.trace('{} deleted {} trie nodes of state {}'.
+                                 format(self, deleted, ledgerId))
+
+    def readBootstrapSnapshot(self) -> Optional[Dict]:
+        """
+        Read the size and the root of the domain ledger of the snapshot set
+        by `BootstrapSnapshot`, if the node has not got further than it
+        """
+        path = self.config.BootstrapSnapshot
+        if not path or not os.path.isfile(path):
+            return None
+        info = readManifest(path)['ledgers'].get(str(DOMAIN_LEDGER_ID))
+        if info is None or self.domainLedger.size >= info['size']:
+            return None
+        return info
+
+    def requestSnapshotRoots(self):
+        """
+        Ask the other nodes for the root of their domain ledger at the size
+        of the bootstrap snapshot, as a consistency proof from that size to
+        itself. The snapshot is imported once f+1 nodes sent its root, or
+        dropped if f+1 nodes sent another root or not enough nodes answer in
+        `BootstrapSnapshotTimeout` seconds.
+        """
+        if self._snapshotRootsRequested:
+            return
+        self._snapshotRootsRequested = True
+        size = self.bootstrapSnapshot['size']
+        logger.info('{} asking other nodes for the root of their domain '
+                    'ledger at size {} of the bootstrap snapshot'.
+                    format(self, size))
+        self.request_msg(CONSISTENCY_PROOF, {
+            f.LEDGER_ID.nm: DOMAIN_LEDGER_ID,
+            f.SEQ_NO_START.nm: size,
+            f.SEQ_NO_END.nm: size
+        })
+        self._schedule(self.onSnapshotRootsTimeout,
+                       self.config.BootstrapSnapshotTimeout)
+
+    def processConsistencyProof(self, proof: ConsistencyProof, frm: str):
+        snapshot = self.bootstrapSnapshot
+        if snapshot is not None and \
+                proof.ledgerId == DOMAIN_LEDGER_ID and \
+                proof.seqNoStart == proof.seqNoEnd == snapshot['size']:
+            self.processSnapshotRoot(proof.oldMerkleRoot, frm)
+            return
+        self.ledgerManager.processConsistencyProof(proof, frm)
+
+    def processSnapshotRoot(self, root: str, frm: str):
+        """
+        Count the root of the domain ledger at the size of the bootstrap
+        snapshot sent by a node. f+1 nodes sending the same root include a
+        correct node, so that root is the one of the pool.
+        """
+        self._snapshotRoots[frm] = root
+        quorum = self.quorums.same_consistency_proof
+        snapshotRoot = self.bootstrapSnapshot['rootHash']
+        for root, count in Counter(self._snapshotRoots.values()).items():
+            if not quorum.is_reached(count):
+                continue
+            if root == snapshotRoot:
+                self.importBootstrapSnapshot()
+            else:
+                self.dropBootstrapSnapshot(
+                    'nodes {} have root {} instead of {}'.format(
+                        [n for n, r in self._snapshotRoots.items()
+                         if r == root], root, snapshotRoot))
+            return
+
+    def onSnapshotRootsTimeout(self):
+        if self.bootstrapSnapshot is not None:
+            self.dropBootstrapSnapshot(
+                'not enough nodes sent its root, got {}'.format(
+                    self._snapshotRoots))
+
+    def dropBootstrapSnapshot(self, reason: str):
+        logger.warning('{} not importing bootstrap snapshot since {}, '
+                       'catching up the domain ledger'.format(self, reason))
+        self.bootstrapSnapshot = None
+        self._snapshotRoots = {}
+        self.start_domain_ledger_sync()
+
+    def importBootstrapSnapshot(self):
+        """
+        Import the domain ledger and state from the bootstrap snapshot, whose
+        root the pool attested, then sync the domain ledger: only the txns
+        ordered after the snapshot are caught up
+        """
+        path = self.config.BootstrapSnapshot
+        self.bootstrapSnapshot = None
+        self._snapshotRoots = {}
+        size = self.domainLedger.size
+        try:
+            importSnapshot(path, {DOMAIN_LEDGER_ID: self.domainLedger},
+                           {DOMAIN_LEDGER_ID: self.states[DOMAIN_LEDGER_ID]})
+        except (SnapshotVerificationFailed, OSError, tarfile.TarError) as ex:
+            # The ledger and the state are left with the genesis txns only
+            logger.warning('{} could not import bootstrap snapshot {}: {}, '
+                           'catching up the domain ledger'.
+                           format(self, path, ex))
+        else:
+            self.addImportedTxns(size + 1)
+        # The state is at the imported ledger unless the snapshot has no
+        # state, then the txns of the ledger are applied to it
+        self.initDomainState()
+        self.start_domain_ledger_sync()
+
+    def addImportedTxns(self, frm: int):
+        """
+        Record the txns of the domain ledger from seqNo `frm` like caught up
+        txns are, in the seqNoDB and for the client authenticator
+        """
+        txns = self.domainLedger.getAllTxn(frm=frm)
+        while True:
+            chunk = list(islice(txns, self.config.StateReplayBatchSize))
+            if not chunk:
+                break
+            for seqNo, txn in chunk:
+                txn[F.seqNo.name] = seqNo
+                self.post_txn_from_catchup_added_to_domain_ledger(txn)
+            self.updateSeqNoMap(txn for _, txn in chunk)
+
+    def onStableCheckpoint(self, seqNo: int):
+        """
+        A checkpoint of the master instance became stable, start writing a
+        snapshot of the domain ledger and state every
+        `SnapshotEveryCheckpoints` of them if snapshots are enabled
+        """
+        if not self.config.SnapshotDir or self._snapshotWriter is not None:
+            return
+        self._checkpointsSinceSnapshot += 1
+        if self._checkpointsSinceSnapshot < \
+                self.config.SnapshotEveryCheckpoints:
+            return
+        state = self.states[DOMAIN_LEDGER_ID]
+        if not isinstance(state, PruningState) or \
+                state.committedSeqNo != self.domainLedger.size:
+            logger.debug('{} not writing a snapshot since its domain state '
+                         'is not committed at the size of the ledger'.
+                         format(self))
+            return
+        self._checkpointsSinceSnapshot = 0
+        os.makedirs(self.config.SnapshotDir, exist_ok=True)
+        self._snapshotWriter = SnapshotWriter(
+            os.path.join(self.config.SnapshotDir,
+                         '{}.tar.gz'.format(self.name)),
+            {DOMAIN_LEDGER_ID: self.domainLedger},
+            {DOMAIN_LEDGER_ID: state},
+            {DOMAIN_LEDGER_ID: self.reqHandler.committedMetaKeys})
+        logger.info('{} writing snapshot of domain ledger at size {} after '
+                    'checkpoint {}'.format(self, self.domainLedger.size,
+                                           seqNo))
+        self._schedule(self.writeSnapshot)
+
+    def writeSnapshot(self):
+        """
+        Write the snapshot being written for a slice of
+        `SnapshotTimeSlice` seconds, every `SnapshotWriteFreq` seconds until
+        it is complete
+        """
+        if self._snapshotWriter is None:
+            return
+        try:
+            done = self._snapshotWriter.write(self.config.SnapshotTimeSlice)
+        except OSError as ex:
+            logger.warning('{} could not write snapshot: {}'.format(self, ex))
+            done = True
+        if done:
+            self._snapshotWriter = None
+        else:
+            self._schedule(self.writeSnapshot, self.config.SnapshotWriteFreq)
 
     def initDomainState(self):
+        # The role counts of the committed state are restored before the
+        # txns it misses are applied to it
+        self.reqHandler.initRoleCounts()
         self.initStateFromLedger(self.states[DOMAIN_LEDGER_ID],
                                  self.domainLedger, self.reqHandler)
 
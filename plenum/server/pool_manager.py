@@ -17,7 +17,6 @@ from plenum.common.request import Request
 from plenum.common.stack_manager import TxnStackManager
 from plenum.common.types import NodeDetail
 from plenum.persistence.storage import initKeyValueStorage
-from plenum.persistence.util import pop_merkle_info
 from plenum.server.pool_req_handler import PoolRequestHandler
 from plenum.server.suspicion_codes import Suspicions
 from state.pruning_state import PruningState
@@ -142,7 +141,11 @@ class TxnPoolManager(PoolManager, TxnStackManager):
             initKeyValueStorage(
                 self.config.poolStateStorage,
                 self.node.dataLocation,
-                self.config.poolStateDbName)
+                self.config.poolStateDbName,
+                db_config=self.config.rocksdbStateConfig),
+            writeBack=self.config.StateWriteBack,
+            nodeCacheSize=self.config.StateNodeCacheSize,
+            retainedRoots=self.config.StateRetainedRoots
         )
 
     def initPoolState(self):
@@ -203,12 +206,11 @@ class TxnPoolManager(PoolManager, TxnStackManager):
         committedTxns = self.reqHandler.commit(len(reqs), stateRoot, txnRoot)
         self.node.updateSeqNoMap(committedTxns)
         for txn in committedTxns:
-            t = deepcopy(txn)
-            # Since the committed transactions contain merkle info,
-            # try to avoid this kind of strictness
-            pop_merkle_info(t)
-            self.onPoolMembershipChange(t)
-        self.node.sendRepliesToClients(committedTxns, ppTime)
+            self.onPoolMembershipChange(deepcopy(txn))
+        self.node.sendCommittedReplies(
+            self.reqHandler,
+            self.node.txnsToReply(self.reqHandler.ledger, committedTxns),
+            ppTime)
         return committedTxns
 
     def onPoolMembershipChange(self, txn):
@@ -1,6 +1,6 @@
 from collections import OrderedDict, defaultdict
 
-from typing import Tuple, Union
+from typing import Tuple, Union, Callable
 
 from orderedset._orderedset import OrderedSet
 from plenum.common.constants import PROPAGATE, THREE_PC_PREFIX
@@ -56,6 +56,16 @@ class Requests(OrderedDict):
     request is popped out
     """
 
+    def __init__(self, *args,
+                 on_removed: Callable[[Tuple[str, int]], None]=None,
+                 **kwargs):
+        """
+        :param on_removed: called with the key of a request once the request
+        is removed from the store after being executed and freed
+        """
+        super().__init__(*args, **kwargs)
+        self.on_removed = on_removed
+
     def add(self, req: Request):
         """
         Add the specified request to this request store.
@@ -139,6 +149,8 @@ class Requests(OrderedDict):
     def _clean(self, state):
         if state.executed and state.forwardedTo <= 0:
             self.pop(state.request.key, None)
+            if self.on_removed:
+                self.on_removed(state.request.key)
 
     def has_propagated(self, req: Request, sender: str) -> bool:
         """
@@ -158,9 +170,15 @@ class Propagator:
     MAX_REQUESTED_KEYS_TO_KEEP = 1000
 
     def __init__(self):
-        self.requests = Requests()
+        self.requests = Requests(on_removed=self.on_request_removed)
         self.requested_propagates_for = OrderedSet()
 
+    def on_request_removed(self, request_key: Tuple[str, int]):
+        """
+        Called once a request is executed and is not needed by any replica
+        """
+        pass
+
     # noinspection PyUnresolvedReferences
     def propagate(self, request: Request, clientName):
         """
@@ -1,6 +1,7 @@
 import time
 from collections import deque, OrderedDict
 from enum import unique, IntEnum
+from itertools import islice
 from hashlib import sha256
 from typing import List, Union, Dict, Optional, Any, Set, Tuple, Callable
 
@@ -21,6 +22,7 @@ from plenum.common.request import ReqDigest, Request, ReqKey
 from plenum.common.types import f
 from plenum.common.util import updateNamedTuple, compare_3PC_keys, max_3PC_key, \
     mostCommonElement, SortedDict
+from plenum.server.adaptive_batch_sizer import AdaptiveBatchSizer
 from plenum.server.has_action_queue import HasActionQueue
 from plenum.server.models import Commits, Prepares
 from plenum.server.router import Router
@@ -67,6 +69,29 @@ class Stats:
         return str({TPCStat(k).name: v for k, v in self.stats.items()})
 
 
+def remove_ordered_from_queue(outBox: deque,
+                              last_caught_up_3PC=None) -> List[Ordered]:
+    """
+    Remove from the outBox of a replica any Ordered less than or equal to
+    `last_caught_up_3PC` if `last_caught_up_3PC` is passed else all Ordered
+
+    :return: the Ordered removed, in the order they should be processed
+    """
+    to_remove = []
+    for i, msg in enumerate(outBox):
+        if isinstance(msg, Ordered) and (not last_caught_up_3PC or
+                                         compare_3PC_keys(
+                                             (msg.viewNo, msg.ppSeqNo),
+                                             last_caught_up_3PC) >= 0):
+            to_remove.append(i)
+
+    removed = []
+    for i in reversed(to_remove):
+        removed.insert(0, outBox[i])
+        del outBox[i]
+    return removed
+
+
 class Replica(HasActionQueue, MessageProcessor):
     STASHED_CHECKPOINTS_BEFORE_CATCHUP = 1
     HAS_NO_PRIMARY_WARN_THRESCHOLD = 10
@@ -236,6 +261,11 @@ class Replica(HasActionQueue, MessageProcessor):
         # TODO: Need to have a timer for each ledger
         self.lastBatchCreated = time.perf_counter()
 
+        # Adapts the size of and the wait for 3 phase batches to the load if
+        # enabled, otherwise they are `Max3PCBatchSize` and `Max3PCBatchWait`
+        self.batchSizer = AdaptiveBatchSizer(self.config) \
+            if self.config.Adaptive3PCBatching else None
+
         # self.lastOrderedPPSeqNo = 0
         # Three phase key for the last ordered batch
         self._last_ordered_3pc = (0, 0)
@@ -615,24 +645,51 @@ class Replica(HasActionQueue, MessageProcessor):
         self.batches[(pp.viewNo, pp.ppSeqNo)] = [pp.ledgerId, pp.discarded,
                                                  pp.ppTime, prevStateRootHash]
 
+    @property
+    def batchSize(self):
+        return self.batchSizer.batchSize if self.batchSizer \
+            else self.config.Max3PCBatchSize
+
+    @property
+    def batchWait(self):
+        return self.batchSizer.batchWait if self.batchSizer \
+            else self.config.Max3PCBatchWait
+
     def send3PCBatch(self):
         r = 0
         for lid, q in self.requestQueues.items():
             # TODO: make the condition more apparent
-            if len(q) >= self.config.Max3PCBatchSize or (
+            if len(q) >= self.batchSize or (
                     self.lastBatchCreated +
-                    self.config.Max3PCBatchWait <
+                    self.batchWait <
                     time.perf_counter() and len(q) > 0):
+                queueDepth = len(q)
                 oldStateRootHash = self.stateRootHash(lid, to_str=False)
                 ppReq = self.create3PCBatch(lid)
                 self.sendPrePrepare(ppReq)
                 self.trackBatches(ppReq, oldStateRootHash)
+                if self.batchSizer:
+                    self.adaptBatchSize(queueDepth)
                 r += 1
 
         if r > 0:
             self.lastBatchCreated = time.perf_counter()
         return r
 
+    def adaptBatchSize(self, queueDepth: int):
+        inFlight = self.lastPrePrepareSeqNo - self.last_ordered_3pc[1]
+        latency = self.node.monitor.orderingLatency(self.instId)
+        decision = self.batchSizer.update(queueDepth, inFlight, latency)
+        logger.trace('{} decided to {} 3PC batches, now {} requests and {} '
+                     'seconds of wait, with {} requests queued, {} batches in '
+                     'flight and {} seconds of latency'.
+                     format(self, decision, self.batchSizer.batchSize,
+                            self.batchSizer.batchWait, queueDepth, inFlight,
+                            latency))
+        self.node.monitor.batchSizeAdapted(self.instId, decision,
+                                           self.batchSizer.batchSize,
+                                           self.batchSizer.batchWait)
+
     @staticmethod
     def batchDigest(reqs):
         return sha256(b''.join([r.digest.encode() for r in reqs])).hexdigest()
@@ -670,7 +727,12 @@ class Replica(HasActionQueue, MessageProcessor):
         validReqs = []
         inValidReqs = []
         rejects = []
-        while len(validReqs) + len(inValidReqs) < self.config.Max3PCBatchSize \
+        if self.isMaster:
+            self.node.prefetchBatchState(ledger_id, [
+                self.requests[key].finalised for key in
+                islice(self.requestQueues[ledger_id], self.batchSize)
+                if key in self.requests])
+        while len(validReqs) + len(inValidReqs) < self.batchSize \
                 and self.requestQueues[ledger_id]:
             key = self.requestQueues[ledger_id].pop(
                 0)  # Remove the first element
@@ -712,9 +774,8 @@ class Replica(HasActionQueue, MessageProcessor):
         self.send(ppReq, TPCStat.PrePrepareSent)
 
     def readyFor3PC(self, key: ReqKey):
-        cls = self.node.__class__
         fin_req = self.requests[key].finalised
-        queue = self.requestQueues[cls.ledgerIdForRequest(fin_req)]
+        queue = self.requestQueues[self.node.ledgerIdForRequest(fin_req)]
         queue.add(key)
         if not self.hasPrimary and len(queue) >= self.HAS_NO_PRIMARY_WARN_THRESCHOLD:
             logger.warning('{} is getting requests but still does not have '
@@ -932,14 +993,15 @@ class Replica(HasActionQueue, MessageProcessor):
     def doPrepare(self, pp: PrePrepare):
         logger.debug("{} Sending PREPARE{} at {}". format(
             self, (pp.viewNo, pp.ppSeqNo), time.perf_counter()))
-        prepare = Prepare(self.instId,
-                          pp.viewNo,
-                          pp.ppSeqNo,
-                          pp.ppTime,
-                          pp.digest,
-                          pp.stateRootHash,
-                          pp.txnRootHash
-                          )
+        # Fields are taken from the already validated PRE-PREPARE
+        prepare = Prepare.create_trusted(self.instId,
+                                         pp.viewNo,
+                                         pp.ppSeqNo,
+                                         pp.ppTime,
+                                         pp.digest,
+                                         pp.stateRootHash,
+                                         pp.txnRootHash
+                                         )
         self.send(prepare, TPCStat.PrepareSent)
         self.addToPrepares(prepare, self.name)
 
@@ -951,9 +1013,9 @@ class Replica(HasActionQueue, MessageProcessor):
         """
         logger.debug("{} Sending COMMIT{} at {}".
                      format(self, (p.viewNo, p.ppSeqNo), time.perf_counter()))
-        commit = Commit(self.instId,
-                        p.viewNo,
-                        p.ppSeqNo)
+        commit = Commit.create_trusted(self.instId,
+                                       p.viewNo,
+                                       p.ppSeqNo)
         self.send(commit, TPCStat.CommitSent)
         self.addToCommits(commit, self.name)
 
@@ -1033,6 +1095,9 @@ class Replica(HasActionQueue, MessageProcessor):
             oldTxnRoot = self.txnRootHash(pp.ledgerId)
             logger.debug('{} state root before processing {} is {}, {}'.
                          format(self, pp, oldStateRoot, oldTxnRoot))
+            self.node.prefetchBatchState(
+                pp.ledgerId,
+                [self.requests[reqKey].finalised for reqKey in pp.reqIdr])
 
         for reqKey in pp.reqIdr:
             req = self.requests[reqKey].finalised
@@ -1239,6 +1304,16 @@ class Replica(HasActionQueue, MessageProcessor):
             return self.prepares[key].msg
         return None
 
+    def serve_requested_msg(self, msg_type: str, viewNo: int, ppSeqNo: int,
+                            frm: str):
+        """
+        The PRE-PREPARE or PREPARE of the replica requested by `frm` in a
+        MESSAGE_REQUEST, None if the replica does not have it
+        """
+        get = self.getPrePrepare if msg_type == PREPREPARE \
+            else self.get_prepare
+        return get(viewNo, ppSeqNo)
+
     @property
     def lastPrePrepare(self):
         last_3pc = (0, 0)
@@ -1450,14 +1525,14 @@ class Replica(HasActionQueue, MessageProcessor):
         # TODO seems not enough for production where optimization happens
         assert pp
         self.addToOrdered(*key)
-        ordered = Ordered(self.instId,
-                          pp.viewNo,
-                          pp.reqIdr[:pp.discarded],
-                          pp.ppSeqNo,
-                          pp.ppTime,
-                          pp.ledgerId,
-                          pp.stateRootHash,
-                          pp.txnRootHash)
+        ordered = Ordered.create_trusted(self.instId,
+                                         pp.viewNo,
+                                         pp.reqIdr[:pp.discarded],
+                                         pp.ppSeqNo,
+                                         pp.ppTime,
+                                         pp.ledgerId,
+                                         pp.stateRootHash,
+                                         pp.txnRootHash)
         # TODO: Should not order or add to checkpoint while syncing
         # 3 phase state.
         if key in self.stashingWhileCatchingUp:
@@ -1609,6 +1684,8 @@ class Replica(HasActionQueue, MessageProcessor):
         self._gc((self.viewNo, seqNo))
         logger.debug("{} marked stable checkpoint {}".format(self, (s, e)))
         self.processStashedMsgsForNewWaterMarks()
+        if self.isMaster:
+            self.node.onStableCheckpoint(seqNo)
 
     def checkIfCheckpointStable(self, key: Tuple[int, int]):
         ckState = self.checkpoints[key]
@@ -2245,21 +2322,7 @@ class Replica(HasActionQueue, MessageProcessor):
         less than or equal to `last_caught_up_3PC` if `last_caught_up_3PC` is
         passed else remove all ordered, needed in catchup
         """
-        to_remove = []
-        for i, msg in enumerate(self.outBox):
-            if isinstance(msg, Ordered) and (not last_caught_up_3PC or
-                                             compare_3PC_keys(
-                                                 (msg.viewNo, msg.ppSeqNo),
-                                                 last_caught_up_3PC) >= 0):
-                to_remove.append(i)
-
-        logger.debug('{} going to remove {} Ordered messages from outbox'.
-                     format(self, len(to_remove)))
-
-        # Removing Ordered from queue but returning `Ordered` in order that
-        # they should be processed.
-        removed = []
-        for i in reversed(to_remove):
-            removed.insert(0, self.outBox[i])
-            del self.outBox[i]
+        removed = remove_ordered_from_queue(self.outBox, last_caught_up_3PC)
+        logger.debug('{} removed {} Ordered messages from outbox'.
+                     format(self, len(removed)))
         return removed
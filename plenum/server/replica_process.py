@@ -0,0 +1,407 @@
+import multiprocessing
+import os
+from collections import deque
+from functools import partial
+from queue import Empty
+from typing import Any, Dict, List, Tuple
+
+from plenum.common.exceptions import SuspiciousNode
+from plenum.common.messages.node_messages import PrePrepare, Prepare
+from plenum.common.request import ReqKey, Request
+from plenum.common.types import f
+from plenum.common.util import get_utc_epoch
+from plenum.server.propagator import Requests
+from plenum.server.quorums import Quorums
+from plenum.server.replica import Replica, remove_ordered_from_queue
+from stp_core.common.log import getlogger
+
+logger = getlogger()
+
+# Kinds of items exchanged between a node and a replica process, each item
+# is a tuple of the kind and its payload
+MESSAGE = 'message'    # message for the inBox or from the outBox of a replica
+REQUEST = 'request'    # finalised request forwarded to a replica
+STATE = 'state'        # state of one side needed by the other
+CALL = 'call'          # method called on a replica or on its node
+STOP = 'stop'
+
+# Methods of its node a replica process may call, by the names it sends
+NODE_CALLS = {
+    'free_request': lambda node: node.requests.free,
+    'reportSuspiciousNode': lambda node: node.reportSuspiciousNode,
+    'request_propagates': lambda node: node.request_propagates,
+    'request_msg': lambda node: node.request_msg,
+    'monitor.batchSizeAdapted': lambda node: node.monitor.batchSizeAdapted,
+    'reply_message_req': lambda node: node.reply_message_req,
+}
+
+
+def _serve_requested_msg(replica: Replica, msg_type: str, viewNo: int,
+                         ppSeqNo: int, frm: str):
+    # The node replies with the message found once it is sent back
+    msg = replica.serve_requested_msg(msg_type, viewNo, ppSeqNo, frm)
+    if msg is not None:
+        replica.node.reply_message_req(msg_type, {
+            f.INST_ID.nm: replica.instId,
+            f.VIEW_NO.nm: viewNo,
+            f.PP_SEQ_NO.nm: ppSeqNo
+        }, msg, frm)
+
+
+# Methods of a replica its node may call in a replica process, by the names
+# it sends
+REPLICA_CALLS = {
+    'set_primaryName':
+        lambda replica: partial(setattr, replica, 'primaryName'),
+    'primaryChanged': lambda replica: replica.primaryChanged,
+    'register_ledger': lambda replica: replica.register_ledger,
+    'process_requested_pre_prepare':
+        lambda replica: replica.process_requested_pre_prepare,
+    'process_requested_prepare':
+        lambda replica: replica.process_requested_prepare,
+    'serve_requested_msg':
+        lambda replica: partial(_serve_requested_msg, replica),
+}
+
+# Time a replica process waits for items from its node when it has nothing
+# to do, its timers are serviced at least that often
+IDLE_WAIT = 0.01
+
+
+class ReplicaProcessRequests(Requests):
+    """
+    Finalised requests forwarded to a replica process. The node is told
+    when the replica frees a request, so the request can be removed from the
+    node once every replica is done with it.
+    """
+
+    def __init__(self, outbox: List[Tuple[str, Any]]):
+        super().__init__()
+        self._outbox = outbox
+
+    def add_finalised(self, request: Request):
+        state = self.add(request)
+        state.finalised = request
+        # The request is removed as soon as the replica frees it
+        state.forwardedTo = 1
+        state.executed = True
+
+    def free(self, request_key):
+        super().free(request_key)
+        self._outbox.append((CALL, ('free_request', (request_key,))))
+
+
+class ReplicaProcessMonitor:
+    """
+    What a backup replica uses of the monitor of its node, in a replica
+    process.
+    """
+
+    def __init__(self, node: 'ReplicaProcessNode'):
+        self._node = node
+
+    def orderingLatency(self, instId: int) -> float:
+        return self._node.orderingLatency
+
+    def batchSizeAdapted(self, instId: int, decision: str, batchSize: int,
+                         batchWait: float):
+        self._node._call('monitor.batchSizeAdapted',
+                         instId, decision, batchSize, batchWait)
+
+
+class ReplicaProcessNode:
+    """
+    What a backup replica uses of its node, in a replica process. The state
+    of the node is updated by the node, actions on the node are sent to it.
+    """
+
+    def __init__(self, name: str, node_class, state: Dict[str, Any],
+                 outbox: List[Tuple[str, Any]]):
+        self.name = name
+        self.ledgerIdForRequest = node_class.ledgerIdForRequest
+        self.requests = ReplicaProcessRequests(outbox)
+        self.monitor = ReplicaProcessMonitor(self)
+        self._outbox = outbox
+        self.totalNodes = None
+        self.orderingLatency = 0
+        self.update(state)
+
+    def update(self, state: Dict[str, Any]):
+        if state['totalNodes'] != self.totalNodes:
+            self.quorums = Quorums(state['totalNodes'])
+        self.__dict__.update(state)
+
+    @staticmethod
+    def utc_epoch() -> int:
+        return get_utc_epoch()
+
+    def reportSuspiciousNodeEx(self, ex: SuspiciousNode):
+        self._call('reportSuspiciousNode',
+                   ex.node, ex.reason, ex.code, ex.offendingMsg)
+
+    def request_propagates(self, req_keys):
+        self._call('request_propagates', list(req_keys))
+
+    def request_msg(self, typ, params: Dict, frm: List[str]=None):
+        self._call('request_msg', typ, params, frm)
+
+    def reply_message_req(self, msg_type: str, params: Dict, msg, frm: str):
+        self._call('reply_message_req', msg_type, params, msg, frm)
+
+    def _call(self, name, *args):
+        self._outbox.append((CALL, (name, args)))
+
+
+def _leave_first_core_to_node():
+    # The master replica runs in the node process, so backup replicas keep
+    # off the first core the process is allowed to run on
+    if not hasattr(os, 'sched_setaffinity'):
+        return
+    cores = os.sched_getaffinity(0)
+    if len(cores) > 1:
+        os.sched_setaffinity(0, cores - {min(cores)})
+
+
+def _call_replica(replica: Replica, name: str, args):
+    method = REPLICA_CALLS.get(name)
+    if method is None:
+        logger.warning('{} ignoring call of unknown replica method {} from '
+                       'its node'.format(replica, name))
+        return
+    method(replica)(*args)
+
+
+def run_replica(node_name: str, node_class, inst_id: int,
+                state: Dict[str, Any], to_replica: multiprocessing.Queue,
+                from_replica: multiprocessing.Queue):
+    """
+    Run a backup replica until it is stopped by its node. Executed in a
+    replica process.
+    """
+    _leave_first_core_to_node()
+    outbox = []
+    node = ReplicaProcessNode(node_name, node_class, state, outbox)
+    replica = Replica(node, inst_id, isMaster=False)
+    replica_state = None
+    busy = False
+    while True:
+        items = []
+        try:
+            if busy:
+                items.extend(to_replica.get_nowait())
+            else:
+                items.extend(to_replica.get(timeout=IDLE_WAIT))
+            while True:
+                items.extend(to_replica.get_nowait())
+        except Empty:
+            pass
+        for kind, payload in items:
+            if kind == STOP:
+                return
+            elif kind == STATE:
+                node.update(payload)
+            elif kind == REQUEST:
+                node.requests.add_finalised(payload)
+            elif kind == MESSAGE:
+                replica.inBox.append(payload)
+            elif kind == CALL:
+                _call_replica(replica, *payload)
+
+        try:
+            busy = replica.serviceQueues() > 0
+        except Exception as ex:
+            logger.error('{} got exception while servicing queues: {}'.
+                         format(replica, ex))
+            busy = False
+
+        while replica.outBox:
+            msg = replica.outBox.popleft()
+            if isinstance(msg, SuspiciousNode):
+                # Reported the way the node does for escalated exceptions,
+                # the exception itself cannot be pickled
+                node.reportSuspiciousNodeEx(msg)
+            else:
+                outbox.append((MESSAGE, msg))
+        new_state = {'last_ordered_3pc': replica.last_ordered_3pc}
+        if new_state != replica_state:
+            outbox.append((STATE, new_state))
+            replica_state = new_state
+        if outbox:
+            from_replica.put(list(outbox))
+            outbox.clear()
+
+
+class ReplicaProcess:
+    """
+    A backup replica running in a separate process, used by its node the
+    same way as a `Replica`. Messages for the replica are put in `inBox` and
+    messages from it are taken from `outBox`, they are exchanged with the
+    process when its queues are serviced.
+
+    The process is started on first use and again after `stop`, a restarted
+    replica starts with an empty state.
+    """
+
+    isMaster = False
+
+    def __init__(self, node, instId: int):
+        self.node = node
+        self.instId = instId
+        self.name = Replica.generateName(node.name, instId)
+        self.inBox = deque()
+        self.outBox = deque()
+        self._primaryName = None
+        self.last_ordered_3pc = (0, 0)
+        self._process = None
+        self._to_replica = None
+        self._from_replica = None
+        # Items not yet sent to the replica process
+        self._pending = []
+        # State of the node last sent to the replica process
+        self._node_state = None
+
+    def __repr__(self):
+        return self.name
+
+    @property
+    def isPrimary(self):
+        return self._primaryName == self.name \
+            if self._primaryName is not None else None
+
+    @property
+    def hasPrimary(self):
+        return self._primaryName is not None
+
+    @property
+    def primaryName(self):
+        return self._primaryName
+
+    @primaryName.setter
+    def primaryName(self, value):
+        self._primaryName = value
+        self._call('set_primaryName', value)
+
+    def primaryChanged(self, primaryName):
+        self._primaryName = primaryName
+        self._call('primaryChanged', primaryName)
+
+    def register_ledger(self, ledger_id):
+        self._call('register_ledger', ledger_id)
+
+    def serve_requested_msg(self, msg_type: str, viewNo: int, ppSeqNo: int,
+                            frm: str):
+        """
+        The replica process looks the message up and the node replies with
+        it once the process sends it back, so nothing is returned
+        """
+        self._call('serve_requested_msg', msg_type, viewNo, ppSeqNo, frm)
+
+    def process_requested_pre_prepare(self, pp: PrePrepare, sender: str):
+        self._call('process_requested_pre_prepare', pp, sender)
+
+    def process_requested_prepare(self, prepare: Prepare, sender: str):
+        self._call('process_requested_prepare', prepare, sender)
+
+    def _remove_ordered_from_queue(self, last_caught_up_3PC=None):
+        # Ordered sent by the replica process but not received yet are
+        # removed too
+        self._receive()
+        removed = remove_ordered_from_queue(self.outBox, last_caught_up_3PC)
+        logger.debug('{} removed {} Ordered messages from outbox'.
+                     format(self, len(removed)))
+        return removed
+
+    def serviceQueues(self, limit=None):
+        """
+        Send the messages in the inBox to the replica process and put the
+        messages it sent in the outBox.
+
+        :return: the number of messages exchanged with the replica process
+        """
+        if self._process is None:
+            self._start()
+        count = len(self.inBox)
+        while self.inBox:
+            msg = self.inBox.popleft()
+            if isinstance(msg, ReqKey):
+                self._post(REQUEST, self.node.requests[msg].finalised)
+            self._post(MESSAGE, msg)
+        if self._pending:
+            self._to_replica.put(self._pending)
+            self._pending = []
+        return count + self._receive()
+
+    def stop(self):
+        if self._process is None:
+            return
+        self._to_replica.put([(STOP, None)])
+        self._process.join(timeout=1)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+        self._node_state = None
+
+    def _start(self):
+        self._to_replica = multiprocessing.Queue()
+        self._from_replica = multiprocessing.Queue()
+        self._node_state = self._get_node_state()
+        self._process = multiprocessing.Process(
+            target=run_replica,
+            args=(self.node.name, self.node.__class__, self.instId,
+                  self._node_state, self._to_replica, self._from_replica),
+            name=self.name,
+            daemon=True)
+        self._process.start()
+        if self._primaryName is not None:
+            self.primaryChanged(self._primaryName)
+        logger.debug('{} started replica process {}'.
+                     format(self, self._process.pid))
+
+    def _get_node_state(self):
+        state = {
+            'viewNo': self.node.viewNo,
+            'f': self.node.f,
+            'totalNodes': self.node.totalNodes,
+            'isParticipating': self.node.isParticipating,
+            'ledger_ids': list(self.node.ledger_ids),
+        }
+        if self.node.config.Adaptive3PCBatching:
+            state['orderingLatency'] = \
+                self.node.monitor.orderingLatency(self.instId)
+        return state
+
+    def _post(self, kind, payload):
+        # The replica acts on the state of the node at the time of the call
+        state = self._get_node_state()
+        if state != self._node_state:
+            self._pending.append((STATE, state))
+            self._node_state = state
+        self._pending.append((kind, payload))
+
+    def _call(self, name, *args):
+        self._post(CALL, (name, args))
+
+    def _receive(self) -> int:
+        count = 0
+        if self._from_replica is None:
+            return count
+        while True:
+            try:
+                items = self._from_replica.get_nowait()
+            except Empty:
+                return count
+            for kind, payload in items:
+                count += 1
+                if kind == MESSAGE:
+                    self.outBox.append(payload)
+                elif kind == STATE:
+                    self.__dict__.update(payload)
+                elif kind == CALL:
+                    name, args = payload
+                    method = NODE_CALLS.get(name)
+                    if method is None:
+                        logger.warning('{} ignoring call of unknown node '
+                                       'method {} from replica process'.
+                                       format(self, name))
+                    else:
+                        method(self.node)(*args)
@@ -3,6 +3,7 @@ from typing import Generator
 
 from plenum.server.monitor import Monitor
 from plenum.server.replica import Replica
+from plenum.server.replica_process import ReplicaProcess
 from stp_core.common.log import getlogger
 
 logger = getlogger()
@@ -38,6 +39,8 @@ class Replicas:
 
     def shrink(self) -> int:
         replica = self._replicas[-1]
+        if isinstance(replica, ReplicaProcess):
+            replica.stop()
         self._replicas = self._replicas[:-1]
         self._messages_to_replicas = self._messages_to_replicas[:-1]
         self._monitor.removeInstance()
@@ -103,8 +106,19 @@ class Replicas:
         """
         Create a new replica with the specified parameters.
         """
+        if not is_master and self._node.config.BackupReplicasInProcesses:
+            return ReplicaProcess(self._node, instance_id)
         return Replica(self._node, instance_id, is_master)
 
+    def stop(self):
+        """
+        Stop the processes of replicas running in separate processes, they
+        are started again when the replicas are serviced.
+        """
+        for replica in self._replicas:
+            if isinstance(replica, ReplicaProcess):
+                replica.stop()
+
     @property
     def num_replicas(self):
         return len(self._replicas)
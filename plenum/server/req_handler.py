@@ -19,6 +19,9 @@ class RequestHandler:
     state control
     """
 
+    # Keys of the entries returned by `committedStateMeta`
+    committedMetaKeys = ()
+
     def __init__(self, ledger: Ledger, state: State):
         self.ledger = ledger
         self.state = state
@@ -28,6 +31,12 @@ class RequestHandler:
         Validates request. Raises exception if request is invalid.
         """
 
+    def prefetch(self, reqs: List[Request]):
+        """
+        Called with the requests of a batch before they are validated and
+        applied one by one, to read the state they need at once
+        """
+
     def apply(self, req: Request, cons_time: int):
         """
         Applies request
@@ -46,7 +55,8 @@ class RequestHandler:
         :param stateRoot: The state trie root after the txns are committed
         :param txnRoot: The txn merkle root after the txns are committed
 
-        :return: list of committed transactions
+        :return: list of committed transactions with their seqNos, without
+        merkle proofs which `txnsWithMerkleInfo` adds
         """
 
         (seqNoStart, seqNoEnd), committedTxns = \
@@ -55,9 +65,27 @@ class RequestHandler:
         # Probably the following assertion fail should trigger catchup
         assert self.ledger.root_hash == txnRoot, '{} {}'.format(
             self.ledger.root_hash, txnRoot)
-        self.state.commit(rootHash=stateRoot)
+        self.state.commit(rootHash=stateRoot, seqNo=self.ledger.size,
+                          meta=self.committedStateMeta(stateRoot))
         return txnsWithSeqNo(seqNoStart, seqNoEnd, committedTxns)
 
+    def commitHead(self, seqNo: int):
+        """
+        Commit the head of the state, to which txns were applied outside of
+        batches, like txns caught up or applied from the ledger on start
+
+        :param seqNo: seqNo of the last txn applied
+        """
+        stateRoot = self.state.headHash
+        self.state.commit(rootHash=stateRoot, seqNo=seqNo,
+                          meta=self.committedStateMeta(stateRoot))
+
+    def committedStateMeta(self, stateRoot):
+        """
+        Called when the state is committed at `stateRoot`, returns the
+        entries to keep with the committed state outside of it, if any
+        """
+
     def onBatchCreated(self, stateRoot):
         pass
 
@@ -0,0 +1,78 @@
+from collections import OrderedDict, defaultdict
+from hashlib import sha256
+from typing import Mapping, Tuple
+
+from common.serializers.serialization import serialize_msg_for_signing
+from plenum.common.types import f
+
+# identifier, reqId, digest, signature, verkey
+VerifiedReqKey = Tuple[str, int, str, str, str]
+
+
+class VerifiedReqCache:
+    """
+    Bounded LRU cache of requests whose signatures have been verified. A
+    request is received once from the client and once in a PROPAGATE from
+    each of the other nodes, all of them carrying the same signature, so
+    only the first of them needs to be authenticated.
+
+    Entries are keyed by identifier, reqId, digest, signature and the verkey
+    the signature was verified with, so a request which differs in any of
+    them, or whose identifier has a new verkey, is not considered verified.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._verified = OrderedDict()  # type: OrderedDict[VerifiedReqKey, None]
+        # Cache keys by request key, used to evict all entries of a request
+        self._keys = defaultdict(set)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._verified)
+
+    @staticmethod
+    def key(req: Mapping, verkey: str,
+            serialized: bytes=None) -> VerifiedReqKey:
+        """
+        :param verkey: the current verkey of the identifier of the request
+        :param serialized: the request already serialized for signing, if
+        known; if None, `req` is serialized
+        """
+        ser = serialized if serialized is not None else \
+            serialize_msg_for_signing(req, topLevelKeysToIgnore=[f.SIG.nm])
+        return (req.get(f.IDENTIFIER.nm), req.get(f.REQ_ID.nm),
+                sha256(ser).hexdigest(), req.get(f.SIG.nm), verkey)
+
+    def is_verified(self, key: VerifiedReqKey) -> bool:
+        if key in self._verified:
+            self._verified.move_to_end(key)
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def add(self, key: VerifiedReqKey):
+        if self.capacity <= 0:
+            return
+        self._verified[key] = None
+        self._verified.move_to_end(key)
+        self._keys[key[:2]].add(key)
+        while len(self._verified) > self.capacity:
+            old, _ = self._verified.popitem(last=False)
+            self._discard_req_key(old)
+
+    def evict(self, req_key: Tuple[str, int]):
+        """
+        Remove all entries of the request with the given identifier and reqId
+        """
+        for key in self._keys.pop(req_key, ()):
+            self._verified.pop(key, None)
+
+    def _discard_req_key(self, key: VerifiedReqKey):
+        keys = self._keys.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys[key[:2]]
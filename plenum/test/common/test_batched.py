@@ -0,0 +1,120 @@
+import pytest
+
+from plenum.common.batched import Batched
+from plenum.common.constants import BATCH, OP_FIELD_NAME
+from plenum.common.message_processor import MessageProcessor
+from plenum.common.types import f
+from stp_core.common.util import adict
+from stp_zmq.zstack import ZStack
+
+
+class FakeStack(Batched):
+    messageTimeout = None
+    serializeMsg = staticmethod(ZStack.serializeMsg)
+    serializeBinaryMsg = staticmethod(ZStack.serializeBinaryMsg)
+    serializerFor = ZStack.serializerFor
+    isBinaryMsg = staticmethod(ZStack.isBinaryMsg)
+    deserializeMsg = staticmethod(ZStack.deserializeMsg)
+
+    def __init__(self, binary_codecs):
+        Batched.__init__(self)
+        MessageProcessor.__init__(self, allowDictOnly=False)
+        self.remotes = {name: adict(name=name, binaryCodec=binary_codec)
+                        for name, binary_codec in binary_codecs.items()}
+        self.transmitted = []
+        self.made_batches = 0
+
+    def transmit(self, msg, uid, timeout=None, serialized=False):
+        self.transmitted.append((uid, msg))
+        return True, None
+
+    def _make_batch(self, msgs, serializer=None, members=None, codecs=None):
+        self.made_batches += 1
+        return super()._make_batch(msgs, serializer, members, codecs)
+
+
+def transmitted_to(stack, uid):
+    return [msg for u, msg in stack.transmitted if u == uid]
+
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_batch_is_the_same_as_serialized_batch_message(binary):
+    stack = FakeStack({'Beta': binary})
+    msgs = [stack.serializerFor(stack.remotes['Beta'])({'a': i})
+            for i in range(3)] + [b'pi']
+    serializer = stack.serializerFor(stack.remotes['Beta'])
+    batch = ZStack.deserializeMsg(stack._make_batch(msgs, serializer))
+    assert ZStack.isBinaryMsg(stack._make_batch(msgs, serializer)) is binary
+    assert batch == {
+        OP_FIELD_NAME: BATCH,
+        f.MSGS.nm: msgs if binary else [m.decode() for m in msgs],
+        f.SIG.nm: None
+    }
+
+
+def test_same_outboxes_are_batched_once():
+    stack = FakeStack({'Beta': False, 'Gamma': False, 'Delta': True})
+    stack.send({'a': 1})
+    stack.send({'b': 2})
+    assert stack.made_batches == 0
+    stack.flushOutBoxes()
+
+    # One batch for JSON and one for msgpack remotes
+    assert stack.made_batches == 2
+    assert transmitted_to(stack, 'Beta') == transmitted_to(stack, 'Gamma')
+    assert transmitted_to(stack, 'Beta')[0] is \
+        transmitted_to(stack, 'Gamma')[0]
+    for uid in stack.remotes:
+        batch, = transmitted_to(stack, uid)
+        assert ZStack.isBinaryMsg(batch) is (uid == 'Delta')
+        assert [ZStack.deserializeMsg(m)
+                for m in ZStack.deserializeMsg(batch)[f.MSGS.nm]] == \
+            [{'a': 1}, {'b': 2}]
+    assert all(not msgs for msgs in stack.outBoxes.values())
+
+
+def test_different_outboxes_are_batched_separately():
+    stack = FakeStack({'Beta': False, 'Gamma': False})
+    stack.send({'a': 1})
+    stack.send({'b': 2}, 'Beta')
+    stack.send({'c': 3})
+    stack.flushOutBoxes()
+
+    assert stack.made_batches == 2
+    for uid, expected in (('Beta', [{'a': 1}, {'b': 2}, {'c': 3}]),
+                          ('Gamma', [{'a': 1}, {'c': 3}])):
+        batch, = transmitted_to(stack, uid)
+        assert [ZStack.deserializeMsg(m)
+                for m in ZStack.deserializeMsg(batch)[f.MSGS.nm]] == expected
+
+
+def test_message_encoded_again_when_remote_stops_accepting_msgpack():
+    stack = FakeStack({'Beta': True})
+    stack.send({'a': 1})
+    stack.remotes['Beta'].binaryCodec = False
+    stack.flushOutBoxes()
+
+    msg, = transmitted_to(stack, 'Beta')
+    assert not ZStack.isBinaryMsg(msg)
+    assert ZStack.deserializeMsg(msg) == {'a': 1}
+
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_batch_members_encoded_by_their_codec_after_codec_change(binary):
+    stack = FakeStack({'Beta': binary, 'Gamma': not binary})
+    stack.send({'a': 1})
+    stack.send({'b': 2})
+    # The codec of the remotes changes between sending and flushing
+    stack.remotes['Beta'].binaryCodec = not binary
+    stack.remotes['Gamma'].binaryCodec = binary
+    stack.flushOutBoxes()
+
+    assert stack.made_batches == 2
+    for uid in stack.remotes:
+        batch, = transmitted_to(stack, uid)
+        assert ZStack.isBinaryMsg(batch) is stack.remotes[uid].binaryCodec
+        members = ZStack.deserializeMsg(batch)[f.MSGS.nm]
+        if not stack.remotes[uid].binaryCodec:
+            assert not any(ZStack.isBinaryMsg(m.encode()) for m in members)
+        assert [ZStack.deserializeMsg(m) for m in members] == \
+            [{'a': 1}, {'b': 2}]
@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from ledger.compact_merkle_tree import CompactMerkleTree
+from ledger.hash_stores.file_hash_store import FileHashStore
+from ledger.test.helper import random_txn
+from ledger.util import F
+from plenum.common.ledger import Ledger
+
+
+def create_ledger(dataDir):
+    return Ledger(CompactMerkleTree(hashStore=FileHashStore(dataDir=dataDir)),
+                  dataDir=dataDir)
+
+
+def check_uncommitted_tree(ledger):
+    if ledger.uncommittedTxns:
+        tree = ledger.treeWithAppliedTxns(ledger.uncommittedTxns, ledger.tree)
+        assert ledger.uncommittedRootHash == tree.root_hash
+        assert ledger.uncommittedTree.hashes == tree.hashes
+    else:
+        assert ledger.uncommittedRootHash is None
+        assert ledger.uncommittedTree is None
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_batches_applied_discarded_and_committed(tdir_for_func, seed):
+    rnd = random.Random(seed)
+    ledger = create_ledger(tdir_for_func + '/batches')
+    referenceLedger = create_ledger(tdir_for_func + '/reference')
+    i = 0
+    for _ in range(100):
+        action = rnd.choice(['append', 'append', 'discard', 'commit'])
+        if action == 'append':
+            txns = [random_txn((i + j) % 90)
+                    for j in range(rnd.randint(1, 5))]
+            i += len(txns)
+            ledger.appendTxns(txns)
+        elif action == 'discard' and ledger.uncommittedTxns:
+            # Usually whole batches are discarded but not always
+            count = ledger.uncommittedBatches[-1][0] if rnd.random() < .7 \
+                else rnd.randint(1, len(ledger.uncommittedTxns))
+            ledger.discardTxns(count)
+        elif action == 'commit' and ledger.uncommittedTxns:
+            count = ledger.uncommittedBatches[0][0] if rnd.random() < .7 \
+                else rnd.randint(1, len(ledger.uncommittedTxns))
+            expectedRoot = ledger.treeWithAppliedTxns(
+                ledger.uncommittedTxns[:count]).root_hash
+            size = ledger.size
+            (start, end), committedTxns = ledger.commitTxns(count)
+            assert (start, end) == (size + 1, size + count)
+            for seqNo, txn in enumerate(committedTxns, start):
+                # Committed txns have seqNos but no merkle proofs, which are
+                # built by `merkleInfo` like `add` builds them
+                assert F.auditPath.name not in txn
+                assert F.rootHash.name not in txn
+                txn = dict(txn)
+                assert txn.pop(F.seqNo.name) == seqNo
+                merkleInfo = referenceLedger.add(txn)
+                assert merkleInfo.pop(F.seqNo.name) == seqNo
+                assert ledger.merkleInfo(seqNo) == merkleInfo
+            assert ledger.tree.root_hash == expectedRoot
+        check_uncommitted_tree(ledger)
+
+    assert ledger.size == referenceLedger.size
+    assert ledger.root_hash == referenceLedger.root_hash
+    assert ledger.tree.nodeCount == referenceLedger.tree.nodeCount
+    for pos in range(1, ledger.tree.nodeCount + 1):
+        assert ledger.tree.hashStore.readNode(pos) == \
+            referenceLedger.tree.hashStore.readNode(pos)
+    for seqNo in range(1, ledger.size + 1):
+        assert ledger.merkleInfo(seqNo) == referenceLedger.merkleInfo(seqNo)
+
+
+def test_discarding_batches_does_not_hash_txns(tdir_for_func):
+    ledger = create_ledger(tdir_for_func)
+    for i in range(10):
+        ledger.appendTxns([random_txn(10 * i + j) for j in range(10)])
+    roots = [tree.root_hash for _, tree, _ in ledger.uncommittedBatches]
+
+    ledger.serialize_for_tree = None
+    for i in range(9, 0, -1):
+        ledger.discardTxns(10)
+        assert ledger.uncommittedRootHash == roots[i - 1]
+    ledger.discardTxns(10)
+    assert ledger.uncommittedRootHash is None
+
+
+def test_only_committed_txns_are_indexed(tdir_for_func):
+    ledger = Ledger(CompactMerkleTree(
+        hashStore=FileHashStore(dataDir=tdir_for_func)),
+        dataDir=tdir_for_func, indexes=[('identifier', 'reqId')])
+    txns = [random_txn(i) for i in range(6)]
+    ledger.appendTxns(txns[:4])
+    ledger.appendTxns(txns[4:])
+    ledger.commitTxns(3)
+    ledger.discardTxns(3)
+    ledger.appendCommittedTxns(txns[4:])
+    for i, txn in enumerate(txns[:3] + txns[4:], 1):
+        assert ledger.get(identifier=txn['identifier'],
+                          reqId=txn['reqId'])[F.seqNo.name] == i
+    assert ledger.get(identifier=txns[3]['identifier'],
+                      reqId=txns[3]['reqId']) is None
@@ -0,0 +1,85 @@
+from hashlib import sha256
+
+from common.serializers.serialization import serialize_msg_for_signing
+from plenum.common.request import Request, SafeRequest
+
+idr = '5G72199XZB7wREviUbQma7'
+
+
+def make_request(cls=Request):
+    return cls(identifier=idr, reqId=1,
+               operation={'type': 'buy', 'amount': 10}, signature='sig')
+
+
+def test_signing_bytes_memoized():
+    req = make_request()
+    ser = serialize_msg_for_signing(req.signingState)
+    assert req.signingBytes == ser
+    assert req.signingBytes is req.signingBytes
+    assert req.digest == sha256(ser).hexdigest()
+    assert serialize_msg_for_signing(req.as_dict,
+                                     topLevelKeysToIgnore=['signature']) == ser
+
+
+def test_signing_bytes_invalidated_on_change():
+    req = make_request()
+    ser = req.signingBytes
+
+    req.reqId = 2
+    assert req.signingBytes != ser
+    assert req.signingBytes == serialize_msg_for_signing(req.signingState)
+
+    ser = req.signingBytes
+    req.operation['amount'] = 11
+    assert req.signingBytes != ser
+    assert req.signingBytes == serialize_msg_for_signing(req.signingState)
+
+    ser = req.signingBytes
+    req.operation = {'type': 'buy', 'amount': 12}
+    assert req.signingBytes != ser
+    assert req.signingBytes == serialize_msg_for_signing(req.signingState)
+
+    # Signature is not part of the signed data
+    ser = req.signingBytes
+    req.signature = 'other'
+    assert req.signingBytes is ser
+
+
+def test_get_digest_notices_nested_changes():
+    req = Request(identifier=idr, reqId=1,
+                  operation={'type': 'buy', 'data': {'amount': 10}})
+    digest = req.digest
+    req.operation['data']['amount'] = 11
+    assert req.getDigest() != digest
+    assert req.signingBytes == serialize_msg_for_signing(req.signingState)
+
+
+def test_signing_bytes_and_hash_notice_nested_changes():
+    req = Request(identifier=idr, reqId=1,
+                  operation={'type': 'buy', 'data': {'amounts': [10]}})
+    ser = req.signingBytes
+    h = hash(req)
+    req.operation['data']['amounts'].append(11)
+    assert req.signingBytes != ser
+    assert req.signingBytes == serialize_msg_for_signing(req.signingState)
+    assert hash(req) != h
+
+
+def test_memoized_values_not_in_state():
+    req = make_request(SafeRequest)
+    req.signingBytes
+    state = req.__getstate__()
+    assert set(state.keys()) == {'identifier', 'reqId', 'operation',
+                                 'digest', 'signature'}
+    restored = Request.fromState(state)
+    assert restored == req
+    assert restored.signingBytes == req.signingBytes
+
+
+def test_hash_consistent_with_equality():
+    req1 = make_request()
+    req2 = make_request(SafeRequest)
+    assert req1 == req2
+    assert hash(req1) == hash(req2)
+    req2.signature = 'other'
+    assert hash(req1) != hash(req2)
@@ -0,0 +1,154 @@
+import pytest
+
+from ledger.compact_merkle_tree import CompactMerkleTree
+from ledger.hash_stores.file_hash_store import FileHashStore
+from plenum.common.constants import NYM, ROLE, STEWARD, TARGET_NYM, \
+    TRUSTEE, TXN_TYPE
+from plenum.common.ledger import Ledger
+from plenum.common.request import Request
+from plenum.server.domain_req_handler import DomainRequestHandler
+from state.pruning_state import PruningState
+from storage.kv_in_memory import KeyValueStorageInMemory
+
+
+@pytest.fixture()
+def req_handler(tdir_for_func, monkeypatch):
+    ledger = Ledger(CompactMerkleTree(
+        hashStore=FileHashStore(dataDir=tdir_for_func)),
+        dataDir=tdir_for_func)
+    handler = DomainRequestHandler(ledger,
+                                   PruningState(KeyValueStorageInMemory()),
+                                   [])
+    handler.initRoleCounts()
+
+    def scan(*args, **kwargs):
+        raise AssertionError('Ledger scanned')
+    monkeypatch.setattr(ledger, 'getAllTxn', scan)
+    yield handler
+    ledger.stop()
+
+
+def nym_req(reqId, nym, role=None):
+    operation = {TXN_TYPE: NYM, TARGET_NYM: nym}
+    if role is not None:
+        operation[ROLE] = role
+    return Request('trustee', reqId, operation)
+
+
+def apply(handler, reqs):
+    for req in reqs:
+        handler.apply(req, 1500000000)
+    handler.onBatchCreated(handler.state.headHash)
+
+
+def commit(handler):
+    ledger = handler.ledger
+    handler.commit(len(ledger.uncommittedTxns),
+                   ledger.hashToStr(handler.state.headHash),
+                   ledger.hashToStr(ledger.uncommittedRootHash))
+
+
+def reject(handler, stateRoot, txnCount):
+    handler.state.revertToHead(stateRoot)
+    handler.ledger.discardTxns(txnCount)
+    handler.onBatchRejected()
+
+
+def counts(handler, isCommitted):
+    return (handler.countStewards(isCommitted=isCommitted),
+            handler.countRole(TRUSTEE, isCommitted))
+
+
+def test_roles_counted_in_uncommitted_and_committed_state(req_handler):
+    apply(req_handler, [nym_req(1, 'a', STEWARD), nym_req(2, 'b', STEWARD),
+                        nym_req(3, 'c', TRUSTEE), nym_req(4, 'd')])
+    assert counts(req_handler, isCommitted=False) == (2, 1)
+    assert counts(req_handler, isCommitted=True) == (0, 0)
+
+    commit(req_handler)
+    assert counts(req_handler, isCommitted=True) == (2, 1)
+
+
+def test_role_counts_reverted_on_batch_reject(req_handler):
+    apply(req_handler, [nym_req(1, 'a', STEWARD)])
+    commit(req_handler)
+    apply(req_handler, [nym_req(2, 'b', STEWARD)])
+    root = req_handler.state.headHash
+    apply(req_handler, [nym_req(3, 'c', TRUSTEE)])
+    assert counts(req_handler, isCommitted=False) == (2, 1)
+
+    reject(req_handler, root, 1)
+    assert counts(req_handler, isCommitted=False) == (2, 0)
+    # A batch is rejected before it is created when its roots do not match
+    req_handler.apply(nym_req(4, 'd', STEWARD), 1500000000)
+    reject(req_handler, root, 1)
+    assert counts(req_handler, isCommitted=False) == (2, 0)
+
+    reject(req_handler, req_handler.state.committedHeadHash, 1)
+    assert counts(req_handler, isCommitted=False) == (1, 0)
+    assert counts(req_handler, isCommitted=True) == (1, 0)
+
+
+def test_committed_counts_of_oldest_batch(req_handler):
+    ledger = req_handler.ledger
+    apply(req_handler, [nym_req(1, 'a', STEWARD)])
+    roots = (ledger.hashToStr(req_handler.state.headHash),
+             ledger.hashToStr(ledger.uncommittedRootHash))
+    apply(req_handler, [nym_req(2, 'b', STEWARD), nym_req(3, 'c', TRUSTEE)])
+    req_handler.commit(1, *roots)
+    assert counts(req_handler, isCommitted=True) == (1, 0)
+    assert counts(req_handler, isCommitted=False) == (2, 1)
+
+
+def test_role_counts_follow_role_changes(req_handler):
+    apply(req_handler, [nym_req(1, 'a', STEWARD), nym_req(2, 'b', STEWARD)])
+    # Updating a nym without a role keeps its role
+    apply(req_handler, [nym_req(3, 'a')])
+    assert counts(req_handler, isCommitted=False) == (2, 0)
+
+    apply(req_handler, [nym_req(4, 'a', TRUSTEE), nym_req(5, 'b', '')])
+    assert counts(req_handler, isCommitted=False) == (0, 1)
+
+
+def test_steward_threshold(req_handler):
+    config = type('Config', (), {'stewardThreshold': 2})
+    apply(req_handler, [nym_req(i, str(i), STEWARD) for i in range(2)])
+    commit(req_handler)
+    assert not req_handler.stewardThresholdExceeded(config)
+
+    apply(req_handler, [nym_req(2, '2', STEWARD)])
+    assert not req_handler.stewardThresholdExceeded(config)
+    assert req_handler.stewardThresholdExceeded(config, isCommitted=False)
+
+
+def test_role_counts_not_in_state(req_handler):
+    apply(req_handler, [nym_req(1, 'a', STEWARD), nym_req(2, 'b', TRUSTEE)])
+    commit(req_handler)
+    assert set(req_handler.state.as_dict) == \
+        {req_handler.nym_to_state_key(nym) for nym in ('a', 'b')}
+
+
+def test_role_counts_restored_with_committed_state(req_handler):
+    apply(req_handler, [nym_req(1, 'a', STEWARD), nym_req(2, 'b', STEWARD),
+                        nym_req(3, 'c', TRUSTEE), nym_req(4, 'a', TRUSTEE),
+                        nym_req(5, 'd'), nym_req(6, 'c')])
+    commit(req_handler)
+    # Uncommitted txns are not counted
+    apply(req_handler, [nym_req(7, 'e', STEWARD)])
+
+    # The ledger is not read, the counts are kept with the committed state
+    restarted = DomainRequestHandler(req_handler.ledger, req_handler.state,
+                                     [])
+    restarted.initRoleCounts()
+    assert counts(restarted, isCommitted=True) == (1, 2)
+    assert counts(restarted, isCommitted=False) == (1, 2)
+
+
+def test_demoted_stewards_not_counted(req_handler):
+    config = type('Config', (), {'stewardThreshold': 1})
+    apply(req_handler, [nym_req(1, 'a', STEWARD), nym_req(2, 'b', STEWARD),
+                        nym_req(3, 'a', '')])
+    commit(req_handler)
+    # Stewards are counted in the state, so a demoted steward is not
+    assert counts(req_handler, isCommitted=True) == (1, 0)
+    assert not req_handler.stewardThresholdExceeded(config)
@@ -0,0 +1,62 @@
+import pickle
+
+import pytest
+
+from plenum.common.messages.fields import NonNegativeNumberField, \
+    NonEmptyStringField
+from plenum.common.messages.message_base import MessageBase
+from plenum.test.input_validation.stub_messages import Message1
+
+
+def test_fields_are_slots():
+    msg = Message1(1, 'x')
+    assert Message1.__slots__ == ('a', 'b')
+    assert msg.a == 1 and msg.b == 'x'
+    assert list(msg) == [1, 'x']
+    assert msg[1] == 'x' and msg[:] == (1, 'x')
+    assert msg._fields == {'a': 1, 'b': 'x'}
+    assert list(msg._asdict().items()) == \
+        [('op', 'Message1'), ('a', 1), ('b', 'x')]
+    with pytest.raises(AttributeError):
+        msg.c = 2
+    assert getattr(msg, 'c', None) is None
+
+
+def test_messages_with_same_values_are_equal():
+    assert Message1(1, 'x') == Message1(a=1, b='x')
+    assert hash(Message1(1, 'x')) == hash(Message1(a=1, b='x'))
+    assert Message1(1, 'x') != Message1(2, 'x')
+
+
+def test_message_can_be_pickled():
+    msg = Message1(1, 'x')
+    assert pickle.loads(pickle.dumps(msg)) == msg
+
+
+def test_create_trusted_does_not_validate():
+    with pytest.raises(TypeError):
+        Message1(-1, 'x')
+    msg = Message1.create_trusted(-1, 'x')
+    assert msg.a == -1 and msg.b == 'x'
+    assert Message1.create_trusted(a=1, b='x', op='Message1') == \
+        Message1(1, 'x')
+    with pytest.raises(AssertionError):
+        Message1.create_trusted(1)
+
+
+def test_replaced_schema_is_recompiled():
+    class Message(MessageBase):
+        typename = 'Message'
+        schema = (
+            ('a', NonNegativeNumberField()),
+        )
+
+    assert Message(1).a == 1
+    with pytest.raises(TypeError):
+        Message('x')
+    Message.schema = (
+        ('a', NonEmptyStringField()),
+    )
+    assert Message('x').a == 'x'
+    with pytest.raises(TypeError):
+        Message(1)
@@ -0,0 +1,39 @@
+import time
+
+import base58
+
+from plenum.common.constants import DOMAIN_LEDGER_ID
+from plenum.common.messages.node_messages import PrePrepare, Prepare, \
+    Commit, Ordered
+
+MSG_COUNT = 10000
+
+root = base58.b58encode(b'a' * 32)
+ts = 1500000000
+messages = {
+    PrePrepare: (0, 1, 2, ts, [('4AdS22kC7xzb4bcqg9JATuCfAMNcQYcZa1u5eWzs6cSJ',
+                                1500000001)],
+                 1, 'digest', DOMAIN_LEDGER_ID, root, root),
+    Prepare: (0, 1, 2, ts, 'digest', root, root),
+    Commit: (0, 1, 2),
+    Ordered: (0, 1, [], 2, ts, DOMAIN_LEDGER_ID, root, root),
+}
+
+
+def rate(create):
+    start = time.perf_counter()
+    for _ in range(MSG_COUNT):
+        create()
+    return MSG_COUNT / (time.perf_counter() - start)
+
+
+def testMeasureMessageCreationRate():
+    for cls, args in messages.items():
+        validated = rate(lambda: cls(*args))
+        trusted = rate(lambda: cls.create_trusted(*args))
+        msg = cls(*args)
+        as_dict = rate(msg._asdict)
+        print("{}: {:.0f} validated, {:.0f} trusted messages/sec, "
+              "{:.0f} conversions to dict/sec".
+              format(cls.typename, validated, trusted, as_dict))
+        assert trusted > validated
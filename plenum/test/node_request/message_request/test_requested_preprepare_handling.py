@@ -24,9 +24,9 @@ def test_handle_delayed_preprepares(looper, txnPoolNodeSet,
 
     last_pp = None
 
-    def patched_method(self, msg):
+    def patched_method(self, msg, frm):
         nonlocal last_pp
-        last_pp = orig_method(msg)
+        last_pp = orig_method(msg, frm)
         return last_pp
 
     confused_node.handlers[PREPREPARE].serve = types.MethodType(patched_method, confused_node.handlers[PREPREPARE])
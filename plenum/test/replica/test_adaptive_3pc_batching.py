@@ -0,0 +1,37 @@
+import pytest
+
+from plenum.test.helper import send_reqs_to_nodes_and_verify_all_replies
+from plenum.test.pool_transactions.conftest import looper, clientAndWallet1, \
+    client1, wallet1, client1Connected
+
+
+@pytest.fixture(scope="module")
+def tconf(tconf, request):
+    oldAdaptive3PCBatching = tconf.Adaptive3PCBatching
+    tconf.Adaptive3PCBatching = True
+
+    def reset():
+        tconf.Adaptive3PCBatching = oldAdaptive3PCBatching
+
+    request.addfinalizer(reset)
+    return tconf
+
+
+def test_primaries_adapt_3pc_batches(tconf, looper, txnPoolNodeSet,
+                                     client1, wallet1, client1Connected):
+    send_reqs_to_nodes_and_verify_all_replies(looper, wallet1, client1, 20)
+
+    for node in txnPoolNodeSet:
+        for replica in node.replicas:
+            assert replica.batchSizer is not None
+            if replica.isPrimary:
+                batchSize, batchWait = \
+                    node.monitor.batchSizes[replica.instId]
+                assert tconf.Min3PCBatchSize <= batchSize <= \
+                    tconf.Max3PCBatchSize
+                assert tconf.Min3PCBatchWait <= batchWait <= \
+                    tconf.Max3PCBatchWait
+                assert sum(node.monitor.batchSizeDecisions[
+                    replica.instId].values()) > 0
+            else:
+                assert replica.instId not in node.monitor.batchSizes
@@ -0,0 +1,51 @@
+import pytest
+
+from plenum.server.adaptive_batch_sizer import AdaptiveBatchSizer, GROW, \
+    SHRINK, KEEP
+from stp_core.common.util import adict
+
+
+@pytest.fixture()
+def sizer():
+    return AdaptiveBatchSizer(adict(Min3PCBatchSize=1,
+                                    Max3PCBatchSize=100,
+                                    Min3PCBatchWait=.0001,
+                                    Max3PCBatchWait=.001,
+                                    Adaptive3PCBatchMaxInFlight=4,
+                                    Adaptive3PCBatchTargetLatency=1))
+
+
+def test_idle_sizer_cuts_batches_at_once(sizer):
+    assert sizer.batchSize == 1
+    assert sizer.batchWait == .0001
+    assert sizer.update(1, 0, 0) == KEEP
+    assert sizer.batchSize == 1
+
+
+def test_sizer_grows_under_load_within_bounds(sizer):
+    decisions = [sizer.update(1000, 1, 0) for _ in range(10)]
+    assert set(decisions) == {GROW}
+    assert sizer.batchSize == 100
+    assert sizer.batchWait == .001
+
+
+def test_sizer_grows_with_many_batches_in_flight(sizer):
+    assert sizer.update(1, 4, 0) == GROW
+    assert sizer.batchSize == 2
+
+
+def test_sizer_shrinks_when_idle_within_bounds(sizer):
+    for _ in range(10):
+        sizer.update(1000, 1, 0)
+    decisions = [sizer.update(0, 0, 0) for _ in range(10)]
+    assert set(decisions) == {SHRINK}
+    assert sizer.batchSize == 1
+    assert sizer.batchWait == .0001
+
+
+def test_sizer_waits_less_when_latency_is_high(sizer):
+    for _ in range(10):
+        sizer.update(1000, 1, 0)
+    assert sizer.update(1000, 1, 2) == GROW
+    assert sizer.batchSize == 100
+    assert sizer.batchWait == .0005
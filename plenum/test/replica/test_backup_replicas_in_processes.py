@@ -0,0 +1,137 @@
+from functools import partial
+from types import SimpleNamespace
+
+import pytest
+
+from plenum.common.constants import DOMAIN_LEDGER_ID, PREPARE, PREPREPARE
+from plenum.common.exceptions import SuspiciousNode
+from plenum.common.messages.node_messages import Ordered
+from plenum.common.types import f
+from plenum.server.replica import Replica
+from plenum.server.replica_process import ReplicaProcess, \
+    ReplicaProcessNode, NODE_CALLS, REPLICA_CALLS, _call_replica
+from plenum.server.suspicion_codes import Suspicions
+from plenum.test import waits
+from plenum.test.helper import send_reqs_to_nodes_and_verify_all_replies
+from plenum.test.pool_transactions.conftest import looper, clientAndWallet1, \
+    client1, wallet1, client1Connected
+from stp_core.loop.eventually import eventually
+
+
+@pytest.fixture(scope="module")
+def tconf(tconf, request):
+    oldBackupReplicasInProcesses = tconf.BackupReplicasInProcesses
+    tconf.BackupReplicasInProcesses = True
+
+    def reset():
+        tconf.BackupReplicasInProcesses = oldBackupReplicasInProcesses
+
+    request.addfinalizer(reset)
+    return tconf
+
+
+def test_backup_replicas_order_in_processes(tconf, looper, txnPoolNodeSet,
+                                            client1, wallet1,
+                                            client1Connected):
+    for node in txnPoolNodeSet:
+        replicas = list(node.replicas)
+        assert isinstance(replicas[0], Replica)
+        assert replicas[1:]
+        assert all(isinstance(r, ReplicaProcess) for r in replicas[1:])
+
+    send_reqs_to_nodes_and_verify_all_replies(looper, wallet1, client1, 5)
+
+    def chk():
+        for node in txnPoolNodeSet:
+            for replica in list(node.replicas)[1:]:
+                assert replica.last_ordered_3pc == \
+                    node.master_replica.last_ordered_3pc
+            # The monitor gets ordering stats of backup instances too
+            for instId in range(1, len(node.replicas)):
+                assert node.monitor.numOrderedRequests[instId][0] == 5
+
+    timeout = waits.expectedTransactionExecutionTime(len(txnPoolNodeSet))
+    looper.run(eventually(chk, retryWait=1, timeout=timeout))
+
+
+def test_replica_processes_call_only_listed_node_methods():
+    outbox = []
+    node = ReplicaProcessNode('Alpha', SimpleNamespace(ledgerIdForRequest=None),
+                              {'totalNodes': 4}, outbox)
+    node.reportSuspiciousNodeEx(
+        SuspiciousNode('Beta', Suspicions.PPR_DIGEST_WRONG, None))
+    node.request_propagates([('id', 1)])
+    node.request_msg('PREPREPARE', {}, ['Beta'])
+    node.monitor.batchSizeAdapted(1, 'increase', 10, 0.1)
+    assert len(outbox) == 4
+    assert {name for _, (name, _) in outbox} <= set(NODE_CALLS)
+
+
+def replica_process():
+    node = SimpleNamespace(name='Alpha', viewNo=0, f=1, totalNodes=4,
+                           isParticipating=True, ledger_ids=[0, 1],
+                           config=SimpleNamespace(Adaptive3PCBatching=False))
+    return ReplicaProcess(node, 1)
+
+
+def ordered(ppSeqNo):
+    return Ordered(1, 0, [], ppSeqNo, 1500000000, DOMAIN_LEDGER_ID,
+                   None, None)
+
+
+def test_replica_process_removes_ordered_from_its_outbox():
+    replica = replica_process()
+    replica.outBox.extend([ordered(1), 'msg', ordered(2), ordered(3)])
+    assert replica._remove_ordered_from_queue((0, 2)) == \
+        [ordered(1), ordered(2)]
+    assert list(replica.outBox) == ['msg', ordered(3)]
+    assert replica._remove_ordered_from_queue() == [ordered(3)]
+    assert list(replica.outBox) == ['msg']
+
+
+def test_replica_processes_called_only_with_listed_replica_methods():
+    replica = replica_process()
+    replica.primaryName = 'Beta:1'
+    replica.primaryChanged('Beta:1')
+    replica.register_ledger(DOMAIN_LEDGER_ID)
+    replica.process_requested_pre_prepare(None, 'Beta:1')
+    replica.process_requested_prepare(None, 'Beta:1')
+    replica.serve_requested_msg(PREPARE, 0, 1, 'Beta')
+    calls = [payload[0] for kind, payload in replica._pending
+             if kind == 'call']
+    assert len(calls) == 6
+    assert set(calls) <= set(REPLICA_CALLS)
+
+    # Other methods are not called
+    target = SimpleNamespace(stopped=[])
+    target.stop = lambda: target.stopped.append(True)
+    _call_replica(target, 'stop', ())
+    assert not target.stopped
+
+    _call_replica(target, 'set_primaryName', ('Beta:1',))
+    assert target.primaryName == 'Beta:1'
+
+
+def test_requested_3pc_msgs_served_by_replica_processes():
+    outbox = []
+    node = ReplicaProcessNode('Alpha', SimpleNamespace(ledgerIdForRequest=None),
+                              {'totalNodes': 4}, outbox)
+    replica = SimpleNamespace(instId=1, node=node,
+                              getPrePrepare=lambda viewNo, ppSeqNo: 'pp',
+                              get_prepare=lambda viewNo, ppSeqNo: None)
+    replica.serve_requested_msg = partial(Replica.serve_requested_msg,
+                                          replica)
+    # Replicas in the node process return the message for the node to reply
+    assert replica.serve_requested_msg(PREPREPARE, 0, 3, 'Beta') == 'pp'
+    _call_replica(replica, 'serve_requested_msg', (PREPREPARE, 0, 3, 'Beta'))
+    # A message the replica does not have is not replied with
+    _call_replica(replica, 'serve_requested_msg', (PREPARE, 0, 3, 'Beta'))
+    assert len(outbox) == 1
+
+    # The node replies with the message found by the replica process
+    replies = []
+    name, args = outbox[0][1]
+    NODE_CALLS[name](SimpleNamespace(
+        reply_message_req=lambda *args: replies.append(args)))(*args)
+    assert replies == [(PREPREPARE, {f.INST_ID.nm: 1, f.VIEW_NO.nm: 0,
+                                     f.PP_SEQ_NO.nm: 3}, 'pp', 'Beta')]
@@ -0,0 +1,53 @@
+import pytest
+
+from plenum.common.exceptions import InvalidSignature
+from plenum.test import waits
+from plenum.test.helper import signed_random_requests, \
+    send_signed_requests, waitForSufficientRepliesForRequests, \
+    checkReqNackWithReason
+from plenum.test.pool_transactions.conftest import looper, clientAndWallet1, \
+    client1, wallet1, client1Connected
+from stp_core.loop.eventually import eventually
+
+whitelist = ['InvalidSignature']
+
+
+@pytest.fixture(scope="module")
+def tconf(tconf, request):
+    oldBatchSigVerification = tconf.BatchSigVerification
+    oldSigVerificationProcesses = tconf.SigVerificationProcesses
+    tconf.BatchSigVerification = True
+    tconf.SigVerificationProcesses = 2
+
+    def reset():
+        tconf.BatchSigVerification = oldBatchSigVerification
+        tconf.SigVerificationProcesses = oldSigVerificationProcesses
+
+    request.addfinalizer(reset)
+    return tconf
+
+
+def test_requests_ordered_with_batched_sig_verification(
+        tconf, looper, txnPoolNodeSet, client1, wallet1, client1Connected):
+    for node in txnPoolNodeSet:
+        assert node.sigVerifier is not None
+
+    reqs = send_signed_requests(client1,
+                                signed_random_requests(wallet1, 10))
+    waitForSufficientRepliesForRequests(looper, client1, requests=reqs)
+
+    for node in txnPoolNodeSet:
+        assert len(node.sigVerifier) == 0
+
+
+def test_request_with_invalid_signature_nacked(
+        tconf, looper, txnPoolNodeSet, client1, wallet1, client1Connected):
+    req = signed_random_requests(wallet1, 1)[0]
+    req.operation['amount'] += 1
+    send_signed_requests(client1, [req])
+
+    timeout = waits.expectedReqNAckQuorumTime()
+    for node in txnPoolNodeSet:
+        looper.run(eventually(checkReqNackWithReason, client1,
+                              InvalidSignature.__name__,
+                              node.clientstack.name, timeout=timeout))
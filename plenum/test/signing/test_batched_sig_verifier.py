@@ -0,0 +1,65 @@
+import time
+from functools import partial
+
+import pytest
+
+from common.serializers.serialization import serialize_msg_for_signing
+from plenum.common.signer_simple import SimpleSigner
+from plenum.server.batched_sig_verifier import BatchedSigVerifier
+from stp_core.crypto.util import randomSeed
+
+
+@pytest.fixture(scope="module")
+def signer():
+    return SimpleSigner(seed=randomSeed())
+
+
+def signed_items(signer, count, corrupt=()):
+    items = []
+    for i in range(count):
+        msg = {'identifier': signer.identifier, 'reqId': i}
+        sig = signer.naclSigner.signature(serialize_msg_for_signing(msg))
+        if i in corrupt:
+            msg['reqId'] = -1
+        items.append((signer.identifier, signer.verkey, sig,
+                      serialize_msg_for_signing(msg)))
+    return items
+
+
+@pytest.fixture(params=[0, 2], ids=['in_process', 'process_pool'])
+def verifier(request):
+    verifier = BatchedSigVerifier(processes=request.param, batchSize=7)
+    yield verifier
+    verifier.stop()
+
+
+def service_till_done(verifier, timeout=10):
+    # Results may not be ready right away when verified by worker processes
+    deadline = time.perf_counter() + timeout
+    delivered = 0
+    while len(verifier) and time.perf_counter() < deadline:
+        delivered += verifier.service()
+        time.sleep(.01)
+    return delivered
+
+
+def test_results_delivered_in_order(signer, verifier):
+    count = 25
+    corrupt = {3, 10, 24}
+    results = []
+    for i, item in enumerate(signed_items(signer, count, corrupt)):
+        verifier.add(*item, callback=partial(
+            lambda i, verified: results.append((i, verified)), i))
+
+    assert len(verifier) == count
+    assert service_till_done(verifier) == count
+    assert len(verifier) == 0
+    assert results == [(i, i not in corrupt) for i in range(count)]
+
+
+def test_invalid_verkey_fails_verification(signer, verifier):
+    results = []
+    identifier, _, sig, ser = signed_items(signer, 1)[0]
+    verifier.add(identifier, 'not a verkey', sig, ser, results.append)
+    service_till_done(verifier)
+    assert results == [False]
@@ -0,0 +1,19 @@
+from plenum.test.helper import sendRandomRequests, \
+    waitForSufficientRepliesForRequests
+from plenum.test.pool_transactions.conftest import looper, clientAndWallet1, \
+    client1, wallet1, client1Connected
+
+
+def test_propagate_of_verified_request_not_verified_again(
+        looper, txnPoolNodeSet, client1, wallet1, client1Connected):
+    """
+    Each node verifies the signature of a request once, PROPAGATEs carrying
+    the same request are found in the cache of verified requests
+    """
+    count = 5
+    hits = {node.name: node.verifiedReqs.hits for node in txnPoolNodeSet}
+    reqs = sendRandomRequests(wallet1, client1, count)
+    waitForSufficientRepliesForRequests(looper, client1, requests=reqs)
+
+    for node in txnPoolNodeSet:
+        assert node.verifiedReqs.hits - hits[node.name] >= count
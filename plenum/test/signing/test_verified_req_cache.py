@@ -0,0 +1,115 @@
+from functools import partial
+from types import SimpleNamespace
+
+import pytest
+
+from plenum.common.exceptions import InvalidSignature
+from plenum.common.messages.node_messages import Propagate
+from plenum.common.request import Request
+from plenum.common.signer_simple import SimpleSigner
+from plenum.server import node as node_module
+from plenum.server.client_authn import SimpleAuthNr
+from plenum.server.node import Node
+from plenum.server.propagator import Requests
+from plenum.server.verified_req_cache import VerifiedReqCache
+
+idr = '5G72199XZB7wREviUbQma7'
+verkey = '~4Rn2d8PqdA3ovRT1uM7UEg'
+
+
+def req_dict(reqId, amount=1, signature='sig'):
+    return Request(idr, reqId, {'type': 'buy', 'amount': amount},
+                   signature).as_dict
+
+
+def test_key_depends_on_content_and_signature():
+    key = VerifiedReqCache.key(req_dict(1), verkey)
+    assert key == VerifiedReqCache.key(req_dict(1), verkey)
+    assert key != VerifiedReqCache.key(req_dict(1, amount=2), verkey)
+    assert key != VerifiedReqCache.key(req_dict(1, signature='other'), verkey)
+    assert key != VerifiedReqCache.key(req_dict(1), '~other')
+    assert key[:2] == (idr, 1)
+
+
+def test_least_recently_used_entries_evicted():
+    cache = VerifiedReqCache(capacity=2)
+    keys = [VerifiedReqCache.key(req_dict(i), verkey) for i in range(3)]
+    cache.add(keys[0])
+    cache.add(keys[1])
+    assert cache.is_verified(keys[0])
+    cache.add(keys[2])
+
+    assert len(cache) == 2
+    assert cache.is_verified(keys[0])
+    assert not cache.is_verified(keys[1])
+    assert cache.is_verified(keys[2])
+    assert cache.hits == 3
+    assert cache.misses == 1
+
+
+def test_entries_evicted_when_request_removed():
+    cache = VerifiedReqCache(capacity=10)
+    requests = Requests(on_removed=cache.evict)
+    req = Request(idr, 1, {'type': 'buy', 'amount': 1}, 'sig')
+    other = VerifiedReqCache.key(req_dict(2), verkey)
+    cache.add(VerifiedReqCache.key(req.as_dict, verkey))
+    cache.add(other)
+
+    requests.add(req)
+    requests.mark_as_forwarded(req, 1)
+    requests.mark_as_executed(req)
+    assert cache.is_verified(VerifiedReqCache.key(req.as_dict, verkey))
+
+    requests.free(req.key)
+    assert req.key not in requests
+    assert not cache.is_verified(VerifiedReqCache.key(req.as_dict, verkey))
+    assert cache.is_verified(other)
+
+
+def verifying_node():
+    node = SimpleNamespace(authnWhitelist=(), clientAuthNr=SimpleAuthNr(),
+                           verifiedReqs=VerifiedReqCache(capacity=10))
+    for name in ('authNr', '_reqForSigVerification', '_verifiedReqKey'):
+        setattr(node, name, partial(getattr(Node, name), node))
+    return node
+
+
+def signed_propagate(signer, reqId):
+    req = Request(signer.identifier, reqId, {'type': 'buy', 'amount': 1})
+    req.signature = signer.sign(req.as_dict)
+    return Propagate(req.as_dict, 'client')
+
+
+def test_request_verified_again_once_verkey_changed():
+    node = verifying_node()
+    signer, newSigner = SimpleSigner(), SimpleSigner()
+    node.clientAuthNr.addIdr(signer.identifier, signer.verkey)
+    propagate = signed_propagate(signer, 1)
+
+    Node.verifySignature(node, propagate)
+    Node.verifySignature(node, propagate)
+    assert node.verifiedReqs.hits == 1
+
+    node.clientAuthNr.addIdr(signer.identifier, newSigner.verkey)
+    with pytest.raises(InvalidSignature):
+        Node.verifySignature(node, propagate)
+    assert node.verifiedReqs.hits == 1
+
+
+def test_propagated_request_serialized_once(monkeypatch):
+    node = verifying_node()
+    signer = SimpleSigner()
+    node.clientAuthNr.addIdr(signer.identifier, signer.verkey)
+    propagate = signed_propagate(signer, 1)
+    serialized = []
+    serialize = node_module.serialize_msg_for_signing
+    monkeypatch.setattr(node_module, 'serialize_msg_for_signing',
+                        lambda *args, **kwargs:
+                        serialized.append(args) or serialize(*args, **kwargs))
+    monkeypatch.setattr(node.clientAuthNr, 'serializeForSig', None)
+
+    Node.verifySignature(node, propagate)
+    assert len(serialized) == 1
+    Node.verifySignature(node, propagate)
+    assert len(serialized) == 2
+    assert node.verifiedReqs.hits == 1
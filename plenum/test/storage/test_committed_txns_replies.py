@@ -0,0 +1,74 @@
+from functools import partial
+from types import SimpleNamespace
+
+from ledger.util import F
+from plenum.client.client import Client
+from plenum.common.types import f
+from plenum.persistence.req_id_to_txn import ReqIdrToTxn
+from plenum.persistence.util import txnsWithMerkleInfo
+from plenum.server.node import Node
+from plenum.server.pool_manager import TxnPoolManager
+from plenum.test.storage.test_state_replay import handler, nym_req  # noqa
+from storage.kv_in_memory import KeyValueStorageInMemory
+
+
+def apply_reqs(handler, frm, to):  # noqa
+    reqs = [nym_req(i, 'nym{}'.format(i)) for i in range(frm, to)]
+    for req in reqs:
+        handler.apply(req, 1500000000)
+    ledger = handler.ledger
+    return reqs, ledger.hashToStr(handler.state.headHash), \
+        ledger.hashToStr(ledger.uncommittedRootHash)
+
+
+def replying_node(waiting):
+    node = SimpleNamespace(seqNoDB=ReqIdrToTxn(KeyValueStorageInMemory()),
+                           isProcessingReq=lambda idr, reqId:
+                           reqId in waiting,
+                           update_txn_with_extra_data=lambda txn: txn,
+                           replies=[])
+    node.sendCommittedReplies = \
+        lambda reqHandler, txns, ppTime: node.replies.extend(txns)
+    for name in ('updateSeqNoMap', 'txnsToReply'):
+        setattr(node, name, partial(getattr(Node, name), node))
+    return node
+
+
+def check_committed(handler, committedTxns, start):  # noqa
+    for seqNo, txn in enumerate(committedTxns, start):
+        assert txn[F.seqNo.name] == seqNo
+        assert F.auditPath.name not in txn
+        assert F.rootHash.name not in txn
+    # Merkle proofs are added when needed
+    for txn in txnsWithMerkleInfo(handler.ledger, committedTxns):
+        assert Client.verifyMerkleProof({f.RESULT.nm: txn})
+
+
+def test_replies_of_committed_txns_have_merkle_proofs(handler):  # noqa
+    node = replying_node(waiting={1, 3})
+    handler.ledger.add({'type': '1', 'identifier': 'genesis', 'reqId': 0})
+    reqs, stateRoot, txnRoot = apply_reqs(handler, 0, 5)
+
+    committedTxns = Node.commitAndSendReplies(node, handler, 1500000000,
+                                              reqs, stateRoot, txnRoot)
+    check_committed(handler, committedTxns, 2)
+    assert [txn[f.REQ_ID.nm] for txn in node.replies] == [1, 3]
+    for txn in node.replies:
+        assert Client.verifyMerkleProof({f.RESULT.nm: txn})
+    for req in reqs:
+        assert node.seqNoDB.get(req.identifier, req.reqId) == req.reqId + 2
+
+
+def test_pool_txns_committed_with_seqnos(handler):  # noqa
+    node = replying_node(waiting={2})
+    changed = []
+    poolManager = SimpleNamespace(reqHandler=handler, node=node,
+                                  onPoolMembershipChange=changed.append)
+    reqs, stateRoot, txnRoot = apply_reqs(handler, 0, 3)
+
+    committedTxns = TxnPoolManager.executePoolTxnBatch(
+        poolManager, 1500000000, reqs, stateRoot, txnRoot)
+    check_committed(handler, committedTxns, 1)
+    assert changed == committedTxns
+    assert [txn[f.REQ_ID.nm] for txn in node.replies] == [2]
+    assert Client.verifyMerkleProof({f.RESULT.nm: node.replies[0]})
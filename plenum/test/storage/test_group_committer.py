@@ -0,0 +1,85 @@
+import time
+from threading import Event
+
+from plenum.server.group_committer import GroupCommitter
+
+
+class Store:
+    def __init__(self, name, synced, blocker=None, fail=False):
+        self.name = name
+        self.synced = synced
+        self.blocker = blocker
+        self.fail = fail
+
+    def sync(self):
+        if self.blocker:
+            self.blocker.wait()
+        if self.fail:
+            raise OSError('disk failed')
+        self.synced.append(self.name)
+
+
+def service_until(committer, count, timeout=5):
+    serviced = 0
+    deadline = time.perf_counter() + timeout
+    while serviced < count and time.perf_counter() < deadline:
+        serviced += committer.service()
+        time.sleep(0.01)
+    return serviced
+
+
+def test_replies_sent_after_stores_synced_in_order():
+    synced = []
+    replies = []
+    unblock = Event()
+    ledger = Store('ledger', synced, blocker=unblock)
+    state = Store('state', synced)
+    committer = GroupCommitter()
+
+    committer.add((ledger, state), lambda: replies.append(1))
+    time.sleep(0.05)
+    assert committer.service() == 0
+    assert replies == []
+
+    # Batches committed while a sync is going on are synced together
+    seqNoDB = Store('seqNoDB', synced)
+    committer.add((ledger, state, seqNoDB), lambda: replies.append(2))
+    committer.add((ledger, state), lambda: replies.append(3))
+    unblock.set()
+    assert service_until(committer, 3) == 3
+    assert replies == [1, 2, 3]
+    assert synced == ['ledger', 'state', 'ledger', 'state', 'seqNoDB']
+    assert committer.syncCount == 2
+    assert len(committer) == 0
+    committer.stop()
+
+
+def test_stop_syncs_pending_batches():
+    synced = []
+    replies = []
+    committer = GroupCommitter()
+    store = Store('ledger', synced)
+    for i in range(5):
+        committer.add((store,), lambda i=i: replies.append(i))
+    committer.stop()
+    assert synced
+    assert committer.service() == 5
+    assert replies == list(range(5))
+
+    # Can be used after being stopped
+    committer.add((store,), lambda: replies.append(5))
+    assert service_until(committer, 1) == 1
+    committer.stop()
+
+
+def test_batch_released_when_sync_fails():
+    synced = []
+    replies = []
+    committer = GroupCommitter()
+    committer.add((Store('ledger', synced, fail=True),
+                   Store('state', synced)),
+                  lambda: replies.append(1))
+    assert service_until(committer, 1) == 1
+    assert replies == [1]
+    assert synced == ['state']
+    committer.stop()
@@ -0,0 +1,291 @@
+import json
+import os
+import tarfile
+from functools import partial
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+
+from ledger.compact_merkle_tree import CompactMerkleTree
+from ledger.hash_stores.file_hash_store import FileHashStore
+from plenum.common.constants import DOMAIN_LEDGER_ID
+from plenum.common.exceptions import SnapshotVerificationFailed
+from plenum.common.ledger import Ledger
+from plenum.common.messages.node_messages import ConsistencyProof
+from plenum.persistence.req_id_to_txn import ReqIdrToTxn
+from plenum.server.domain_req_handler import DomainRequestHandler
+from plenum.server.ledger_snapshot import SnapshotWriter, exportSnapshot, \
+    importSnapshot, readManifest
+from plenum.server.node import Node
+from plenum.server.quorums import Quorums
+from plenum.test.storage.test_state_replay import apply_batch, handler  # noqa
+from state.pruning_state import PruningState
+from storage.kv_in_memory import KeyValueStorageInMemory
+
+LEDGER_ID = 1
+META = {b'\x00meta': b'value'}
+
+
+def create_ledger(dataDir):
+    os.makedirs(dataDir, exist_ok=True)
+    return Ledger(CompactMerkleTree(hashStore=FileHashStore(dataDir=dataDir)),
+                  dataDir=dataDir)
+
+
+def txn(i):
+    return {'type': '1', 'dest': 'nym{}'.format(i), 'reqId': i}
+
+
+def add_txns(ledger, frm, to):
+    for i in range(frm, to):
+        ledger.add(txn(i))
+
+
+def create_state(seqNo):
+    state = PruningState(KeyValueStorageInMemory())
+    for i in range(seqNo):
+        state.set('key{}'.format(i).encode(), str(i).encode())
+    state.commit(seqNo=seqNo, meta=META)
+    return state
+
+
+def rewrite_snapshot(path, tampered, change):
+    # Writes the members of the snapshot in the same order, with the data
+    # of a member changed by `change`
+    with tarfile.open(path, 'r:gz') as src, \
+            tarfile.open(tampered, 'w:gz') as dst:
+        for member in src.getmembers():
+            data = change(member.name, src.extractfile(member).read())
+            info = tarfile.TarInfo(member.name)
+            info.size = len(data)
+            dst.addfile(info, BytesIO(data))
+
+
+@pytest.fixture()
+def snapshot(tdir_for_func):
+    ledger = create_ledger(os.path.join(tdir_for_func, 'source'))
+    add_txns(ledger, 0, 37)
+    state = create_state(37)
+    path = os.path.join(tdir_for_func, 'snapshot.tar.gz')
+    exportSnapshot(path, {LEDGER_ID: ledger}, {LEDGER_ID: state},
+                   {LEDGER_ID: list(META)})
+    yield path, ledger, state
+    ledger.stop()
+
+
+def test_import_snapshot(snapshot, tdir_for_func):
+    path, source, sourceState = snapshot
+    ledger = create_ledger(os.path.join(tdir_for_func, 'target'))
+    # Transactions the ledger has, like genesis ones, are kept
+    add_txns(ledger, 0, 3)
+    state = create_state(3)
+
+    assert importSnapshot(path, {LEDGER_ID: ledger}, {LEDGER_ID: state}) == \
+        {LEDGER_ID: 37}
+    assert ledger.size == source.size
+    assert ledger.root_hash == source.root_hash
+    assert list(ledger.getAllTxn()) == list(source.getAllTxn())
+    assert ledger.merkleInfo(20) == source.merkleInfo(20)
+    assert state.committedHeadHash == sourceState.committedHeadHash
+    assert state.committedSeqNo == 37
+    assert state.getCommittedMeta(b'\x00meta') == b'value'
+    assert state.get(b'key36') == b'36'
+
+    # The ledger goes on from the snapshot
+    add_txns(ledger, 37, 40)
+    add_txns(source, 37, 40)
+    assert ledger.root_hash == source.root_hash
+
+    # The imported ledger is recovered like any other when restarted
+    ledger.stop()
+    ledger = create_ledger(os.path.join(tdir_for_func, 'target'))
+    assert ledger.root_hash == source.root_hash
+    ledger.stop()
+
+
+def test_snapshot_of_other_transactions_not_imported(snapshot,
+                                                     tdir_for_func):
+    path, _, _ = snapshot
+    ledger = create_ledger(os.path.join(tdir_for_func, 'target'))
+    ledger.add(txn(100))
+    rootHash = ledger.root_hash
+    with pytest.raises(SnapshotVerificationFailed):
+        importSnapshot(path, {LEDGER_ID: ledger})
+    assert ledger.size == 1
+    assert ledger.root_hash == rootHash
+    ledger.stop()
+
+
+def test_snapshot_not_matching_manifest_not_imported(snapshot,
+                                                     tdir_for_func):
+    path, _, _ = snapshot
+    manifest = readManifest(path)
+    manifest['ledgers'][str(LEDGER_ID)]['size'] = 36
+    tampered = os.path.join(tdir_for_func, 'tampered.tar.gz')
+    rewrite_snapshot(path, tampered,
+                     lambda name, data: json.dumps(manifest).encode()
+                     if name == 'manifest.json' else data)
+
+    ledger = create_ledger(os.path.join(tdir_for_func, 'target'))
+    state = create_state(0)
+    with pytest.raises(SnapshotVerificationFailed):
+        importSnapshot(tampered, {LEDGER_ID: ledger}, {LEDGER_ID: state})
+    assert ledger.size == 0
+    assert state.isEmpty
+    ledger.stop()
+
+
+def test_snapshot_with_changed_state_not_imported(snapshot, tdir_for_func):
+    path, _, _ = snapshot
+    tampered = os.path.join(tdir_for_func, 'tampered.tar.gz')
+    rewrite_snapshot(path, tampered,
+                     lambda name, data: data[:-1] + b'\x00'
+                     if name.startswith('state/') else data)
+
+    ledger = create_ledger(os.path.join(tdir_for_func, 'target'))
+    add_txns(ledger, 0, 3)
+    rootHash = ledger.root_hash
+    state = create_state(3)
+    with pytest.raises(SnapshotVerificationFailed):
+        importSnapshot(tampered, {LEDGER_ID: ledger}, {LEDGER_ID: state})
+    # Nothing imported is left, the ledger is left with its genesis txns
+    # which it has none of here
+    assert ledger.size == 0
+    assert ledger.root_hash != rootHash
+    assert state.isEmpty
+    assert state.committedSeqNo is None
+    ledger.stop()
+
+
+def test_snapshot_written_in_slices(snapshot, tdir_for_func):
+    path, source, state = snapshot
+    sliced = os.path.join(tdir_for_func, 'sliced.tar.gz')
+    writer = SnapshotWriter(sliced, {LEDGER_ID: source}, {LEDGER_ID: state},
+                            {LEDGER_ID: list(META)}, chunkSize=5)
+    # Txns added while the snapshot is written are not part of it
+    add_txns(source, 37, 40)
+    slices = 1
+    while not writer.write(0):
+        assert not os.path.exists(sliced)
+        slices += 1
+    assert slices > 10
+    assert readManifest(sliced) == readManifest(path)
+
+    ledger = create_ledger(os.path.join(tdir_for_func, 'target'))
+    imported = create_state(0)
+    assert importSnapshot(sliced, {LEDGER_ID: ledger},
+                          {LEDGER_ID: imported}) == {LEDGER_ID: 37}
+    assert ledger.root_hash == readManifest(path)['ledgers'][
+        str(LEDGER_ID)]['rootHash']
+    assert imported.committedHeadHash == state.committedHeadHash
+    ledger.stop()
+
+
+def test_aborted_snapshot_removed(snapshot, tdir_for_func):
+    _, source, state = snapshot
+    path = os.path.join(tdir_for_func, 'aborted.tar.gz')
+    writer = SnapshotWriter(path, {LEDGER_ID: source}, {LEDGER_ID: state},
+                            chunkSize=5)
+    assert not writer.write(0)
+    assert os.path.exists(path + '.tmp')
+    writer.abort()
+    assert not os.path.exists(path + '.tmp')
+    assert not os.path.exists(path)
+
+
+def test_state_not_at_ledger_size_not_written(snapshot, tdir_for_func):
+    _, source, _ = snapshot
+    with pytest.raises(ValueError):
+        SnapshotWriter(os.path.join(tdir_for_func, 'other.tar.gz'),
+                       {LEDGER_ID: source}, {LEDGER_ID: create_state(36)})
+
+
+def bootstrapping_node(size=37, rootHash='root'):
+    node = SimpleNamespace(bootstrapSnapshot={'size': size,
+                                              'rootHash': rootHash},
+                           _snapshotRoots={}, quorums=Quorums(4),
+                           imported=[], dropped=[])
+    node.importBootstrapSnapshot = lambda: node.imported.append(True)
+    node.dropBootstrapSnapshot = node.dropped.append
+    return node
+
+
+def test_snapshot_imported_once_f_plus_1_nodes_sent_its_root():
+    node = bootstrapping_node()
+    Node.processSnapshotRoot(node, 'root', 'Alpha')
+    Node.processSnapshotRoot(node, 'other', 'Beta')
+    assert not node.imported
+    Node.processSnapshotRoot(node, 'root', 'Gamma')
+    assert node.imported
+    assert not node.dropped
+
+
+def test_snapshot_dropped_once_f_plus_1_nodes_sent_other_root():
+    node = bootstrapping_node()
+    Node.processSnapshotRoot(node, 'other', 'Alpha')
+    # A node sending again is counted once
+    Node.processSnapshotRoot(node, 'other', 'Alpha')
+    assert not node.dropped
+    Node.processSnapshotRoot(node, 'other', 'Beta')
+    assert node.dropped
+    assert not node.imported
+
+
+def test_consistency_proof_to_snapshot_size_taken_as_root(snapshot):
+    _, source, _ = snapshot
+    node = bootstrapping_node(rootHash=source.root_hash)
+    node.processSnapshotRoot = partial(Node.processSnapshotRoot, node)
+    node.ledgerManager = SimpleNamespace(processed=[])
+    node.ledgerManager.processConsistencyProof = \
+        lambda proof, frm: node.ledgerManager.processed.append(proof)
+
+    def proof(start, end):
+        return ConsistencyProof(DOMAIN_LEDGER_ID, start, end, 0, 0,
+                                source.root_hash, source.root_hash, [])
+
+    Node.processConsistencyProof(node, proof(37, 37), 'Alpha')
+    Node.processConsistencyProof(node, proof(37, 40), 'Beta')
+    assert node._snapshotRoots == {'Alpha': source.root_hash}
+    assert node.ledgerManager.processed == [proof(37, 40)]
+
+
+def test_imported_snapshot_txns_recorded(handler, tdir_for_func):  # noqa
+    apply_batch(handler, 0, 25)
+    path = os.path.join(tdir_for_func, 'snapshot.tar.gz')
+    exportSnapshot(path, {DOMAIN_LEDGER_ID: handler.ledger},
+                   {DOMAIN_LEDGER_ID: handler.state},
+                   {DOMAIN_LEDGER_ID: DomainRequestHandler.committedMetaKeys})
+
+    ledger = create_ledger(os.path.join(tdir_for_func, 'target'))
+    state = PruningState(KeyValueStorageInMemory())
+    added = []
+    node = SimpleNamespace(
+        config=SimpleNamespace(BootstrapSnapshot=path,
+                               StateReplayBatchSize=4),
+        bootstrapSnapshot=readManifest(path)['ledgers'][
+            str(DOMAIN_LEDGER_ID)],
+        _snapshotRoots={},
+        domainLedger=ledger,
+        states={DOMAIN_LEDGER_ID: state},
+        reqHandler=DomainRequestHandler(ledger, state, []),
+        seqNoDB=ReqIdrToTxn(KeyValueStorageInMemory()),
+        update_txn_with_extra_data=lambda txn: txn,
+        _applyTxnsToState=Node._applyTxnsToState,
+        post_txn_from_catchup_added_to_domain_ledger=added.append,
+        synced=[])
+    for name in ('updateSeqNoMap', 'addImportedTxns', 'initDomainState',
+                 'initStateFromLedger'):
+        setattr(node, name, partial(getattr(Node, name), node))
+    node.start_domain_ledger_sync = lambda: node.synced.append(True)
+
+    Node.importBootstrapSnapshot(node)
+    assert node.bootstrapSnapshot is None
+    assert node.synced
+    assert ledger.root_hash == handler.ledger.root_hash
+    assert state.committedHeadHash == handler.state.committedHeadHash
+    assert node.reqHandler.countStewards() == handler.countStewards()
+    assert [t['reqId'] for t in added] == list(range(25))
+    for seqNo, t in handler.ledger.getAllTxn():
+        assert node.seqNoDB.get(t['identifier'], t['reqId']) == seqNo
+    ledger.stop()
@@ -0,0 +1,163 @@
+import os
+from functools import partial
+from types import SimpleNamespace
+
+import pytest
+
+from ledger.compact_merkle_tree import CompactMerkleTree
+from ledger.hash_stores.file_hash_store import FileHashStore
+from plenum.common.constants import DOMAIN_LEDGER_ID, NYM, ROLE, STEWARD, \
+    TARGET_NYM, TXN_TYPE
+from plenum.common.ledger import Ledger
+from plenum.common.request import Request
+from plenum.server.domain_req_handler import DomainRequestHandler
+from plenum.server.node import Node
+from state.pruning_state import PruningState
+from storage.kv_in_memory import KeyValueStorageInMemory
+
+
+def nym_req(reqId, nym, role=None):
+    operation = {TXN_TYPE: NYM, TARGET_NYM: nym}
+    if role is not None:
+        operation[ROLE] = role
+    return Request('trustee', reqId, operation)
+
+
+def apply_batch(handler, frm, to):
+    ledger = handler.ledger
+    for i in range(frm, to):
+        # Nyms are updated by later txns
+        handler.apply(nym_req(i, 'nym{}'.format(i % 7),
+                              STEWARD if i % 3 else None), 1500000000)
+    handler.commit(len(ledger.uncommittedTxns),
+                   ledger.hashToStr(handler.state.headHash),
+                   ledger.hashToStr(ledger.uncommittedRootHash))
+
+
+def copy_kv(kv):
+    copied = KeyValueStorageInMemory()
+    copied._dict = dict(kv._dict)
+    return copied
+
+
+def init_state(state, ledger, replayBatchSize=4, reqHandler=None):
+    # Initializes the state like a node starting, returns the seqNos of the
+    # ledger txns read
+    scanned = []
+    getAllTxn = ledger.getAllTxn
+
+    def scan(frm=None, to=None):
+        for seqNo, txn in getAllTxn(frm, to):
+            scanned.append(seqNo)
+            yield seqNo, txn
+
+    node = SimpleNamespace(
+        config=SimpleNamespace(StateReplayBatchSize=replayBatchSize),
+        update_txn_with_extra_data=lambda txn: txn,
+        _applyTxnsToState=Node._applyTxnsToState,
+        states={DOMAIN_LEDGER_ID: state},
+        domainLedger=ledger,
+        reqHandler=reqHandler or DomainRequestHandler(ledger, state, []))
+    node.initStateFromLedger = partial(Node.initStateFromLedger, node)
+    ledger.getAllTxn = scan
+    try:
+        Node.initDomainState(node)
+    finally:
+        ledger.getAllTxn = getAllTxn
+    return scanned
+
+
+@pytest.fixture()
+def handler(tdir_for_func):
+    dataDir = os.path.join(tdir_for_func, 'ledger')
+    os.makedirs(dataDir)
+    ledger = Ledger(CompactMerkleTree(hashStore=FileHashStore(
+        dataDir=dataDir)), dataDir=dataDir)
+    yield DomainRequestHandler(ledger,
+                               PruningState(KeyValueStorageInMemory()), [])
+    ledger.stop()
+
+
+def test_only_ledger_tail_applied(handler):
+    apply_batch(handler, 0, 10)
+    assert handler.state.committedSeqNo == 10
+    behind = copy_kv(handler.state._kv)
+    apply_batch(handler, 10, 25)
+
+    state = PruningState(behind)
+    assert state.committedSeqNo == 10
+    assert init_state(state, handler.ledger) == list(range(11, 26))
+    assert state.committedSeqNo == 25
+    assert state.committedHeadHash == handler.state.committedHeadHash
+
+    # An up to date state is not changed
+    assert init_state(state, handler.ledger) == []
+
+
+def test_empty_state_rebuilt(handler):
+    apply_batch(handler, 0, 15)
+    state = PruningState(KeyValueStorageInMemory())
+    assert init_state(state, handler.ledger) == list(range(1, 16))
+    assert state.committedHeadHash == handler.state.committedHeadHash
+    assert state.committedSeqNo == 15
+
+
+def test_state_with_unknown_seq_no_not_changed(handler):
+    apply_batch(handler, 0, 10)
+    state = PruningState(copy_kv(handler.state._kv))
+    state.commit(state.headHash)
+    assert state.committedSeqNo is None
+    apply_batch(handler, 10, 12)
+    assert init_state(state, handler.ledger) == []
+
+
+def test_reset_state_rebuilt(handler):
+    # Like the state of a node importing a snapshot without its state
+    apply_batch(handler, 0, 10)
+    state = PruningState(copy_kv(handler.state._kv))
+    apply_batch(handler, 10, 15)
+    state.reset()
+    assert state.committedSeqNo is None
+    assert init_state(state, handler.ledger) == list(range(1, 16))
+    assert state.committedHeadHash == handler.state.committedHeadHash
+
+
+def test_role_counts_restored_without_reading_ledger(handler):
+    apply_batch(handler, 0, 10)
+    behind = copy_kv(handler.state._kv)
+    apply_batch(handler, 10, 25)
+    stewards = handler.countStewards()
+
+    # Only the txns after the committed state are read on start
+    state = PruningState(behind)
+    restarted = DomainRequestHandler(handler.ledger, state, [])
+    assert init_state(state, handler.ledger,
+                      reqHandler=restarted) == list(range(11, 26))
+    assert restarted.countStewards() == stewards
+    assert restarted.countStewards(isCommitted=False) == stewards
+
+    restarted = DomainRequestHandler(handler.ledger, state, [])
+    assert init_state(state, handler.ledger, reqHandler=restarted) == []
+    assert restarted.countStewards() == stewards
+
+
+def test_role_counts_of_state_without_them_counted_once(handler):
+    # Like a state committed before role counts were kept with it
+    apply_batch(handler, 0, 10)
+    behind = copy_kv(handler.state._kv)
+    behind.remove(DomainRequestHandler.roleCountsKey)
+    stewards = handler.countStewards()
+    apply_batch(handler, 10, 25)
+
+    state = PruningState(behind)
+    restarted = DomainRequestHandler(handler.ledger, state, [])
+    assert init_state(state, handler.ledger, reqHandler=restarted) == \
+        list(range(1, 11)) + list(range(11, 26))
+    assert restarted.countStewards() == handler.countStewards()
+    assert state.committedHeadHash == handler.state.committedHeadHash
+
+    restarted = DomainRequestHandler(handler.ledger, PruningState(behind), [])
+    assert init_state(restarted.state, handler.ledger,
+                      reqHandler=restarted) == []
+    assert restarted.countStewards() == handler.countStewards()
+    assert stewards != handler.countStewards()
@@ -45,6 +45,7 @@ from plenum.test.test_stack import StackedTester, getTestableStack, CONNECTED, \
 from plenum.test.testable import spyable
 from plenum.test import waits
 from plenum.common.messages.node_message_factory import node_message_factory
+from plenum.server.replica_process import ReplicaProcess
 from plenum.server.replicas import Replicas
 
 logger = getlogger()
@@ -373,8 +374,17 @@ class TestReplica(replica.Replica):
             Stasher(self.outBox, "replicaOutBoxTestStasher~" + self.name)
 
 
+class TestReplicaProcess(ReplicaProcess):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.outBoxTestStasher = \
+            Stasher(self.outBox, "replicaOutBoxTestStasher~" + self.name)
+
+
 class TestReplicas(Replicas):
     def _new_replica(self, instance_id: int, is_master: bool):
+        if not is_master and self._node.config.BackupReplicasInProcesses:
+            return TestReplicaProcess(self._node, instance_id)
         return TestReplica(self._node, instance_id, is_master)
 
 
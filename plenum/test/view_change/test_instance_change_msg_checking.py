@@ -23,7 +23,7 @@ def testInstanceChangeMsgTypeChecking(nodeSet, looper, up):
         goodViewNo = 1
         badViewNo = "BAD"
         icMsg = nodeSet.Alpha._create_instance_change_msg(goodViewNo, 0)
-        icMsg._fields["viewNo"] = badViewNo
+        icMsg.viewNo = badViewNo
         return icMsg
 
     icMsg = createInstanceChangeMessage()
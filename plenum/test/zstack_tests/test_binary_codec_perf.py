@@ -0,0 +1,61 @@
+import time
+
+import base58
+
+from plenum.common.constants import DOMAIN_LEDGER_ID
+from plenum.common.messages.node_messages import PrePrepare, Prepare, \
+    Commit, Batch
+from stp_zmq.zstack import ZStack
+
+MSG_COUNT = 10000
+BATCH_SIZE = 100
+
+root = base58.b58encode(b'a' * 32)
+ts = 1500000000
+messages = (
+    PrePrepare(0, 1, 2, ts,
+               [('4AdS22kC7xzb4bcqg9JATuCfAMNcQYcZa1u5eWzs6cSJ', 1500000001)],
+               1, 'digest', DOMAIN_LEDGER_ID, root, root),
+    Prepare(0, 1, 2, ts, 'digest', root, root),
+    Commit(0, 1, 2),
+)
+codecs = {
+    'json': ZStack.serializeMsg,
+    'msgpack': ZStack.serializeBinaryMsg,
+}
+
+
+def decode_time(serialized, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        ZStack.deserializeMsg(serialized)
+    return (time.perf_counter() - start) / count
+
+
+def decode_batch_time(serialized_batch, count):
+    # Members of a batch are decoded after the batch itself, like
+    # `Node.unpackNodeMsg` does
+    start = time.perf_counter()
+    for _ in range(count):
+        batch = ZStack.deserializeMsg(serialized_batch)
+        for m in batch['messages']:
+            ZStack.deserializeMsg(m)
+    return (time.perf_counter() - start) / (count * BATCH_SIZE)
+
+
+def testMeasureWireSizeAndDecodeTimeOf3PCMessages():
+    for msg in messages:
+        sizes = {}
+        for name, serialize in codecs.items():
+            serialized = serialize(msg._asdict())
+            sizes[name] = len(serialized)
+            batch = Batch([serialized] * BATCH_SIZE, None)
+            serialized_batch = serialize(batch._asdict())
+            print("{} with {}: {} bytes, {:.2f} us to decode, "
+                  "{:.2f} bytes and {:.2f} us to decode in a batch".
+                  format(msg.typename, name, len(serialized),
+                         decode_time(serialized, MSG_COUNT) * 1e6,
+                         len(serialized_batch) / BATCH_SIZE,
+                         decode_batch_time(serialized_batch,
+                                           MSG_COUNT // BATCH_SIZE) * 1e6))
+        assert sizes['msgpack'] < sizes['json']
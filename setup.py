@@ -67,7 +67,8 @@ setup(
                       'psutil', 'intervaltree', 'msgpack-python==0.4.6'],
     extras_require={
         'stats': ['python-firebase'],
-        'benchmark': ['pympler']
+        'benchmark': ['pympler'],
+        'rocksdb': ['python-rocksdb']
                     },
     setup_requires=['pytest-runner'],
     tests_require=['pytest', 'pytest-xdist'],
@@ -77,7 +78,7 @@ setup(
              'scripts/gen_steward_key', 'scripts/gen_node',
              'scripts/export-gen-txns', 'scripts/get_keys',
              'scripts/udp_sender', 'scripts/udp_receiver', 'scripts/filter_log',
-             'scripts/log_stats']
+             'scripts/log_stats', 'scripts/export_ledger_snapshot']
 )
 
 if not os.path.exists(CONFIG_FILE):
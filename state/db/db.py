@@ -2,6 +2,9 @@ from abc import abstractmethod
 
 
 class BaseDB:
+    # If the reference counts of nodes are kept, otherwise `dec_refcount`
+    # does nothing
+    counts_references = True
 
     @abstractmethod
     def inc_refcount(self, key, value):
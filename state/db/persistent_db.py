@@ -3,6 +3,8 @@ from storage.kv_store import KeyValueStorage
 
 
 class PersistentDB(BaseDB):
+    counts_references = False
+
     def __init__(self, keyValueStorage: KeyValueStorage):
         self._keyValueStorage = keyValueStorage
 
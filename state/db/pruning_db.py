@@ -0,0 +1,234 @@
+import struct
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import rlp
+from state.db.write_back_db import WriteBackDB, node_refs
+from state.trie.pruning_trie import BLANK_ROOT
+from storage.kv_store import KeyValueStorage
+
+
+class PruningDB(WriteBackDB):
+    """
+    Database of trie nodes which deletes the nodes no longer reachable from
+    the last `retainedRoots` committed roots.
+
+    The store keeps a reference count for each node: the number of nodes in
+    the store referring to it plus the number of retained roots it is. The
+    counts are changed when a root is committed, with the nodes written for
+    it, so nodes of batches which are reverted are never counted. A node
+    whose count drops to zero is dead, dead nodes are deleted by `compact`
+    in bounded time slices; deleting a node decreases the counts of its
+    children, which may become dead in turn.
+
+    A node is deleted before the counts of its children are decreased, so a
+    crash at any point can only leave nodes in the store, never delete a
+    live node.
+    """
+
+    rootsKey = b'\x00pruning:roots'
+    deadRangeKey = b'\x00pruning:deadRange'
+    deadPrefix = b'\x00pruning:dead:'
+    refcountPrefix = b'\x00pruning:refcount:'
+
+    def __init__(self, keyValueStorage: KeyValueStorage, rootHash: bytes,
+                 retainedRoots: int):
+        """
+        :param rootHash: the committed root of the trie
+        :param retainedRoots: number of last committed roots whose nodes
+        are kept, at least 1
+        """
+        if retainedRoots < 1:
+            raise ValueError('At least the committed root must be retained')
+        super().__init__(keyValueStorage)
+        self.retainedRoots = retainedRoots
+        # Records of dead nodes by their numbers, in the order the nodes
+        # died
+        self._dead = deque()  # type: deque[Tuple[int, List[bytes]]]
+        if self.rootsKey in self._keyValueStorage:
+            self._roots_committed = self._split_hashes(
+                self._keyValueStorage.get(self.rootsKey))
+            first, self._next_dead = struct.unpack(
+                '>QQ', bytes(self._keyValueStorage.get(self.deadRangeKey)))
+            for num in range(first, self._next_dead):
+                try:
+                    keys = self._keyValueStorage.get(self._dead_key(num))
+                except KeyError:
+                    continue
+                self._dead.append((num, self._split_hashes(keys)))
+        else:
+            self._init_refcounts(bytes(rootHash))
+
+    @property
+    def deadCount(self) -> int:
+        """
+        Number of nodes waiting to be deleted
+        """
+        return sum(len(keys) for _, keys in self._dead)
+
+    def _commit_batch(self, root_hash: bytes, extra: Iterable[Tuple]):
+        counts = {}  # type: Dict[bytes, int]
+        batch = []
+        # Only references from the nodes written are counted, nodes already
+        # in the store have their children counted
+        stack = [root_hash]
+        while stack:
+            ref = stack.pop()
+            if ref in self._dirty and self._refcount(ref, {}) is None:
+                encoded = self._dirty.pop(ref)[1]
+                batch.append((ref, encoded))
+                for child in node_refs(rlp.decode(encoded)):
+                    self._add_reference(child, 1, counts)
+                    stack.append(child)
+
+        died = []
+        self._add_reference(root_hash, 1, counts)
+        self._roots_committed.append(root_hash)
+        while len(self._roots_committed) > self.retainedRoots:
+            old = self._roots_committed.pop(0)
+            if self._add_reference(old, -1, counts) == 0:
+                died.append(old)
+
+        batch.extend((self._refcount_key(k), self._encode_count(c))
+                     for k, c in counts.items())
+        batch.append((self.rootsKey, b''.join(self._roots_committed)))
+        batch.extend(self._dead_records(died))
+        batch.extend(extra)
+        return batch
+
+    def compact(self, timeLimit: float) -> int:
+        """
+        Delete dead nodes for at most about `timeLimit` seconds
+
+        :return: the number of nodes deleted
+        """
+        deadline = time.perf_counter() + timeLimit
+        counts = {}  # type: Dict[bytes, int]
+        died = []
+        changed = set()
+        done = []
+        deleted = 0
+        while self._dead and time.perf_counter() < deadline:
+            num, keys = self._dead[0]
+            changed.add(num)
+            while keys and time.perf_counter() < deadline:
+                if self._delete_if_dead(keys.pop(), counts, died):
+                    deleted += 1
+            if not keys:
+                self._dead.popleft()
+                done.append(num)
+
+        if not changed:
+            return deleted
+        batch = [(self._refcount_key(k), self._encode_count(c))
+                 for k, c in counts.items()]
+        batch.extend((self._dead_key(num), b''.join(keys))
+                     for num, keys in self._dead if num in changed)
+        batch.extend(self._dead_records(died))
+        self._keyValueStorage.setBatch(batch)
+        for num in done:
+            self._keyValueStorage.remove(self._dead_key(num))
+        return deleted
+
+    def _delete_if_dead(self, key: bytes, counts: Dict[bytes, int],
+                        died: List[bytes]) -> bool:
+        # A dead node may have been referred to again by a committed root,
+        # or already deleted if it died twice
+        if self._refcount(key, counts) != 0:
+            return False
+        encoded = self._keyValueStorage.get(key)
+        self._keyValueStorage.remove(key)
+        self._keyValueStorage.remove(self._refcount_key(key))
+        counts.pop(key, None)
+        for child in node_refs(rlp.decode(encoded)):
+            if self._add_reference(child, -1, counts) == 0:
+                died.append(child)
+        return True
+
+    def _dead_records(self, died: List[bytes]):
+        # Newly dead nodes are a record after the ones of `_dead`, the range
+        # of the records is always written with them
+        if died:
+            self._dead.append((self._next_dead, died))
+            yield self._dead_key(self._next_dead), b''.join(died)
+            self._next_dead += 1
+        first = self._dead[0][0] if self._dead else self._next_dead
+        yield self.deadRangeKey, struct.pack('>QQ', first, self._next_dead)
+
+    def _add_reference(self, key: bytes, delta: int,
+                       counts: Dict[bytes, int]) -> Optional[int]:
+        if key == BLANK_ROOT:
+            return None
+        count = self._refcount(key, counts)
+        if count is None:
+            # Every node a stored node refers to is stored too, it is being
+            # written when it has no count
+            count = 0
+        counts[key] = count + delta
+        return counts[key]
+
+    def _refcount(self, key: bytes, counts: Dict[bytes, int]) -> Optional[int]:
+        """
+        The reference count of a node, the changes not written yet are in
+        `counts`, None if the node is not in the store
+        """
+        if key in counts:
+            return counts[key]
+        try:
+            return struct.unpack(
+                '>Q', bytes(self._keyValueStorage.get(
+                    self._refcount_key(key))))[0]
+        except KeyError:
+            return None
+
+    def _init_refcounts(self, rootHash: bytes):
+        """
+        Count the references to the nodes of a store which was not pruned,
+        nodes which are not the committed root and not referred to by other
+        nodes are dead
+        """
+        stale = []
+        counts = {}  # type: Dict[bytes, int]
+        for key in self._keyValueStorage.iterator(include_value=False):
+            key = bytes(key)
+            if key.startswith(self.refcountPrefix) or \
+                    key.startswith(self.deadPrefix):
+                stale.append(key)
+            elif len(key) == 32:
+                counts[key] = 0
+        for key in stale:
+            self._keyValueStorage.remove(key)
+        for key, encoded in self._keyValueStorage.iterator():
+            if bytes(key) in counts:
+                for child in node_refs(rlp.decode(bytes(encoded))):
+                    if child in counts:
+                        counts[child] += 1
+        if rootHash in counts:
+            counts[rootHash] += 1
+
+        self._roots_committed = [rootHash]
+        self._next_dead = 0
+        batch = [(self._refcount_key(k), self._encode_count(c))
+                 for k, c in counts.items()]
+        batch.extend(self._dead_records(
+            [k for k, c in counts.items() if c == 0]))
+        batch.append((self.rootsKey, rootHash))
+        self._keyValueStorage.setBatch(batch)
+
+    @classmethod
+    def _refcount_key(cls, key: bytes) -> bytes:
+        return cls.refcountPrefix + key
+
+    @classmethod
+    def _dead_key(cls, num: int) -> bytes:
+        return cls.deadPrefix + struct.pack('>Q', num)
+
+    @staticmethod
+    def _encode_count(count: int) -> bytes:
+        return struct.pack('>Q', count)
+
+    @staticmethod
+    def _split_hashes(data) -> List[bytes]:
+        data = bytes(data)
+        return [data[i:i + 32] for i in range(0, len(data), 32)]
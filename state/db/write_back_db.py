@@ -0,0 +1,126 @@
+from typing import Dict, Iterable, Tuple
+
+import rlp
+from state.db.db import BaseDB
+from state.trie.pruning_trie import NIBBLE_TERMINATOR, unpack_to_nibbles
+from storage.kv_store import KeyValueStorage
+
+
+class WriteBackDB(BaseDB):
+    """
+    Database of trie nodes keeping the nodes written by updates in memory,
+    the nodes reachable from a root are written to the store at once when
+    the root is committed. Most of the nodes written by updates are replaced
+    by later updates of the same batch and are never written to the store.
+
+    Nodes are numbered in the order they are written. The number of the
+    last written node is remembered for each root read as the head of the
+    trie: when the root is committed, the nodes written before it which are
+    not reachable from it are not reachable from any later head either, so
+    they are dropped.
+    """
+
+    counts_references = False
+
+    def __init__(self, keyValueStorage: KeyValueStorage):
+        self._keyValueStorage = keyValueStorage
+        # Nodes not written to the store yet, with their numbers
+        self._dirty = {}  # type: Dict[bytes, Tuple[int, bytes]]
+        self._roots = {}  # type: Dict[bytes, int]
+        self._written = 0
+
+    def get(self, key: bytes) -> bytes:
+        # Stores like LevelDB give byte arrays, which are not hashable
+        dirty = self._dirty.get(bytes(key))
+        if dirty is not None:
+            return dirty[1]
+        return self._keyValueStorage.get(key)
+
+    def _has_key(self, key: bytes):
+        try:
+            self.get(key)
+            return True
+        except KeyError:
+            return False
+
+    def __contains__(self, key):
+        return self._has_key(key)
+
+    def __len__(self):
+        return len(self._dirty)
+
+    def inc_refcount(self, key, value):
+        self._written += 1
+        self._dirty[key] = (self._written, value)
+
+    def dec_refcount(self, key):
+        pass
+
+    def mark_root(self, root_hash: bytes):
+        """
+        Remember that `root_hash` is a head of the trie, which can be
+        committed later
+        """
+        self._roots[bytes(root_hash)] = self._written
+
+    def commit(self, root_hash: bytes, extra: Iterable[Tuple] = ()):
+        """
+        Write the nodes reachable from `root_hash` not in the store yet, and
+        the `extra` entries, in one batch
+        """
+        root_hash = bytes(root_hash)
+        self._keyValueStorage.setBatch(self._commit_batch(root_hash, extra))
+
+        written = self._roots.get(root_hash)
+        if written is not None:
+            self._dirty = {k: v for k, v in self._dirty.items()
+                           if v[0] > written}
+            self._roots = {k: v for k, v in self._roots.items()
+                           if v > written}
+
+    def _commit_batch(self, root_hash: bytes, extra: Iterable[Tuple]):
+        batch = list(self._reachable_dirty(root_hash))
+        batch.extend(extra)
+        return batch
+
+    def discard(self):
+        """
+        Drop the nodes not in the store, when the trie is reverted to its
+        committed root
+        """
+        self._dirty = {}
+        self._roots = {}
+
+    def _reachable_dirty(self, root_hash: bytes):
+        # Nodes in the store only refer to nodes in the store
+        stack = [root_hash]
+        while stack:
+            ref = stack.pop()
+            if ref in self._dirty:
+                encoded = self._dirty.pop(ref)[1]
+                yield ref, encoded
+                stack.extend(node_refs(rlp.decode(encoded)))
+
+
+def node_refs(node):
+    """
+    Yield the hashes of the nodes a trie node refers to, including the ones
+    referred to by the nodes embedded in it
+    """
+    stack = [node]
+    while stack:
+        ref = stack.pop()
+        if isinstance(ref, list):
+            node = ref
+        elif len(ref) == 32:
+            yield bytes(ref)
+            continue
+        else:
+            continue
+        if len(node) == 17:
+            stack.extend(node[:16])
+        elif len(node) == 2:
+            nibbles = unpack_to_nibbles(node[0])
+            if not nibbles or nibbles[-1] != NIBBLE_TERMINATOR:
+                # Extension node
+                stack.append(node[1])
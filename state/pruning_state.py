@@ -1,13 +1,17 @@
-from binascii import unhexlify
-from typing import Optional
+from binascii import hexlify, unhexlify
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
+import rlp
 from state.db.persistent_db import PersistentDB
+from state.db.pruning_db import PruningDB
+from state.db.write_back_db import WriteBackDB, node_refs
+from state.trie.node_cache import TrieNodeCache
 from state.state import State
 from state.trie.pruning_trie import BLANK_ROOT, Trie, BLANK_NODE, \
     bin_to_nibbles
 from state.util.fast_rlp import encode_optimized as rlp_encode, \
     decode_optimized as rlp_decode
-from state.util.utils import to_string, isHex
+from state.util.utils import to_string, isHex, sha3
 from storage.kv_in_memory import KeyValueStorageInMemory
 from storage.kv_store import KeyValueStorage
 
@@ -25,17 +29,60 @@ class PruningState(State):
 
     # SOME KEY THAT DOES NOT COLLIDE WITH ANY STATE VARIABLE'S NAME
     rootHashKey = b'\x88\xc8\x88 \x9a\xa7\x89\x1b'
+    # Ledger seqNo of the committed root, written with it
+    committedSeqNoKey = b'\x00committedSeqNo'
 
-    def __init__(self, keyValueStorage: KeyValueStorage):
+    def __init__(self, keyValueStorage: KeyValueStorage,
+                 writeBack: bool = False, nodeCacheSize: int = 0,
+                 retainedRoots: int = 0):
+        """
+        :param writeBack: if the trie nodes written by updates are kept in
+        memory and only the nodes of committed roots are written to the
+        store, see `WriteBackDB`
+        :param nodeCacheSize: memory budget in bytes of the cache of decoded
+        trie nodes, no nodes are cached if 0
+        :param retainedRoots: number of last committed roots whose nodes are
+        kept, the other nodes are deleted by `compact`, see `PruningDB`. No
+        nodes are deleted if 0
+        """
         self._kv = keyValueStorage
+        # References to nodes are counted when roots are committed, so
+        # pruning writes nodes back
+        self.writeBack = writeBack or bool(retainedRoots)
+        self.retainedRoots = retainedRoots
+        self.nodeCache = TrieNodeCache(nodeCacheSize) if nodeCacheSize \
+            else None
+        self._initTrie()
+
+    def _initTrie(self):
         if self.rootHashKey in self._kv:
             rootHash = bytes(self._kv.get(self.rootHashKey))
         else:
             rootHash = BLANK_ROOT
             self._kv.put(self.rootHashKey, BLANK_ROOT)
-        self._trie = Trie(
-            PersistentDB(self._kv),
-            rootHash)
+        # The committed root is only changed by `commit`, so it is not read
+        # from the store every time
+        self._committedHeadHash = rootHash
+        self._committedSeqNo = self._readCommittedSeqNo()
+        if self.nodeCache is not None:
+            self.nodeCache.clear()
+        if self.retainedRoots:
+            self._db = PruningDB(self._kv, rootHash, self.retainedRoots)
+        else:
+            if PruningDB.rootsKey in self._kv:
+                # Nodes will be written without counting references, so the
+                # counts are recomputed if pruning is enabled again
+                self._kv.remove(PruningDB.rootsKey)
+            self._db = WriteBackDB(self._kv) if self.writeBack \
+                else PersistentDB(self._kv)
+        self._trie = Trie(self._db, rootHash, node_cache=self.nodeCache)
+
+    def _readCommittedSeqNo(self) -> Optional[int]:
+        try:
+            seqNo = self._kv.get(self.committedSeqNoKey)
+        except KeyError:
+            return None
+        return int(seqNo) if seqNo else None
 
     @property
     def head(self):
@@ -59,15 +106,40 @@ class PruningState(State):
         if not isCommitted:
             val = self._trie.get(key)
         else:
-            val = self._trie._get(self.committedHead,
+            val = self._trie._get(self._committedRootNode(),
                                   bin_to_nibbles(to_string(key)))
         if val:
             return rlp_decode(val)[0]
 
+    def get_many(self, keys: Sequence[bytes],
+                 isCommitted: bool = True) -> List[Optional[bytes]]:
+        """
+        Get the values of `keys` walking the trie once, the nodes on the
+        paths shared by the keys are read once. Values are in the order of
+        `keys`, None for keys not in the state
+        """
+        root = self._committedRootNode() if isCommitted \
+            else self._trie.root_node
+        return [rlp_decode(val)[0] if val else None
+                for val in self._trie.get_many_at(root, keys)]
+
+    def _committedRootNode(self):
+        root = self.committedHeadHash
+        return self._trie._decode_to_node_for_read(root) \
+            if root != BLANK_ROOT else BLANK_NODE
+
     def remove(self, key: bytes):
         self._trie.delete(key)
 
-    def commit(self, rootHash=None, rootNode=None):
+    def commit(self, rootHash=None, rootNode=None,
+               seqNo: Optional[int] = None,
+               meta: Optional[Dict[bytes, bytes]] = None):
+        """
+        :param meta: entries written with the root in the same batch, kept
+        outside of the trie so they do not change its root. Their keys must
+        not collide with trie node keys, which are hashes, so they start with
+        a zero byte like `committedSeqNoKey`
+        """
         if rootNode:
             rootHash = self._trie._encode_node(rootNode)
         elif rootHash and isHex(rootHash):
@@ -78,9 +150,21 @@ class PruningState(State):
             rootHash = rootHash
         else:
             rootHash = self.headHash
-        self._kv.put(self.rootHashKey, rootHash)
+        # A commit without seqNo makes the seqNo of the root unknown
+        entries = ((self.rootHashKey, rootHash),
+                   (self.committedSeqNoKey,
+                    str(seqNo).encode() if seqNo is not None else b'')) + \
+            tuple((meta or {}).items())
+        if self.writeBack:
+            self._db.commit(rootHash, entries)
+        else:
+            self._kv.setBatch(entries)
+        self._committedHeadHash = bytes(rootHash)
+        self._committedSeqNo = seqNo
 
     def revertToHead(self, headHash=None):
+        if self.writeBack and headHash == self.committedHeadHash:
+            self._db.discard()
         if headHash != BLANK_ROOT:
             head = self._trie._decode_to_node(headHash)
         else:
@@ -96,6 +180,18 @@ class PruningState(State):
         return Trie.verify_spv_proof(root, key, rlp_encode([value]),
                                      proof_nodes, serialized)
 
+    def generate_multi_proof(self, keys: Sequence[bytes], root=None,
+                             serialize=False):
+        return self._trie.generate_multi_proof(keys, root, serialize)
+
+    @staticmethod
+    def verify_multi_proof(root, key_values: Dict[bytes, Optional[bytes]],
+                           proof_nodes, serialized=False):
+        key_values = {k: rlp_encode([v]) if v is not None else None
+                      for k, v in key_values.items()}
+        return Trie.verify_multi_proof(root, key_values, proof_nodes,
+                                       serialized)
+
     @property
     def as_dict(self):
         d = self._trie.to_dict()
@@ -108,16 +204,121 @@ class PruningState(State):
         tree then hash of the root
         :return:
         """
-        return self._trie.root_hash
+        rootHash = self._trie.root_hash
+        if self.writeBack:
+            self._db.mark_root(rootHash)
+        return rootHash
 
     @property
     def committedHeadHash(self):
-        return self._kv.get(self.rootHashKey)
+        return self._committedHeadHash
+
+    @property
+    def committedSeqNo(self) -> Optional[int]:
+        return self._committedSeqNo
+
+    def getCommittedMeta(self, key: bytes) -> Optional[bytes]:
+        try:
+            val = self._kv.get(key)
+        except KeyError:
+            return None
+        return bytes(val) if val is not None else None
 
     @property
     def isEmpty(self):
         return self.committedHeadHash == BLANK_ROOT
 
+    def compact(self, timeLimit: float) -> int:
+        """
+        Delete trie nodes not reachable from the retained roots for at most
+        about `timeLimit` seconds
+
+        :return: the number of nodes deleted
+        """
+        if not self.retainedRoots:
+            return 0
+        return self._db.compact(timeLimit)
+
+    def snapshotNodes(self, rootHash: bytes) -> Iterable[Tuple[bytes, bytes]]:
+        """
+        Yield the hashes and the encodings of the trie nodes reachable from
+        the committed root `rootHash`, every node before the nodes it refers
+        to. The nodes of a subtree found under several branches are yielded
+        for each of them.
+
+        Nodes are read from the store as they are yielded, so the nodes of
+        the root must not be deleted by `compact` until all are read
+        """
+        if rootHash == BLANK_ROOT:
+            return
+        stack = [bytes(rootHash)]
+        while stack:
+            key = stack.pop()
+            encoded = bytes(self._kv.get(key))
+            yield key, encoded
+            stack.extend(reversed(list(node_refs(rlp.decode(encoded)))))
+
+    def loadSnapshot(self, nodes: Iterable[Tuple[bytes, bytes]],
+                     rootHash: bytes, seqNo: int,
+                     meta: Optional[Dict[bytes, bytes]] = None,
+                     batchSize: int = 1000):
+        """
+        Replace the contents of the state by the trie nodes of a snapshot,
+        as `snapshotNodes` gives them, committed at `rootHash` for ledger
+        seqNo `seqNo` with the entries `meta`, see `commit`.
+
+        Every node must hash to its key and be reachable from the root, and
+        every node reachable from the root must be given, otherwise the state
+        is left empty and ValueError is raised.
+        """
+        rootHash = bytes(rootHash)
+        self._kv.reset()
+        try:
+            # Nodes referred to by the nodes loaded which are not loaded yet
+            pending = {rootHash} if rootHash != BLANK_ROOT else set()
+            batch = {}
+            for key, encoded in nodes:
+                if key not in pending:
+                    if key in batch or key in self._kv:
+                        continue
+                    raise ValueError('Trie node {} is not reachable from '
+                                     'root {}'.format(hexlify(key),
+                                                      hexlify(rootHash)))
+                if sha3(encoded) != key:
+                    raise ValueError('Trie node {} does not match its hash'.
+                                     format(hexlify(key)))
+                pending.remove(key)
+                batch[key] = encoded
+                for ref in node_refs(rlp.decode(encoded)):
+                    if ref not in batch and ref not in self._kv:
+                        pending.add(ref)
+                if len(batch) >= batchSize:
+                    self._kv.setBatch(batch.items())
+                    batch = {}
+            if pending:
+                raise ValueError('{} trie nodes of root {} are missing'.
+                                 format(len(pending), hexlify(rootHash)))
+            self._kv.setBatch(
+                list(batch.items()) +
+                [(self.rootHashKey, rootHash),
+                 (self.committedSeqNoKey, str(seqNo).encode())] +
+                list((meta or {}).items()))
+        except Exception:
+            self.reset()
+            raise
+        self._initTrie()
+
+    def reset(self):
+        """
+        Remove every entry of the state, which has to be rebuilt from its
+        ledger
+        """
+        self._kv.reset()
+        self._initTrie()
+
+    def sync(self):
+        self._kv.sync()
+
     def close(self):
         if self._kv:
             self._kv.close()
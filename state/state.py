@@ -13,12 +13,20 @@ class State:
         # committed state else get the latest value
         raise NotImplementedError
 
+    def get_many(self, keys, isCommitted: bool=True):
+        # Values of several keys in the order of `keys`, states which can
+        # read many keys at once override it
+        return [self.get(key, isCommitted) for key in keys]
+
     @abstractmethod
     def remove(self, key: bytes):
         raise NotImplementedError
 
     @abstractmethod
-    def commit(self, rootHash=None, rootNode=None):
+    def commit(self, rootHash=None, rootNode=None, seqNo=None, meta=None):
+        # `seqNo` is the seqNo of the last ledger txn applied to the
+        # committed state, if known. `meta` are entries kept with the
+        # committed state outside of it, see `getCommittedMeta`
         raise NotImplementedError
 
     @abstractmethod
@@ -26,6 +34,11 @@ class State:
         # Revert to the given head
         raise NotImplementedError
 
+    @abstractmethod
+    def sync(self):
+        # Make the committed state durable
+        raise NotImplementedError
+
     @abstractmethod
     def close(self):
         raise NotImplementedError
@@ -59,6 +72,17 @@ class State:
     def committedHeadHash(self):
         raise NotImplementedError
 
+    @property
+    def committedSeqNo(self):
+        # The seqNo of the last ledger txn applied to the committed state,
+        # None if not known
+        return None
+
+    def getCommittedMeta(self, key: bytes):
+        # The value of the `meta` entry written with the committed state,
+        # None if there is none
+        return None
+
     @property
     @abstractmethod
     def isEmpty(self):
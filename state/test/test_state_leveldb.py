@@ -12,20 +12,34 @@ i = 0
 # TODO: combine with in-memory tests
 
 
+@pytest.fixture(scope="function", params=[False, True],
+                ids=['write_through', 'write_back'])
+def writeBack(request):
+    return request.param
+
+
+@pytest.fixture(scope="function", params=[0, 1024 * 1024],
+                ids=['no_node_cache', 'node_cache'])
+def nodeCacheSize(request):
+    return request.param
+
+
 @pytest.yield_fixture(scope="function")
-def state(tempdir) -> State:
+def state(tempdir, writeBack, nodeCacheSize) -> State:
     global i
     state = PruningState(
-        KeyValueStorageLeveldb(tempdir, 'kv{}'.format(i)))
+        KeyValueStorageLeveldb(tempdir, 'kv{}'.format(i)),
+        writeBack=writeBack, nodeCacheSize=nodeCacheSize)
     yield state
     state.close()
 
 
 @pytest.yield_fixture(scope="function")
-def state2(tempdir) -> State:
+def state2(tempdir, writeBack, nodeCacheSize) -> State:
     global i
     state = PruningState(
-        KeyValueStorageLeveldb(tempdir, 'kv2{}'.format(i)))
+        KeyValueStorageLeveldb(tempdir, 'kv2{}'.format(i)),
+        writeBack=writeBack, nodeCacheSize=nodeCacheSize)
     yield state
     state.close()
 
@@ -55,3 +55,48 @@ def test_state_proof_and_verification_serialized(state):
     for k, v in data.items():
         assert PruningState.verify_state_proof(state.headHash, k, v,
                                                proofs[k], serialized=True)
+
+
+def test_get_many(state):
+    data = {'k{}'.format(i).encode(): 'v{}'.format(i).encode()
+            for i in range(100)}
+    for k, v in data.items():
+        state.set(k, v)
+    state.commit(state.headHash)
+    state.set(b'k1', b'v1-new')
+    state.set(b'k100', b'v100')
+
+    keys = [b'k100', b'k5', b'k1', b'absent', b'k5', b'k10']
+    assert state.get_many(keys) == [state.get(k) for k in keys]
+    assert state.get_many(keys, isCommitted=False) == \
+        [state.get(k, isCommitted=False) for k in keys]
+    assert state.get_many(keys, isCommitted=False)[:4] == \
+        [b'v100', b'v5', b'v1-new', None]
+    assert state.get_many([]) == []
+
+
+def test_multi_proof_and_verification(state):
+    data = {'k{}'.format(i).encode(): 'v{}'.format(i).encode()
+            for i in range(50)}
+    for k, v in data.items():
+        state.set(k, v)
+
+    keys = [b'k1', b'k12', b'k13', b'k40', b'k99']
+    proof = state.generate_multi_proof(keys)
+    # Nodes on shared paths are in the proof once
+    assert len(proof) < sum(len(state.generate_state_proof(k)) for k in keys)
+
+    key_values = {k: data.get(k) for k in keys}
+    assert PruningState.verify_multi_proof(state.headHash, key_values, proof)
+
+    # Incorrect value, a key said to be absent and a key not in the proof
+    assert not PruningState.verify_multi_proof(
+        state.headHash, {**key_values, b'k12': b'v1'}, proof)
+    assert not PruningState.verify_multi_proof(
+        state.headHash, {**key_values, b'k40': None}, proof)
+    assert not PruningState.verify_multi_proof(
+        state.headHash, {**key_values, b'k30': b'v30'}, proof)
+
+    serialized = state.generate_multi_proof(keys, serialize=True)
+    assert PruningState.verify_multi_proof(state.headHash, key_values,
+                                           serialized, serialized=True)
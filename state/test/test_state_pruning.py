@@ -0,0 +1,146 @@
+import random
+
+import pytest
+import rlp
+
+from state.db.write_back_db import node_refs
+from state.pruning_state import PruningState
+from state.trie.pruning_trie import BLANK_ROOT
+from storage.kv_in_memory import KeyValueStorageInMemory
+from storage.kv_store_leveldb import KeyValueStorageLeveldb
+
+RETAINED = 3
+
+
+def apply_batch(state, rnd, count=30, keys=200):
+    for _ in range(count):
+        key = str(rnd.randrange(keys)).encode()
+        state.set(key, str(rnd.random()).encode())
+    return state.headHash
+
+
+def stored_nodes(kv):
+    return {bytes(k) for k in kv.iterator(include_value=False)
+            if len(k) == 32}
+
+
+def reachable_nodes(kv, roots):
+    nodes = set()
+    stack = [r for r in roots if r != BLANK_ROOT]
+    while stack:
+        key = stack.pop()
+        if key not in nodes:
+            nodes.add(key)
+            stack.extend(node_refs(rlp.decode(bytes(kv.get(key)))))
+    return nodes
+
+
+def compact_all(state):
+    while state.compact(1):
+        pass
+
+
+@pytest.fixture(scope="function")
+def kv():
+    return KeyValueStorageInMemory()
+
+
+@pytest.fixture(scope="function")
+def state(kv):
+    return PruningState(kv, retainedRoots=RETAINED)
+
+
+def test_nodes_of_retained_roots_kept(state, kv):
+    rnd = random.Random(1)
+    roots = []
+    for i in range(40):
+        root = apply_batch(state, rnd)
+        if i % 5 == 4:
+            # Nodes of reverted batches are never counted
+            state.revertToHead(state.committedHeadHash)
+            continue
+        state.commit(root)
+        roots.append((root, state.as_dict))
+        state.compact(0.001)
+    compact_all(state)
+
+    retained = [root for root, _ in roots[-RETAINED:]]
+    assert stored_nodes(kv) == reachable_nodes(kv, retained)
+    for root, values in roots[-RETAINED:]:
+        for key, value in values.items():
+            assert state._trie.get_at(state._trie._decode_to_node(root),
+                                      key) is not None
+        proof = state.generate_multi_proof(list(values), root=state._trie.
+                                           _decode_to_node(root))
+        assert PruningState.verify_multi_proof(root, values, proof)
+
+
+def test_unchanged_root_committed_again(state, kv):
+    rnd = random.Random(2)
+    root = apply_batch(state, rnd)
+    for _ in range(RETAINED + 2):
+        state.commit(root)
+    compact_all(state)
+    assert stored_nodes(kv) == reachable_nodes(kv, [root])
+    assert PruningState(kv, retainedRoots=RETAINED).committedHeadHash == root
+
+
+def test_compaction_in_slices(state, kv):
+    rnd = random.Random(3)
+    for _ in range(20):
+        state.commit(apply_batch(state, rnd, count=100, keys=1000))
+    dead = state._db.deadCount
+    assert dead > 0
+
+    deleted = state.compact(0)
+    assert deleted == 0 and state._db.deadCount == dead
+    slices = 0
+    while state._db.deadCount:
+        state.compact(0.0001)
+        slices += 1
+    assert slices > 1
+    assert stored_nodes(kv) == \
+        reachable_nodes(kv, state._db._roots_committed)
+
+
+def test_dead_nodes_deleted_after_restart(tempdir):
+    rnd = random.Random(4)
+    state = PruningState(KeyValueStorageLeveldb(tempdir, 'kv'),
+                         retainedRoots=RETAINED)
+    for _ in range(10):
+        state.commit(apply_batch(state, rnd))
+    state.compact(0.0001)
+    dead = state._db.deadCount
+    values = state.as_dict
+    state.close()
+
+    kv = KeyValueStorageLeveldb(tempdir, 'kv')
+    state = PruningState(kv, retainedRoots=RETAINED)
+    assert state._db.deadCount == dead
+    compact_all(state)
+    assert stored_nodes(kv) == \
+        reachable_nodes(kv, state._db._roots_committed)
+    assert state.as_dict == values
+    state.close()
+
+
+def test_store_not_pruned_before(kv):
+    rnd = random.Random(5)
+    state = PruningState(kv)
+    for _ in range(10):
+        state.commit(apply_batch(state, rnd))
+    values = state.as_dict
+    before = len(stored_nodes(kv))
+
+    state = PruningState(kv, retainedRoots=1)
+    compact_all(state)
+    assert len(stored_nodes(kv)) < before
+    assert stored_nodes(kv) == reachable_nodes(kv, [state.committedHeadHash])
+    assert state.as_dict == values
+
+    # Counts are recomputed when pruning is enabled after being disabled
+    state = PruningState(kv)
+    state.commit(apply_batch(state, rnd))
+    state = PruningState(kv, retainedRoots=1)
+    compact_all(state)
+    assert stored_nodes(kv) == reachable_nodes(kv, [state.committedHeadHash])
@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+from state.pruning_state import PruningState
+from state.test.test_state_pruning import apply_batch, compact_all, \
+    reachable_nodes, stored_nodes
+from storage.kv_in_memory import KeyValueStorageInMemory
+
+META = {b'\x00meta': b'value'}
+
+
+@pytest.fixture(scope="function")
+def source():
+    state = PruningState(KeyValueStorageInMemory())
+    rnd = random.Random(1)
+    for seqNo in range(1, 6):
+        apply_batch(state, rnd)
+        state.commit(seqNo=seqNo, meta=META)
+    # Not committed, so not part of the snapshot
+    apply_batch(state, rnd)
+    return state
+
+
+def committed_items(state):
+    keys = [str(i).encode() for i in range(200)]
+    return dict(zip(keys, state.get_many(keys)))
+
+
+def test_state_loaded_from_snapshot(source):
+    root = source.committedHeadHash
+    kv = KeyValueStorageInMemory()
+    state = PruningState(kv, retainedRoots=2)
+    apply_batch(state, random.Random(2))
+    state.commit(seqNo=3)
+
+    state.loadSnapshot(source.snapshotNodes(root), root, 5, META)
+    assert state.committedHeadHash == root
+    assert state.committedSeqNo == 5
+    assert state.getCommittedMeta(b'\x00meta') == b'value'
+    assert committed_items(state) == committed_items(source)
+    # Only the nodes of the root are stored, pruning keeps them
+    assert stored_nodes(kv) == reachable_nodes(kv, [root])
+    compact_all(state)
+    assert stored_nodes(kv) == reachable_nodes(kv, [root])
+
+    # The state goes on from the snapshot and is kept on restart
+    source.revertToHead(root)
+    assert apply_batch(state, random.Random(3)) == \
+        apply_batch(source, random.Random(3))
+    assert PruningState(kv).committedHeadHash == root
+
+
+def test_state_snapshot_with_changed_node_not_loaded(source):
+    root = source.committedHeadHash
+    nodes = list(source.snapshotNodes(root))
+    key, encoded = nodes[-1]
+    nodes[-1] = key, encoded[:-1] + b'\x00'
+    state = PruningState(KeyValueStorageInMemory())
+    with pytest.raises(ValueError):
+        state.loadSnapshot(nodes, root, 5, META)
+    assert state.isEmpty
+    assert state.committedSeqNo is None
+
+
+def test_state_snapshot_missing_nodes_not_loaded(source):
+    root = source.committedHeadHash
+    state = PruningState(KeyValueStorageInMemory())
+    with pytest.raises(ValueError):
+        state.loadSnapshot(list(source.snapshotNodes(root))[:-1], root, 5)
+    assert state.isEmpty
+
+
+def test_state_snapshot_of_other_root_not_loaded(source):
+    root = source.committedHeadHash
+    other = PruningState(KeyValueStorageInMemory())
+    other.set(b'key', b'value')
+    other.commit(seqNo=1)
+    nodes = list(source.snapshotNodes(root)) + \
+        list(other.snapshotNodes(other.committedHeadHash))
+    state = PruningState(KeyValueStorageInMemory())
+    with pytest.raises(ValueError):
+        state.loadSnapshot(nodes, root, 5)
+    assert state.isEmpty
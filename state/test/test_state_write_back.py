@@ -0,0 +1,96 @@
+import pytest
+
+from state.pruning_state import PruningState
+from storage.kv_in_memory import KeyValueStorageInMemory
+
+
+class CountingStorage(KeyValueStorageInMemory):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def put(self, key, value):
+        self.writes += 1
+        super().put(key, value)
+
+
+def apply_batch(state, frm, to, prefix=b'k'):
+    for i in range(frm, to):
+        state.set(prefix + str(i).encode(), str(i).encode())
+    return state.headHash
+
+
+@pytest.fixture(scope="function")
+def kv():
+    return CountingStorage()
+
+
+@pytest.fixture(scope="function")
+def state(kv):
+    return PruningState(kv, writeBack=True)
+
+
+def test_same_roots_with_less_writes(state, kv):
+    writeThroughKv = CountingStorage()
+    writeThrough = PruningState(writeThroughKv)
+    for s in (state, writeThrough):
+        for i in range(0, 500, 100):
+            s.commit(apply_batch(s, i, i + 100))
+
+    assert state.committedHeadHash == writeThrough.committedHeadHash
+    # Only the nodes of the committed tries are written
+    assert kv.writes * 3 < writeThroughKv.writes
+    assert len(state._db) == 0
+
+    restarted = PruningState(kv, writeBack=True)
+    for i in range(500):
+        assert restarted.get(b'k' + str(i).encode()) == str(i).encode()
+
+
+def test_batches_committed_in_order(state, kv):
+    root1 = apply_batch(state, 0, 50)
+    root2 = apply_batch(state, 50, 100)
+    state.commit(root1)
+    # Nodes of the second batch are kept for it to be committed
+    assert len(state._db) > 0
+    assert state.get(b'k70', isCommitted=False) == b'70'
+    assert state.get(b'k70') is None
+
+    state.commit(root2)
+    assert len(state._db) == 0
+    restarted = PruningState(kv, writeBack=True)
+    assert restarted.committedHeadHash == root2
+    assert restarted.get(b'k70') == b'70'
+
+
+def test_revert_batches(state, kv):
+    committed = apply_batch(state, 0, 50)
+    state.commit(committed)
+
+    root1 = apply_batch(state, 50, 60)
+    apply_batch(state, 60, 70)
+    state.revertToHead(root1)
+    assert state.headHash == root1
+    assert state.get(b'k55', isCommitted=False) == b'55'
+    assert state.get(b'k65', isCommitted=False) is None
+
+    # Reverting to the committed root drops the nodes not written
+    state.revertToHead(committed)
+    assert state.headHash == committed
+    assert state.get(b'k55', isCommitted=False) is None
+    assert len(state._db) <= 1
+
+    root = apply_batch(state, 50, 55)
+    state.commit(root)
+    assert PruningState(kv).get(b'k54') == b'54'
+
+
+def test_uncommitted_nodes_not_written(state, kv):
+    state.commit(apply_batch(state, 0, 10))
+    writes = kv.writes
+    apply_batch(state, 10, 20)
+    assert kv.writes == writes
+
+    restarted = PruningState(kv, writeBack=True)
+    assert restarted.get(b'k5') == b'5'
+    assert restarted.get(b'k15', isCommitted=False) is None
@@ -0,0 +1,76 @@
+import random
+
+from state.pruning_state import PruningState
+from state.trie.node_cache import TrieNodeCache
+from storage.kv_in_memory import KeyValueStorageInMemory
+
+
+class CountingStorage(KeyValueStorageInMemory):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def get(self, key):
+        self.reads += 1
+        return super().get(key)
+
+
+def test_cache_within_budget():
+    cache = TrieNodeCache(maxBytes=10 * (100 + TrieNodeCache.entryOverhead))
+    for i in range(20):
+        cache.put(str(i).encode(), [b'node'], 100)
+    assert len(cache) == 10
+    assert cache.size <= cache.maxBytes
+    assert cache.get(b'5') is None
+    assert cache.get(b'15') == [b'node']
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hitRatio == 0.5
+
+    # Too large to be cached
+    cache.put(b'large', [b'node'], cache.maxBytes)
+    assert cache.get(b'large') is None
+
+
+def test_same_state_with_cache():
+    states = [PruningState(KeyValueStorageInMemory()),
+              PruningState(KeyValueStorageInMemory(),
+                           nodeCacheSize=1024 * 1024)]
+    keys = [str(i).encode() for i in range(300)]
+    for batch in range(5):
+        random.seed(batch)
+        updated = random.sample(keys, 100)
+        removed = random.sample(keys, 10)
+        for state in states:
+            for key in updated:
+                state.set(key, str(batch).encode() + key)
+            for key in removed:
+                state.remove(key)
+            state.commit(state.headHash)
+        assert states[0].headHash == states[1].headHash
+        for key in keys:
+            assert states[0].get(key) == states[1].get(key)
+            assert states[0].get(key, isCommitted=False) == \
+                states[1].get(key, isCommitted=False)
+        assert states[0].as_dict == states[1].as_dict
+
+    key = keys[7]
+    proof = states[1].generate_state_proof(key, serialize=True)
+    assert PruningState.verify_state_proof(states[1].committedHeadHash, key,
+                                           states[1].get(key), proof,
+                                           serialized=True)
+
+
+def test_hot_keys_read_from_cache():
+    kv = CountingStorage()
+    state = PruningState(kv, nodeCacheSize=1024 * 1024)
+    for i in range(200):
+        state.set(str(i).encode(), str(i).encode())
+    state.commit(state.headHash)
+
+    assert state.get(b'42') == b'42'
+    reads = kv.reads
+    for _ in range(10):
+        assert state.get(b'42') == b'42'
+        assert state.get(b'42', isCommitted=False) == b'42'
+    assert kv.reads == reads
+    assert state.nodeCache.hits > 0
@@ -0,0 +1,56 @@
+from collections import OrderedDict
+from typing import Optional
+
+
+class TrieNodeCache:
+    """
+    LRU cache of decoded trie nodes by their hashes. A node with a given
+    hash never changes, so the cache is shared by reads at every root of the
+    trie, committed or not. Nodes are kept within a budget of `maxBytes`,
+    the size of a node being approximated from its encoded size.
+
+    Cached nodes must not be changed, the trie copies them before updating
+    them.
+    """
+
+    # Approximate memory taken by an entry besides its encoded size, with
+    # its key, the lists of the decoded node and its place in the LRU order
+    entryOverhead = 300
+
+    def __init__(self, maxBytes: int = 32 * 1024 * 1024):
+        self.maxBytes = maxBytes
+        self._nodes = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._nodes)
+
+    @property
+    def hitRatio(self) -> Optional[float]:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+    def get(self, key: bytes):
+        entry = self._nodes.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._nodes.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: bytes, node, encodedSize: int):
+        size = encodedSize + self.entryOverhead
+        if size > self.maxBytes or key in self._nodes:
+            return
+        self._nodes[key] = (node, size)
+        self.size += size
+        while self.size > self.maxBytes:
+            _, (_, evictedSize) = self._nodes.popitem(last=False)
+            self.size -= evictedSize
+
+    def clear(self):
+        self._nodes.clear()
+        self.size = 0
@@ -2,10 +2,12 @@
 
 import copy
 import sys
+from itertools import groupby
 
 import rlp
 from rlp.utils import decode_hex, encode_hex, ascii_chr, str_to_bytes
 from state.db.db import BaseDB
+from state.trie.node_cache import TrieNodeCache
 from state.util.fast_rlp import encode_optimized, decode_optimized
 from state.util.utils import is_string, to_string, sha3, sha3rlp, encode_int
 from storage.kv_in_memory import KeyValueStorageInMemory
@@ -197,19 +199,32 @@ BLANK_ROOT = sha3rlp(BLANK_NODE)
 DEATH_ROW_OFFSET = 2**62
 
 
+def _copy_node(node):
+    return [_copy_node(item) if isinstance(item, list) else item
+            for item in node]
+
+
 def transient_trie_exception(*args):
     raise Exception("Transient trie")
 
 
 class Trie:
 
-    def __init__(self, db: BaseDB, root_hash=BLANK_ROOT, transient=False):
+    def __init__(self, db: BaseDB, root_hash=BLANK_ROOT, transient=False,
+                 node_cache: TrieNodeCache = None):
         '''it also present a dictionary like interface
 
         :param db key value database
         :root: blank or trie node in form of [key, value] or [v0,v1..v15,v]
+        :param node_cache: cache of decoded nodes, nodes are read from the
+        database every time without one
         '''
         self._db = db  # Pass in a database object directly
+        self._node_cache = node_cache
+        # Old nodes are only needed to decrement their reference counts, so
+        # with databases not counting references they are neither copied nor
+        # encoded again
+        self._counts_references = getattr(db, 'counts_references', True)
         self.transient = transient
         if self.transient:
             self.update = self.get = self.delete = transient_trie_exception
@@ -335,10 +350,40 @@ class Trie:
             return BLANK_NODE
         if isinstance(encoded, list):
             return encoded
-        o = rlp.decode(self._db.get(encoded))
+        if self._node_cache is None:
+            o = rlp.decode(self._db.get(encoded))
+        else:
+            # Nodes are changed in place by updates, so cached nodes are
+            # copied
+            o = _copy_node(self._load_node(encoded))
         self.spv_grabbing(o)
         return o
 
+    def _decode_to_node_for_read(self, encoded):
+        '''same as `_decode_to_node` for nodes which are not changed, cached
+        nodes are not copied
+        '''
+        if encoded == BLANK_NODE:
+            return BLANK_NODE
+        if isinstance(encoded, list):
+            return encoded
+        if self._node_cache is None:
+            o = rlp.decode(self._db.get(encoded))
+        else:
+            o = self._load_node(encoded)
+        self.spv_grabbing(o)
+        return o
+
+    def _load_node(self, encoded):
+        if not isinstance(encoded, bytes):
+            encoded = bytes(encoded)
+        o = self._node_cache.get(encoded)
+        if o is None:
+            data = self._db.get(encoded)
+            o = rlp.decode(data)
+            self._node_cache.put(encoded, o, len(data))
+        return o
+
     def _get_node_type(self, node):
         ''' get node type and content
 
@@ -373,7 +418,7 @@ class Trie:
             # already reach the expected node
             if not key:
                 return node[-1]
-            sub_node = self._decode_to_node(node[key[0]])
+            sub_node = self._decode_to_node_for_read(node[key[0]])
             return self._get(sub_node, key[1:])
 
         # key value node
@@ -384,11 +429,54 @@ class Trie:
         if node_type == NODE_TYPE_EXTENSION:
             # traverse child nodes
             if starts_with(key, curr_key):
-                sub_node = self._decode_to_node(node[1])
+                sub_node = self._decode_to_node_for_read(node[1])
                 return self._get(sub_node, key[len(curr_key):])
             else:
                 return BLANK_NODE
 
+    def _get_many(self, node, keys, results):
+        """ get values of several keys inside a node, each node on the
+        shared paths of the keys is read once
+
+        :param node: node in form of list, or BLANK_NODE
+        :param keys: list of (nibble list without terminator, index) sorted
+            by nibbles
+        :param results: list where the value of each key is set at its
+            index, it is left unchanged for keys which do not exist
+        """
+        node_type = self._get_node_type(node)
+
+        if node_type == NODE_TYPE_BLANK:
+            return
+
+        if node_type == NODE_TYPE_BRANCH:
+            # keys which reach this node come first as they are sorted
+            i = 0
+            while i < len(keys) and not keys[i][0]:
+                results[keys[i][1]] = node[-1]
+                i += 1
+            for nibble, group in groupby(keys[i:], key=lambda k: k[0][0]):
+                sub_node = self._decode_to_node_for_read(node[nibble])
+                self._get_many(sub_node, [(key[1:], idx)
+                                          for key, idx in group], results)
+            return
+
+        # key value node
+        curr_key = without_terminator(unpack_to_nibbles(node[0]))
+        if node_type == NODE_TYPE_LEAF:
+            for key, idx in keys:
+                if key == curr_key:
+                    results[idx] = node[1]
+            return
+
+        if node_type == NODE_TYPE_EXTENSION:
+            # traverse child nodes
+            sub_keys = [(key[len(curr_key):], idx) for key, idx in keys
+                        if starts_with(key, curr_key)]
+            if sub_keys:
+                sub_node = self._decode_to_node_for_read(node[1])
+                self._get_many(sub_node, sub_keys, results)
+
     def _update(self, node, key, value):
         # sys.stderr.write('u\n')
         """ update item inside a node
@@ -427,7 +515,7 @@ class Trie:
 
     def _update_and_delete_storage(self, node, key, value):
         # sys.stderr.write('uds_start %r\n' % node)
-        old_node = copy.deepcopy(node)
+        old_node = self._copy_old_node(node)
         new_node = self._update(node, key, value)
         # sys.stderr.write('uds_mid %r\n' % old_node)
         self._delete_node_storage(old_node)
@@ -524,7 +612,7 @@ class Trie:
             if reverse:
                 scan_range.reverse()
             for i in scan_range:
-                o = self._getany(self._decode_to_node(
+                o = self._getany(self._decode_to_node_for_read(
                     node[i]), path=path + [i])
                 if o:
                     return [i] + o
@@ -535,7 +623,7 @@ class Trie:
 
         if node_type == NODE_TYPE_EXTENSION:
             curr_key = without_terminator(unpack_to_nibbles(node[0]))
-            sub_node = self._decode_to_node(node[1])
+            sub_node = self._decode_to_node_for_read(node[1])
             return self._getany(sub_node, path=path + curr_key)
 
     def _iter(self, node, key, reverse=False, path=[]):
@@ -546,7 +634,7 @@ class Trie:
 
         elif node_type == NODE_TYPE_BRANCH:
             if len(key):
-                sub_node = self._decode_to_node(node[key[0]])
+                sub_node = self._decode_to_node_for_read(node[key[0]])
                 o = self._iter(sub_node, key[1:], reverse, path + [key[0]])
                 if o:
                     return [key[0]] + o
@@ -555,7 +643,7 @@ class Trie:
             else:
                 scan_range = list(range(key[0] + 1 if len(key) else 0, 16))
             for i in scan_range:
-                sub_node = self._decode_to_node(node[i])
+                sub_node = self._decode_to_node_for_read(node[i])
                 o = self._getany(sub_node, reverse, path + [i])
                 if o:
                     return [i] + o
@@ -572,7 +660,7 @@ class Trie:
 
         if node_type == NODE_TYPE_EXTENSION:
             # traverse child nodes
-            sub_node = self._decode_to_node(node[1])
+            sub_node = self._decode_to_node_for_read(node[1])
             sub_key = key[len(descend_key):]
             if starts_with(key, descend_key):
                 o = self._iter(sub_node, sub_key, reverse, path + descend_key)
@@ -594,11 +682,15 @@ class Trie:
         o = self._iter(self.root_node, key, reverse=True)
         return nibbles_to_bin(o) if o else None
 
+    def _copy_old_node(self, node):
+        # Nodes are changed in place by updates
+        return copy.deepcopy(node) if self._counts_references else node
+
     def _delete_node_storage(self, node, is_root=False):
         '''delete storage
         :param node: node in form of list, or BLANK_NODE
         '''
-        if node == BLANK_NODE:
+        if node == BLANK_NODE or not self._counts_references:
             return
         # assert isinstance(node, list)
         encoded = rlp_encode(node)
@@ -677,7 +769,7 @@ class Trie:
 
     def _delete_and_delete_storage(self, node, key):
         # sys.stderr.write('dds_start %r\n' % node)
-        old_node = copy.deepcopy(node)
+        old_node = self._copy_old_node(node)
         new_node = self._delete(node, key)
         # sys.stderr.write('dds_mid %r\n' % old_node)
         self._delete_node_storage(old_node)
@@ -773,7 +865,7 @@ class Trie:
         if len(key) > 32:
             raise Exception("Max key length is 32")
 
-        old_root = copy.deepcopy(self.root_node)
+        old_root = self._copy_old_node(self.root_node)
         self.root_node = self._delete_and_delete_storage(
             self.root_node,
             bin_to_nibbles(to_string(key)))
@@ -812,11 +904,11 @@ class Trie:
         if is_key_value_type(node_type):
             value_is_node = node_type == NODE_TYPE_EXTENSION
             if value_is_node:
-                return self._get_size(self._decode_to_node(node[1]))
+                return self._get_size(self._decode_to_node_for_read(node[1]))
             else:
                 return 1
         elif node_type == NODE_TYPE_BRANCH:
-            sizes = [self._get_size(self._decode_to_node(node[x]))
+            sizes = [self._get_size(self._decode_to_node_for_read(node[x]))
                      for x in range(16)]
             sizes = sizes + [1 if node[-1] else 0]
             return sum(sizes)
@@ -840,7 +932,7 @@ class Trie:
             nibbles = without_terminator(unpack_to_nibbles(node[0]))
             key = b'+'.join([to_string(x) for x in nibbles])
             if node_type == NODE_TYPE_EXTENSION:
-                sub_dict = self._to_dict(self._decode_to_node(node[1]))
+                sub_dict = self._to_dict(self._decode_to_node_for_read(node[1]))
             else:
                 sub_dict = {to_string(NIBBLE_TERMINATOR): node[1]}
 
@@ -854,7 +946,7 @@ class Trie:
         elif node_type == NODE_TYPE_BRANCH:
             res = {}
             for i in range(16):
-                sub_dict = self._to_dict(self._decode_to_node(node[i]))
+                sub_dict = self._to_dict(self._decode_to_node_for_read(node[i]))
 
                 for sub_key, sub_value in sub_dict.items():
                     full_key = (str_to_bytes(str(i)) +
@@ -902,7 +994,7 @@ class Trie:
             nibbles = without_terminator(unpack_to_nibbles(node[0]))
             key = b'+'.join([to_string(x) for x in nibbles])
             if node_type == NODE_TYPE_EXTENSION:
-                sub_tree = self._iter_branch(self._decode_to_node(node[1]))
+                sub_tree = self._iter_branch(self._decode_to_node_for_read(node[1]))
             else:
                 sub_tree = [(to_string(NIBBLE_TERMINATOR), node[1])]
 
@@ -913,7 +1005,7 @@ class Trie:
 
         elif node_type == NODE_TYPE_BRANCH:
             for i in range(16):
-                sub_tree = self._iter_branch(self._decode_to_node(node[i]))
+                sub_tree = self._iter_branch(self._decode_to_node_for_read(node[i]))
                 for sub_key, sub_value in sub_tree:
                     full_key = (str_to_bytes(str(i)) +
                                 b'+' + sub_key).strip(b'+')
@@ -958,7 +1050,7 @@ class Trie:
 
         # if value == '':
         #     return self.delete(key)
-        old_root = copy.deepcopy(self.root_node)
+        old_root = self._copy_old_node(self.root_node)
         self.root_node = self._update_and_delete_storage(
             self.root_node,
             bin_to_nibbles(to_string(key)),
@@ -987,6 +1079,24 @@ class Trie:
         """
         return self._get(root_node, bin_to_nibbles(to_string(key)))
 
+    def get_many_at(self, root_node, keys):
+        """
+        Get values of several keys when the root node was `root_node`,
+        walking the trie once for all of them
+        :param root_node:
+        :param keys:
+        :return: values in the order of `keys`, BLANK_NODE for the keys
+        which do not exist
+        """
+        nibble_keys = sorted((bin_to_nibbles(to_string(key)), idx)
+                             for idx, key in enumerate(keys))
+        results = [BLANK_NODE] * len(nibble_keys)
+        self._get_many(root_node, nibble_keys, results)
+        return results
+
+    def get_many(self, keys):
+        return self.get_many_at(self.root_node, keys)
+
     def generate_state_proof(self, key, root=None, serialize=False):
         # NOTE: The method `produce_spv_proof` is not deliberately modified
         root = root or self.root_node
@@ -1018,6 +1128,47 @@ class Trie:
             proof.pop()
             return False
 
+    def generate_multi_proof(self, keys, root=None, serialize=False):
+        """
+        Proof of the values, or absence, of all `keys`: the nodes on the
+        paths of the keys, shared by keys with common prefixes
+        """
+        root = root or self.root_node
+        proof.push(RECORDING)
+        self.get_many_at(root, keys)
+        pf = proof.get_nodelist()
+        proof.pop()
+        pf.append(copy.deepcopy(root))
+        return pf if not serialize else self.serialize_proof(pf)
+
+    @staticmethod
+    def verify_multi_proof(root, key_values, proof_nodes, serialized=False):
+        """
+        Verify a proof generated by `generate_multi_proof`, `key_values`
+        maps each key to its value or to None if the key must not exist
+        """
+        if serialized:
+            proof_nodes = Trie.deserialize_proof(proof_nodes)
+        proof.push(VERIFYING, proof_nodes)
+        new_trie = Trie(KeyValueStorageInMemory())
+
+        for node in proof_nodes:
+            R = rlp_encode(node)
+            H = sha3(R)
+            new_trie._db.put(H, R)
+        keys = list(key_values.keys())
+        try:
+            new_trie.root_hash = root
+            values = new_trie.get_many(keys)
+            proof.pop()
+        except Exception:
+            # A proof missing nodes of the keys does not prove them
+            proof.pop()
+            return False
+        return all(v == (BLANK_NODE if key_values[k] is None
+                         else key_values[k])
+                   for k, v in zip(keys, values))
+
     @staticmethod
     def serialize_proof(proof_nodes):
         return rlp_encode(proof_nodes)
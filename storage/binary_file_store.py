@@ -1,5 +1,6 @@
 import logging
 import os
+from typing import Iterable, Tuple
 
 from storage.kv_store_single_file import SingleFileStore
 
@@ -40,9 +41,18 @@ class BinaryFileStore(SingleFileStore):
         return open(self.db_path, mode="a+b", buffering=0)
 
     def put(self, key, value):
+        self._checkEntry(key, value)
+        super().put(key=key, value=value)
+
+    def setBatch(self, batch: Iterable[Tuple]):
+        batch = list(batch)
+        for key, value in batch:
+            self._checkEntry(key, value)
+        super().setBatch(batch)
+
+    def _checkEntry(self, key, value):
         if not ((self.isLineNoKey or not key or self._isBytes(key)) and self._isBytes(value)):
             raise ValueError("key and value need to be bytes-like object")
-        super().put(key=key, value=value)
 
     def get(self, key):
         if not self.isLineNoKey and not self._isBytes(key):
@@ -1,7 +1,10 @@
 import os
 import shutil
+from collections import OrderedDict
+from typing import List
 
 from storage.kv_store_file import KeyValueStorageFile
+from storage.store_utils import fsync_path
 from storage.text_file_store import TextFileStore
 
 
@@ -18,6 +21,9 @@ class ChunkedFileStore(KeyValueStorageFile):
 
     Every instance of ChunkedFileStore maintains its own directory for
     storing the chunked data files.
+
+    Chunks read from are kept open, up to `maxOpenChunks` of the most
+    recently read ones, so reading a key does not open its chunk again.
     """
 
     firstChunkIndex = 1
@@ -42,11 +48,13 @@ class ChunkedFileStore(KeyValueStorageFile):
                  chunkSize: int=1000,
                  ensureDurability: bool=True,
                  chunk_creator=None,
-                 open=True):
+                 open=True,
+                 maxOpenChunks: int=16):
         """
 
         :param chunkSize: number of items in one chunk. Cannot be lower then number of items in defaultFile
         :param chunkStoreConstructor: constructor of store for single chunk
+        :param maxOpenChunks: number of chunks kept open for reading
         """
 
         super().__init__(dbDir,
@@ -61,6 +69,11 @@ class ChunkedFileStore(KeyValueStorageFile):
         self.dataDir = os.path.join(dbDir, dbName)  # chunk files destination
         self.currentChunk = None  # type: KeyValueStorageFile
         self.currentChunkIndex = None  # type: int
+        self.maxOpenChunks = maxOpenChunks
+        # Chunks open for reading by their indices, least recently read first
+        self._openChunks = OrderedDict()  # type: OrderedDict[int, KeyValueStorageFile]
+        # Paths of the chunks written to and closed since the last `sync`
+        self._unsyncedChunks = []  # type: List[str]
 
         # TODO: fix chunk_creator support
         def default_chunk_creator(name):
@@ -125,6 +138,8 @@ class ChunkedFileStore(KeyValueStorageFile):
             if self.currentChunkIndex == index and \
                     not self.currentChunk.closed:
                 return
+            if not self.ensureDurability:
+                self._unsyncedChunks.append(self.currentChunk.db_path)
             self.currentChunk.close()
 
         self.currentChunk = self._openChunk(index)
@@ -142,6 +157,29 @@ class ChunkedFileStore(KeyValueStorageFile):
         return self._chunkCreator(
             ChunkedFileStore._chunkIndexToFileName(index))
 
+    def _getChunk(self, index) -> KeyValueStorageFile:
+        """
+        Return an open chunk to read from, the current chunk or one of the
+        chunks kept open
+
+        :param index: chunk index
+        """
+        if index == self.currentChunkIndex:
+            return self.currentChunk
+        chunk = self._openChunks.pop(index, None)
+        if chunk is None:
+            chunk = self._openChunk(index)
+            if len(self._openChunks) >= self.maxOpenChunks:
+                _, oldest = self._openChunks.popitem(last=False)
+                oldest.close()
+        self._openChunks[index] = chunk
+        return chunk
+
+    def _closeOpenChunks(self):
+        for chunk in self._openChunks.values():
+            chunk.close()
+        self._openChunks.clear()
+
     def _get_key_location(self, key) -> (int, int):
         """
         Return chunk no and 1-based offset of key
@@ -165,6 +203,16 @@ class ChunkedFileStore(KeyValueStorageFile):
         self.itemNum += 1
         self.currentChunk.put(key, value)
 
+    def sync(self):
+        # The current chunk is taken first, if a next chunk is started after
+        # it, the current one is synced through its path
+        currentChunk = self.currentChunk
+        unsynced, self._unsyncedChunks = self._unsyncedChunks, []
+        for path in unsynced:
+            fsync_path(path)
+        if currentChunk is not None:
+            currentChunk.sync()
+
     def get(self, key) -> str:
         """
         Determines the file to retrieve the data from and retrieves the data.
@@ -174,8 +222,7 @@ class ChunkedFileStore(KeyValueStorageFile):
         # TODO: get is creating files when a key is given which is more than
         # the store size
         chunk_no, offset = self._get_key_location(key)
-        with self._openChunk(chunk_no) as chunk:
-            return chunk.get(str(offset))
+        return self._getChunk(chunk_no).get(str(offset))
 
     def reset(self) -> None:
         """
@@ -184,6 +231,7 @@ class ChunkedFileStore(KeyValueStorageFile):
         self.close()
         for f in os.listdir(self.dataDir):
             os.remove(os.path.join(self.dataDir, f))
+        self._unsyncedChunks = []
         self._useLatestChunk()
 
     def drop(self):
@@ -207,6 +255,7 @@ class ChunkedFileStore(KeyValueStorageFile):
         return self.currentChunk._parse_line(line, prefix, returnKey, returnValue, key)
 
     def close(self):
+        self._closeOpenChunks()
         if self.currentChunk is not None:
             self.currentChunk.close()
         self.currentChunk = None
@@ -266,23 +315,23 @@ class ChunkedFileStore(KeyValueStorageFile):
             if start_chunk_no == end_chunk_no:
                 # If entries lie in the same range
                 assert end_offset >= start_offset
-                with self._openChunk(start_chunk_no) as chunk:
-                    yield from zip(range(start, end + 1),
-                                   (l for _, l in chunk.iterator(start=start_offset,
-                                                                 end=end_offset)))
+                chunk = self._getChunk(start_chunk_no)
+                yield from zip(range(start, end + 1),
+                               (l for _, l in chunk.iterator(start=start_offset,
+                                                             end=end_offset)))
             else:
                 current_chunk_no = start_chunk_no
                 while current_chunk_no <= end_chunk_no:
-                    with self._openChunk(current_chunk_no) as chunk:
-                        if current_chunk_no == start_chunk_no:
-                            yield from ((str(current_chunk_no + int(k) - 1), l) for k, l in
-                                        chunk.iterator(start=start_offset))
-                        elif current_chunk_no == end_chunk_no:
-                            yield from ((str(current_chunk_no + int(k) - 1), l)
-                                        for k, l in chunk.iterator(end=end_offset))
-                        else:
-                            yield from ((str(current_chunk_no + int(k) - 1), l)
-                                        for k, l in chunk.iterator(start=1, end=self.chunkSize))
+                    chunk = self._getChunk(current_chunk_no)
+                    if current_chunk_no == start_chunk_no:
+                        yield from ((str(current_chunk_no + int(k) - 1), l) for k, l in
+                                    chunk.iterator(start=start_offset))
+                    elif current_chunk_no == end_chunk_no:
+                        yield from ((str(current_chunk_no + int(k) - 1), l)
+                                    for k, l in chunk.iterator(end=end_offset))
+                    else:
+                        yield from ((str(current_chunk_no + int(k) - 1), l)
+                                    for k, l in chunk.iterator(start=1, end=self.chunkSize))
                     current_chunk_no += self.chunkSize
 
     def _append_new_line_if_req(self):
@@ -300,9 +349,7 @@ class ChunkedFileStore(KeyValueStorageFile):
         if num_chunks == 0:
             return 0
         count = (num_chunks - 1) * self.chunkSize
-        last_chunk = self._openChunk(chunks[-1])
-        count += sum(1 for _ in last_chunk._lines())
-        last_chunk.close()
+        count += self._getChunk(chunks[-1]).size
         return count
 
     @property
@@ -20,6 +20,13 @@ class KeyValueStorage(metaclass=ABCMeta):
     def setBatch(self, batch: Iterable[Tuple]):
         pass
 
+    def sync(self):
+        """
+        Make the writes done so far durable. It can be called from another
+        thread than the one writing, stores writing durably have nothing to do
+        """
+        pass
+
     @abstractmethod
     def open(self):
         pass
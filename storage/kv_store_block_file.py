@@ -0,0 +1,339 @@
+import os
+import shutil
+import struct
+import zlib
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import chain
+from typing import Iterable, List, Tuple
+
+from storage.kv_store import KeyValueStorage
+from storage.store_utils import fsync_path
+
+
+class KeyValueStorageBlockFile(KeyValueStorage):
+    """
+    Append only store of values keyed by consecutive integers from 1, like
+    the sequence numbers of a transaction log.
+
+    Values are grouped in blocks of `blockSize` values compressed together
+    and appended to a file of blocks, each block starting with a header
+    giving the key of its first value, the number of its values and the
+    length of its compressed data. The keys of the first values of blocks
+    and the offsets of blocks make a sparse index, kept in memory and built
+    from the headers when the store is opened. Values not making a whole
+    block yet are appended uncompressed to a tail file.
+
+    Values are read by decompressing their block, the last read blocks are
+    cached. Iterating over a range of keys decompresses each block once.
+
+    Values cannot be removed or replaced: `remove` and writes of other keys
+    than the next one raise ValueError.
+
+    :param blockSize: number of values compressed together
+    :param compressionLevel: zlib compression level of blocks
+    :param cachedBlocks: number of decompressed blocks cached for reads of
+    single values
+    :param ensureDurability: if the files are fsynced after every write,
+    they are fsynced by `sync` otherwise
+    """
+
+    blocksFileName = 'blocks'
+    tailFileName = 'tail'
+
+    # Key of the first value, number of values and length of the compressed
+    # data of a block
+    blockHeader = struct.Struct('>QII')
+    # Key and length of the value of a record of the tail file
+    tailRecordHeader = struct.Struct('>QI')
+    valueLength = struct.Struct('>I')
+
+    def __init__(self, db_dir, db_name, open=True, blockSize: int = 256,
+                 compressionLevel: int = 6, cachedBlocks: int = 16,
+                 ensureDurability: bool = False):
+        self._db_path = os.path.join(db_dir, db_name)
+        self.blockSize = blockSize
+        self.compressionLevel = compressionLevel
+        self.cachedBlocks = cachedBlocks
+        self.ensureDurability = ensureDurability
+        self._blocksFile = None
+        self._tailFile = None
+        if open:
+            self.open()
+
+    def __repr__(self):
+        return self.db_path
+
+    @property
+    def is_byte(self) -> bool:
+        return True
+
+    @property
+    def db_path(self) -> str:
+        return self._db_path
+
+    @property
+    def blocksPath(self):
+        return os.path.join(self.db_path, self.blocksFileName)
+
+    @property
+    def tailPath(self):
+        return os.path.join(self.db_path, self.tailFileName)
+
+    def open(self):
+        os.makedirs(self.db_path, exist_ok=True)
+        self._blockKeys = []  # type: List[int]
+        self._blockOffsets = []  # type: List[int]
+        self._blockCache = OrderedDict()
+        self._tail = []  # type: List[bytes]
+        self._blocksFile = self._openFile(self.blocksPath)
+        self._tailFile = self._openFile(self.tailPath)
+        self._loadBlocks()
+        self._loadTail()
+
+    @staticmethod
+    def _openFile(path):
+        if not os.path.exists(path):
+            open(path, 'wb').close()
+        return open(path, 'r+b')
+
+    def _loadBlocks(self):
+        # A block partially written when the node stopped is dropped, its
+        # values are still in the tail file
+        f = self._blocksFile
+        end = f.seek(0, os.SEEK_END)
+        offset = 0
+        nextKey = 1
+        while offset + self.blockHeader.size <= end:
+            f.seek(offset)
+            firstKey, count, length = self.blockHeader.unpack(
+                f.read(self.blockHeader.size))
+            blockEnd = offset + self.blockHeader.size + length
+            if firstKey != nextKey or blockEnd > end:
+                break
+            self._blockKeys.append(firstKey)
+            self._blockOffsets.append(offset)
+            offset = blockEnd
+            nextKey += count
+        self._truncate(f, offset)
+        self._tailStart = nextKey
+
+    def _loadTail(self):
+        # Records of values already in blocks are left when the node stopped
+        # after writing a block but before truncating the tail
+        f = self._tailFile
+        f.seek(0)
+        data = f.read()
+        offset = 0
+        values = []
+        while offset + self.tailRecordHeader.size <= len(data):
+            key, length = self.tailRecordHeader.unpack_from(data, offset)
+            valueStart = offset + self.tailRecordHeader.size
+            if valueStart + length > len(data):
+                break
+            if key >= self._tailStart:
+                if key != self._tailStart + len(values):
+                    break
+                values.append(data[valueStart:valueStart + length])
+            offset = valueStart + length
+        if offset < len(data):
+            self._truncate(f, offset)
+        self._tail = values
+        if len(values) >= self.blockSize:
+            self._writeBlocks()
+        self._size = self._tailStart + len(self._tail) - 1
+
+    @staticmethod
+    def _truncate(f, size):
+        f.seek(size)
+        f.truncate()
+
+    def close(self):
+        for f in (self._blocksFile, self._tailFile):
+            if f is not None:
+                f.close()
+        self._blocksFile = None
+        self._tailFile = None
+
+    def drop(self):
+        self.close()
+        shutil.rmtree(self.db_path, ignore_errors=True)
+
+    def reset(self):
+        self.drop()
+        self.open()
+
+    @property
+    def closed(self):
+        return self._blocksFile is None
+
+    @property
+    def size(self):
+        return self._size
+
+    def put(self, key, value):
+        self.setBatch(((key, value),))
+
+    def setBatch(self, batch: Iterable[Tuple]):
+        added = []
+        for key, value in batch:
+            key = self._toKey(key)
+            if key != self._size + len(added) + 1:
+                raise ValueError('Values can only be appended, expected key '
+                                 '{} but got {}'.format(
+                                     self._size + len(added) + 1, key))
+            if isinstance(value, str):
+                value = value.encode()
+            added.append(value)
+        if not added:
+            return
+        self._size += len(added)
+        self._tail.extend(added)
+        if len(self._tail) >= self.blockSize:
+            self._writeBlocks()
+        else:
+            start = self._tailStart + len(self._tail) - len(added)
+            self._tailFile.seek(0, os.SEEK_END)
+            self._writeTailRecords(start, added)
+        self._flush(self._tailFile)
+
+    def _writeBlocks(self):
+        # Whole blocks are written and synced before the tail file is
+        # truncated so that values are always in one of the files, even
+        # those of the tail synced without `ensureDurability`
+        f = self._blocksFile
+        offset = f.seek(0, os.SEEK_END)
+        while len(self._tail) >= self.blockSize:
+            values = self._tail[:self.blockSize]
+            data = zlib.compress(
+                b''.join(self.valueLength.pack(len(v)) + v for v in values),
+                self.compressionLevel)
+            f.write(self.blockHeader.pack(self._tailStart, len(values),
+                                          len(data)))
+            f.write(data)
+            self._blockKeys.append(self._tailStart)
+            self._blockOffsets.append(offset)
+            offset += self.blockHeader.size + len(data)
+            self._tailStart += len(values)
+            del self._tail[:self.blockSize]
+        f.flush()
+        os.fsync(f.fileno())
+        self._truncate(self._tailFile, 0)
+        self._writeTailRecords(self._tailStart, self._tail)
+
+    def _writeTailRecords(self, start, values):
+        self._tailFile.write(b''.join(
+            self.tailRecordHeader.pack(key, len(value)) + value
+            for key, value in enumerate(values, start)))
+
+    def _flush(self, f):
+        f.flush()
+        if self.ensureDurability:
+            os.fsync(f.fileno())
+
+    def sync(self):
+        # Files are flushed after every write, so only fsync is needed
+        for f, path in ((self._blocksFile, self.blocksPath),
+                        (self._tailFile, self.tailPath)):
+            try:
+                os.fsync(f.fileno())
+            except (AttributeError, ValueError):
+                # Closed by the thread writing to the store
+                fsync_path(path)
+
+    def remove(self, key):
+        raise ValueError('Values of an append only store cannot be removed, '
+                         'cannot remove key {}'.format(key))
+
+    @staticmethod
+    def _toKey(key) -> int:
+        if isinstance(key, (bytes, bytearray)):
+            key = key.decode()
+        return int(key)
+
+    def get(self, key) -> bytes:
+        try:
+            k = self._toKey(key)
+        except (TypeError, ValueError):
+            raise KeyError(key)
+        if not 1 <= k <= self._size:
+            raise KeyError(key)
+        if k >= self._tailStart:
+            return self._tail[k - self._tailStart]
+        index = bisect_right(self._blockKeys, k) - 1
+        values = self._blockCache.get(index)
+        if values is None:
+            values = self._readBlock(index)
+            self._blockCache[index] = values
+            if len(self._blockCache) > self.cachedBlocks:
+                self._blockCache.popitem(last=False)
+        else:
+            self._blockCache.move_to_end(index)
+        return values[k - self._blockKeys[index]]
+
+    def _readBlock(self, index) -> List[bytes]:
+        fd = self._blocksFile.fileno()
+        offset = self._blockOffsets[index]
+        _, count, length = self.blockHeader.unpack(
+            os.pread(fd, self.blockHeader.size, offset))
+        data = zlib.decompress(
+            os.pread(fd, length, offset + self.blockHeader.size))
+        values = []
+        pos = 0
+        for _ in range(count):
+            length, = self.valueLength.unpack_from(data, pos)
+            pos += self.valueLength.size
+            values.append(data[pos:pos + length])
+            pos += length
+        return values
+
+    def iterator(self, start=None, end=None, include_key=True,
+                 include_value=True, prefix=None):
+        if not (include_key or include_value):
+            raise ValueError("At least one of includeKey or includeValue "
+                             "should be true")
+        start = max(self._toKey(start), 1) if start is not None else 1
+        # Values appended while iterating are not part of the iteration
+        end = min(self._toKey(end), self._size) if end is not None \
+            else self._size
+        if prefix:
+            items = chain.from_iterable(
+                self._items(max(first, start), min(last, end))
+                for first, last in self._prefixRanges(prefix, end))
+        else:
+            items = self._items(start, end)
+        if include_key and include_value:
+            return ((str(k).encode(), v) for k, v in items)
+        elif include_key:
+            return (str(k).encode() for k, _ in items)
+        else:
+            return (v for _, v in items)
+
+    @staticmethod
+    def _prefixRanges(prefix, end) -> Iterable[Tuple[int, int]]:
+        # Keys are numbers written without leading zeros, the keys starting
+        # with a prefix are the ranges of numbers made of the prefix followed
+        # by 0, 1, 2... digits, in increasing order
+        if isinstance(prefix, (bytes, bytearray)):
+            prefix = prefix.decode()
+        if not prefix.isdigit() or prefix.startswith('0'):
+            return
+        first = last = int(prefix)
+        while first <= end:
+            yield first, last
+            first, last = first * 10, last * 10 + 9
+
+    def _items(self, start, end):
+        k = start
+        while k <= end:
+            if k >= self._tailStart:
+                yield k, self._tail[k - self._tailStart]
+                k += 1
+                continue
+            # Blocks are decompressed once, without going through the cache
+            # used by reads of single values
+            index = bisect_right(self._blockKeys, k) - 1
+            first = self._blockKeys[index]
+            for value in self._readBlock(index)[k - first:end - first + 1]:
+                yield k, value
+                k += 1
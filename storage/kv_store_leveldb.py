@@ -69,6 +69,10 @@ class KeyValueStorageLeveldb(KeyValueStorage):
             b.Put(key, value)
         self._db.Write(b, sync=False)
 
+    def sync(self):
+        # A synced write makes the log of the previous writes durable too
+        self._db.Write(leveldb.WriteBatch(), sync=True)
+
     def open(self):
         self._db = leveldb.LevelDB(self.db_path)
 
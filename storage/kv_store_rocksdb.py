@@ -1,23 +1,217 @@
+import os
+import shutil
 from typing import Iterable, Tuple
 
 from storage.kv_store import KeyValueStorage
 
+try:
+    import rocksdb
+except ImportError:
+    # RocksDB is optional, its stores are not usable without it
+    pass
 
-# TODO: WIP below
+
+def _toBytes(data):
+    if isinstance(data, int):
+        data = str(data)
+    if isinstance(data, str):
+        data = data.encode()
+    return data
+
+
+if 'rocksdb' in globals():
+    class FixedPrefix(rocksdb.interfaces.SliceTransform):
+        """
+        Prefix of keys used by prefix bloom filters, the first `length`
+        bytes of keys. Shorter keys are not in the domain of the prefix.
+        """
+
+        def __init__(self, length: int):
+            self.length = length
+
+        def name(self):
+            return 'FixedPrefix{}'.format(self.length).encode()
+
+        def transform(self, src):
+            return 0, self.length
+
+        def in_domain(self, src):
+            return len(src) >= self.length
+
+        def in_range(self, dst):
+            return len(dst) == self.length
 
 
 class KeyValueStorageRocksdb(KeyValueStorage):
-    def set(self, key, value):
-        raise NotImplementedError
+    """
+    A key value store on RocksDB. Each store is a database of its own, tuned
+    for the data it keeps:
+
+    :param bloomBitsPerKey: bits per key of the bloom filters of whole keys
+    (and of prefixes), so reads of missing keys rarely touch the disk
+    :param prefixLength: length of the prefix of keys for which bloom filters
+    are kept too, useful for keys sharing prefixes or read by prefixes
+    :param blockCacheSize: size in bytes of the cache of uncompressed blocks
+    :param writeBufferSize: size in bytes of the memtable
+    """
+
+    def __init__(self, db_dir, db_name, open=True, bloomBitsPerKey: int = 10,
+                 prefixLength: int = None,
+                 blockCacheSize: int = 64 * 1024 * 1024,
+                 writeBufferSize: int = 64 * 1024 * 1024):
+        if 'rocksdb' not in globals():
+            raise RuntimeError('Rocksdb is needed to use this class')
+        self.db_path = os.path.join(db_dir, db_name)
+        self.bloomBitsPerKey = bloomBitsPerKey
+        self.prefixLength = prefixLength
+        self.blockCacheSize = blockCacheSize
+        self.writeBufferSize = writeBufferSize
+        self._db = None
+        if open:
+            self.open()
+
+    def __repr__(self):
+        return self.db_path
+
+    @property
+    def is_byte(self) -> bool:
+        return True
+
+    def db_path(self) -> str:
+        return self.db_path
+
+    def _options(self):
+        opts = rocksdb.Options(create_if_missing=True,
+                               write_buffer_size=self.writeBufferSize)
+        opts.table_factory = rocksdb.BlockBasedTableFactory(
+            filter_policy=rocksdb.BloomFilterPolicy(self.bloomBitsPerKey),
+            block_cache=rocksdb.LRUCache(self.blockCacheSize))
+        if self.prefixLength:
+            opts.prefix_extractor = FixedPrefix(self.prefixLength)
+        return opts
+
+    def open(self):
+        self._db = rocksdb.DB(self.db_path, self._options())
+
+    def close(self):
+        # The database is closed when it is garbage collected
+        del self._db
+        self._db = None
+
+    def drop(self):
+        self.close()
+        shutil.rmtree(self.db_path)
+
+    def reset(self):
+        self.drop()
+        self.open()
+
+    @property
+    def closed(self):
+        return self._db is None
+
+    def put(self, key, value):
+        self._db.put(_toBytes(key), _toBytes(value))
 
     def get(self, key):
-        raise NotImplementedError
+        return self._get(key)
+
+    def _get(self, key, snapshot=None):
+        value = self._db.get(_toBytes(key), snapshot=snapshot)
+        if value is None:
+            raise KeyError(key)
+        return value
 
     def remove(self, key):
-        raise NotImplementedError
+        self._db.delete(_toBytes(key))
 
     def setBatch(self, batch: Iterable[Tuple]):
-        raise NotImplementedError
+        b = rocksdb.WriteBatch()
+        for key, value in batch:
+            b.put(_toBytes(key), _toBytes(value))
+        self._db.write(b, sync=False)
 
-    def close(self):
-        raise NotImplementedError
+    def removeBatch(self, keys: Iterable):
+        b = rocksdb.WriteBatch()
+        for key in keys:
+            b.delete(_toBytes(key))
+        self._db.write(b, sync=False)
+
+    def sync(self):
+        # A synced write makes the log of the previous writes durable too
+        self._db.write(rocksdb.WriteBatch(), sync=True)
+
+    def snapshot(self) -> 'RocksdbSnapshot':
+        """
+        Take a consistent view of the store, not changed by later writes
+        """
+        return RocksdbSnapshot(self, self._db.snapshot())
+
+    def iterator(self, start=None, end=None, include_key=True,
+                 include_value=True, prefix=None):
+        return self._iterator(start, end, include_key, include_value, prefix)
+
+    def _iterator(self, start=None, end=None, include_key=True,
+                  include_value=True, prefix=None, snapshot=None):
+        if not (include_key or include_value):
+            raise ValueError("At least one of includeKey or includeValue "
+                             "should be true")
+        start = _toBytes(start)
+        end = _toBytes(end)
+        prefix = _toBytes(prefix)
+        if include_key and include_value:
+            it = self._db.iteritems(snapshot=snapshot)
+        elif include_key:
+            it = self._db.iterkeys(snapshot=snapshot)
+        else:
+            # Keys are needed to know where to stop
+            it = self._db.iteritems(snapshot=snapshot)
+        return self._range(it, start, end, prefix, include_key,
+                           include_value)
+
+    def _range(self, it, start, end, prefix, include_key, include_value):
+        if prefix and (not start or start < prefix):
+            start = prefix
+        # With a prefix extractor, seeking finds only the keys with the prefix
+        # of the sought one, so other ranges are scanned from the beginning
+        seekable = not self.prefixLength or \
+            (prefix and len(prefix) >= self.prefixLength)
+        if start and seekable:
+            it.seek(start)
+        else:
+            it.seek_to_first()
+        for item in it:
+            key = item[0] if isinstance(item, tuple) else item
+            if start and not seekable and self._compare(key, start) < 0:
+                continue
+            if prefix and not key.startswith(prefix):
+                if self._compare(key, prefix) > 0:
+                    break
+                continue
+            if end and self._compare(key, end) > 0:
+                break
+            if include_key:
+                yield item
+            else:
+                yield item[1]
+
+    def _compare(self, a: bytes, b: bytes) -> int:
+        return (a > b) - (a < b)
+
+
+class RocksdbSnapshot:
+    """
+    Consistent read only view of a RocksDB store at the time it was taken
+    """
+
+    def __init__(self, store: KeyValueStorageRocksdb, snapshot):
+        self._store = store
+        self._snapshot = snapshot
+
+    def get(self, key):
+        return self._store._get(key, snapshot=self._snapshot)
+
+    def iterator(self, start=None, end=None, include_key=True,
+                 include_value=True, prefix=None):
+        return self._store._iterator(start, end, include_key, include_value,
+                                     prefix, snapshot=self._snapshot)
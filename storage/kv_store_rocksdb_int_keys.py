@@ -0,0 +1,41 @@
+from storage.kv_store_rocksdb import KeyValueStorageRocksdb
+
+try:
+    import rocksdb
+except ImportError:
+    # RocksDB is optional, its stores are not usable without it
+    pass
+
+
+if 'rocksdb' in globals():
+    class IntegerComparator(rocksdb.interfaces.Comparator):
+        def compare(self, a, b):
+            return KeyValueStorageRocksdbIntKeys.compare(a, b)
+
+        def name(self):
+            return b'IntegerComparator'
+
+
+class KeyValueStorageRocksdbIntKeys(KeyValueStorageRocksdb):
+    """
+    RocksDB store ordering keys as integers, like the sequence numbers of
+    a transaction log
+    """
+
+    @staticmethod
+    def compare(a, b):
+        a = int(a)
+        b = int(b)
+        if (a < b):
+            return -1
+        if (a > b):
+            return 1
+        return 0
+
+    def _options(self):
+        opts = super()._options()
+        opts.comparator = IntegerComparator()
+        return opts
+
+    def _compare(self, a: bytes, b: bytes) -> int:
+        return self.compare(a, b)
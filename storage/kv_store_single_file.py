@@ -1,7 +1,9 @@
 import os
 from hashlib import sha256
+from typing import Iterable, Tuple
 
 from storage.kv_store_file import KeyValueStorageFile
+from storage.store_utils import fsync_path
 
 
 class SingleFileStore(KeyValueStorageFile):
@@ -17,6 +19,15 @@ class SingleFileStore(KeyValueStorageFile):
                  open=True):
         self.delimiter = delimiter
         self.lineSep = lineSep
+        # Byte offsets of the lines of the file and the offset of the end of
+        # the last indexed line, built lazily when lines are read by their
+        # numbers with a separate reader of the file
+        self._offsets = []
+        self._indexedEnd = 0
+        # Data after the last line separator, it is a line too but not
+        # indexed since the line can continue
+        self._tail = b''
+        self._reader = None
         super().__init__(dbDir,
                          dbName,
                          isLineNoKey,
@@ -25,6 +36,17 @@ class SingleFileStore(KeyValueStorageFile):
                          open=open)
 
     def put(self, key, value):
+        self._write(key, value)
+        self._flush()
+
+    def setBatch(self, batch: Iterable[Tuple]):
+        # Entries are written at once, the file is flushed (and synced) only
+        # after the last one
+        for key, value in batch:
+            self._write(key, value)
+        self._flush()
+
+    def _write(self, key, value):
         # If line no is not treated as key then write the key and then the
         # delimiter
         if not self.isLineNoKey:
@@ -43,6 +65,7 @@ class SingleFileStore(KeyValueStorageFile):
             self.db_file.write(hexedHash)
         self.db_file.write(self.lineSep)
 
+    def _flush(self):
         # A little bit smart strategy like flush every 2 seconds
         # or every 10 writes or every 1 KB may be a better idea
         # Make sure data get written to the disk
@@ -56,7 +79,125 @@ class SingleFileStore(KeyValueStorageFile):
             # orders of magnitude. See testMeasureWriteTime
             os.fsync(self.db_file.fileno())
 
+    def sync(self):
+        # The file is flushed after every write, so only fsync is needed
+        try:
+            os.fsync(self.db_file.fileno())
+        except ValueError:
+            # Closed by the thread writing to the file
+            fsync_path(self.db_path)
+
+    def get(self, key):
+        if not self._isIndexable:
+            return super().get(key)
+        try:
+            lineNo = int(key)
+        except (TypeError, ValueError):
+            lineNo = 0
+        lines = self._readLines(lineNo, lineNo) if lineNo > 0 else []
+        if not lines:
+            raise KeyError("'{}' doesn't contain {} key".format(
+                self.db_file, str(key)))
+        return self._parse_line(lines[0], returnKey=False, key=str(key))
+
+    def iterator(self, start=None, end=None, include_key=True,
+                 include_value=True, prefix=None):
+        if not self._isIndexable or not (start or end):
+            return super().iterator(start, end, include_key, include_value,
+                                    prefix)
+        if not (include_key or include_value):
+            raise ValueError("At least one of includeKey or includeValue "
+                             "should be true")
+        self._is_valid_range(start, end)
+        return self._rangeIterator(start or 1, end, include_key,
+                                   include_value, prefix)
+
+    def _rangeIterator(self, start, end, returnKey, returnValue, prefix):
+        # Lines are read from the offset of the first one
+        for lineNo, line in enumerate(self._readLines(start, end), start):
+            yield self._parse_line(line, prefix, returnKey, returnValue,
+                                   str(lineNo))
+
+    @property
+    def size(self) -> int:
+        if not self._isIndexable:
+            return super().size
+        self._indexLines()
+        return len(self._offsets) + (1 if self._tail else 0)
+
+    @property
+    def _isIndexable(self) -> bool:
+        # Lines can be found by their numbers only when they are separated
+        return self.isLineNoKey and bool(self.lineSep)
+
+    @property
+    def _lineSepBytes(self) -> bytes:
+        return self.lineSep if isinstance(self.lineSep, bytes) \
+            else self.lineSep.encode()
+
+    def _indexLines(self):
+        """
+        Add the offsets of the lines written since the file was indexed last,
+        the file is read from the end of the last indexed line
+        """
+        if self._reader is None:
+            self._reader = open(self.db_path, mode="rb")
+        # Data written but still buffered is read as well
+        self.db_file.flush()
+        lineSep = self._lineSepBytes
+        self._reader.seek(self._indexedEnd)
+        data = self._reader.read()
+        # A line is indexed once its separator is written
+        last = data.rfind(lineSep)
+        last = last + len(lineSep) if last >= 0 else 0
+        data, self._tail = data[:last], data[last:].strip(lineSep)
+        pos = self._indexedEnd
+        for line in data.split(lineSep):
+            if line.strip(lineSep):
+                self._offsets.append(pos)
+            pos += len(line) + len(lineSep)
+        self._indexedEnd += len(data)
+
+    def _readLines(self, start, end=None):
+        """
+        Read the lines from number `start` to `end` (both included) at once,
+        from the offset of the first one
+        """
+        if end is None or end > len(self._offsets):
+            self._indexLines()
+        count = len(self._offsets)
+        lines = []
+        if start <= min(end or count, count):
+            last = count if end is None else min(end, count)
+            first = self._offsets[start - 1]
+            stop = self._offsets[last] if last < count else self._indexedEnd
+            self._reader.seek(first)
+            data = self._reader.read(stop - first)
+            lineSep = self._lineSepBytes
+            bounds = self._offsets[start - 1:last] + [stop]
+            lines = [data[b - first:e - first].strip(lineSep)
+                     for b, e in zip(bounds, bounds[1:])]
+        if self._tail and start <= count + 1 and \
+                (end is None or end > count):
+            lines.append(self._tail)
+        if not self.is_byte:
+            lines = [line.decode() for line in lines]
+        return lines
+
+    def _resetIndex(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        self._offsets = []
+        self._indexedEnd = 0
+        self._tail = b''
+
+    def open(self):
+        self._resetIndex()
+        super().open()
+
     def close(self):
+        self._resetIndex()
         self.db_file.close()
 
     @property
@@ -64,6 +205,7 @@ class SingleFileStore(KeyValueStorageFile):
         return self.db_file.closed
 
     def reset(self):
+        self._resetIndex()
         self.db_file.truncate(0)
 
     def drop(self):
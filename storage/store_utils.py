@@ -9,3 +9,15 @@ def cleanLines(source, lineSep=os.linesep):
     """
     stripped = (line.strip(lineSep) for line in source)
     return (line for line in stripped if len(line) != 0)
+
+
+def fsync_path(path):
+    """
+    Make the written contents of the file at `path` durable, the file does
+    not need to be open
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -5,6 +5,7 @@ import random
 from time import perf_counter
 
 import pytest
+from storage.binary_file_store import BinaryFileStore
 from storage.chunked_file_store import ChunkedFileStore
 from storage.text_file_store import TextFileStore
 
@@ -116,3 +117,84 @@ def test_get_range(populatedChunkedFileStore):
         for k, v in populatedChunkedFileStore.iterator(
                 start=frm, end=to):
             assert data[int(k) - 1] == v
+
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_random_reads_with_few_open_chunks(tempdir, binary):
+    def chunk_creator(name):
+        return BinaryFileStore(os.path.join(tempdir, "chunked_data"), name,
+                               isLineNoKey=True, storeContentHash=False,
+                               ensureDurability=False)
+
+    store = ChunkedFileStore(tempdir, "chunked_data", True, True, chunkSize,
+                             ensureDurability=False,
+                             chunk_creator=chunk_creator if binary else None,
+                             maxOpenChunks=2)
+    values = [d.encode() if binary else d for d in data]
+    for key, value in enumerate(values[:dataSize // 2], 1):
+        store.put(None, value)
+        # Lines written after a chunk was read are found as well
+        assert store.get(key) == value
+    store.setBatch((None, value) for value in values[dataSize // 2:])
+
+    for key in random.sample(range(1, dataSize + 1), dataSize):
+        assert store.get(key) == values[key - 1]
+        assert len(store._openChunks) <= 2
+    assert store.size == dataSize
+    assert [v for _, v in store.iterator(start=2, end=dataSize - 1)] == \
+        values[1:dataSize - 1]
+    with pytest.raises(KeyError):
+        store.get(dataSize + 1)
+
+    store.close()
+    assert not store._openChunks
+    store.open()
+    assert store.get(dataSize) == values[-1]
+    store.close()
+
+
+def test_sync_chunks_written_since_last_sync(tempdir, monkeypatch):
+    synced = []
+    monkeypatch.setattr('storage.chunked_file_store.fsync_path',
+                        synced.append)
+    monkeypatch.setattr(TextFileStore, 'sync',
+                        lambda self: synced.append(self.db_path))
+    store = ChunkedFileStore(tempdir, "chunked_data", True, True, chunkSize,
+                             ensureDurability=False)
+
+    def chunk_path(index):
+        return os.path.join(tempdir, "chunked_data", str(index))
+
+    store.setBatch((None, value) for value in data[:7])
+    store.sync()
+    assert synced == [chunk_path(1), chunk_path(4), chunk_path(7)]
+
+    synced.clear()
+    store.put(None, data[7])
+    store.sync()
+    assert synced == [chunk_path(7)]
+    store.close()
+
+
+def testMeasureRandomReadTime(tempdir):
+    store = ChunkedFileStore(tempdir, "chunked_data", True, False, 1000,
+                             ensureDurability=False)
+    store.setBatch((None, getValue(i)) for i in range(1, 10001))
+    keys = [random.randint(1, 10000) for _ in range(1000)]
+
+    start = perf_counter()
+    for key in keys:
+        # The chunk is opened and scanned for every read
+        chunkNo, offset = store._get_key_location(key)
+        with store._openChunk(chunkNo) as chunk:
+            next(itertools.islice(chunk._lines(), offset - 1, None))
+    scanTime = perf_counter() - start
+    start = perf_counter()
+    for key in keys:
+        assert store.get(key) == getValue(key)
+    indexedTime = perf_counter() - start
+    print("Time taken for {} random reads is {:.4f} seconds with a scan of "
+          "the chunk and {:.4f} seconds with open chunks and offsets".
+          format(len(keys), scanTime, indexedTime))
+    assert indexedTime < scanTime
+    store.close()
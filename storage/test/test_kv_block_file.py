@@ -0,0 +1,142 @@
+import os
+import random
+import string
+
+import pytest
+
+from storage.kv_store_block_file import KeyValueStorageBlockFile
+from storage.kv_store_leveldb_int_keys import KeyValueStorageLeveldbIntKeys
+
+
+def value(i):
+    return '{{"identifier": "cli{}", "reqId": {}, "op": "{}"}}'.format(
+        i, i, 'NYM' if i % 2 else 'ATTRIB').encode()
+
+
+@pytest.yield_fixture(scope="function")
+def kv(tempdir) -> KeyValueStorageBlockFile:
+    kv = KeyValueStorageBlockFile(tempdir, 'txns', blockSize=4)
+    yield kv
+    kv.close()
+
+
+def test_get_and_iterate(kv):
+    kv.put('1', value(1))
+    kv.setBatch((str(i), value(i)) for i in range(2, 11))
+    assert kv.size == 10
+    # Blocks of values 1 to 4 and 5 to 8, 9 and 10 are in the tail
+    assert len(kv._blockKeys) == 2
+    for i in range(1, 11):
+        assert kv.get(str(i)) == value(i)
+        assert kv.get(i) == value(i)
+    for key in ['0', '11', 'a']:
+        with pytest.raises(KeyError):
+            kv.get(key)
+
+    assert list(kv.iterator()) == \
+        [(str(i).encode(), value(i)) for i in range(1, 11)]
+    assert list(kv.iterator(start=3, end=9, include_key=False)) == \
+        [value(i) for i in range(3, 10)]
+    assert [int(k) for k in kv.iterator(start=6, include_value=False)] == \
+        list(range(6, 11))
+    assert [int(k) for k in kv.iterator(end=5, include_value=False)] == \
+        list(range(1, 6))
+
+
+def test_iterate_with_prefix(kv):
+    kv.setBatch((str(i), value(i)) for i in range(1, 131))
+    assert list(kv.iterator(prefix=b'1')) == \
+        [(str(i).encode(), value(i))
+         for i in range(1, 131) if str(i).startswith('1')]
+    assert [int(k) for k in kv.iterator(prefix='12',
+                                        include_value=False)] == \
+        [12] + list(range(120, 130))
+    assert [int(k) for k in kv.iterator(start=15, end=105, prefix='1',
+                                        include_value=False)] == \
+        [15, 16, 17, 18, 19, 100, 101, 102, 103, 104, 105]
+    for prefix in [b'131', b'0', b'01', b'a']:
+        assert list(kv.iterator(prefix=prefix)) == []
+
+
+def test_only_appends(kv):
+    kv.setBatch((str(i), value(i)) for i in range(1, 4))
+    with pytest.raises(ValueError):
+        kv.put('5', value(5))
+    with pytest.raises(ValueError):
+        kv.setBatch([('4', value(4)), ('4', value(4))])
+    assert kv.size == 3
+    with pytest.raises(ValueError):
+        kv.remove('1')
+    assert kv.get('1') == value(1)
+
+
+def test_reopen(kv):
+    kv.setBatch((str(i), value(i)) for i in range(1, 8))
+    kv.sync()
+    kv.close()
+    kv.open()
+    assert kv.size == 7
+    assert list(kv.iterator(include_key=False)) == \
+        [value(i) for i in range(1, 8)]
+    kv.put('8', value(8))
+    assert kv.get('8') == value(8)
+
+
+def test_recovers_from_partial_writes(kv):
+    kv.setBatch((str(i), value(i)) for i in range(1, 4))
+    tail = open(kv.tailPath, 'rb').read()
+    kv.put('4', value(4))
+    kv.put('5', value(5))
+    kv.close()
+
+    # The block of values 1 to 4 was not completely written and the tail was
+    # not truncated
+    with open(kv.blocksPath, 'r+b') as f:
+        f.truncate(os.path.getsize(kv.blocksPath) - 1)
+    with open(kv.tailPath, 'wb') as f:
+        f.write(tail + tail[:5])
+    kv.open()
+    assert kv.size == 3
+    assert list(kv.iterator(include_key=False)) == \
+        [value(i) for i in range(1, 4)]
+
+    # The block was written but not the tail
+    kv.setBatch((str(i), value(i)) for i in range(4, 7))
+    kv.close()
+    with open(kv.tailPath, 'wb') as f:
+        f.write(tail)
+    kv.open()
+    assert kv.size == 4
+    assert list(kv.iterator(include_key=False)) == \
+        [value(i) for i in range(1, 5)]
+
+
+def test_reset(kv):
+    kv.setBatch((str(i), value(i)) for i in range(1, 10))
+    kv.reset()
+    assert kv.size == 0
+    assert list(kv.iterator()) == []
+    kv.put('1', value(1))
+    assert kv.get('1') == value(1)
+
+
+def test_uses_less_disk_than_leveldb(tempdir):
+    count = 5000
+    values = [value(i) + ''.join(
+        random.choice(string.hexdigits) for _ in range(40)).encode()
+        for i in range(1, count + 1)]
+    blockFile = KeyValueStorageBlockFile(tempdir, 'block_file')
+    leveldb = KeyValueStorageLeveldbIntKeys(tempdir, 'leveldb')
+    for store in (blockFile, leveldb):
+        for i in range(0, count, 100):
+            store.setBatch((str(j), values[j - 1])
+                           for j in range(i + 1, i + 101))
+    leveldb.close()
+    blockFile.close()
+
+    def diskUse(path):
+        return sum(os.path.getsize(os.path.join(path, name))
+                   for name in os.listdir(path))
+
+    assert diskUse(blockFile.db_path) < \
+        0.6 * min(diskUse(leveldb.db_path), sum(map(len, values)))
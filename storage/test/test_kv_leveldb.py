@@ -27,6 +27,15 @@ def test_reopen(kv):
     assert b'v1' == v2
 
 
+def test_sync(kv):
+    kv.setBatch([('k1', 'v1'), ('k2', 'v2')])
+    kv.sync()
+    kv.close()
+
+    kv.open()
+    assert kv.get('k2') == b'v2'
+
+
 def test_drop(kv):
     kv.put('k1', 'v1')
     hasKeyBeforeDrop = 'k1' in kv
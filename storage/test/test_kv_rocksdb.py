@@ -0,0 +1,151 @@
+import os
+import random
+from hashlib import sha256
+from time import perf_counter
+
+import pytest
+
+pytest.importorskip('rocksdb')
+
+from storage.kv_store_leveldb import KeyValueStorageLeveldb  # noqa: E402
+from storage.kv_store_leveldb_int_keys import KeyValueStorageLeveldbIntKeys  # noqa: E402
+from storage.kv_store_rocksdb import KeyValueStorageRocksdb  # noqa: E402
+from storage.kv_store_rocksdb_int_keys import KeyValueStorageRocksdbIntKeys  # noqa: E402
+
+
+@pytest.yield_fixture(scope="function")
+def kv(tempdir) -> KeyValueStorageRocksdb:
+    kv = KeyValueStorageRocksdb(tempdir, 'kv')
+    yield kv
+    kv.close()
+
+
+def test_reopen(kv):
+    kv.put('k1', 'v1')
+    kv.sync()
+    kv.close()
+
+    kv.open()
+    assert kv.get('k1') == b'v1'
+
+
+def test_get_missing_key(kv):
+    with pytest.raises(KeyError):
+        kv.get('k1')
+    assert 'k1' not in kv
+
+
+def test_batches(kv):
+    kv.setBatch([('k1', 'v1'), (b'k2', b'v2'), ('k3', 'v3')])
+    assert kv.get(b'k2') == b'v2'
+    kv.removeBatch(['k1', 'k3'])
+    assert list(kv.iterator()) == [(b'k2', b'v2')]
+
+
+def test_drop(kv):
+    kv.put('k1', 'v1')
+    kv.drop()
+    kv.open()
+    assert 'k1' not in kv
+
+
+def test_iterator_range_and_prefix(tempdir):
+    kv = KeyValueStorageRocksdb(tempdir, 'kv', prefixLength=2)
+    kv.setBatch((key, key.upper())
+                for key in ['aa1', 'aa2', 'ab1', 'ba1', 'ba2', 'bb1'])
+    assert list(kv.iterator(prefix='ba')) == [(b'ba1', b'BA1'),
+                                              (b'ba2', b'BA2')]
+    assert list(kv.iterator(start='aa2', end='ba1', include_value=False)) == \
+        [b'aa2', b'ab1', b'ba1']
+    assert list(kv.iterator(start='ab', include_key=False)) == \
+        [b'AB1', b'BA1', b'BA2', b'BB1']
+    kv.close()
+
+
+def test_int_keys_ordered_as_integers(tempdir):
+    kv = KeyValueStorageRocksdbIntKeys(tempdir, 'txns')
+    kv.setBatch((i, str(i)) for i in range(1, 21))
+    assert [int(k) for k in kv.iterator(include_value=False)] == \
+        list(range(1, 21))
+    assert [int(v) for _, v in kv.iterator(start=9, end=11)] == [9, 10, 11]
+    kv.close()
+
+
+def test_snapshot_not_changed_by_later_writes(kv):
+    kv.setBatch([('k1', 'v1'), ('k2', 'v2')])
+    snapshot = kv.snapshot()
+    kv.put('k1', 'v3')
+    kv.put('k3', 'v3')
+    kv.remove('k2')
+
+    assert snapshot.get('k1') == b'v1'
+    with pytest.raises(KeyError):
+        snapshot.get('k3')
+    assert list(snapshot.iterator()) == [(b'k1', b'v1'), (b'k2', b'v2')]
+    assert list(kv.iterator()) == [(b'k1', b'v3'), (b'k3', b'v3')]
+
+
+def measure(store, write, read):
+    start = perf_counter()
+    write(store)
+    writeTime = perf_counter() - start
+    start = perf_counter()
+    read(store)
+    readTime = perf_counter() - start
+    store.close()
+    return writeTime, readTime
+
+
+def testMeasureWorkloads(tempdir):
+    count = 20000
+    batchSize = 100
+    txn = os.urandom(400)
+    hashes = [sha256(str(i).encode()).digest() for i in range(count)]
+
+    def writeLedger(store):
+        for i in range(1, count + 1, batchSize):
+            store.setBatch((j, txn) for j in range(i, i + batchSize))
+
+    def readLedger(store):
+        for i in range(1, count + 1, batchSize):
+            for _ in store.iterator(start=i, end=i + batchSize - 1):
+                pass
+
+    def writeState(store):
+        for i in range(0, count, batchSize):
+            store.setBatch((h, txn[:100]) for h in hashes[i:i + batchSize])
+
+    def readState(store):
+        for h in random.sample(hashes, count):
+            store.get(h)
+        # Reads of missing trie nodes
+        for i in range(count):
+            store._has_key(sha256(str(-i).encode()).digest())
+
+    def writeSeqNo(store):
+        for i in range(0, count, batchSize):
+            store.setBatch((h, str(i)) for h in hashes[i:i + batchSize])
+
+    def readSeqNo(store):
+        for h in random.sample(hashes, count):
+            store.get(h)
+
+    workloads = [
+        ('ledger', writeLedger, readLedger,
+         KeyValueStorageLeveldbIntKeys, KeyValueStorageRocksdbIntKeys, {}),
+        ('state', writeState, readState,
+         KeyValueStorageLeveldb, KeyValueStorageRocksdb,
+         {'prefixLength': 8}),
+        ('seqNo', writeSeqNo, readSeqNo,
+         KeyValueStorageLeveldb, KeyValueStorageRocksdb, {})]
+    for name, write, read, leveldbCls, rocksdbCls, options in workloads:
+        leveldbTimes = measure(leveldbCls(tempdir, name + '_leveldb'),
+                               write, read)
+        rocksdbTimes = measure(rocksdbCls(tempdir, name + '_rocksdb',
+                                          **options),
+                               write, read)
+        print("{} workload of {} keys: writes take {:.2f}s on LevelDB and "
+              "{:.2f}s on RocksDB, reads take {:.2f}s on LevelDB and {:.2f}s "
+              "on RocksDB".format(name, count, leveldbTimes[0],
+                                  rocksdbTimes[0], leveldbTimes[1],
+                                  rocksdbTimes[1]))
@@ -42,6 +42,9 @@ MAX_SOCKETS = 16384 if sys.platform != 'win32' else None
 ENABLE_HEARTBEATS = False
 HEARTBEAT_FREQ = 5      # seconds
 ZMQ_INTERNAL_QUEUE_SIZE = 0  # messages (0 - no limit)
+# Encode messages with msgpack instead of JSON for remotes which announced
+# they can decode them too, messages of any of the two are accepted anyway
+ENABLE_BINARY_CODEC = False
 
 
 # All messages exceeding the limit will be rejected without processing
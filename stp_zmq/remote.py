@@ -45,6 +45,12 @@ class Remote:
         self._isConnected = False
         self._lastConnectedAt = None
         self.config = config or getConfig()
+        # Whether messages to the remote are encoded with msgpack, set when
+        # the remote announces it can decode them
+        self.binaryCodec = False
+        # Whether this end announced it can decode msgpack on the current
+        # connection to the remote
+        self.codecAnnounced = False
 
         # Currently keeping uid field to resemble RAET RemoteEstate
         self.uid = name
@@ -59,6 +65,9 @@ class Remote:
         lost = self.hasLostConnection
         if lost:
             self._isConnected = False
+            # The remote may come back with another version, the codecs are
+            # announced again on the new connection
+            self.resetCodec()
             return False
         return True
 
@@ -104,6 +113,11 @@ class Remote:
                          'being called twice.'.format(self))
 
         self._isConnected = False
+        self.resetCodec()
+
+    def resetCodec(self):
+        self.binaryCodec = False
+        self.codecAnnounced = False
 
     @property
     def hasLostConnection(self):
@@ -0,0 +1,95 @@
+import pytest
+
+from stp_core.common.util import adict
+from stp_core.loop.eventually import eventually
+from stp_core.network.port_dispenser import genHa
+from stp_core.test.helper import Printer, prepStacks, chkPrinted
+from stp_zmq.test.helper import genKeys
+from stp_zmq.zstack import ZStack
+
+
+def create_stacks(tdir, looper, tconf, binary_codecs):
+    names = ['Alpha', 'Beta']
+    genKeys(tdir, names)
+    printers = [Printer(n) for n in names]
+    stacks = []
+    for name, printer, binary_codec in zip(names, printers, binary_codecs):
+        config = adict(**tconf.__dict__)
+        config.ENABLE_BINARY_CODEC = binary_codec
+        stacks.append(ZStack(name, ha=genHa(), basedirpath=tdir,
+                             msgHandler=printer.print, restricted=True,
+                             config=config))
+    prepStacks(looper, *stacks, connect=True, useKeys=True)
+    return stacks, printers
+
+
+def check_codecs(alpha, beta, alpha_binary, beta_binary):
+    assert alpha.getRemote(beta.name).binaryCodec is alpha_binary
+    assert beta.getRemote(alpha.name).binaryCodec is beta_binary
+
+
+def check_communicating(looper, alpha, beta, alphaP, betaP):
+    alpha.send({'greetings': 'hi'}, beta.name)
+    beta.send({'greetings': 'hello'}, alpha.name)
+    looper.run(eventually(chkPrinted, alphaP, {'greetings': 'hello'}))
+    looper.run(eventually(chkPrinted, betaP, {'greetings': 'hi'}))
+
+
+def test_binary_codec_used_when_both_support_it(tdir, looper, tconf):
+    (alpha, beta), (alphaP, betaP) = create_stacks(tdir, looper, tconf,
+                                                   (True, True))
+    looper.run(eventually(check_codecs, alpha, beta, True, True))
+    assert ZStack.isBinaryMsg(
+        alpha.prepare_to_send({'a': 1}, alpha.getRemote(beta.name)))
+    check_communicating(looper, alpha, beta, alphaP, betaP)
+
+
+@pytest.mark.parametrize('binary_codecs', [(True, False), (False, True)])
+def test_json_used_when_one_does_not_support_binary_codec(tdir, looper,
+                                                          tconf,
+                                                          binary_codecs):
+    (alpha, beta), (alphaP, betaP) = create_stacks(tdir, looper, tconf,
+                                                   binary_codecs)
+    looper.runFor(1)
+    check_codecs(alpha, beta, False, False)
+    check_communicating(looper, alpha, beta, alphaP, betaP)
+
+
+def test_binary_codec_not_used_after_remote_disconnect(tdir, looper, tconf):
+    (alpha, beta), _ = create_stacks(tdir, looper, tconf, (True, True))
+    looper.run(eventually(check_codecs, alpha, beta, True, True))
+    alpha.getRemote(beta.name).disconnect()
+    assert alpha.getRemote(beta.name).binaryCodec is False
+    assert alpha.getRemote(beta.name).codecAnnounced is False
+
+
+def test_binary_codec_announced_once_to_remote_without_it(tdir, looper,
+                                                          tconf):
+    (alpha, beta), _ = create_stacks(tdir, looper, tconf, (True, False))
+    looper.runFor(1)
+    assert alpha.getRemote(beta.name).codecAnnounced is True
+
+    sent = []
+    send = alpha.send
+
+    def recording_send(msg, *args, **kwargs):
+        sent.append(msg)
+        return send(msg, *args, **kwargs)
+
+    alpha.send = recording_send
+    alpha.send_heartbeats()
+    beta.send_heartbeats()
+    looper.runFor(1)
+    assert ZStack.pingMessage in sent and ZStack.pongMessage in sent
+    assert ZStack.binaryCodecMessage not in sent
+
+
+def test_binary_msg_serialization():
+    msg = {'op': 'BATCH', 'messages': [b'{"a": 1}', b'pi'], 'signature': None}
+    serialized = ZStack.serializeBinaryMsg(msg)
+    assert ZStack.isBinaryMsg(serialized)
+    assert ZStack.deserializeMsg(serialized) == msg
+    assert not ZStack.isBinaryMsg(ZStack.serializeMsg({'a': 1}))
+    assert ZStack.serializeBinaryMsg(ZStack.pingMessage) == b'pi'
+    assert not ZStack.isBinaryMsg(b'pi')
+    assert not ZStack.isBinaryMsg(b'')
@@ -17,6 +17,7 @@ from collections import deque
 from typing import Mapping, Tuple, Any, Union
 
 # import stp_zmq.asyncio
+import msgpack
 import zmq.auth
 from stp_core.crypto.nacl_wrappers import Signer, Verifier
 from stp_core.crypto.util import isHex, ed25519PkToCurve25519
@@ -49,7 +50,11 @@ class ZStack(NetworkInterface):
     sigLen = 64
     pingMessage = 'pi'
     pongMessage = 'po'
-    healthMessages = {pingMessage.encode(), pongMessage.encode()}
+    # Sent along with ping and pong by a stack which can receive messages
+    # encoded with msgpack
+    binaryCodecMessage = 'bc'
+    healthMessages = {pingMessage.encode(), pongMessage.encode(),
+                      binaryCodecMessage.encode()}
 
     # TODO: This is not implemented, implement this
     messageTimeout = 3
@@ -67,6 +72,7 @@ class ZStack(NetworkInterface):
         self.listenerQuota = self.config.DEFAULT_LISTENER_QUOTA
         self.senderQuota = self.config.DEFAULT_SENDER_QUOTA
         self.msgLenVal = MessageLenValidator(self.config.MSG_LEN_LIMIT)
+        self.binaryCodec = self.config.ENABLE_BINARY_CODEC
 
         self.homeDir = None
         # As of now there would be only one file in secretKeysDir and sigKeyDir
@@ -444,7 +450,8 @@ class ZStack(NetworkInterface):
     def _verifyAndAppend(self, msg, ident):
         try:
             self.msgLenVal.validate(msg)
-            decoded = msg.decode()
+            # Messages encoded with msgpack are kept as bytes
+            decoded = msg if self.isBinaryMsg(msg) else msg.decode()
         except (UnicodeDecodeError, InvalidMessageExceedingSizeException) as ex:
             errstr = 'Message will be discarded due to {}'.format(ex)
             frm = self.remotesByKeys[ident].name if ident in self.remotesByKeys else ident
@@ -641,6 +648,7 @@ class ZStack(NetworkInterface):
         action = 'ping' if is_ping else 'pong'
         name = remote if isinstance(remote, (str, bytes)) else remote.name
         r = self.send(msg, name)
+        self.announceBinaryCodec(name)
         if r[0] is True:
             logger.debug('{} {}ed {}'.format(self.name, action, name))
         elif r[0] is False:
@@ -658,6 +666,20 @@ class ZStack(NetworkInterface):
         return r[0]
 
     def handlePingPong(self, msg, frm, ident):
+        if isinstance(msg, bytes):
+            # Health messages in a batch encoded with msgpack
+            if msg not in self.healthMessages:
+                return False
+            msg = msg.decode()
+        if msg == self.binaryCodecMessage:
+            remote = self.remotesByKeys.get(ident)
+            if self.binaryCodec and remote is not None and \
+                    not remote.binaryCodec:
+                remote.binaryCodec = True
+                logger.debug('{} will send messages encoded with msgpack '
+                             'to {}'.format(self, frm))
+                self.announceBinaryCodec(remote.name)
+            return True
         if msg in (self.pingMessage, self.pongMessage):
             if msg == self.pingMessage:
                 logger.debug('{} got ping from {}'.format(self, frm))
@@ -670,6 +692,21 @@ class ZStack(NetworkInterface):
             return True
         return False
 
+    def announceBinaryCodec(self, name):
+        """
+        Tell the remote this stack can decode messages encoded with msgpack.
+        Older versions fail to parse the announcement, so it is made once per
+        connection and repeated only to remotes which announced it too, in
+        case they were restarted without dropping the connection.
+        """
+        remote = self.remotes.get(name)
+        if not self.binaryCodec or remote is None:
+            return
+        if remote.codecAnnounced and not remote.binaryCodec:
+            return
+        remote.codecAnnounced = True
+        self.send(self.binaryCodecMessage, name)
+
     def send_heartbeats(self):
         # Sends heartbeat (ping) to all
         logger.debug('{} sending heartbeat to all remotes'.format(self))
@@ -685,16 +722,21 @@ class ZStack(NetworkInterface):
                 r = []
                 e = []
                 # Serializing beforehand since to avoid serializing for each
-                # remote
-                try:
-                    msg = self.prepare_to_send(msg)
-                except InvalidMessageExceedingSizeException as ex:
-                    err_str = '{}Cannot send message. Error {}'.format(
-                        CONNECTION_PREFIX, ex)
-                    logger.error(err_str)
-                    return False, err_str
-                for uid in self.remotes:
-                    res, err = self.transmit(msg, uid, serialized=True)
+                # remote, once for every codec used by the remotes
+                serialized = {}
+                for uid, remote in self.remotes.items():
+                    serializer = self.serializerFor(remote)
+                    if serializer not in serialized:
+                        try:
+                            serialized[serializer] = \
+                                self.prepare_to_send(msg, remote)
+                        except InvalidMessageExceedingSizeException as ex:
+                            err_str = '{}Cannot send message. Error {}'.format(
+                                CONNECTION_PREFIX, ex)
+                            logger.error(err_str)
+                            return False, err_str
+                    res, err = self.transmit(serialized[serializer], uid,
+                                             serialized=True)
                     r.append(res)
                     e.append(err)
                 e = list(filter(lambda x: x is not None, e))
@@ -716,7 +758,7 @@ class ZStack(NetworkInterface):
             return False, err_str
         try:
             if not serialized:
-                msg = self.prepare_to_send(msg)
+                msg = self.prepare_to_send(msg, remote)
             # socket.send(self.signedMsg(msg), flags=zmq.NOBLOCK)
             socket.send(msg, flags=zmq.NOBLOCK)
             logger.debug('{} transmitting message {} to {}'
@@ -777,13 +819,39 @@ class ZStack(NetworkInterface):
         assert isinstance(msg, bytes)
         return msg
 
+    @staticmethod
+    def serializeBinaryMsg(msg):
+        if isinstance(msg, Mapping):
+            # Serialized messages nested in the message (like in a batch)
+            # are kept as bytes
+            return msgpack.packb(msg, use_bin_type=True)
+        return ZStack.serializeMsg(msg)
+
+    @staticmethod
+    def isBinaryMsg(msg):
+        # A message encoded with msgpack is a map which starts with a byte
+        # greater than 0x7f, while JSON text and health messages are ASCII
+        return isinstance(msg, bytes) and len(msg) > 0 and msg[0] > 0x7f
+
     @staticmethod
     def deserializeMsg(msg):
+        if ZStack.isBinaryMsg(msg):
+            return msgpack.unpackb(msg, raw=False)
         if isinstance(msg, bytes):
             msg = msg.decode()
         msg = json.loads(msg)
         return msg
 
+    def serializerFor(self, remote: Remote=None):
+        """
+        Return the function serializing messages for the given remote, the
+        remote gets messages encoded with msgpack only if it announced it
+        can decode them.
+        """
+        if remote is not None and remote.binaryCodec:
+            return self.serializeBinaryMsg
+        return self.serializeMsg
+
     def signedMsg(self, msg: bytes, signer: Signer=None):
         sig = self.signer.signature(msg)
         return msg + sig
@@ -951,8 +1019,8 @@ class ZStack(NetworkInterface):
     def clearRemoteKeeps(self):
         pass
 
-    def prepare_to_send(self, msg: Any):
-        msg_bytes = self.serializeMsg(msg)
+    def prepare_to_send(self, msg: Any, remote: Remote=None):
+        msg_bytes = self.serializerFor(remote)(msg)
         self.msgLenVal.validate(msg_bytes)
         return msg_bytes
 